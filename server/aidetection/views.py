@@ -83,6 +83,8 @@ def get_ai_detection_data(request):
                     "fine_amount": violation.get("fine_amount", 0),
                     "location": violation.get("location", ""),
                     "evidence_photo": violation.get("evidence_photo", ""),
+                    "evidence_thumbnail": (violation.get("evidence_urls") or {}).get("thumbnail", ""),
+                    "evidence_medium": (violation.get("evidence_urls") or {}).get("medium", ""),
                     "status": violation.get("status", "pending"),
                     "confidence": violation.get("confidence", random.randint(85, 99)),
                     "created_at": violation.get("created_at", datetime.now()).isoformat(),
@@ -330,6 +332,7 @@ def get_violation_details(request, violation_id):
                     "fine_amount": violation.get("fine_amount", 0),
                     "location": violation.get("location", ""),
                     "evidence_photo": violation.get("evidence_photo", ""),
+                    "evidence_medium": (violation.get("evidence_urls") or {}).get("medium", ""),
                     "status": violation.get("status", "pending"),
                     "confidence": violation.get("confidence", random.randint(85, 99)),
                     "created_at": violation.get("created_at", datetime.now()).isoformat(),
@@ -1,6 +1,23 @@
 # AI Models Package
-from .helmet_detector import HelmetDetector
-from .plate_reader import PlateReader
-from .violation_processor import ViolationProcessor
+# Model classes are imported on first access so that importing a submodule
+# (e.g. the model server client) does not pull in torch, ultralytics or EasyOCR.
+import importlib
 
-__all__ = ['HelmetDetector', 'PlateReader', 'ViolationProcessor']
\ No newline at end of file
+_EXPORTS = {
+    'HelmetDetector': '.helmet_detector',
+    'ModelCascade': '.model_cascade',
+    'BatchInferenceService': '.batch_inference',
+    'PlateReader': '.plate_reader',
+    'ViolationProcessor': '.violation_processor',
+    'ModelServer': '.model_server',
+    'ModelClient': '.model_server'
+}
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+
+
+__all__ = list(_EXPORTS)
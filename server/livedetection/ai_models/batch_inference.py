@@ -0,0 +1,217 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from ..utils.frame import load_frame_image
+
+
+class _PendingFrame:
+    """A frame waiting in the batching queue together with its caller's future"""
+
+    __slots__ = ('image', 'future', 'enqueued_at')
+
+    def __init__(self, image, future):
+        self.image = image
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class BatchInferenceService:
+    def __init__(self, detector, max_batch_size=8, max_wait_ms=10, stats_window=500):
+        """
+        Collect concurrent detection requests into batched forward passes
+
+        Args:
+            detector: HelmetDetector (anything with detect_batch and _empty_result)
+            max_batch_size (int): Maximum frames per forward pass
+            max_wait_ms (float): How long the first frame of a batch waits for company
+            stats_window (int): Number of recent batches kept for statistics
+        """
+        self.detector = detector
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self._running = False
+
+        # Batch statistics
+        self._batch_stats = deque(maxlen=stats_window)
+        self._total_batches = 0
+        self._total_frames = 0
+
+    def start(self):
+        """Start the batching worker thread"""
+        with self._lock:
+            if self._running:
+                return
+
+            self._running = True
+            self._worker = threading.Thread(
+                target=self._run, name='helmet-batch-inference', daemon=True
+            )
+            self._worker.start()
+
+    def stop(self, timeout=5.0):
+        """Stop the worker thread after it drains the frames already queued"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+
+        self._queue.put(None)
+        if self._worker is not None:
+            self._worker.join(timeout)
+        self._worker = None
+
+    def submit(self, image):
+        """
+        Queue an image for batched detection
+
+        Args:
+            image: Frame, OpenCV image array or path to the image file
+
+        Returns:
+            concurrent.futures.Future: Resolves to the detection result dict
+        """
+        future = Future()
+
+        # Decode in the caller's thread so decoding runs in parallel with inference
+        frame = load_frame_image(image)
+
+        if frame is None:
+            print(f"Could not load image for batched detection: {image}")
+            future.set_result(self.detector._empty_result())
+            return future
+
+        if not self._running:
+            self.start()
+
+        self._queue.put(_PendingFrame(frame, future))
+        return future
+
+    def detect(self, image, timeout=None):
+        """
+        Detect persons, helmets, and vehicles, sharing the forward pass with concurrent callers
+
+        Args:
+            image: Frame, OpenCV image array or path to the image file
+            timeout (float): Seconds to wait for the result
+
+        Returns:
+            dict: Detection results for this image only
+        """
+        return self.submit(image).result(timeout)
+
+    def _run(self):
+        """Worker loop: gather a batch, run it, hand results back"""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            stop_requested = False
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop_requested = True
+                    break
+                batch.append(item)
+
+            self._process_batch(batch)
+
+            if stop_requested:
+                break
+
+    def _process_batch(self, batch):
+        """Run one forward pass for the batch and resolve every caller's future"""
+        started = time.monotonic()
+
+        try:
+            results = self.detector.detect_batch([item.image for item in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Detector returned {len(results)} results for {len(batch)} frames")
+        except Exception as e:
+            print(f"Error in batched inference: {e}")
+            results = [self.detector._empty_result() for _ in batch]
+
+        finished = time.monotonic()
+
+        for item, result in zip(batch, results):
+            if not item.future.done():
+                item.future.set_result(result)
+
+        queue_waits = [(started - item.enqueued_at) * 1000 for item in batch]
+        with self._lock:
+            self._total_batches += 1
+            self._total_frames += len(batch)
+            self._batch_stats.append({
+                'size': len(batch),
+                'inference_ms': (finished - started) * 1000,
+                'max_queue_wait_ms': max(queue_waits),
+                'mean_queue_wait_ms': sum(queue_waits) / len(queue_waits)
+            })
+
+    def get_stats(self):
+        """
+        Get batch size and latency statistics over the recent window
+
+        Returns:
+            dict: Batching statistics
+        """
+        with self._lock:
+            recent = list(self._batch_stats)
+            total_batches = self._total_batches
+            total_frames = self._total_frames
+
+        stats = {
+            'running': self._running,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'queue_depth': self._queue.qsize(),
+            'total_batches': total_batches,
+            'total_frames': total_frames,
+            'window_batches': len(recent)
+        }
+
+        if not recent:
+            return stats
+
+        sizes = np.array([b['size'] for b in recent])
+        inference_ms = np.array([b['inference_ms'] for b in recent])
+        queue_wait_ms = np.array([b['max_queue_wait_ms'] for b in recent])
+
+        stats.update({
+            'mean_batch_size': round(float(sizes.mean()), 2),
+            'batch_size_histogram': {
+                str(size): int(count) for size, count in zip(*np.unique(sizes, return_counts=True))
+            },
+            'inference_ms': self._percentiles(inference_ms),
+            'per_frame_inference_ms': round(float(inference_ms.sum() / sizes.sum()), 2),
+            'queue_wait_ms': self._percentiles(queue_wait_ms)
+        })
+
+        return stats
+
+    def _percentiles(self, values):
+        """Summarise latency values as mean/p50/p95/max"""
+        return {
+            'mean': round(float(values.mean()), 2),
+            'p50': round(float(np.percentile(values, 50)), 2),
+            'p95': round(float(np.percentile(values, 95)), 2),
+            'max': round(float(values.max()), 2)
+        }
@@ -1,24 +1,73 @@
 import cv2
 import numpy as np
-import torch
 from ultralytics import YOLO
 import os
 from pathlib import Path
 
+from ..config.model_config import MODEL_CONFIG, resolve_device
+from ..utils.frame import Frame, load_frame_image
+from ..utils.box_utils import as_boxes, array_to_bbox, iou_matrix, ioa_matrix, nms
+from .inference_backends import get_backend
+
+def tile_grid(shape, tile_size, overlap):
+    """
+    Overlapping tiles covering an image, the last row/column flush with the edge
+    
+    Returns:
+        list: (x1, y1, x2, y2) tiles
+    """
+    height, width = shape[:2]
+    step = max(1, int(tile_size * (1 - overlap)))
+    
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, step))
+        return positions + [length - tile_size]
+    
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in starts(height) for x in starts(width)
+    ]
+
+def tile_motion(motion_mask, tile, shape):
+    """Changed-pixel share of a tile, 1.0 when there is no motion mask"""
+    if motion_mask is None:
+        return 1.0
+    
+    scale_y = motion_mask.shape[0] / float(shape[0])
+    scale_x = motion_mask.shape[1] / float(shape[1])
+    x1, y1, x2, y2 = tile
+    region = motion_mask[int(y1 * scale_y):max(int(y2 * scale_y), int(y1 * scale_y) + 1),
+                         int(x1 * scale_x):max(int(x2 * scale_x), int(x1 * scale_x) + 1)]
+    return float(np.count_nonzero(region)) / region.size if region.size else 0.0
+
 class HelmetDetector:
-    def __init__(self):
-        """Initialize helmet detection model"""
+    def __init__(self, backend=None, model_path=None, confidence_threshold=0.5):
+        """
+        Initialize helmet detection model
+        
+        Args:
+            backend (str): Inference backend ('torch', 'onnx', 'openvino'),
+                defaults to MODEL_CONFIG['INFERENCE']['BACKEND']
+            model_path: Custom weights, defaults to weights/helmet_detection.pt
+            confidence_threshold (float): Minimum box confidence
+        """
         self.base_dir = Path(__file__).parent.parent
         self.weights_dir = self.base_dir / "weights"
-        self.model_path = self.weights_dir / "helmet_detection.pt"
+        self.model_path = Path(model_path) if model_path else self.weights_dir / "helmet_detection.pt"
         
         # Create weights directory if it doesn't exist
         self.weights_dir.mkdir(exist_ok=True)
         
         # Detection parameters
-        self.confidence_threshold = 0.5
+        self.confidence_threshold = confidence_threshold
         self.iou_threshold = 0.45
-        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.device = resolve_device()
+        self.backend_name = backend or MODEL_CONFIG['INFERENCE']['BACKEND']
+        self.precision = MODEL_CONFIG['INFERENCE']['PRECISION']
+        self.backend = None
+        self.max_batch_size = None  # Set when the model graph has a fixed batch size
         
         # Class mappings based on your data.yaml
         self.class_names = {
@@ -28,6 +77,14 @@ class HelmetDetector:
             3: 'motorcycle',
             4: 'license_plate'
         }
+        self.class_ids = {name: class_id for class_id, name in self.class_names.items()}
+        
+        # Rider association rules
+        spatial_rules = MODEL_CONFIG['VIOLATION_RULES']['SPATIAL_CONSTRAINTS']
+        self.rider_overlap_threshold = spatial_rules['OVERLAP_THRESHOLD']
+        self.head_region_fraction = spatial_rules['HEAD_REGION_FRACTION']
+        self.helmet_iou_threshold = spatial_rules['HELMET_HEAD_IOU']
+        self.vehicle_required = MODEL_CONFIG['VIOLATION_RULES']['HELMET_DETECTION']['VEHICLE_REQUIRED']
         
         self.model = None
         self.load_model()
@@ -36,26 +93,60 @@ class HelmetDetector:
         """Load the helmet detection model"""
         try:
             if os.path.exists(self.model_path):
-                # Load custom trained model
-                self.model = YOLO(str(self.model_path))
-                print(f"Loaded custom helmet detection model from {self.model_path}")
+                # Load custom trained model on the configured backend
+                self.backend = get_backend(self.backend_name, self.model_path, self.device, self.precision)
+                if not self.backend.is_available() and self.precision != 'fp32':
+                    print(f"No promoted {self.precision} model at {self.backend.artifact_path}, using fp32")
+                    self.backend = get_backend(self.backend_name, self.model_path, self.device)
+                if not self.backend.is_available():
+                    print(f"{self.backend_name} backend unavailable ({self.backend.artifact_path} or runtime missing), using torch")
+                    self.backend = get_backend('torch', self.model_path, self.device)
+                
+                self.model = self.backend.load()
+                print(f"Loaded custom helmet detection model from {self.backend.artifact_path} ({self.backend.name})")
+                self._check_batch_size()
             else:
                 # Fallback to YOLOv8 general model for initial testing
+                self.backend = get_backend('torch', 'yolov8n.pt', self.device)
                 self.model = YOLO('yolov8n.pt')
+                self.model.to(self.device)
                 print("Using YOLOv8 general model - train custom model for better results")
-                
-            self.model.to(self.device)
             
         except Exception as e:
             print(f"Error loading helmet detection model: {e}")
             self.model = None
     
+    def _check_batch_size(self):
+        """Split batches when the exported graph only takes a fixed batch size"""
+        try:
+            self.max_batch_size = self.backend.static_batch_size()
+        except Exception as e:
+            print(f"Could not read the batch size of {self.backend.artifact_path}: {e}")
+            self.max_batch_size = None
+        
+        if self.max_batch_size:
+            print(
+                f"{self.backend.artifact_path} has a fixed batch size of {self.max_batch_size}; "
+                f"batches are split (re-export with dynamic axes to batch)"
+            )
+    
+    def _run_model(self, images, conf=None):
+        """Forward pass over a list of images, in chunks the model graph accepts"""
+        conf = self.confidence_threshold if conf is None else conf
+        images = list(images)
+        step = self.max_batch_size or len(images) or 1
+        
+        results = []
+        for start in range(0, len(images), step):
+            results.extend(self.model(images[start:start + step], conf=conf, iou=self.iou_threshold))
+        return results
+    
     def detect(self, image_path):
         """
         Detect persons, helmets, and vehicles in image
         
         Args:
-            image_path (str): Path to the image file
+            image_path: Frame, OpenCV image array or path to the image file
             
         Returns:
             dict: Detection results with bounding boxes and confidence scores
@@ -64,8 +155,8 @@ class HelmetDetector:
             return self._empty_result()
             
         try:
-            # Load image
-            image = cv2.imread(image_path)
+            # Load image (already decoded for frames and arrays)
+            image = load_frame_image(image_path)
             if image is None:
                 raise ValueError(f"Could not load image from {image_path}")
             
@@ -81,120 +172,260 @@ class HelmetDetector:
             print(f"Error in helmet detection: {e}")
             return self._empty_result()
     
-    def _iou(self, boxA, boxB):
-        # Compute intersection over union between two boxes
-        xA = max(boxA['x1'], boxB['x1'])
-        yA = max(boxA['y1'], boxB['y1'])
-        xB = min(boxA['x2'], boxB['x2'])
-        yB = min(boxA['y2'], boxB['y2'])
-        interArea = max(0, xB - xA) * max(0, yB - yA)
-        boxAArea = (boxA['x2'] - boxA['x1']) * (boxA['y2'] - boxA['y1'])
-        boxBArea = (boxB['x2'] - boxB['x1']) * (boxB['y2'] - boxB['y1'])
-        iou = interArea / float(boxAArea + boxBArea - interArea + 1e-6)
-        return iou
-
-    def _process_detections(self, result, image_shape):
-        """Process YOLO detection results"""
-        h, w, _ = image_shape
+    def detect_batch(self, images):
+        """
+        Detect persons, helmets, and vehicles in several images with one forward pass
         
-        detection_data = {
-            'person_detected': False,
-            'person_confidence': 0.0,
-            'person_bbox': {},
+        Args:
+            images (list): OpenCV image arrays
             
-            'helmet_detected': False,
-            'helmet_confidence': 0.0,
-            'helmet_bbox': {},
+        Returns:
+            list: One detection result dict per input image, in input order
+        """
+        if self.model is None or not images:
+            return [self._empty_result() for _ in images]
+        
+        try:
+            # Run batched inference
+            results = self._run_model(images)
             
-            'vehicle_detected': False,
-            'vehicle_type': '',
-            'vehicle_confidence': 0.0,
-            'vehicle_bbox': {},
+            return [
+                self._process_detections(result, image.shape)
+                for result, image in zip(results, images)
+            ]
             
-            'all_detections': []
-        }
+        except Exception as e:
+            print(f"Error in batched helmet detection: {e}")
+            return [self._empty_result() for _ in images]
+    
+    def detect_tiled(self, image_path, tiling=None, motion_mask=None):
+        """
+        Detect small, distant objects by running the model on overlapping tiles
         
+        Tiles without motion are skipped, the remaining tiles (plus the
+        downscaled full frame) go through one batched forward pass, and
+        boxes cut by tile edges are merged with cross-tile NMS.
+        
+        Args:
+            image_path: Frame, OpenCV image array or path to the image file
+            tiling (dict): TILING settings, defaults to MODEL_CONFIG['TILING']
+            motion_mask: Changed-pixel mask at any scale (taken from the frame when not given);
+                None runs every tile
+            
+        Returns:
+            dict: Detection results in full-frame coordinates, with tile counters under 'tiling'
+        """
+        if self.model is None:
+            return self._empty_result()
+        
+        tiling = tiling or MODEL_CONFIG['TILING']
+        if motion_mask is None and isinstance(image_path, Frame):
+            motion_mask = image_path.motion_mask
+        
+        try:
+            image = load_frame_image(image_path)
+            if image is None:
+                raise ValueError(f"Could not load image from {image_path}")
+            
+            tiles = tile_grid(image.shape, tiling['TILE_SIZE'], tiling['OVERLAP'])
+            if len(tiles) == 1:
+                return self.detect(image)
+            
+            active = [
+                tile for tile in tiles
+                if tile_motion(motion_mask, tile, image.shape) >= tiling['MIN_TILE_MOTION']
+            ]
+            inputs = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in active]
+            origins = [(x1, y1) for x1, y1, _, _ in active]
+            if tiling['FULL_FRAME_PASS']:
+                inputs.append(image)
+                origins.append((0, 0))
+            
+            boxes, scores, classes = [np.zeros((0, 4))], [np.zeros(0)], [np.zeros(0, dtype=int)]
+            if inputs:
+                # One forward pass for every tile that moved
+                results = self._run_model(inputs)
+                for result, (dx, dy) in zip(results, origins):
+                    if result.boxes is None or not len(result.boxes):
+                        continue
+                    found = result.boxes.cpu().numpy()
+                    boxes.append(found.xyxy + [dx, dy, dx, dy])
+                    scores.append(found.conf)
+                    classes.append(found.cls.astype(int))
+            
+            xyxy, conf, cls = np.concatenate(boxes), np.concatenate(scores), np.concatenate(classes)
+            keep = nms(xyxy, conf, tiling['MERGE_IOS_THRESHOLD'], classes=cls, metric='ios')
+            
+            detection_result = self._build_detection_data(xyxy[keep], conf[keep], cls[keep], image.shape)
+            detection_result['tiling'] = {
+                'tiles': len(tiles),
+                'tiles_run': len(active),
+                'tiles_skipped': len(tiles) - len(active)
+            }
+            return detection_result
+            
+        except Exception as e:
+            print(f"Error in tiled helmet detection: {e}")
+            return self._empty_result()
+    
+    def predict_arrays(self, images, conf=None):
+        """
+        Raw boxes for several images with one forward pass, before any post-processing
+        
+        Args:
+            images (list): OpenCV image arrays
+            conf (float): Confidence floor, defaults to confidence_threshold
+            
+        Returns:
+            list: (xyxy, conf, cls) arrays per image
+        """
+        results = self._run_model(images, conf)
+        return [self._result_arrays(result) for result in results]
+    
+    def _result_arrays(self, result):
+        """(xyxy, conf, cls) arrays of one YOLO result"""
         if result.boxes is not None and len(result.boxes) > 0:
             boxes = result.boxes.cpu().numpy()
+            return boxes.xyxy, boxes.conf, boxes.cls.astype(int)
+        return np.zeros((0, 4)), np.zeros(0), np.zeros(0, dtype=int)
+    
+    def _process_detections(self, result, image_shape):
+        """Process YOLO detection results"""
+        xyxy, conf, cls = self._result_arrays(result)
+        return self._build_detection_data(xyxy, conf, cls, image_shape)
+    
+    def _build_detection_data(self, xyxy, conf, cls, image_shape):
+        """
+        Build the detection result from raw box arrays
+        
+        Args:
+            xyxy: (N, 4) box corners
+            conf: (N,) confidences
+            cls: (N,) class ids
+            image_shape: Shape of the image the boxes belong to
             
-            for box in boxes:
-                class_id = int(box.cls[0])
-                confidence = float(box.conf[0])
-                x1, y1, x2, y2 = box.xyxy[0].astype(int)
-                
-                # Normalize coordinates
-                bbox = {
-                    'x1': int(x1), 'y1': int(y1),
-                    'x2': int(x2), 'y2': int(y2),
-                    'confidence': confidence,
-                    'width': int(x2 - x1),
-                    'height': int(y2 - y1)
-                }
-                
-                class_name = self.class_names.get(class_id, 'unknown')
-                
-                # Store detection
-                detection_data['all_detections'].append({
-                    'class_id': class_id,
-                    'class_name': class_name,
-                    'confidence': confidence,
-                    'bbox': bbox
-                })
-                
-                # Process by class type
-                if class_name == 'person':
-                    if confidence > detection_data['person_confidence']:
-                        detection_data['person_detected'] = True
-                        detection_data['person_confidence'] = confidence
-                        detection_data['person_bbox'] = bbox
-                
-                elif class_name == 'helmet':
-                    # Just collect, don't set helmet_detected here
-                    pass
-                
-                elif class_name == 'motorcycle':
-                    if confidence > detection_data['vehicle_confidence']:
-                        detection_data['vehicle_detected'] = True
-                        detection_data['vehicle_type'] = 'motorcycle'
-                        detection_data['vehicle_confidence'] = confidence
-                        detection_data['vehicle_bbox'] = bbox
-
-        # --- Helmet-on-person logic ---
-        persons = [d for d in detection_data['all_detections'] if d['class_name'] == 'person']
-        helmets = [d for d in detection_data['all_detections'] if d['class_name'] == 'helmet']
-
-        helmet_on_person = False
-        for person in persons:
-            person_bbox = person['bbox']
-            # Define head region (upper 40% of person bbox)
-            head_bbox = {
-                'x1': person_bbox['x1'],
-                'y1': person_bbox['y1'],
-                'x2': person_bbox['x2'],
-                'y2': person_bbox['y1'] + int(0.4 * person_bbox['height']),
-                'width': person_bbox['width'],
-                'height': int(0.4 * person_bbox['height'])
+        Returns:
+            dict: Detection results, including a helmet verdict per rider
+        """
+        xyxy = as_boxes(xyxy)
+        conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+        cls = np.asarray(cls, dtype=int).reshape(-1)
+        
+        detection_data = self._empty_result()
+        detection_data['all_detections'] = [
+            {
+                'class_id': class_id,
+                'class_name': self.class_names.get(class_id, 'unknown'),
+                'confidence': confidence,
+                'bbox': array_to_bbox(box, confidence)
             }
-            for helmet in helmets:
-                if self._iou(head_bbox, helmet['bbox']) > 0.4:
-                    helmet_on_person = True
-                    detection_data['helmet_detected'] = True
-                    detection_data['helmet_confidence'] = helmet['confidence']
-                    detection_data['helmet_bbox'] = helmet['bbox']
-                    break
-            if helmet_on_person:
-                break
-        if not helmet_on_person:
-            detection_data['helmet_detected'] = False
-            detection_data['helmet_confidence'] = 0.0
-            detection_data['helmet_bbox'] = {}
-
+            for box, confidence, class_id in zip(xyxy.tolist(), conf.tolist(), cls.tolist())
+        ]
+        
+        person_idx = np.flatnonzero(cls == self.class_ids['person'])
+        helmet_idx = np.flatnonzero(cls == self.class_ids['helmet'])
+        no_helmet_idx = np.flatnonzero(cls == self.class_ids['no_helmet'])
+        motorcycle_idx = np.flatnonzero(cls == self.class_ids['motorcycle'])
+        
+        # Highest-confidence person and motorcycle keep the single-object fields
+        if person_idx.size:
+            top = person_idx[np.argmax(conf[person_idx])]
+            detection_data['person_detected'] = True
+            detection_data['person_confidence'] = float(conf[top])
+            detection_data['person_bbox'] = array_to_bbox(xyxy[top], conf[top])
+        
+        if motorcycle_idx.size:
+            top = motorcycle_idx[np.argmax(conf[motorcycle_idx])]
+            detection_data['vehicle_detected'] = True
+            detection_data['vehicle_type'] = 'motorcycle'
+            detection_data['vehicle_confidence'] = float(conf[top])
+            detection_data['vehicle_bbox'] = array_to_bbox(xyxy[top], conf[top])
+        
+        # --- Helmet-on-rider logic, one verdict per rider ---
+        riders = self._associate_riders(xyxy, conf, person_idx, helmet_idx, no_helmet_idx, motorcycle_idx)
+        detection_data['riders'] = riders
+        detection_data['rider_count'] = len(riders)
+        detection_data['riders_without_helmet'] = sum(1 for rider in riders if not rider['helmet_detected'])
+        
+        # Frame-level helmet fields report the most confident helmet on a rider
+        helmeted = [rider for rider in riders if rider['helmet_detected']]
+        if helmeted:
+            best = max(helmeted, key=lambda rider: rider['helmet_confidence'])
+            detection_data['helmet_detected'] = True
+            detection_data['helmet_confidence'] = best['helmet_confidence']
+            detection_data['helmet_bbox'] = best['helmet_bbox']
+        
         # If using general YOLO model, simulate helmet detection
         if not os.path.exists(self.model_path):
             detection_data = self._simulate_helmet_detection(detection_data)
         
         return detection_data
     
+    def _associate_riders(self, xyxy, conf, person_idx, helmet_idx, no_helmet_idx, motorcycle_idx):
+        """
+        Pair every person on a motorcycle with helmet evidence in one vectorized step
+        
+        Returns:
+            list: Rider dicts with the person box, matched motorcycle and helmet verdict
+        """
+        if not person_idx.size:
+            return []
+        
+        persons = xyxy[person_idx]
+        
+        # Persons count as riders when they overlap a motorcycle
+        if motorcycle_idx.size:
+            on_motorcycle = ioa_matrix(persons, xyxy[motorcycle_idx])
+            rider_mask = on_motorcycle.max(axis=1) >= self.rider_overlap_threshold
+            motorcycle_match = motorcycle_idx[on_motorcycle.argmax(axis=1)]
+        else:
+            # Without a motorcycle in frame, only count persons when a vehicle is not required
+            rider_mask = np.full(len(person_idx), not self.vehicle_required)
+            motorcycle_match = np.full(len(person_idx), -1)
+        
+        if not rider_mask.any():
+            return []
+        
+        # Head region: upper part of each person box
+        heads = persons.copy()
+        heads[:, 3] = persons[:, 1] + self.head_region_fraction * (persons[:, 3] - persons[:, 1])
+        
+        helmet_iou = iou_matrix(heads, xyxy[helmet_idx])
+        no_helmet_iou = iou_matrix(heads, xyxy[no_helmet_idx])
+        
+        best_helmet = helmet_iou.argmax(axis=1) if helmet_idx.size else np.zeros(len(persons), dtype=int)
+        best_helmet_iou = helmet_iou.max(axis=1) if helmet_idx.size else np.zeros(len(persons))
+        best_no_helmet_iou = no_helmet_iou.max(axis=1) if no_helmet_idx.size else np.zeros(len(persons))
+        
+        has_helmet = best_helmet_iou > self.helmet_iou_threshold
+        has_no_helmet = best_no_helmet_iou > self.helmet_iou_threshold
+        
+        riders = []
+        for rider_id, p in enumerate(np.flatnonzero(rider_mask)):
+            person = person_idx[p]
+            rider = {
+                'rider_id': rider_id,
+                'person_bbox': array_to_bbox(xyxy[person], conf[person]),
+                'person_confidence': float(conf[person]),
+                'helmet_detected': bool(has_helmet[p]),
+                'helmet_status': 'helmet' if has_helmet[p] else ('no_helmet' if has_no_helmet[p] else 'undetermined'),
+                'helmet_confidence': 0.0,
+                'helmet_bbox': {},
+                'motorcycle_bbox': {}
+            }
+            
+            if has_helmet[p]:
+                helmet = helmet_idx[best_helmet[p]]
+                rider['helmet_confidence'] = float(conf[helmet])
+                rider['helmet_bbox'] = array_to_bbox(xyxy[helmet], conf[helmet])
+            
+            if motorcycle_match[p] >= 0:
+                rider['motorcycle_bbox'] = array_to_bbox(xyxy[motorcycle_match[p]], conf[motorcycle_match[p]])
+            
+            riders.append(rider)
+        
+        return riders
+    
     def _simulate_helmet_detection(self, detection_data):
         """
         Simulate helmet detection when using general YOLO model
@@ -207,6 +438,11 @@ class HelmetDetector:
             # 70% chance of helmet detection for testing
             has_helmet = random.random() > 0.3
             
+            for rider in detection_data.get('riders', []):
+                rider['helmet_detected'] = has_helmet
+                rider['helmet_status'] = 'helmet' if has_helmet else 'no_helmet'
+            detection_data['riders_without_helmet'] = 0 if has_helmet else detection_data.get('rider_count', 0)
+            
             if has_helmet:
                 detection_data['helmet_detected'] = True
                 detection_data['helmet_confidence'] = random.uniform(0.6, 0.9)
@@ -240,6 +476,9 @@ class HelmetDetector:
             'vehicle_type': '',
             'vehicle_confidence': 0.0,
             'vehicle_bbox': {},
+            'riders': [],
+            'rider_count': 0,
+            'riders_without_helmet': 0,
             'all_detections': []
         }
     
@@ -0,0 +1,259 @@
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+
+
+class InferenceBackend:
+    """Base class for the runtimes the helmet model can be executed on"""
+
+    name = 'base'
+    runtime_module = None  # Python module the runtime needs, checked before loading
+
+    def __init__(self, weights_path, device='cpu', precision='fp32'):
+        """
+        Args:
+            weights_path: Path to the source .pt weights
+            device (str): Device for runtimes that support more than CPU
+            precision (str): 'fp32' or 'int8' (quantized artifacts, exported backends only)
+        """
+        self.weights_path = Path(weights_path)
+        self.device = device
+        self.precision = precision
+
+    @property
+    def artifact_stem(self):
+        """Artifact name stem, quantized models carry an _int8 suffix"""
+        if self.precision == 'int8':
+            return f"{self.weights_path.stem}_int8"
+        return self.weights_path.stem
+
+    @property
+    def artifact_path(self):
+        """Path of the model file/directory this backend loads"""
+        return self.weights_path
+
+    def is_available(self):
+        """Check that the runtime is installed and the model artifact exists"""
+        if self.runtime_module and importlib.util.find_spec(self.runtime_module) is None:
+            return False
+        return self.artifact_path.exists()
+
+    def load(self):
+        """
+        Load the model for this backend
+
+        Returns:
+            ultralytics.YOLO: Model callable as model(images, conf=..., iou=...)
+        """
+        from ultralytics import YOLO
+
+        return YOLO(str(self.artifact_path), task='detect')
+
+    def export(self, imgsz=640, **kwargs):
+        """Export the .pt weights into this backend's format"""
+        raise NotImplementedError(f"{self.name} backend does not need an export")
+
+    def static_batch_size(self):
+        """Batch size fixed in the model graph, None when any batch size works"""
+        return None
+
+
+class TorchBackend(InferenceBackend):
+    """Ultralytics eager-mode PyTorch model"""
+
+    name = 'torch'
+    runtime_module = 'torch'
+
+    def load(self):
+        model = super().load()
+        model.to(self.device)
+        return model
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """ONNX Runtime CPU execution of the exported model"""
+
+    name = 'onnx'
+    runtime_module = 'onnxruntime'
+    export_format = 'onnx'
+
+    @property
+    def artifact_path(self):
+        return self.weights_path.parent / f"{self.artifact_stem}.onnx"
+
+    def export(self, imgsz=640, **kwargs):
+        from ultralytics import YOLO
+
+        # Dynamic axes keep batched inference working with the exported graph
+        exported = YOLO(str(self.weights_path)).export(
+            format=self.export_format, imgsz=imgsz, dynamic=True, simplify=True, device='cpu', **kwargs
+        )
+        return Path(exported)
+
+    def static_batch_size(self):
+        import onnxruntime
+
+        session = onnxruntime.InferenceSession(str(self.artifact_path), providers=['CPUExecutionProvider'])
+        batch = session.get_inputs()[0].shape[0]
+        # Dynamic axes are named ('batch') or None
+        return batch if isinstance(batch, int) else None
+
+
+class OpenVinoBackend(InferenceBackend):
+    """OpenVINO CPU execution of the exported model"""
+
+    name = 'openvino'
+    runtime_module = 'openvino'
+    export_format = 'openvino'
+
+    @property
+    def artifact_path(self):
+        return self.weights_path.parent / f"{self.artifact_stem}_openvino_model"
+
+    def export(self, imgsz=640, **kwargs):
+        from ultralytics import YOLO
+
+        exported = YOLO(str(self.weights_path)).export(
+            format=self.export_format, imgsz=imgsz, dynamic=True, device='cpu', **kwargs
+        )
+        return Path(exported)
+
+    def static_batch_size(self):
+        from openvino import Core
+
+        model = Core().read_model(str(next(self.artifact_path.glob('*.xml'))))
+        batch = model.inputs[0].get_partial_shape()[0]
+        return batch.get_length() if batch.is_static else None
+
+
+BACKENDS = {
+    TorchBackend.name: TorchBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+    OpenVinoBackend.name: OpenVinoBackend
+}
+
+
+def get_backend(name, weights_path, device='cpu', precision='fp32'):
+    """
+    Create an inference backend by name
+
+    Args:
+        name (str): 'torch', 'onnx' or 'openvino'
+        weights_path: Path to the source .pt weights
+        device (str): Device for the torch backend
+        precision (str): 'fp32' or 'int8' (exported backends only)
+
+    Returns:
+        InferenceBackend: Backend instance
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {name}. Choose from {', '.join(BACKENDS)}")
+
+    if name == TorchBackend.name:
+        # Quantized artifacts only exist for the exported runtimes
+        precision = 'fp32'
+    else:
+        # Exported CPU runtimes ignore CUDA devices
+        device = 'cpu'
+
+    return BACKENDS[name](weights_path, device=device, precision=precision)
+
+
+def export_model(weights_path, formats, imgsz=640):
+    """
+    Export .pt weights to the given backend formats
+
+    Args:
+        weights_path: Path to the source .pt weights
+        formats (list): Backend names to export ('onnx', 'openvino')
+        imgsz (int): Inference image size baked into the export
+
+    Returns:
+        dict: Backend name -> exported artifact path
+    """
+    exported = {}
+    for name in formats:
+        backend = get_backend(name, weights_path)
+        exported[name] = str(backend.export(imgsz=imgsz))
+        print(f"Exported {weights_path} to {name}: {exported[name]}")
+
+    return exported
+
+
+def result_arrays(result):
+    """Extract (xyxy, conf, cls) numpy arrays from an ultralytics result"""
+    if result.boxes is None or len(result.boxes) == 0:
+        return np.zeros((0, 4)), np.zeros(0), np.zeros(0, dtype=int)
+
+    boxes = result.boxes.cpu().numpy()
+    return boxes.xyxy, boxes.conf, boxes.cls.astype(int)
+
+
+def compare_backend_outputs(reference, candidate, iou_threshold=0.9, conf_tolerance=0.05):
+    """
+    Compare one image's detections between two backends
+
+    Each reference box is matched to the candidate box of the same class
+    with the highest IoU.
+
+    Args:
+        reference: Ultralytics result from the reference (torch) backend
+        candidate: Ultralytics result from the backend under test
+        iou_threshold (float): Minimum IoU for a box to count as matched
+        conf_tolerance (float): Maximum allowed confidence difference
+
+    Returns:
+        dict: Parity report with 'match' flag and per-box details
+    """
+    ref_xyxy, ref_conf, ref_cls = result_arrays(reference)
+    cand_xyxy, cand_conf, cand_cls = result_arrays(candidate)
+
+    report = {
+        'match': True,
+        'reference_boxes': int(len(ref_xyxy)),
+        'candidate_boxes': int(len(cand_xyxy)),
+        'unmatched': [],
+        'min_iou': 1.0,
+        'max_conf_delta': 0.0
+    }
+
+    if len(ref_xyxy) != len(cand_xyxy):
+        report['match'] = False
+
+    used = set()
+    for i in range(len(ref_xyxy)):
+        best_j, best_iou = None, 0.0
+        for j in range(len(cand_xyxy)):
+            if j in used or cand_cls[j] != ref_cls[i]:
+                continue
+            iou = _box_iou(ref_xyxy[i], cand_xyxy[j])
+            if iou > best_iou:
+                best_j, best_iou = j, iou
+
+        if best_j is None or best_iou < iou_threshold:
+            report['match'] = False
+            report['unmatched'].append({
+                'class_id': int(ref_cls[i]),
+                'bbox': [float(v) for v in ref_xyxy[i]],
+                'best_iou': round(float(best_iou), 4)
+            })
+            continue
+
+        used.add(best_j)
+        conf_delta = abs(float(ref_conf[i]) - float(cand_conf[best_j]))
+        report['min_iou'] = min(report['min_iou'], float(best_iou))
+        report['max_conf_delta'] = max(report['max_conf_delta'], conf_delta)
+        if conf_delta > conf_tolerance:
+            report['match'] = False
+
+    return report
+
+
+def _box_iou(a, b):
+    """IoU of two xyxy boxes"""
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
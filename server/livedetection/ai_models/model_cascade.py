@@ -0,0 +1,214 @@
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+from ..config.model_config import MODEL_CONFIG
+from ..utils.frame import load_frame_image
+
+
+class ModelCascade:
+    def __init__(self, fast_detector, accurate_detector=None, config=None):
+        """
+        Initialize a two-tier detector: the fast model on every frame, the accurate one only when unsure
+
+        A frame is escalated when the fast model reports a person/helmet box
+        with a borderline confidence, or a rider it cannot give a helmet
+        verdict. Otherwise the fast result is returned as is.
+
+        Args:
+            fast_detector: HelmetDetector with the small model
+            accurate_detector: HelmetDetector with the larger model, None disables escalation
+            config (dict): CASCADE settings, defaults to MODEL_CONFIG['CASCADE']
+        """
+        self.fast = fast_detector
+        self.accurate = accurate_detector
+        self.config = config or MODEL_CONFIG['CASCADE']
+
+        fast_config = self.config['FAST']
+        self.fast.confidence_threshold = fast_config['CONFIDENCE_THRESHOLD']
+        self.borderline_low = fast_config['BORDERLINE_LOW']
+        self.borderline_high = fast_config['BORDERLINE_HIGH']
+        self.escalate_class_ids = [
+            self.fast.class_ids[name] for name in self.config['ESCALATE_CLASSES'] if name in self.fast.class_ids
+        ]
+
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._reasons = Counter()
+        self._latency_ms = {
+            'fast': deque(maxlen=self.config['STATS_WINDOW']),
+            'accurate': deque(maxlen=self.config['STATS_WINDOW'])
+        }
+
+    @property
+    def model(self):
+        return self.fast.model
+
+    @property
+    def class_ids(self):
+        return self.fast.class_ids
+
+    def _empty_result(self):
+        return self.fast._empty_result()
+
+    def detect(self, image_path):
+        """
+        Detect persons, helmets, and vehicles, escalating uncertain frames
+
+        Args:
+            image_path: Frame, OpenCV image array or path to the image file
+
+        Returns:
+            dict: Detection results, with the tier that produced them under 'cascade'
+        """
+        image = load_frame_image(image_path)
+        if image is None:
+            print(f"Could not load image from {image_path}")
+            return self._empty_result()
+
+        return self.detect_batch([image])[0]
+
+    def detect_batch(self, images):
+        """
+        Run the fast model on every image and the accurate model on the uncertain ones, each in one pass
+
+        Args:
+            images (list): OpenCV image arrays
+
+        Returns:
+            list: One detection result dict per input image, in input order
+        """
+        if self.fast.model is None or not images:
+            return [self._empty_result() for _ in images]
+
+        try:
+            started = time.perf_counter()
+            raw = self.fast.predict_arrays(images, conf=self.borderline_low)
+            self._record_latency('fast', started, len(images))
+
+            results, escalate = [], []
+            for index, ((xyxy, conf, cls), image) in enumerate(zip(raw, images)):
+                keep = conf >= self.fast.confidence_threshold
+                result = self.fast._build_detection_data(xyxy[keep], conf[keep], cls[keep], image.shape)
+                reason = self.escalation_reason(conf, cls, result)
+                result['cascade'] = {'tier': 'fast', 'reason': reason}
+                results.append(result)
+                if reason is not None:
+                    escalate.append(index)
+
+            if escalate and self.accurate is not None and self.accurate.model is not None:
+                started = time.perf_counter()
+                accurate_results = self.accurate.detect_batch([images[index] for index in escalate])
+                self._record_latency('accurate', started, len(escalate))
+
+                for index, result in zip(escalate, accurate_results):
+                    result['cascade'] = {'tier': 'accurate', 'reason': results[index]['cascade']['reason']}
+                    results[index] = result
+
+            self._record(results)
+            return results
+
+        except Exception as e:
+            print(f"Error in cascaded helmet detection: {e}")
+            return [self._empty_result() for _ in images]
+
+    def detect_tiled(self, image_path, tiling=None, motion_mask=None):
+        """Tiled detection runs on the fast model only; tiling already targets the small objects"""
+        return self.fast.detect_tiled(image_path, tiling, motion_mask)
+
+    def escalation_reason(self, conf, cls, result):
+        """
+        Why a fast-model result should go to the accurate model
+
+        Args:
+            conf: Fast-model confidences down to BORDERLINE_LOW
+            cls: Class ids of those boxes
+            result (dict): Fast-model detection data
+
+        Returns:
+            str: 'borderline_<class>', 'undetermined_rider', or None to keep the fast result
+        """
+        borderline = (conf >= self.borderline_low) & (conf < self.borderline_high) & np.isin(cls, self.escalate_class_ids)
+        if borderline.any():
+            class_id = int(cls[borderline][np.argmax(conf[borderline])])
+            return f"borderline_{self.fast.class_names.get(class_id, 'unknown')}"
+
+        if self.config['ESCALATE_UNDETERMINED_RIDERS'] and any(
+            rider.get('helmet_status') == 'undetermined' for rider in result.get('riders', [])
+        ):
+            return 'undetermined_rider'
+
+        return None
+
+    def _record_latency(self, tier, started, frames):
+        per_frame = (time.perf_counter() - started) * 1000 / max(1, frames)
+        with self._lock:
+            self._latency_ms[tier].extend([per_frame] * frames)
+
+    def _record(self, results):
+        with self._lock:
+            for result in results:
+                cascade = result['cascade']
+                self._counts['frames'] += 1
+                if cascade['reason'] is not None:
+                    self._counts['escalation_candidates'] += 1
+                    self._reasons[cascade['reason']] += 1
+                if cascade['tier'] == 'accurate':
+                    self._counts['escalated'] += 1
+
+    def get_stats(self):
+        """
+        Escalation rate, reasons and per-tier latency
+
+        Returns:
+            dict: Cascade statistics
+        """
+        with self._lock:
+            counts = dict(self._counts)
+            reasons = dict(self._reasons)
+            latency = {tier: sorted(values) for tier, values in self._latency_ms.items()}
+
+        frames = counts.get('frames', 0)
+        stats = {
+            'accurate_tier_loaded': self.accurate is not None and self.accurate.model is not None,
+            'frames': frames,
+            'escalated': counts.get('escalated', 0),
+            'escalation_candidates': counts.get('escalation_candidates', 0),
+            'escalation_rate': round(counts.get('escalated', 0) / frames, 4) if frames else 0.0,
+            'reasons': reasons
+        }
+        for tier, values in latency.items():
+            if values:
+                stats[f'{tier}_ms'] = {
+                    'p50': round(values[len(values) // 2], 2),
+                    'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))], 2)
+                }
+        return stats
+
+
+def create_helmet_detector():
+    """
+    HelmetDetector, wrapped in a ModelCascade when MODEL_CONFIG['CASCADE'] is enabled
+
+    The accurate tier is only loaded when its weights exist; without them the
+    cascade still reports how many frames it would have escalated.
+    """
+    from .helmet_detector import HelmetDetector
+
+    cascade_config = MODEL_CONFIG['CASCADE']
+    if not cascade_config['ENABLED']:
+        return HelmetDetector()
+
+    accurate = None
+    accurate_path = MODEL_CONFIG['PATHS']['MODELS']['HELMET_DETECTION_ACCURATE']
+    if accurate_path.exists():
+        accurate = HelmetDetector(
+            model_path=accurate_path,
+            confidence_threshold=cascade_config['ACCURATE']['CONFIDENCE_THRESHOLD']
+        )
+    else:
+        print(f"Cascade accurate model not found at {accurate_path}, escalation disabled")
+
+    return ModelCascade(HelmetDetector(), accurate, cascade_config)
@@ -0,0 +1,449 @@
+import itertools
+import os
+import socket
+import stat
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+from ..config.model_config import MODEL_CONFIG
+from ..utils.frame import Frame, as_frame, get_crop_decode_stats
+from .model_cascade import ModelCascade, create_helmet_detector
+
+
+def default_socket_path():
+    """Socket path used when SERVING SOCKET_PATH is unset"""
+    directory = os.getenv('XDG_RUNTIME_DIR')
+    if not directory:
+        user = os.getuid() if hasattr(os, 'getuid') else os.getenv('USERNAME', 'user')
+        directory = os.path.join(tempfile.gettempdir(), f'sentra-{user}')
+    return os.path.join(directory, 'sentra-model-server.sock')
+
+
+class ModelReplica:
+    def __init__(self, replica_id):
+        """
+        Initialize one copy of the helmet detector and plate reader
+
+        Args:
+            replica_id (int): Index of the replica inside the server
+        """
+        from .plate_reader import PlateReader
+        from .batch_inference import BatchInferenceService
+
+        self.replica_id = replica_id
+        self.helmet_detector = create_helmet_detector()
+        self.plate_reader = PlateReader()
+
+        # Detection calls may come from several connections at once
+        inference_config = MODEL_CONFIG['INFERENCE']
+        if inference_config['DYNAMIC_BATCHING']:
+            self.batch_inference = BatchInferenceService(
+                self.helmet_detector,
+                max_batch_size=inference_config['BATCH_SIZE'],
+                max_wait_ms=inference_config['BATCH_WAIT_MS'],
+                stats_window=inference_config['BATCH_STATS_WINDOW']
+            )
+            self.batch_inference.start()
+        else:
+            self.batch_inference = None
+        self._detect_lock = threading.Lock()
+
+        self.requests_served = 0
+
+    def detect(self, frame):
+        """Run helmet detection, through the batching service when enabled"""
+        if self.batch_inference is not None:
+            return self.batch_inference.detect(frame)
+
+        with self._detect_lock:
+            return self.helmet_detector.detect(frame)
+
+    def detect_tiled(self, frame, tiling=None):
+        """Run tiled helmet detection (tiles are already batched into one pass)"""
+        with self._detect_lock:
+            return self.helmet_detector.detect_tiled(frame, tiling)
+
+    def read_plate(self, frame, helmet_result=None):
+        """Run the plate reader on a frame"""
+        return self.plate_reader.detect_and_read(frame, helmet_result)
+
+    def read_plate_crop(self, crop):
+        """Recognition-only OCR on a plate crop"""
+        return self.plate_reader.read_plate_crop(crop)
+
+    def get_stats(self):
+        """Per-replica statistics"""
+        stats = {
+            'replica_id': self.replica_id,
+            'requests_served': self.requests_served,
+            'dynamic_batching': self.batch_inference is not None
+        }
+        if self.batch_inference is not None:
+            stats['batching'] = self.batch_inference.get_stats()
+        if self.plate_reader.reader is not None:
+            stats['plate_cascade'] = self.plate_reader.get_cascade_stats()
+        if isinstance(self.helmet_detector, ModelCascade):
+            stats['model_cascade'] = self.helmet_detector.get_stats()
+        return stats
+
+    def close(self):
+        if self.batch_inference is not None:
+            self.batch_inference.stop()
+
+
+class ModelServer:
+    def __init__(self, socket_path=None, replicas=None, authkey=None):
+        """
+        Initialize the local inference server that owns the detection models
+
+        Django workers talk to it over a Unix socket through ModelClient, so the
+        YOLO weights and EasyOCR models are loaded once per replica instead of
+        once per HTTP worker.
+
+        Requests are pickled, so the server only starts with a shared secret
+        and with its socket in a directory private to this user.
+
+        Args:
+            socket_path (str): Unix socket to listen on
+            replicas (int): Number of model copies to load
+            authkey (bytes): Shared secret clients must present
+        """
+        config = MODEL_CONFIG['SERVING']
+        self.socket_path = socket_path or config['SOCKET_PATH'] or default_socket_path()
+        self.replica_count = max(1, int(replicas or config['REPLICAS']))
+        self.authkey = authkey or config['AUTHKEY']
+        if not self.authkey:
+            raise ValueError("MODEL_SERVER_AUTHKEY is not set; the model server needs a shared secret")
+
+        self.replicas = []
+        self._replica_cycle = None
+        self._replica_lock = threading.Lock()
+        self._listener = None
+        self._owns_socket = False
+        self._running = False
+        self.started_at = None
+
+    def load_replicas(self):
+        """Load every model replica before accepting connections"""
+        for replica_id in range(self.replica_count):
+            print(f"Loading model replica {replica_id + 1}/{self.replica_count}")
+            self.replicas.append(ModelReplica(replica_id))
+        self._replica_cycle = itertools.cycle(self.replicas)
+
+    def serve_forever(self):
+        """Listen on the socket and serve each client connection in its own thread"""
+        self._prepare_socket()
+        if not self.replicas:
+            self.load_replicas()
+
+        self._listener = Listener(self.socket_path, family='AF_UNIX', authkey=self.authkey)
+        self._owns_socket = True
+        self._running = True
+        self.started_at = time.time()
+        print(f"Model server listening on {self.socket_path} with {self.replica_count} replica(s)")
+
+        try:
+            while self._running:
+                try:
+                    connection = self._listener.accept()
+                except Exception as e:
+                    if not self._running:
+                        # Listener closed by shutdown()
+                        break
+                    # Failed handshake, e.g. a wrong authkey or a peer that hung up
+                    print(f"Rejected model server connection: {e}")
+                    continue
+
+                threading.Thread(
+                    target=self._serve_connection, args=(connection,), daemon=True
+                ).start()
+        finally:
+            self.shutdown()
+
+    def _prepare_socket(self):
+        """
+        Check the socket directory is private and the socket path is free
+
+        The directory is created with mode 0700 when missing. A socket file
+        left by a crashed server is removed, but a path some live server
+        listens on, or that is not a socket, is never touched.
+
+        Raises:
+            RuntimeError: The directory is shared or the path is in use
+        """
+        directory = os.path.dirname(os.path.abspath(self.socket_path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        info = os.stat(directory)
+        owner = os.getuid() if hasattr(os, 'getuid') else info.st_uid
+        if info.st_uid != owner or info.st_mode & 0o077:
+            raise RuntimeError(f"Model server socket directory {directory} must be owned by this user with mode 0700")
+
+        if not os.path.lexists(self.socket_path):
+            return
+        if not stat.S_ISSOCK(os.lstat(self.socket_path).st_mode):
+            raise RuntimeError(f"{self.socket_path} exists and is not a socket")
+
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except ConnectionRefusedError:
+            print(f"Removing stale model server socket {self.socket_path}")
+            os.unlink(self.socket_path)
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"Another model server is already listening on {self.socket_path}")
+
+    def shutdown(self):
+        """Stop accepting connections and release the replicas"""
+        self._running = False
+
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+        for replica in self.replicas:
+            replica.close()
+
+        # Only remove the socket this server bound, never another server's
+        if self._owns_socket and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._owns_socket = False
+
+    def _next_replica(self):
+        """Pick replicas round-robin"""
+        with self._replica_lock:
+            replica = next(self._replica_cycle)
+            replica.requests_served += 1
+            return replica
+
+    def _serve_connection(self, connection):
+        """Answer requests from one client until it disconnects"""
+        try:
+            while True:
+                try:
+                    method, payload = connection.recv()
+                except (EOFError, OSError):
+                    break
+
+                try:
+                    response = {'status': 'success', 'data': self.handle_request(method, payload)}
+                except Exception as e:
+                    print(f"Error in model server {method}: {e}")
+                    response = {'status': 'error', 'message': str(e)}
+
+                try:
+                    connection.send(response)
+                except (EOFError, OSError):
+                    # The client gave up waiting (timeout) and closed its end
+                    break
+        finally:
+            connection.close()
+
+    def handle_request(self, method, payload):
+        """
+        Dispatch one request to a replica
+
+        Args:
+            method (str): 'detect', 'detect_tiled', 'read_plate', 'read_plate_crop', 'stats' or 'ping'
+            payload (dict): Method arguments
+
+        Returns:
+            Result of the method
+        """
+        if method == 'ping':
+            return {'replicas': self.replica_count, 'pid': os.getpid()}
+
+        if method == 'stats':
+            return self.get_stats()
+
+        frame = Frame(payload['image'], camera_id=payload.get('camera_id', 'upload'), path=payload.get('path'))
+        if payload.get('original'):
+            # Plate crops are cut from the reduced-decoded upload's original bytes
+            buffer, scale, offset = payload['original']
+            frame.parent = (Frame(None, camera_id=frame.camera_id, buffer=buffer, scale=scale), tuple(offset))
+        replica = self._next_replica()
+
+        if method == 'detect':
+            return replica.detect(frame)
+
+        if method == 'detect_tiled':
+            frame.motion_mask = payload.get('motion_mask')
+            return replica.detect_tiled(frame, payload.get('tiling'))
+
+        if method == 'read_plate':
+            return replica.read_plate(frame, payload.get('helmet_result'))
+
+        if method == 'read_plate_crop':
+            return replica.read_plate_crop(frame.image)
+
+        raise ValueError(f"Unknown model server method: {method}")
+
+    def get_stats(self):
+        """Server-wide statistics"""
+        return {
+            'socket_path': self.socket_path,
+            'pid': os.getpid(),
+            'uptime_seconds': round(time.time() - self.started_at, 1) if self.started_at else 0,
+            'plate_crop_decode': get_crop_decode_stats(),
+            'replicas': [replica.get_stats() for replica in self.replicas]
+        }
+
+
+class ModelClient:
+    def __init__(self, socket_path=None, authkey=None, timeout=None):
+        """
+        Initialize a thin client for the model server
+
+        Exposes the same detect/detect_and_read calls the views use on
+        HelmetDetector and PlateReader.
+
+        Args:
+            socket_path (str): Unix socket the server listens on
+            authkey (bytes): Shared secret configured on the server
+            timeout (float): Seconds to wait for a response
+        """
+        config = MODEL_CONFIG['SERVING']
+        self.socket_path = socket_path or config['SOCKET_PATH'] or default_socket_path()
+        self.authkey = authkey or config['AUTHKEY']
+        if not self.authkey:
+            raise ValueError("MODEL_SERVER_AUTHKEY is not set; the model server needs a shared secret")
+        self.timeout = timeout or config['REQUEST_TIMEOUT']
+
+        # One connection per thread, Connection objects are not thread-safe
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = Client(self.socket_path, family='AF_UNIX', authkey=self.authkey)
+            self._local.connection = connection
+        return connection
+
+    def _drop_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            try:
+                connection.close()
+            except OSError:
+                pass
+        self._local.connection = None
+
+    def call(self, method, payload=None):
+        """
+        Send one request and wait for the response
+
+        A send that fails is retried once on a fresh connection, so a restarted
+        server is picked up transparently. Once the request is sent it is never
+        resent: the server may already be running it.
+
+        Args:
+            method (str): Server method name
+            payload (dict): Method arguments
+
+        Returns:
+            Response data
+
+        Raises:
+            TimeoutError: No answer within the client timeout
+            ConnectionError: The server cannot be reached or dropped the connection
+        """
+        for attempt in range(2):
+            try:
+                connection = self._connection()
+                connection.send((method, payload or {}))
+                break
+            except (EOFError, OSError):
+                self._drop_connection()
+                if attempt == 1:
+                    raise ConnectionError(f"Model server unavailable at {self.socket_path}")
+
+        try:
+            answered = connection.poll(self.timeout)
+            response = connection.recv() if answered else None
+        except (EOFError, OSError):
+            self._drop_connection()
+            raise ConnectionError(f"Model server closed the connection during {method}")
+
+        if not answered:
+            # A late answer would be read as the response to the next request
+            self._drop_connection()
+            raise TimeoutError(f"Model server did not answer {method} within {self.timeout}s")
+
+        if response['status'] != 'success':
+            raise RuntimeError(response['message'])
+        return response['data']
+
+    def _frame_payload(self, image, with_original=False, **extra):
+        """
+        Send the decoded pixels so the server does not decode or read from disk again
+
+        With with_original, a reduced-decoded frame also carries its encoded
+        original, scale and offset, so plate crops keep their full resolution.
+        """
+        frame = as_frame(image)
+        payload = {'image': frame.image, 'camera_id': frame.camera_id, 'path': frame.path, **extra}
+        if with_original:
+            payload['original'] = frame.original_source()
+        return payload
+
+    def detect(self, image):
+        """
+        Detect persons, helmets, and vehicles on the model server
+
+        Args:
+            image: Frame, OpenCV image array or path to the image file
+
+        Returns:
+            dict: Detection results
+        """
+        return self.call('detect', self._frame_payload(image))
+
+    def detect_tiled(self, image, tiling=None):
+        """
+        Run tiled detection on the model server
+
+        Args:
+            image: Frame, OpenCV image array or path to the image file
+            tiling (dict): TILING settings
+
+        Returns:
+            dict: Detection results in full-frame coordinates
+        """
+        frame = as_frame(image)
+        return self.call('detect_tiled', self._frame_payload(frame, tiling=tiling, motion_mask=frame.motion_mask))
+
+    def detect_and_read(self, image, helmet_result=None):
+        """
+        Read license plates on the model server
+
+        Args:
+            image: Frame, OpenCV image array or path to the image file
+            helmet_result (dict): Detector output with plate/motorcycle boxes
+
+        Returns:
+            dict: Plate detection results
+        """
+        return self.call('read_plate', self._frame_payload(image, with_original=True, helmet_result=helmet_result))
+
+    def read_plate_crop(self, crop):
+        """
+        Read a tight plate crop on the model server
+
+        Args:
+            crop: OpenCV image array containing just the plate
+
+        Returns:
+            tuple: (cleaned plate text or '', confidence)
+        """
+        return tuple(self.call('read_plate_crop', {'image': crop}))
+
+    def get_stats(self):
+        """Statistics from every replica on the server"""
+        return self.call('stats')
+
+    def ping(self):
+        """Check the server is reachable"""
+        return self.call('ping')
@@ -3,8 +3,23 @@ import numpy as np
 import easyocr
 import re
 import os
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 
+from ..config.model_config import MODEL_CONFIG
+from ..utils.frame import Frame, load_frame_image
+
+# Preprocessing variants tried by the OCR cascade, in default order
+PREPROCESSING_VARIANTS = {
+    'gray': lambda gray: gray,  # Original grayscale
+    'bilateral': lambda gray: cv2.bilateralFilter(gray, 11, 17, 17),  # Noise reduction
+    'otsu': lambda gray: cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1],  # Otsu threshold
+    'adaptive': lambda gray: cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)  # Adaptive threshold
+}
+
 class PlateReader:
     def __init__(self):
         """Initialize license plate detection and OCR"""
@@ -20,18 +35,44 @@ class PlateReader:
                 r'^[A-Z]{2}[0-9]{2}[A-Z]{4}[0-9]{4}$',  # New BH series
             ]
             
+            # Detector-guided OCR settings
+            self.confidence_threshold = MODEL_CONFIG['PLATE_RECOGNITION']['CONFIDENCE_THRESHOLD']
+            self.allowlist = MODEL_CONFIG['PLATE_RECOGNITION']['ALLOWLIST']
+            self.guided_config = MODEL_CONFIG['PLATE_RECOGNITION']['DETECTOR_GUIDED']
+            
+            # Early-exit preprocessing cascade with per-camera variant ordering
+            self.cascade_config = MODEL_CONFIG['PLATE_RECOGNITION']['CASCADE']
+            self._variant_successes = defaultdict(Counter)
+            self._variant_lock = threading.Lock()
+            self._overrunning = 0  # Variants still OCR'ing after their frame gave up on them
+            self._overrun_skips = 0
+            # Room for every frame's variants plus the overrunning ones, so the pool never queues
+            self._cascade_executor = ThreadPoolExecutor(
+                max_workers=self.cascade_config['MAX_WORKERS'] + self.cascade_config['MAX_OVERRUNNING'],
+                thread_name_prefix='plate-ocr-cascade'
+            )
+            
             print("License plate reader initialized successfully")
             
         except Exception as e:
             print(f"Error initializing plate reader: {e}")
             self.reader = None
     
-    def detect_and_read(self, image_path):
+    def detect_and_read(self, image_path, helmet_result=None, camera_id=None):
         """
         Detect and read license plate from image
         
+        When HelmetDetector found license_plate boxes, only those crops are
+        read. Motorcycle boxes narrow the search otherwise, and the
+        full-frame passes run only when the detector found no plate box.
+        Box crops of a frame decoded at reduced size are taken from its
+        full-resolution original; boxes stay in frame coordinates.
+        
         Args:
-            image_path (str): Path to the image file
+            image_path: Frame, OpenCV image array or path to the image file
+            helmet_result (dict): HelmetDetector result whose boxes guide the OCR
+            camera_id: Camera whose learned variant ordering the cascade uses
+                (taken from the frame when not given)
             
         Returns:
             dict: Plate detection results
@@ -39,31 +80,227 @@ class PlateReader:
         if self.reader is None:
             return self._empty_result()
         
+        if camera_id is None and isinstance(image_path, Frame):
+            camera_id = image_path.camera_id
+        
+        # Per-frame budget for the full-frame fallback passes
+        deadline = time.monotonic() + self.cascade_config['TIME_BUDGET_MS'] / 1000.0
+        
         try:
-            # Load image
-            image = cv2.imread(image_path)
+            # Load image (already decoded for frames and arrays)
+            image = load_frame_image(image_path)
             if image is None:
                 raise ValueError(f"Could not load image from {image_path}")
             
+            frame = image_path if isinstance(image_path, Frame) else None
+            detections = (helmet_result or {}).get('all_detections', [])
+            plate_boxes = [d['bbox'] for d in detections if d.get('class_name') == 'license_plate']
+            motorcycle_boxes = [d['bbox'] for d in detections if d.get('class_name') == 'motorcycle']
+            
+            # Detector found the plate: read only those crops, never the full frame
+            if plate_boxes:
+                return self._read_plate_boxes(image, plate_boxes, frame)
+            
+            # No plate box: search the lower part of each motorcycle first
+            if motorcycle_boxes:
+                motorcycle_result = self._read_motorcycle_regions(image, motorcycle_boxes, frame)
+                if motorcycle_result['plate_detected']:
+                    return motorcycle_result
+            
             # Method 1: Direct OCR on full image
             ocr_result = self._ocr_detection(image)
             if ocr_result['plate_detected']:
-                return ocr_result
+                return self._with_source(ocr_result, 'full_frame')
             
             # Method 2: Preprocess and try OCR
-            preprocessed_result = self._preprocessed_detection(image)
+            preprocessed_result = self._preprocessed_detection(image, camera_id, deadline)
             if preprocessed_result['plate_detected']:
-                return preprocessed_result
+                return self._with_source(preprocessed_result, 'full_frame')
+            
+            if time.monotonic() >= deadline:
+                print(f"Plate OCR time budget exhausted for camera {camera_id}")
+                return self._empty_result()
             
             # Method 3: Region-based detection
             region_result = self._region_based_detection(image)
             
-            return region_result
+            return self._with_source(region_result, 'full_frame')
             
         except Exception as e:
             print(f"Error in plate detection: {e}")
             return self._empty_result()
     
+    def _read_plate_boxes(self, image, plate_boxes, frame=None):
+        """Recognition-only OCR on the detector's license_plate crops"""
+        best_result = self._empty_result()
+        
+        ranked = sorted(plate_boxes, key=lambda b: b.get('confidence', 0.0), reverse=True)
+        for bbox in ranked[:self.guided_config['MAX_PLATE_CROPS']]:
+            crop, (x1, y1, x2, y2) = self._crop_box(
+                image, bbox, self.guided_config['CROP_PADDING'], frame, min_height=self.guided_config['MIN_CROP_HEIGHT']
+            )
+            if crop is None:
+                continue
+            
+            text, confidence = self.read_plate_crop(crop)
+            if text and confidence > best_result['plate_confidence']:
+                best_result = {
+                    'plate_detected': True,
+                    'plate_number': text,
+                    'plate_confidence': confidence,
+                    'plate_bbox': {
+                        'x1': x1, 'y1': y1,
+                        'x2': x2, 'y2': y2,
+                        'confidence': confidence,
+                        'width': x2 - x1,
+                        'height': y2 - y1
+                    }
+                }
+        
+        return self._with_source(best_result, 'plate_box')
+    
+    def read_plate_crop(self, crop):
+        """
+        Read a tight plate crop with recognition-only OCR
+        
+        Args:
+            crop: OpenCV image array containing just the plate
+            
+        Returns:
+            tuple: (cleaned plate text or '', confidence)
+        """
+        if self.reader is None or crop is None or crop.size == 0:
+            return '', 0.0
+        
+        try:
+            gray = self._upsample(crop)
+            h, w = gray.shape[:2]
+            
+            # Square-ish plates (most motorcycles) carry two rows of characters
+            if w / float(h) < self.guided_config['TWO_LINE_MAX_ASPECT']:
+                lines = [[0, w, 0, h // 2], [0, w, h // 2, h]]
+            else:
+                lines = [[0, w, 0, h]]
+            
+            results = self.reader.recognize(
+                gray,
+                horizontal_list=lines,
+                free_list=[],
+                allowlist=self.allowlist,
+                detail=1,
+                paragraph=False
+            )
+            
+            texts = [text for (_, text, _) in results if text]
+            confidences = [confidence for (_, text, confidence) in results if text]
+            if not texts:
+                return '', 0.0
+            
+            cleaned_text = self._clean_plate_text(''.join(texts))
+            confidence = float(min(confidences))
+            
+            if self._is_valid_plate(cleaned_text) and confidence > self.confidence_threshold:
+                return cleaned_text, confidence
+            
+            return '', 0.0
+            
+        except Exception as e:
+            print(f"Plate crop OCR error: {e}")
+            return '', 0.0
+    
+    def _read_motorcycle_regions(self, image, motorcycle_boxes, frame=None):
+        """OCR the lower part of each motorcycle box when no plate box was detected"""
+        region_fraction = self.guided_config['MOTORCYCLE_PLATE_REGION']
+        best_result = self._empty_result()
+        
+        for bbox in motorcycle_boxes:
+            region = dict(bbox)
+            region['y1'] = int(bbox['y2'] - (bbox['y2'] - bbox['y1']) * region_fraction)
+            
+            # The plate is an unknown share of the region, so it is cut at the original resolution
+            crop, (x1, y1, x2, y2) = self._crop_box(image, region, 0.0, frame)
+            if crop is None:
+                continue
+            
+            gray = self._upsample(crop)
+            # OCR pixels per frame pixel (the crop may be at full resolution)
+            scale = gray.shape[0] / float(y2 - y1)
+            
+            try:
+                results = self.reader.readtext(gray, allowlist=self.allowlist)
+            except Exception as e:
+                print(f"Motorcycle region OCR error: {e}")
+                continue
+            
+            for (ocr_bbox, text, confidence) in results:
+                cleaned_text = self._clean_plate_text(text)
+                
+                if self._is_valid_plate(cleaned_text) and confidence > max(self.confidence_threshold, best_result['plate_confidence']):
+                    # Map the OCR box from the upsampled crop back to frame coordinates
+                    local = self._convert_bbox(ocr_bbox)
+                    bx1 = x1 + int(local.get('x1', 0) / scale)
+                    by1 = y1 + int(local.get('y1', 0) / scale)
+                    bx2 = x1 + int(local.get('x2', 0) / scale)
+                    by2 = y1 + int(local.get('y2', 0) / scale)
+                    
+                    best_result = {
+                        'plate_detected': True,
+                        'plate_number': cleaned_text,
+                        'plate_confidence': confidence,
+                        'plate_bbox': {
+                            'x1': bx1, 'y1': by1,
+                            'x2': bx2, 'y2': by2,
+                            'confidence': confidence,
+                            'width': bx2 - bx1,
+                            'height': by2 - by1
+                        }
+                    }
+        
+        return self._with_source(best_result, 'motorcycle_box')
+    
+    def _crop_box(self, image, bbox, padding, frame=None, min_height=None):
+        """
+        Crop a bbox dict with fractional padding, clamped to the image
+        
+        With a frame, the crop comes from its original, decoded at the
+        smallest scale giving min_height pixels (full resolution when None).
+        
+        Returns:
+            tuple: (crop or None, (x1, y1, x2, y2) in image coordinates)
+        """
+        h, w = image.shape[:2]
+        box_w = bbox.get('x2', 0) - bbox.get('x1', 0)
+        box_h = bbox.get('y2', 0) - bbox.get('y1', 0)
+        pad_x, pad_y = int(box_w * padding), int(box_h * padding)
+        
+        x1 = max(0, int(bbox.get('x1', 0)) - pad_x)
+        y1 = max(0, int(bbox.get('y1', 0)) - pad_y)
+        x2 = min(w, int(bbox.get('x2', 0)) + pad_x)
+        y2 = min(h, int(bbox.get('y2', 0)) + pad_y)
+        
+        if x2 <= x1 or y2 <= y1:
+            return None, (x1, y1, x2, y2)
+        
+        if frame is not None:
+            return frame.full_resolution_crop(x1, y1, x2, y2, min_height), (x1, y1, x2, y2)
+        return image[y1:y2, x1:x2], (x1, y1, x2, y2)
+    
+    def _upsample(self, crop):
+        """Grayscale and upsample a crop so characters reach OCR-friendly size"""
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if len(crop.shape) == 3 else crop
+        
+        min_height = self.guided_config['MIN_CROP_HEIGHT']
+        if gray.shape[0] < min_height:
+            factor = min_height / float(gray.shape[0])
+            gray = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_CUBIC)
+        
+        return gray
+    
+    def _with_source(self, result, source):
+        """Tag a result with the stage that produced it"""
+        result['plate_source'] = source if result.get('plate_detected') else ''
+        return result
+    
     def _ocr_detection(self, image):
         """Direct OCR detection on full image"""
         try:
@@ -100,43 +337,73 @@ class PlateReader:
             print(f"OCR detection error: {e}")
             return self._empty_result()
     
-    def _preprocessed_detection(self, image):
-        """OCR detection with image preprocessing"""
+    def _preprocessed_detection(self, image, camera_id=None, deadline=None):
+        """
+        OCR detection with image preprocessing, as an early-exit cascade
+        
+        Variants run concurrently in a small thread pool, ordered by how
+        often each one succeeded for this camera. The cascade stops at the
+        first plate above EARLY_EXIT_CONFIDENCE or when the deadline passes.
+        
+        At most MAX_WORKERS variants of a frame run at once. A variant still
+        mid-readtext when the cascade stops is left to finish and counted as
+        overrunning; while MAX_OVERRUNNING of them are in flight the cascade
+        is skipped, so slow frames cannot pile up EasyOCR calls. Variants
+        also check the deadline before starting their OCR.
+        
+        Args:
+            image: OpenCV image array
+            camera_id: Camera whose learned variant ordering is used
+            deadline (float): time.monotonic() value after which to give up
+            
+        Returns:
+            dict: Plate detection results with the winning 'ocr_variant'
+        """
         try:
+            with self._variant_lock:
+                if self._overrunning >= self.cascade_config['MAX_OVERRUNNING']:
+                    self._overrun_skips += 1
+                    return self._empty_result()
+            
             # Convert to grayscale
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             
-            # Apply various preprocessing techniques
-            preprocessed_images = [
-                gray,  # Original grayscale
-                cv2.bilateralFilter(gray, 11, 17, 17),  # Noise reduction
-                cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1],  # Otsu threshold
-                cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)  # Adaptive threshold
-            ]
-            
+            order = deque(self.variant_order(camera_id))
             best_result = None
-            best_confidence = 0
+            pending = set()
             
-            for processed_img in preprocessed_images:
-                results = self.reader.readtext(processed_img)
-                
-                for (bbox, text, confidence) in results:
-                    cleaned_text = self._clean_plate_text(text)
+            try:
+                while order or pending:
+                    # Keep MAX_WORKERS variants of this frame in flight
+                    while order and len(pending) < self.cascade_config['MAX_WORKERS']:
+                        pending.add(self._cascade_executor.submit(self._run_variant, order.popleft(), gray, deadline))
                     
-                    if self._is_valid_plate(cleaned_text) and confidence > best_confidence:
-                        best_confidence = confidence
-                        best_result = {
-                            'text': cleaned_text,
-                            'confidence': confidence,
-                            'bbox': self._convert_bbox(bbox)
-                        }
+                    timeout = None if deadline is None else deadline - time.monotonic()
+                    if timeout is not None and timeout <= 0:
+                        break
+                    
+                    done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        result = future.result()
+                        if result and (best_result is None or result['confidence'] > best_result['confidence']):
+                            best_result = result
+                    
+                    if best_result and best_result['confidence'] >= self.cascade_config['EARLY_EXIT_CONFIDENCE']:
+                        break
+            finally:
+                # Variants that have not started are dropped, running ones finish without blocking
+                for future in pending:
+                    if not future.cancel():
+                        self._count_overrun(future)
             
             if best_result:
+                self._record_variant_success(camera_id, best_result['variant'])
                 return {
                     'plate_detected': True,
                     'plate_number': best_result['text'],
                     'plate_confidence': best_result['confidence'],
-                    'plate_bbox': best_result['bbox']
+                    'plate_bbox': best_result['bbox'],
+                    'ocr_variant': best_result['variant']
                 }
             
             return self._empty_result()
@@ -145,6 +412,77 @@ class PlateReader:
             print(f"Preprocessed detection error: {e}")
             return self._empty_result()
     
+    def _run_variant(self, name, gray, deadline=None):
+        """Run a variant unless its frame's deadline passed while it waited for a thread"""
+        if deadline is not None and time.monotonic() >= deadline:
+            return None
+        return self._read_variant(name, gray)
+    
+    def _count_overrun(self, future):
+        with self._variant_lock:
+            self._overrunning += 1
+        future.add_done_callback(lambda _: self._release_overrun())
+    
+    def _release_overrun(self):
+        with self._variant_lock:
+            self._overrunning -= 1
+    
+    def _read_variant(self, name, gray):
+        """Run one preprocessing variant and OCR, returning its best valid plate"""
+        try:
+            started = time.monotonic()
+            results = self.reader.readtext(PREPROCESSING_VARIANTS[name](gray))
+            
+            best_result = None
+            for (bbox, text, confidence) in results:
+                cleaned_text = self._clean_plate_text(text)
+                
+                if self._is_valid_plate(cleaned_text) and (best_result is None or confidence > best_result['confidence']):
+                    best_result = {
+                        'text': cleaned_text,
+                        'confidence': confidence,
+                        'bbox': self._convert_bbox(bbox),
+                        'variant': name
+                    }
+            
+            if best_result:
+                best_result['elapsed_ms'] = (time.monotonic() - started) * 1000
+            return best_result
+            
+        except Exception as e:
+            print(f"OCR variant {name} error: {e}")
+            return None
+    
+    def variant_order(self, camera_id=None):
+        """Preprocessing variants for a camera, most successful first"""
+        defaults = list(PREPROCESSING_VARIANTS)
+        with self._variant_lock:
+            successes = dict(self._variant_successes.get(camera_id, {}))
+        
+        return sorted(defaults, key=lambda name: (-successes.get(name, 0), defaults.index(name)))
+    
+    def _record_variant_success(self, camera_id, variant):
+        with self._variant_lock:
+            self._variant_successes[camera_id][variant] += 1
+    
+    def get_cascade_stats(self):
+        """Per-camera variant success counts and the resulting try order"""
+        with self._variant_lock:
+            cameras = {camera: dict(counts) for camera, counts in self._variant_successes.items()}
+            overrunning = self._overrunning
+            overrun_skips = self._overrun_skips
+        
+        return {
+            'early_exit_confidence': self.cascade_config['EARLY_EXIT_CONFIDENCE'],
+            'time_budget_ms': self.cascade_config['TIME_BUDGET_MS'],
+            'overrunning_variants': overrunning,
+            'overrun_skips': overrun_skips,
+            'cameras': {
+                str(camera): {'successes': counts, 'order': self.variant_order(camera)}
+                for camera, counts in cameras.items()
+            }
+        }
+    
     def _region_based_detection(self, image):
         """Detection based on potential plate regions"""
         try:
@@ -273,7 +611,8 @@ class PlateReader:
             'plate_detected': False,
             'plate_number': '',
             'plate_confidence': 0.0,
-            'plate_bbox': {}
+            'plate_bbox': {},
+            'plate_source': ''
         }
     
     def enhance_image_for_ocr(self, image):
@@ -6,6 +6,11 @@ from datetime import datetime
 from pathlib import Path
 from pymongo import MongoClient
 
+from ..utils.frame import load_frame_image, frame_path
+from ..utils.derivatives import derivative_urls, write_derivatives
+from ..utils.encoding import get_encoding_policy
+from ..utils.media_store import get_media_store
+
 # MongoDB connection
 MONGO_URI = "mongodb://localhost:27017/"
 client = MongoClient(MONGO_URI)
@@ -17,8 +22,16 @@ users_collection = db["users"]
 vehicles_collection = db["vehicles"]
 
 class ViolationProcessor:
-    def __init__(self):
-        """Initialize violation processor"""
+    def __init__(self, media_store=None, encoding_policy=None):
+        """
+        Initialize violation processor
+        
+        Args:
+            media_store: MediaStore annotated and evidence images are written to, defaults to the shared one
+            encoding_policy: EncodingPolicy choosing their codec and quality, defaults to the shared one
+        """
+        self.media_store = media_store or get_media_store()
+        self.encoding_policy = encoding_policy or get_encoding_policy()
         self.base_dir = Path(__file__).parent.parent
         self.media_dir = self.base_dir / "media"
         self.violations_dir = self.media_dir / "violations"
@@ -57,6 +70,14 @@ class ViolationProcessor:
             # Check if vehicle is detected (motorcycle/bike)
             vehicle_detected = detection_data.get('vehicle_detected', False)
             
+            # Per-rider verdicts: any confident rider without a helmet is a violation
+            if 'riders' in detection_data:
+                return any(
+                    rider.get('person_confidence', 0.0) >= self.violation_rules['confidence_threshold'] and
+                    not rider.get('helmet_detected', False)
+                    for rider in detection_data['riders']
+                )
+            
             # Violation logic: Person on vehicle without helmet
             if (person_detected and 
                 person_confidence >= self.violation_rules['confidence_threshold'] and
@@ -75,111 +96,142 @@ class ViolationProcessor:
         Create annotated image with bounding boxes and violation markers
         
         Args:
-            original_image_path (str): Path to original image
+            original_image_path: Frame, OpenCV image array or path to original image
             detection_data (dict): Detection results
             
         Returns:
             str: Path to annotated image
         """
         try:
-            # Load original image
-            image = cv2.imread(original_image_path)
+            # Load original image (already decoded for frames and arrays)
+            image = load_frame_image(original_image_path)
             if image is None:
-                return original_image_path
-            
-            # Create copy for annotation
-            annotated = image.copy()
-            
-            # Draw person bounding box
-            person_bbox = detection_data.get('person_bbox', {})
-            if person_bbox:
-                x1, y1 = person_bbox.get('x1', 0), person_bbox.get('y1', 0)
-                x2, y2 = person_bbox.get('x2', 0), person_bbox.get('y2', 0)
-                confidence = person_bbox.get('confidence', 0.0)
-                
-                # Red box for person without helmet
-                color = (0, 0, 255) if detection_data.get('is_violation') else (0, 255, 0)
-                cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 3)
-                
-                # Label
-                label = f"Person: {confidence:.2f}"
-                if detection_data.get('is_violation'):
-                    label += " - NO HELMET!"
-                
-                cv2.putText(annotated, label, (x1, y1-10), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-            
-            # Draw helmet bounding box if detected
-            helmet_bbox = detection_data.get('helmet_bbox', {})
-            if helmet_bbox:
-                x1, y1 = helmet_bbox.get('x1', 0), helmet_bbox.get('y1', 0)
-                x2, y2 = helmet_bbox.get('x2', 0), helmet_bbox.get('y2', 0)
-                confidence = helmet_bbox.get('confidence', 0.0)
-                
-                cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                cv2.putText(annotated, f"Helmet: {confidence:.2f}", (x1, y1-10), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-            
-            # Draw license plate bounding box if detected
-            plate_bbox = detection_data.get('plate_bbox', {})
-            plate_number = detection_data.get('plate_number', '')
-            if plate_bbox:
-                x1, y1 = plate_bbox.get('x1', 0), plate_bbox.get('y1', 0)
-                x2, y2 = plate_bbox.get('x2', 0), plate_bbox.get('y2', 0)
-                
-                cv2.rectangle(annotated, (x1, y1), (x2, y2), (255, 0, 0), 2)
-                if plate_number:
-                    cv2.putText(annotated, plate_number, (x1, y2+25), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
-            
-            # Draw vehicle bounding box if detected
-            vehicle_bbox = detection_data.get('vehicle_bbox', {})
-            if vehicle_bbox:
-                x1, y1 = vehicle_bbox.get('x1', 0), vehicle_bbox.get('y1', 0)
-                x2, y2 = vehicle_bbox.get('x2', 0), vehicle_bbox.get('y2', 0)
-                vehicle_type = detection_data.get('vehicle_type', 'Vehicle')
-                
-                cv2.rectangle(annotated, (x1, y1), (x2, y2), (255, 255, 0), 2)
-                cv2.putText(annotated, vehicle_type, (x1, y1-10), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-            
-            # Add timestamp and violation status
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            camera_id = detection_data.get('camera_id', 'Unknown')
+                return frame_path(original_image_path)
             
-            # Background for text
-            cv2.rectangle(annotated, (10, 10), (500, 80), (0, 0, 0), -1)
-            
-            # Text overlay
-            cv2.putText(annotated, f"Camera: {camera_id}", 
-                       (15, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            cv2.putText(annotated, f"Time: {timestamp}", 
-                       (15, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
-            if detection_data.get('is_violation'):
-                cv2.putText(annotated, "VIOLATION DETECTED!", 
-                           (15, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            annotated = self.render_annotations(image, detection_data)
             
             # Save annotated image
-            base_name = os.path.basename(original_image_path)
-            name, ext = os.path.splitext(base_name)
-            annotated_filename = f"{name}_annotated_{datetime.now().strftime('%Y%m%d_%H%M%S')}{ext}"
-            annotated_path = self.processed_dir / annotated_filename
-            
-            cv2.imwrite(str(annotated_path), annotated)
-            
-            return str(annotated_path)
+            data, ext = self.encoding_policy.encode(annotated, 'annotated')
+            return self.media_store.put_bytes(data, ext, 'annotated')
             
         except Exception as e:
             print(f"Error creating annotated image: {e}")
-            return original_image_path
+            return frame_path(original_image_path)
+    
+    def render_annotations(self, image, detection_data):
+        """
+        Draw bounding boxes and violation markers on a copy of a decoded image
+        
+        Args:
+            image: OpenCV image array
+            detection_data (dict): Detection results
+            
+        Returns:
+            numpy.ndarray: Annotated copy of the image
+        """
+        # Create copy for annotation
+        annotated = image.copy()
+        
+        # Draw every rider with its own helmet verdict
+        riders = detection_data.get('riders', [])
+        for rider in riders:
+            x1, y1 = rider['person_bbox'].get('x1', 0), rider['person_bbox'].get('y1', 0)
+            x2, y2 = rider['person_bbox'].get('x2', 0), rider['person_bbox'].get('y2', 0)
+            
+            color = (0, 255, 0) if rider.get('helmet_detected') else (0, 0, 255)
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 3)
+            
+            rider_label = rider.get('track_id') or rider.get('rider_id', '')
+            label = f"Rider {rider_label}: {rider.get('person_confidence', 0.0):.2f}"
+            if not rider.get('helmet_detected'):
+                label += " - NO HELMET!"
+            cv2.putText(annotated, label, (x1, y1-10), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+        
+        # Draw person bounding box (frames without rider verdicts)
+        person_bbox = detection_data.get('person_bbox', {}) if not riders else {}
+        if person_bbox:
+            x1, y1 = person_bbox.get('x1', 0), person_bbox.get('y1', 0)
+            x2, y2 = person_bbox.get('x2', 0), person_bbox.get('y2', 0)
+            confidence = person_bbox.get('confidence', 0.0)
+            
+            # Red box for person without helmet
+            color = (0, 0, 255) if detection_data.get('is_violation') else (0, 255, 0)
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 3)
+            
+            # Label
+            label = f"Person: {confidence:.2f}"
+            if detection_data.get('is_violation'):
+                label += " - NO HELMET!"
+            
+            cv2.putText(annotated, label, (x1, y1-10), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+        
+        # Draw helmet bounding box if detected
+        if riders:
+            helmet_bboxes = [rider['helmet_bbox'] for rider in riders if rider.get('helmet_bbox')]
+        else:
+            helmet_bboxes = [detection_data['helmet_bbox']] if detection_data.get('helmet_bbox') else []
+        
+        for helmet_bbox in helmet_bboxes:
+            x1, y1 = helmet_bbox.get('x1', 0), helmet_bbox.get('y1', 0)
+            x2, y2 = helmet_bbox.get('x2', 0), helmet_bbox.get('y2', 0)
+            confidence = helmet_bbox.get('confidence', 0.0)
+            
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(annotated, f"Helmet: {confidence:.2f}", (x1, y1-10), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        
+        # Draw license plate bounding box if detected
+        plate_bbox = detection_data.get('plate_bbox', {})
+        plate_number = detection_data.get('plate_number', '')
+        if plate_bbox:
+            x1, y1 = plate_bbox.get('x1', 0), plate_bbox.get('y1', 0)
+            x2, y2 = plate_bbox.get('x2', 0), plate_bbox.get('y2', 0)
+            
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), (255, 0, 0), 2)
+            if plate_number:
+                cv2.putText(annotated, plate_number, (x1, y2+25), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
+        
+        # Draw vehicle bounding box if detected
+        vehicle_bbox = detection_data.get('vehicle_bbox', {})
+        if vehicle_bbox:
+            x1, y1 = vehicle_bbox.get('x1', 0), vehicle_bbox.get('y1', 0)
+            x2, y2 = vehicle_bbox.get('x2', 0), vehicle_bbox.get('y2', 0)
+            vehicle_type = detection_data.get('vehicle_type', 'Vehicle')
+            
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), (255, 255, 0), 2)
+            cv2.putText(annotated, vehicle_type, (x1, y1-10), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+        
+        # Add timestamp (of the capture, rendering may happen later) and violation status
+        captured_at = detection_data.get('timestamp')
+        timestamp = (captured_at if isinstance(captured_at, datetime) else datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+        camera_id = detection_data.get('camera_id', 'Unknown')
+        
+        # Background for text
+        cv2.rectangle(annotated, (10, 10), (500, 80), (0, 0, 0), -1)
+        
+        # Text overlay
+        cv2.putText(annotated, f"Camera: {camera_id}", 
+                   (15, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        cv2.putText(annotated, f"Time: {timestamp}", 
+                   (15, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        
+        if detection_data.get('is_violation'):
+            cv2.putText(annotated, "VIOLATION DETECTED!", 
+                       (15, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        
+        return annotated
     
-    def generate_violation_memo(self, detection_data):
+    def generate_violation_memo(self, detection_data, owner=None):
         """
         Generate violation memo and save to database
         
         Args:
             detection_data (dict): Detection results
+            owner (dict): Vehicle/user already looked up with lookup_owner, looked up here if None
             
         Returns:
             dict: Violation memo data
@@ -194,8 +246,10 @@ class ViolationProcessor:
                 }
             
             # Get user and vehicle information
-            vehicle_info = self._get_vehicle_info(plate_number)
-            user_info = self._get_user_info(vehicle_info.get('owner_id', '')) if vehicle_info else None
+            if owner is None:
+                owner = self.lookup_owner(plate_number)
+            vehicle_info = owner.get('vehicle')
+            user_info = owner.get('user')
             
             # Generate violation ID
             violation_id = f"VIO{datetime.now().strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:6].upper()}"
@@ -219,7 +273,8 @@ class ViolationProcessor:
                     'plate_number': plate_number,
                     'plate_confidence': detection_data.get('plate_confidence', 0.0),
                     'person_confidence': detection_data.get('person_confidence', 0.0),
-                    'helmet_detected': detection_data.get('helmet_detected', False)
+                    'helmet_detected': detection_data.get('helmet_detected', False),
+                    'track_ids': detection_data.get('violation_tracks', [])
                 }
             }
             
@@ -261,6 +316,20 @@ class ViolationProcessor:
                 'message': str(e)
             }
     
+    def lookup_owner(self, plate_number):
+        """
+        Look up the registered vehicle for a plate and its owner
+        
+        Args:
+            plate_number (str): Plate read from the frame
+            
+        Returns:
+            dict: {'vehicle': vehicle document or None, 'user': owner document or None}
+        """
+        vehicle_info = self._get_vehicle_info(plate_number)
+        user_info = self._get_user_info(vehicle_info.get('owner_id', '')) if vehicle_info else None
+        return {'vehicle': vehicle_info, 'user': user_info}
+    
     def _get_vehicle_info(self, plate_number):
         """Get vehicle information from database"""
         try:
@@ -287,21 +356,57 @@ class ViolationProcessor:
     def _save_violation_evidence(self, detection_data, violation_id):
         """Save violation evidence images"""
         try:
-            # Copy processed image to violations folder
+            # The processed image is the evidence: reference its stored copy instead of copying it
             processed_image = detection_data.get('processed_image', '')
             if processed_image and os.path.exists(processed_image):
-                evidence_filename = f"{violation_id}_evidence.jpg"
-                evidence_path = self.violations_dir / evidence_filename
+                if self.media_store.add_reference(processed_image, 'violation', violation_id):
+                    return processed_image
                 
-                import shutil
-                shutil.copy2(processed_image, evidence_path)
-                
-                return str(evidence_path)
+                # Not in the store (e.g. an older file): store it once
+                return self.media_store.put_file(processed_image, 'evidence', [('violation', violation_id)])
                 
         except Exception as e:
             print(f"Error saving violation evidence: {e}")
             return None
     
+    def write_evidence(self, image, detection_data, refs=()):
+        """
+        Render the annotations on a decoded frame and store the evidence image, encoded once
+        
+        The thumbnail and medium derivatives are written next to it from the
+        same rendered image.
+        
+        Args:
+            image: OpenCV image array of the original frame
+            detection_data (dict): Detection results
+            refs: (kind, id) pairs referencing the evidence, e.g. ('violation', 'VIO...')
+            
+        Returns:
+            str: Path of the stored evidence image
+        """
+        annotated = self.render_annotations(image, detection_data)
+        data, ext = self.encoding_policy.encode(annotated, 'evidence')
+        
+        evidence_path = self.media_store.put_bytes(data, ext, 'evidence', refs)
+        write_derivatives(annotated, evidence_path, policy=self.encoding_policy)
+        return evidence_path
+    
+    def evidence_urls(self, evidence_path):
+        """URLs of an evidence image and its derivatives: {'full', 'medium', 'thumbnail'}"""
+        return derivative_urls(self.media_store, evidence_path, policy=self.encoding_policy)
+    
+    def set_evidence_photo(self, violation_id, evidence_path, evidence_urls=None):
+        """Point a violation memo at its evidence image (and derivative URLs) once it has been written"""
+        try:
+            fields = {'evidence_photo': evidence_path, 'evidence_written_at': datetime.now()}
+            if evidence_urls:
+                fields['evidence_urls'] = evidence_urls
+            violations_collection.update_one({'violation_id': violation_id}, {'$set': fields})
+            return True
+        except Exception as e:
+            print(f"Error updating evidence for violation {violation_id}: {e}")
+            return False
+    
     def create_violation_memo(self, violation_data):
         """Create violation memo from provided data"""
         try:
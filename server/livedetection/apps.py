@@ -10,7 +10,7 @@ class LivedetectionConfig(AppConfig):
         try:
             # Import configuration and validate
             from .config.settings import validate_config
-            from .config.model_config import validate_model_config
+            from .config.model_config import MODEL_CONFIG, validate_model_config
             
             print("Initializing Live Detection app...")
             
@@ -24,6 +24,10 @@ class LivedetectionConfig(AppConfig):
             # Check model availability
             self._check_model_availability()
             
+            # Models load lazily; warm them up front only when asked to
+            if MODEL_CONFIG['STARTUP']['WARMUP']:
+                self._start_warmup()
+            
             print("Live Detection app initialized successfully!")
             
         except Exception as e:
@@ -46,6 +50,19 @@ class LivedetectionConfig(AppConfig):
         for directory in required_dirs:
             directory.mkdir(parents=True, exist_ok=True)
     
+    def _start_warmup(self):
+        """Load the detection models and run a dummy frame in the background"""
+        import threading
+        from . import model_registry
+        
+        def run():
+            try:
+                model_registry.warmup()
+            except Exception as e:
+                print(f"Model warmup failed: {e}")
+        
+        threading.Thread(target=run, name='livedetection-warmup', daemon=True).start()
+    
     def _check_model_availability(self):
         """Check if required models are available"""
         from .config.settings import CONFIG
@@ -0,0 +1,568 @@
+"""
+End-to-end detection pipeline benchmark: synthetic and sample frames, in-memory Mongo, per-stage percentiles
+"""
+import copy
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+from bson import ObjectId
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from . import model_registry
+from .config.model_config import MODEL_CONFIG
+from .config.settings import CONFIG
+
+_MISSING = object()
+SAMPLE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+BENCHMARK_PLATE = 'KA01AB1234'
+
+
+class MemoryCollection:
+    def __init__(self, name):
+        """
+        Initialize an in-memory stand-in for a Mongo collection
+
+        Covers the calls the detection path makes: insert_one, find_one,
+        update_one/update_many ($set, $setOnInsert, $push, $addToSet, $pull,
+        upsert), delete_one and count_documents, with equality queries.
+        Documents are deep-copied in and out, as BSON encoding would.
+
+        Args:
+            name (str): Collection name
+        """
+        self.name = name
+        self.documents = []
+        self._lock = threading.Lock()
+
+    def insert_one(self, document):
+        with self._lock:
+            # pymongo also sets _id on the caller's dict
+            document.setdefault('_id', ObjectId())
+            self.documents.append(copy.deepcopy(document))
+        return SimpleNamespace(inserted_id=document['_id'])
+
+    def find_one(self, query=None, projection=None):
+        with self._lock:
+            for document in self.documents:
+                if _matches(document, query or {}):
+                    return _project(document, projection)
+        return None
+
+    def count_documents(self, query):
+        with self._lock:
+            return sum(1 for document in self.documents if _matches(document, query))
+
+    def update_one(self, query, update, upsert=False):
+        return self._update(query, update, upsert, many=False)
+
+    def update_many(self, query, update, upsert=False):
+        return self._update(query, update, upsert, many=True)
+
+    def delete_one(self, query):
+        with self._lock:
+            for index, document in enumerate(self.documents):
+                if _matches(document, query):
+                    del self.documents[index]
+                    return SimpleNamespace(deleted_count=1)
+        return SimpleNamespace(deleted_count=0)
+
+    def _update(self, query, update, upsert, many):
+        update = copy.deepcopy(update)
+        with self._lock:
+            matched = [document for document in self.documents if _matches(document, query)]
+            if not many:
+                matched = matched[:1]
+
+            upserted_id = None
+            if not matched and upsert:
+                document = {key: value for key, value in query.items() if not key.startswith('$')}
+                document.setdefault('_id', ObjectId())
+                document.update(update.get('$setOnInsert', {}))
+                self.documents.append(document)
+                matched, upserted_id = [document], document['_id']
+
+            for document in matched:
+                document.update(update.get('$set', {}))
+                for field, value in update.get('$push', {}).items():
+                    document.setdefault(field, []).append(value)
+                for field, value in update.get('$addToSet', {}).items():
+                    values = value['$each'] if isinstance(value, dict) and '$each' in value else [value]
+                    items = document.setdefault(field, [])
+                    items.extend(item for item in values if item not in items)
+                for field, value in update.get('$pull', {}).items():
+                    document[field] = [item for item in document.get(field, []) if item != value]
+
+        return SimpleNamespace(matched_count=len(matched) if upserted_id is None else 0, upserted_id=upserted_id)
+
+
+class MemoryDatabase:
+    """Dict of MemoryCollections, created on first access like pymongo databases"""
+
+    def __init__(self):
+        self.collections = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self.collections:
+                self.collections[name] = MemoryCollection(name)
+            return self.collections[name]
+
+
+class MemoryClient:
+    """MongoClient stand-in: client[db_name][collection_name]"""
+
+    def __init__(self):
+        self.databases = defaultdict(MemoryDatabase)
+
+    def __getitem__(self, name):
+        return self.databases[name]
+
+    def close(self):
+        pass
+
+
+def _value(document, key):
+    for part in key.split('.'):
+        document = document.get(part) if isinstance(document, dict) else None
+    return document
+
+
+def _matches(document, query):
+    return all(_value(document, key) == value for key, value in query.items())
+
+
+def _project(document, projection):
+    excluded = {field for field, keep in (projection or {}).items() if not keep}
+    return {key: copy.deepcopy(value) for key, value in document.items() if key not in excluded}
+
+
+class _Timed:
+    """Callable wrapper recording how long each call takes; other attributes pass through"""
+
+    def __init__(self, target, name, timer):
+        self._target = target
+        self._name = name
+        self._timer = timer
+
+    def __call__(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._target(*args, **kwargs)
+        finally:
+            name = self._name(*args, **kwargs) if callable(self._name) else self._name
+            self._timer.record(name, (time.perf_counter() - started) * 1000)
+
+    def __getattr__(self, attribute):
+        return getattr(self._target, attribute)
+
+
+class StageTimer:
+    def __init__(self):
+        """Initialize a collector of per-stage latencies (milliseconds)"""
+        self.samples = defaultdict(list)
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._patched = []
+
+    def record(self, name, elapsed_ms):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.samples[name].append(elapsed_ms)
+
+    def wrap(self, owner, attribute, name):
+        """
+        Time every call of owner.attribute until restore()
+
+        Args:
+            owner: Object or class holding the callable; None is ignored
+            attribute (str): Attribute name, e.g. 'model' or '_read_variant'
+            name: Stage name, or a function of the call's arguments returning one
+        """
+        if owner is None or getattr(owner, attribute, None) is None:
+            return
+        raw = vars(owner).get(attribute, _MISSING)
+        setattr(owner, attribute, _Timed(getattr(owner, attribute), name, self))
+        self._patched.append((owner, attribute, raw))
+
+    def restore(self):
+        """Put every wrapped attribute back"""
+        for owner, attribute, raw in reversed(self._patched):
+            if raw is _MISSING:
+                delattr(owner, attribute)
+            else:
+                setattr(owner, attribute, raw)
+        self._patched = []
+
+    def summary(self, percentiles):
+        """
+        Latency distribution of every stage
+
+        Returns:
+            dict: stage -> {'count', 'mean_ms', 'p<N>_ms'..., 'max_ms'}
+        """
+        with self._lock:
+            samples = {name: np.array(values) for name, values in self.samples.items() if values}
+
+        report = {}
+        for name, values in sorted(samples.items()):
+            stats = {'count': int(values.size), 'mean_ms': round(float(values.mean()), 2)}
+            for percentile in percentiles:
+                stats[f'p{percentile}_ms'] = round(float(np.percentile(values, percentile)), 2)
+            stats['max_ms'] = round(float(values.max()), 2)
+            report[name] = stats
+        return report
+
+
+def synthetic_frame(width, height, seed=0):
+    """
+    Street-like test frame: textured road, a motorcycle, a rider without a helmet and a readable plate
+
+    Returns:
+        numpy.ndarray: BGR image
+    """
+    rng = np.random.RandomState(seed)
+    image = cv2.GaussianBlur(rng.randint(70, 140, (height, width, 3), dtype=np.uint8), (5, 5), 0)
+
+    unit = width / 640.0
+    x = int(rng.uniform(0.1, 0.5) * width)
+    y = int(0.35 * height)
+
+    def box(x1, y1, x2, y2, color):
+        cv2.rectangle(image, (int(x1), int(y1)), (int(x2), int(y2)), color, -1)
+
+    box(x, y + 120 * unit, x + 200 * unit, y + 220 * unit, (40, 40, 40))  # Motorcycle
+    box(x + 60 * unit, y + 20 * unit, x + 130 * unit, y + 140 * unit, (120, 60, 20))  # Rider
+    cv2.circle(image, (int(x + 95 * unit), int(y + 5 * unit)), int(22 * unit), (60, 90, 150), -1)  # Bare head
+    box(x + 65 * unit, y + 190 * unit, x + 145 * unit, y + 215 * unit, (255, 255, 255))  # Plate
+    cv2.putText(image, BENCHMARK_PLATE, (int(x + 68 * unit), int(y + 209 * unit)),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.3 * unit, (0, 0, 0), max(1, int(unit)))
+    return image
+
+
+def build_corpus(sizes=None, per_size=None, sample_dir=None, max_samples=None):
+    """
+    Encoded frames to benchmark, as uploads would arrive
+
+    Args:
+        sizes (list): (width, height) of the synthetic frames, defaults to BENCHMARK SYNTHETIC_SIZES
+        per_size (int): Synthetic frames per size
+        sample_dir: Directory of real frames added after the synthetic ones (skipped when missing)
+        max_samples (int): Most sample frames used
+
+    Returns:
+        list: {'name', 'data', 'source', 'size'} per frame
+    """
+    config = MODEL_CONFIG['BENCHMARK']
+    sizes = sizes or config['SYNTHETIC_SIZES']
+    per_size = config['SYNTHETIC_FRAMES_PER_SIZE'] if per_size is None else per_size
+    sample_dir = Path(sample_dir or config['SAMPLE_DIR'])
+    max_samples = config['MAX_SAMPLES'] if max_samples is None else max_samples
+
+    corpus = []
+    for width, height in sizes:
+        for index in range(per_size):
+            image = synthetic_frame(width, height, seed=index)
+            corpus.append({
+                'name': f'synthetic_{width}x{height}_{index}.jpg',
+                'data': cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes(),
+                'source': 'synthetic',
+                'size': f'{width}x{height}'
+            })
+
+    if sample_dir.is_dir():
+        samples = sorted(path for path in sample_dir.iterdir() if path.suffix.lower() in SAMPLE_EXTENSIONS)
+        for path in samples[:max_samples]:
+            image = cv2.imread(str(path))
+            if image is None:
+                continue
+            corpus.append({
+                'name': path.name,
+                'data': path.read_bytes(),
+                'source': 'sample',
+                'size': f'{image.shape[1]}x{image.shape[0]}'
+            })
+
+    return corpus
+
+
+class PipelineBenchmark:
+    def __init__(self, corpus, warmup_frames=None, percentiles=None, camera_id='BENCH_CAM'):
+        """
+        Initialize an end-to-end benchmark of process_image_detection
+
+        Every frame goes through the upload path (FileHandler decode and
+        normalisation), then views.process_image_detection with a pipeline
+        wired to in-memory Mongo collections and a temporary media store.
+        The models are the configured ones. The models, decode, OCR
+        variants, annotation, encoding and collection writes are timed
+        in place, without changing what they do.
+
+        Args:
+            corpus (list): Frames from build_corpus
+            warmup_frames (int): Frames run first and not recorded, defaults to BENCHMARK WARMUP_FRAMES
+            percentiles (list): Latency percentiles to report
+            camera_id: Camera the frames are attributed to
+        """
+        config = MODEL_CONFIG['BENCHMARK']
+        self.corpus = corpus
+        self.warmup_frames = config['WARMUP_FRAMES'] if warmup_frames is None else warmup_frames
+        self.percentiles = percentiles or config['PERCENTILES']
+        self.camera_id = camera_id
+
+    def run(self, repeat=1, label=''):
+        """
+        Run the corpus repeat times
+
+        Args:
+            repeat (int): Passes over the corpus
+            label (str): Free text stored with the results, e.g. 'before-int8'
+
+        Returns:
+            dict: JSON-serialisable results
+        """
+        from . import views
+        from .ai_models import violation_processor as violation_module
+        from .evidence_writer import EvidenceWriter
+        from .pipeline import DetectionPipeline
+        from .utils.database_handler import DatabaseHandler
+        from .utils.encoding import EncodingPolicy
+        from .utils.file_handler import FileHandler
+        from .utils.frame import Frame, get_crop_decode_stats
+        from .utils.media_store import MediaStore
+
+        started_at = datetime.now()
+        timer = StageTimer()
+        client = MemoryClient()
+        sentra = client['sentra']
+        self._seed_owner(sentra)
+
+        saved_globals = {
+            name: getattr(violation_module, name)
+            for name in ('violations_collection', 'users_collection', 'vehicles_collection')
+        }
+        saved_pipeline = views.detection_pipeline
+
+        with tempfile.TemporaryDirectory() as media_dir:
+            try:
+                # The violation processor talks to module-level collections
+                violation_module.violations_collection = sentra['violations']
+                violation_module.users_collection = sentra['users']
+                violation_module.vehicles_collection = sentra['vehicles']
+
+                policy = EncodingPolicy()
+                store = MediaStore(media_dir, collection=sentra['media_objects'])
+                processor = violation_module.ViolationProcessor(media_store=store, encoding_policy=policy)
+                db_handler = DatabaseHandler(client=client)
+                file_handler = FileHandler(media_store=store, encoding_policy=policy)
+                evidence_config = CONFIG['EVIDENCE']
+                writer = EvidenceWriter(
+                    processor, db_handler,
+                    workers=evidence_config['WRITER_WORKERS'], max_depth=evidence_config['QUEUE_MAX_DEPTH']
+                )
+                writer.start()
+                views.detection_pipeline = DetectionPipeline(processor, db_handler, evidence_writer=writer)
+
+                self._instrument(timer, Frame, processor, policy, sentra)
+                crop_decodes = get_crop_decode_stats()
+                counts, wall_seconds = self._run_frames(timer, file_handler, views, repeat)
+                crop_decodes_after = get_crop_decode_stats()
+
+                flush_started = time.perf_counter()
+                writer.stop(timeout=60)
+                flush_seconds = time.perf_counter() - flush_started
+
+                encoding, stored = policy.get_stats(), store.get_stats()
+            finally:
+                timer.restore()
+                views.detection_pipeline = saved_pipeline
+                for name, collection in saved_globals.items():
+                    setattr(violation_module, name, collection)
+
+        return {
+            'label': label,
+            'started_at': started_at.isoformat(),
+            'commit': _git_commit(),
+            'settings': self._settings(repeat),
+            'corpus': {
+                'frames': len(self.corpus),
+                'sources': dict(Counter(item['source'] for item in self.corpus)),
+                'sizes': dict(Counter(item['size'] for item in self.corpus))
+            },
+            **counts,
+            'wall_seconds': round(wall_seconds, 3),
+            'fps': round(counts['frames'] / wall_seconds, 2) if wall_seconds else 0.0,
+            'evidence_flush_seconds': round(flush_seconds, 3),
+            # Whole process, models included
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': timer.summary(self.percentiles),
+            # Original-buffer decodes for plate crops in this process, warmup frames included
+            'plate_crop_decode': {
+                'decodes': crop_decodes_after['decodes'] - crop_decodes['decodes'],
+                'decode_ms': round(crop_decodes_after['decode_ms'] - crop_decodes['decode_ms'], 2)
+            },
+            'encoding': encoding,
+            'stored': stored
+        }
+
+    def _run_frames(self, timer, file_handler, views, repeat):
+        counts = {'frames': 0, 'errors': 0, 'violations': 0, 'plates': 0}
+        queue = [item for _ in range(repeat) for item in self.corpus]
+        warmup = [self.corpus[index % len(self.corpus)] for index in range(self.warmup_frames)] if self.corpus else []
+
+        timer.enabled = False
+        for item in warmup:
+            self._run_frame(timer, file_handler, views, item)
+        timer.enabled = True
+
+        loop_started = time.perf_counter()
+        for item in queue:
+            result = self._run_frame(timer, file_handler, views, item)
+            counts['frames'] += 1
+            if not isinstance(result, dict):
+                counts['errors'] += 1
+                continue
+            counts['violations'] += int(bool(result.get('is_violation')))
+            counts['plates'] += int(bool(result.get('plate_detected')))
+        return counts, time.perf_counter() - loop_started
+
+    def _run_frame(self, timer, file_handler, views, item):
+        started = time.perf_counter()
+        upload = SimpleUploadedFile(item['name'], item['data'], content_type='image/jpeg')
+        try:
+            frame = file_handler.read_uploaded_image(upload, self.camera_id)
+        except ValueError as e:
+            print(f"Benchmark frame {item['name']} rejected: {e}")
+            return None
+        timer.record('ingest', (time.perf_counter() - started) * 1000)
+
+        result = views.process_image_detection(frame, self.camera_id)
+        timer.record('end_to_end', (time.perf_counter() - started) * 1000)
+
+        # Errors come back as a JsonResponse
+        if isinstance(result, dict):
+            for stage, timing in result.get('stage_timings', {}).items():
+                if stage == 'total_ms':
+                    timer.record('stage.total', timing)
+                else:
+                    timer.record(f'stage.{stage}', timing['ms'])
+        return result
+
+    def _instrument(self, timer, frame_class, processor, policy, sentra):
+        timer.wrap(frame_class, 'from_bytes', 'decode')
+        timer.wrap(processor, 'render_annotations', 'annotate')
+        timer.wrap(processor, 'write_evidence', 'evidence_write')
+        timer.wrap(policy, 'encode', lambda image, media_class, **kwargs: f'encode.{media_class}')
+
+        for name in ('helmet_detections', 'violations', 'media_objects'):
+            for operation in ('insert_one', 'update_one'):
+                timer.wrap(sentra[name], operation, f'db.{name}.{operation}')
+
+        if model_registry.server_mode():
+            client = model_registry.get_model_client()
+            timer.wrap(client, 'detect', 'model_server.detect')
+            timer.wrap(client, 'detect_and_read', 'model_server.plate')
+            timer.wrap(client, 'read_plate_crop', 'model_server.plate_crop')
+            return
+
+        detector = model_registry.get_helmet_detector()
+        # A ModelCascade times its two tiers separately
+        tiers = [('yolo', detector), ('yolo.fast', getattr(detector, 'fast', None)),
+                 ('yolo.accurate', getattr(detector, 'accurate', None))]
+        for name, tier in tiers:
+            if tier is not None and hasattr(tier, '_process_detections'):
+                timer.wrap(tier, 'model', name)
+                timer.wrap(tier, '_process_detections', 'postprocess')
+
+        plate_reader = model_registry.get_plate_reader()
+        timer.wrap(plate_reader, 'read_plate_crop', 'ocr.plate_crop')
+        timer.wrap(plate_reader, '_read_motorcycle_regions', 'ocr.motorcycle_regions')
+        timer.wrap(plate_reader, '_ocr_detection', 'ocr.full_frame')
+        timer.wrap(plate_reader, '_read_variant', lambda variant, gray: f'ocr.variant.{variant}')
+        timer.wrap(plate_reader, '_region_based_detection', 'ocr.regions')
+
+    def _seed_owner(self, sentra):
+        """Register the synthetic plate so violations go through the owner lookup and memo"""
+        sentra['users'].insert_one({'user_id': 'BENCH_USER', 'name': 'Benchmark Owner', 'mobile_number': ''})
+        sentra['vehicles'].insert_one({'plate_number': BENCHMARK_PLATE, 'user_id': 'BENCH_USER'})
+
+    def _settings(self, repeat):
+        inference = MODEL_CONFIG['INFERENCE']
+        return {
+            'repeat': repeat,
+            'warmup_frames': self.warmup_frames,
+            'serving_mode': MODEL_CONFIG['SERVING']['MODE'],
+            'backend': inference['BACKEND'],
+            'precision': inference['PRECISION'],
+            'dynamic_batching': inference['DYNAMIC_BATCHING'],
+            'model_cascade': MODEL_CONFIG['CASCADE']['ENABLED'],
+            'reduced_decode': CONFIG['FILES']['REDUCED_DECODE'],
+            'evidence_format': CONFIG['ENCODING']['CLASSES']['evidence']['FORMAT'],
+            'stage_workers': CONFIG['PIPELINE']['MAX_WORKERS'],
+            'timed_stage_workers': CONFIG['PIPELINE']['TIMED_STAGE_WORKERS']
+        }
+
+
+def compare_results(baseline, current, stages=None):
+    """
+    Differences between two benchmark results
+
+    Args:
+        baseline (dict): Earlier run
+        current (dict): New run
+        stages (list): Stages to compare, defaults to those in both runs
+
+    Returns:
+        dict: {'fps': (before, after, change %), 'peak_rss_mb': ..., 'stages': {stage: {'p50_ms': ..., 'p95_ms': ...}}}
+    """
+    def delta(before, after):
+        # peak_rss_mb is None where the platform cannot report it
+        if before is None or after is None:
+            return before, after, None
+        change = round((after - before) / before * 100, 1) if before else None
+        return before, after, change
+
+    stages = stages or sorted(set(baseline.get('stages', {})) & set(current.get('stages', {})))
+    report = {
+        'fps': delta(baseline.get('fps', 0.0), current.get('fps', 0.0)),
+        'peak_rss_mb': delta(baseline.get('peak_rss_mb', 0.0), current.get('peak_rss_mb', 0.0)),
+        'stages': {}
+    }
+    for stage in stages:
+        before, after = baseline['stages'].get(stage, {}), current['stages'].get(stage, {})
+        report['stages'][stage] = {
+            key: delta(before[key], after[key]) for key in ('p50_ms', 'p95_ms') if key in before and key in after
+        }
+    return report
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where the resource module is missing (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor, 1)
+
+
+def _git_commit():
+    """HEAD of the checkout the benchmark ran from, '' outside git"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).parent,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip()
+    except Exception:
+        return ''
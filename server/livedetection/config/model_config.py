@@ -1,4 +1,4 @@
-import torch
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).parent.parent
@@ -28,7 +28,7 @@ MODEL_CONFIG = {
         'CONFIDENCE_THRESHOLD': 0.5,
         'IOU_THRESHOLD': 0.45,
         'MAX_DETECTIONS': 300,
-        'DEVICE': 'cuda' if torch.cuda.is_available() else 'cpu'
+        'DEVICE': os.getenv('MODEL_DEVICE', 'auto')  # 'auto' picks cuda when available, see resolve_device()
     },
     
     # License Plate Recognition Configuration
@@ -51,7 +51,27 @@ MODEL_CONFIG = {
             r'^[A-Z]{2}[0-9]{2}[A-Z]{4}[0-9]{4}$'  # New BH series
         ],
         'MIN_PLATE_LENGTH': 6,
-        'MAX_PLATE_LENGTH': 12
+        'MAX_PLATE_LENGTH': 12,
+        'ALLOWLIST': '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ',
+        'DETECTOR_GUIDED': {
+            'MAX_PLATE_CROPS': 3,  # Highest-confidence license_plate boxes to OCR
+            'CROP_PADDING': 0.1,  # Fraction of the box size added on every side
+            'MIN_CROP_HEIGHT': 64,  # Crops are upsampled to at least this height
+            'TWO_LINE_MAX_ASPECT': 2.5,  # Plates narrower than this are read as two lines
+            'MOTORCYCLE_PLATE_REGION': 0.5  # Lower fraction of a motorcycle box searched when no plate box exists
+        },
+        'TRACK_VOTING': {
+            'MAX_READS': 5,  # Best plate crops OCR'd per rider track
+            'MIN_READS': 2,  # Reads needed before a track's plate can settle
+            'CONSENSUS_THRESHOLD': 0.8,  # Stop OCR for a track once the voted plate is this confident
+            'MIN_PLATE_OVERLAP': 0.5  # Share of a plate box inside a rider's motorcycle (or lower body) box
+        },
+        'CASCADE': {
+            'EARLY_EXIT_CONFIDENCE': 0.8,  # Stop trying preprocessing variants once a plate reads this well
+            'MAX_WORKERS': 2,  # Variants OCR'd concurrently per frame
+            'MAX_OVERRUNNING': 2,  # Variants still running past their frame's budget above which the cascade is skipped
+            'TIME_BUDGET_MS': 1500  # Per-frame budget for the full-frame fallback passes
+        }
     },
     
     # Training Configuration
@@ -112,9 +132,13 @@ MODEL_CONFIG = {
     
     # Inference Configuration
     'INFERENCE': {
-        'BATCH_SIZE': 1,
+        'BATCH_SIZE': 8,  # Maximum frames per batched forward pass
         'HALF_PRECISION': False,
-        'DYNAMIC_BATCHING': False,
+        'DYNAMIC_BATCHING': True,
+        'BATCH_WAIT_MS': 10,  # How long to wait for more frames before running a batch
+        'BATCH_STATS_WINDOW': 500,  # Number of recent batches kept for stats
+        'BACKEND': 'torch',  # 'torch', 'onnx' (ONNX Runtime) or 'openvino'
+        'PRECISION': 'fp32',  # 'int8' loads the promoted quantized model for onnx/openvino
         'TTA': False,  # Test Time Augmentation
         'AGNOSTIC_NMS': False,
         'MULTI_LABEL': False,
@@ -123,11 +147,76 @@ MODEL_CONFIG = {
         'SAVE_CROPS': False
     },
     
+    # Two-tier model cascade: the fast model sees every frame, uncertain frames go to the accurate model
+    'CASCADE': {
+        'ENABLED': os.getenv('MODEL_CASCADE', 'false').lower() == 'true',
+        'FAST': {
+            'CONFIDENCE_THRESHOLD': 0.5,  # Boxes kept when the frame is not escalated
+            'BORDERLINE_LOW': 0.25,  # Fast model runs down to this confidence to see uncertain boxes
+            'BORDERLINE_HIGH': 0.6  # person/helmet/no_helmet boxes in [LOW, HIGH) escalate the frame
+        },
+        'ACCURATE': {
+            'CONFIDENCE_THRESHOLD': 0.45  # Weights: PATHS['MODELS']['HELMET_DETECTION_ACCURATE']
+        },
+        'ESCALATE_CLASSES': ['person', 'helmet', 'no_helmet'],
+        'ESCALATE_UNDETERMINED_RIDERS': True,  # Riders with neither a helmet nor a no_helmet box
+        'STATS_WINDOW': 500  # Recent frames kept for latency percentiles
+    },
+    
+    # Tiled (SAHI-style) detection for high-resolution cameras, overridden per camera by cameras.tiling
+    'TILING': {
+        'ENABLED': os.getenv('TILED_INFERENCE', 'false').lower() == 'true',
+        'TILE_SIZE': 640,  # Square tile side in pixels
+        'OVERLAP': 0.2,  # Fraction of a tile shared with its neighbour
+        'MIN_FRAME_WIDTH': 1280,  # Narrower frames are detected whole
+        'MIN_TILE_MOTION': 0.002,  # Changed-pixel share below which a tile is skipped
+        'FULL_FRAME_PASS': True,  # Also detect the downscaled full frame, for objects larger than a tile
+        'MERGE_IOS_THRESHOLD': 0.6  # Cross-tile NMS on intersection over the smaller box
+    },
+    
+    # Shared model server (run_model_server command)
+    'SERVING': {
+        'MODE': os.getenv('MODEL_SERVING_MODE', 'inprocess'),  # 'inprocess' or 'server'
+        # Requests are pickled, so the socket lives in a private (0700) runtime directory the server
+        # creates or checks. Unset means $XDG_RUNTIME_DIR, else <tempdir>/sentra-<uid>, resolved
+        # by the server and client rather than at import
+        'SOCKET_PATH': os.getenv('MODEL_SERVER_SOCKET'),
+        'AUTHKEY': os.getenv('MODEL_SERVER_AUTHKEY', '').encode(),  # Required: shared secret of server and clients
+        'REPLICAS': int(os.getenv('MODEL_SERVER_REPLICAS', '1')),  # Model copies loaded by the server
+        'REQUEST_TIMEOUT': 30  # seconds
+    },
+    
+    # Startup behaviour (startup_benchmark command)
+    'STARTUP': {
+        'WARMUP': os.getenv('LIVEDETECTION_WARMUP', 'false').lower() == 'true',  # Load models and run a dummy frame at boot
+        'IMPORT_BUDGET_SECONDS': 2.0,  # Per-app URLconf import time budget
+        'HEAVY_MODULES': ['torch', 'ultralytics', 'easyocr', 'onnxruntime', 'openvino'],
+        'HEAVY_MODULE_APPS': []  # Apps allowed to import HEAVY_MODULES at import time
+    },
+    
+    # End-to-end pipeline benchmark (python manage.py benchmark_pipeline)
+    'BENCHMARK': {
+        'SYNTHETIC_SIZES': [(640, 480), (1280, 720), (1920, 1080), (4000, 3000)],  # Width, height
+        'SYNTHETIC_FRAMES_PER_SIZE': 5,
+        'SAMPLE_DIR': BASE_DIR / 'data' / 'val' / 'images',  # Real frames added to the corpus when present
+        'MAX_SAMPLES': 20,
+        'WARMUP_FRAMES': 3,  # Run first and left out of the results (model loading, first inference)
+        'PERCENTILES': [50, 90, 95, 99]
+    },
+    
+    # Post-training quantization
+    'QUANTIZATION': {
+        'FORMAT': 'openvino',  # 'openvino' (NNCF) or 'onnx' (ONNX Runtime static quantization)
+        'MAX_MAP50_DROP': 0.01,  # Refuse to promote if INT8 mAP50 is lower than FP32 by more than this
+        'CALIBRATION_IMAGES': 300,  # Images from data/val/images used to calibrate activations
+        'IMAGE_SIZE': 640
+    },
+    
     # Performance Configuration
     'PERFORMANCE': {
         'TENSORRT': False,
-        'ONNX_EXPORT': False,
-        'OPENVINO': False,
+        'ONNX_EXPORT': True,  # Formats produced by the export_helmet_model command
+        'OPENVINO': True,
         'COREML': False,
         'TFLITE': False,
         'BENCHMARK_MODE': False,
@@ -148,11 +237,16 @@ MODEL_CONFIG = {
         'SPATIAL_CONSTRAINTS': {
             'PERSON_HELMET_MAX_DISTANCE': 100,  # pixels
             'PERSON_VEHICLE_MAX_DISTANCE': 200,  # pixels
-            'OVERLAP_THRESHOLD': 0.3
+            'OVERLAP_THRESHOLD': 0.3,  # Share of a person box inside a motorcycle box to count as a rider
+            'HEAD_REGION_FRACTION': 0.4,  # Upper part of a person box treated as the head
+            'HELMET_HEAD_IOU': 0.4  # Minimum helmet/head IoU for a rider to count as helmeted
         },
         'TEMPORAL_CONSTRAINTS': {
             'MINIMUM_DETECTION_DURATION': 2,  # seconds
-            'MAXIMUM_GAP_BETWEEN_DETECTIONS': 5  # seconds
+            'MAXIMUM_GAP_BETWEEN_DETECTIONS': 5,  # seconds
+            'TRACK_IOU_THRESHOLD': 0.3,  # Minimum IoU between a predicted track box and a rider box
+            'TRACK_HIGH_CONFIDENCE': 0.6,  # Riders above this are matched first and may start tracks
+            'MIN_TRACK_HITS': 2  # Frames a track needs before it can raise a violation
         }
     },
     
@@ -162,6 +256,7 @@ MODEL_CONFIG = {
         'MODELS': {
             'HELMET_DETECTION': BASE_DIR / 'weights' / 'helmet_detection.pt',
             'HELMET_DETECTION_BACKUP': BASE_DIR / 'weights' / 'backup' / 'helmet_detection_backup.pt',
+            'HELMET_DETECTION_ACCURATE': BASE_DIR / 'weights' / 'helmet_detection_medium.pt',  # Cascade tier 2, trained from YOLO_MEDIUM
             'YOLO_BASE': 'yolov8n.pt',
             'YOLO_MEDIUM': 'yolov8m.pt',
             'YOLO_LARGE': 'yolov8l.pt'
@@ -218,6 +313,32 @@ def validate_model_config():
     if len(class_names) != num_classes:
         errors.append(f"Number of class names ({len(class_names)}) doesn't match num_classes ({num_classes})")
     
+    # Validate batching parameters
+    if MODEL_CONFIG['INFERENCE']['BATCH_SIZE'] < 1:
+        errors.append(f"Inference batch size must be at least 1: {MODEL_CONFIG['INFERENCE']['BATCH_SIZE']}")
+    
+    if MODEL_CONFIG['INFERENCE']['BATCH_WAIT_MS'] < 0:
+        errors.append(f"Batch wait window cannot be negative: {MODEL_CONFIG['INFERENCE']['BATCH_WAIT_MS']}")
+    
+    backend = MODEL_CONFIG['INFERENCE']['BACKEND']
+    if backend not in ('torch', 'onnx', 'openvino'):
+        errors.append(f"Unknown inference backend: {backend}")
+    
+    if MODEL_CONFIG['INFERENCE']['PRECISION'] not in ('fp32', 'int8'):
+        errors.append(f"Unknown inference precision: {MODEL_CONFIG['INFERENCE']['PRECISION']}")
+    
+    if MODEL_CONFIG['QUANTIZATION']['MAX_MAP50_DROP'] < 0:
+        errors.append("Quantization mAP50 drop limit cannot be negative")
+
+    if MODEL_CONFIG['SERVING']['MODE'] not in ('inprocess', 'server'):
+        errors.append(f"Unknown model serving mode: {MODEL_CONFIG['SERVING']['MODE']}")
+
+    if MODEL_CONFIG['SERVING']['MODE'] == 'server' and not MODEL_CONFIG['SERVING']['AUTHKEY']:
+        errors.append("MODEL_SERVER_AUTHKEY must be set when MODEL_SERVING_MODE=server")
+
+    if MODEL_CONFIG['SERVING']['REPLICAS'] < 1:
+        errors.append(f"Model server needs at least one replica: {MODEL_CONFIG['SERVING']['REPLICAS']}")
+
     # Validate split ratios
     ratios = MODEL_CONFIG['DATA']['SPLIT_RATIOS']
     total_ratio = sum(ratios.values())
@@ -238,10 +359,29 @@ def validate_model_config():
     
     print("Model configuration validation passed")
 
+def resolve_device(device=None):
+    """
+    Resolve the configured device, importing torch only when it has to probe CUDA
+    
+    Args:
+        device (str): 'auto', 'cpu', 'cuda' or 'cuda:N', defaults to HELMET_DETECTION['DEVICE']
+    
+    Returns:
+        str: Concrete device name
+    """
+    device = device or MODEL_CONFIG['HELMET_DETECTION']['DEVICE']
+    if device != 'auto':
+        return device
+    
+    import torch
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
+
 def get_device_config():
     """Get optimal device configuration"""
+    import torch
+    
     device_info = {
-        'device': MODEL_CONFIG['HELMET_DETECTION']['DEVICE'],
+        'device': resolve_device(),
         'gpu_available': torch.cuda.is_available(),
         'gpu_count': torch.cuda.device_count() if torch.cuda.is_available() else 0,
         'mixed_precision': MODEL_CONFIG['HARDWARE']['MIXED_PRECISION']
@@ -260,7 +400,8 @@ def get_model_summary():
             'model_type': MODEL_CONFIG['HELMET_DETECTION']['MODEL_TYPE'],
             'num_classes': MODEL_CONFIG['HELMET_DETECTION']['NUM_CLASSES'],
             'input_size': MODEL_CONFIG['HELMET_DETECTION']['INPUT_SIZE'],
-            'confidence_threshold': MODEL_CONFIG['HELMET_DETECTION']['CONFIDENCE_THRESHOLD']
+            'confidence_threshold': MODEL_CONFIG['HELMET_DETECTION']['CONFIDENCE_THRESHOLD'],
+            'backend': MODEL_CONFIG['INFERENCE']['BACKEND']
         },
         'plate_recognition': {
             'ocr_engine': MODEL_CONFIG['PLATE_RECOGNITION']['OCR_ENGINE'],
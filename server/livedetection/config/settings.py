@@ -21,7 +21,8 @@ CONFIG = {
             'cameras': 'cameras',
             'helmet_detections': 'helmet_detections',
             'detection_sessions': 'detection_sessions',
-            'training_logs': 'training_logs'
+            'training_logs': 'training_logs',
+            'media_objects': 'media_objects'
         }
     },
     
@@ -89,8 +90,10 @@ CONFIG = {
         'ALLOWED_EXTENSIONS': ['.jpg', '.jpeg', '.png', '.bmp', '.tiff'],
         'CLEANUP_TEMP_FILES_HOURS': int(os.getenv('CLEANUP_TEMP_FILES_HOURS', '24')),
         'COMPRESS_IMAGES': True,
-        'MAX_IMAGE_WIDTH': int(os.getenv('MAX_IMAGE_WIDTH', '1920')),
-        'MAX_IMAGE_HEIGHT': int(os.getenv('MAX_IMAGE_HEIGHT', '1080'))
+        'MAX_IMAGE_WIDTH': int(os.getenv('MAX_IMAGE_WIDTH', '1920')),  # Uploads are downsized to fit before detection
+        'MAX_IMAGE_HEIGHT': int(os.getenv('MAX_IMAGE_HEIGHT', '1080')),
+        'REDUCED_DECODE': os.getenv('REDUCED_DECODE', 'true').lower() == 'true',  # Decode large JPEGs at 1/2, 1/4 or 1/8 scale
+        'MIN_DECODED_SIDE': int(os.getenv('MIN_DECODED_SIDE', '1280'))  # Long side kept by a reduced decode (2x the 640 detector input)
     },
     
     # API settings
@@ -128,6 +131,106 @@ CONFIG = {
         'MAX_WORKERS': int(os.getenv('MAX_WORKERS', '4'))
     },
     
+    # Asynchronous process-image jobs (per Django worker process)
+    'JOB_QUEUE': {
+        'ASYNC_BY_DEFAULT': os.getenv('DETECTION_ASYNC_BY_DEFAULT', 'false').lower() == 'true',
+        'WORKERS': int(os.getenv('DETECTION_JOB_WORKERS', '2')),
+        'MAX_DEPTH': int(os.getenv('DETECTION_QUEUE_MAX_DEPTH', '32')),  # Queued jobs before 429
+        'MAX_RETRIES': 2,
+        'RETRY_BACKOFF_SECONDS': 1.0,
+        'RETRY_AFTER_SECONDS': 2
+    },
+    
+    # Camera stream ingestion (run_stream_ingestion command)
+    'STREAMING': {
+        'SAMPLE_FPS': float(os.getenv('STREAM_SAMPLE_FPS', '2')),  # Overridden per camera by cameras.sample_fps
+        'RECONNECT_INITIAL_SECONDS': 1.0,
+        'RECONNECT_MAX_SECONDS': 60.0,
+        'MAX_READ_FAILURES': 5,  # Consecutive failed reads before reconnecting
+        'LOOP_VIDEO_FILES': True,  # Local files standing in for RTSP restart when they end
+        'PACE_VIDEO_FILES': True,  # Play local files at their native frame rate
+        'STATUS_INTERVAL_SECONDS': 10,  # How often cameras.ingestion is refreshed
+        'TRACK_RIDERS': os.getenv('STREAM_TRACK_RIDERS', 'true').lower() == 'true'  # One violation per rider track, not per frame
+    },
+    
+    # Skip detection on frames where nothing moved (stream ingestion)
+    'MOTION_GATE': {
+        'ENABLED': os.getenv('MOTION_GATE_ENABLED', 'true').lower() == 'true',
+        'METHOD': 'difference',  # 'difference' (running average) or 'mog2' (background subtractor)
+        'DOWNSCALE_WIDTH': 160,  # Frames are compared as small grayscale thumbnails
+        'PIXEL_THRESHOLD': 25,  # Intensity change that counts a pixel as changed
+        'MIN_CHANGED_FRACTION': 0.01,  # Default per-camera threshold, overridden by cameras.motion_threshold
+        'SCENE_CHANGE_FRACTION': 0.6,  # Above this the background is relearned
+        'BACKGROUND_LEARNING_RATE': 0.05,
+        'HOLD_FRAMES': 3,  # Frames still processed after motion stops
+        'MAX_SKIP_SECONDS': 10,  # Process at least one frame this often even on a static scene
+        'LOG_EVERY': 200  # Print the skip rate every N frames per camera
+    },
+    
+    # Per-camera region of interest (cameras.roi: [[x, y], ...] as fractions of the frame size)
+    'ROI': {
+        'ENABLED': os.getenv('CAMERA_ROI_ENABLED', 'true').lower() == 'true',
+        'MASK_OUTSIDE': True,  # Black out the bounding rectangle outside the polygon (cameras.roi_mask overrides)
+        'CACHE_SECONDS': 60  # How long a camera's ROI is cached before Mongo is read again
+    },
+    
+    # Detection stage graph (per-stage timeouts fall back to a degraded result)
+    'PIPELINE': {
+        'MAX_WORKERS': int(os.getenv('PIPELINE_STAGE_WORKERS', '8')),  # Threads shared by the untimed stages
+        'TIMED_STAGE_WORKERS': int(os.getenv('PIPELINE_TIMED_STAGE_WORKERS', '4')),  # Own pool per stage with a timeout
+        'MAX_ABANDONED': int(os.getenv('PIPELINE_MAX_ABANDONED', '2')),  # Timed-out runs of a stage in flight before it is shed (< TIMED_STAGE_WORKERS)
+        'STAGE_TIMEOUTS': {  # Seconds
+            'detect': float(os.getenv('PIPELINE_DETECT_TIMEOUT', '10')),
+            'plate': float(os.getenv('PIPELINE_PLATE_TIMEOUT', '5')),
+            'owner_lookup': 2.0
+        }
+    },
+    
+    # Content-addressed media store (media/store/ab/cd/<sha256>.<ext>)
+    'MEDIA_STORE': {
+        'DIRECTORY': 'store',  # Under PATHS MEDIA_DIR
+        'SHARD_LEVELS': 2,  # Nested directories per object
+        'SHARD_WIDTH': 2  # Hex characters of the hash per level (256 entries per directory)
+    },
+    
+    # serve_media responses
+    'MEDIA_SERVING': {
+        # '' streams from Django; 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache/lighttpd) hands the file to the web server
+        'SENDFILE': os.getenv('MEDIA_SENDFILE', '').lower(),
+        'ACCEL_REDIRECT_PREFIX': os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/'),  # nginx internal location for the media root
+        'CHUNK_SIZE': 64 * 1024,
+        'MAX_AGE': 3600,  # Seconds, files that may change
+        'IMMUTABLE_MAX_AGE': 365 * 24 * 3600  # Seconds, content-addressed store objects
+    },
+    
+    # Codec and quality per media class (used when FILES COMPRESS_IMAGES is on)
+    'ENCODING': {
+        # FORMAT: 'jpeg', 'webp' or 'avif' ('avif' needs OpenCV with libavif); 'original' stores uploads as received
+        'CLASSES': {
+            'upload': {'FORMAT': os.getenv('UPLOAD_IMAGE_FORMAT', 'original'), 'QUALITY': 90},
+            'annotated': {'FORMAT': os.getenv('ANNOTATED_IMAGE_FORMAT', 'jpeg'), 'QUALITY': 75},
+            'evidence': {'FORMAT': os.getenv('EVIDENCE_IMAGE_FORMAT', 'jpeg'), 'QUALITY': 85},
+            'thumbnail': {'FORMAT': os.getenv('THUMBNAIL_IMAGE_FORMAT', 'jpeg'), 'QUALITY': 70}  # DERIVATIVES SIZES override QUALITY
+        },
+        'PROGRESSIVE_JPEG': True,
+        'UNCOMPRESSED_QUALITY': 95,  # JPEG quality for every class when COMPRESS_IMAGES is off
+        'RECOMPRESS_MIN_SAVINGS': 0.1  # recompress_media keeps a file unless re-encoding saves this fraction
+    },
+    
+    # Downscaled copies written next to each evidence image, for list and review pages
+    'DERIVATIVES': {
+        'SIZES': {
+            'thumbnail': {'MAX_WIDTH': 240, 'QUALITY': 70},
+            'medium': {'MAX_WIDTH': 960, 'QUALITY': 80}
+        }
+    },
+    
+    # Background rendering and writing of violation evidence images
+    'EVIDENCE': {
+        'WRITER_WORKERS': int(os.getenv('EVIDENCE_WRITER_WORKERS', '1')),
+        'QUEUE_MAX_DEPTH': int(os.getenv('EVIDENCE_QUEUE_MAX_DEPTH', '64'))  # Beyond this evidence is written inline
+    },
+    
     # Notification settings
     'NOTIFICATIONS': {
         'EMAIL_ENABLED': False,
@@ -176,6 +279,20 @@ def validate_config():
     if CONFIG['TRAINING']['DEFAULT_BATCH_SIZE'] <= 0:
         errors.append("Training batch size must be positive")
     
+    if CONFIG['STREAMING']['SAMPLE_FPS'] <= 0:
+        errors.append("Stream sample FPS must be positive")
+    
+    # Validate job queue limits
+    if CONFIG['JOB_QUEUE']['WORKERS'] <= 0:
+        errors.append("Detection job workers must be positive")
+    
+    if CONFIG['JOB_QUEUE']['MAX_DEPTH'] <= 0:
+        errors.append("Detection queue depth must be positive")
+    
+    # Abandoned runs must leave threads free in a timed stage's pool, or new runs queue and time out
+    if not 0 < CONFIG['PIPELINE']['MAX_ABANDONED'] < CONFIG['PIPELINE']['TIMED_STAGE_WORKERS']:
+        errors.append("PIPELINE MAX_ABANDONED must be positive and below TIMED_STAGE_WORKERS")
+    
     if errors:
         raise ValueError(f"Configuration validation failed: {'; '.join(errors)}")
     
@@ -0,0 +1,217 @@
+"""
+Background evidence writer: annotation rendering and image writes off the request path
+"""
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from .config.settings import CONFIG
+
+
+class _EvidenceJob:
+    """A violation frame waiting to be rendered and written"""
+
+    __slots__ = ('detection_id', 'violation_id', 'image', 'detection_data')
+
+    def __init__(self, detection_id, violation_id, image, detection_data):
+        self.detection_id = detection_id
+        self.violation_id = violation_id
+        self.image = image
+        self.detection_data = detection_data
+
+
+class EvidenceWriter:
+    def __init__(self, violation_processor, db_handler, workers=1, max_depth=64):
+        """
+        Initialize a bounded background writer for violation evidence
+
+        Each job renders the annotations on the already-decoded frame,
+        encodes it once into the media store (with its thumbnail and medium
+        derivatives), then records the path and URLs: processed_image/
+        evidence_urls/evidence_status on the detection record and
+        evidence_photo/evidence_urls on the violation memo. When the queue is full the
+        write happens inline, so evidence is slowed down rather than lost.
+
+        Args:
+            violation_processor: ViolationProcessor that renders and writes the image
+            db_handler: DatabaseHandler used to mark the detection record
+            workers (int): Writer threads
+            max_depth (int): Jobs allowed to wait (each holds a decoded frame)
+        """
+        self.violation_processor = violation_processor
+        self.db_handler = db_handler
+        self.worker_count = max(1, int(workers))
+        self.max_depth = max(1, int(max_depth))
+
+        self._queue = queue.Queue(maxsize=self.max_depth)
+        self._workers = []
+        self._lock = threading.Lock()
+        self._running = False
+
+        # Counters
+        self._stats = {'enqueued': 0, 'written': 0, 'failed': 0, 'inline': 0}
+        self._write_ms = deque(maxlen=500)
+
+    def start(self):
+        """Start the writer threads"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+
+            for index in range(self.worker_count):
+                worker = threading.Thread(target=self._run, name=f'evidence-writer-{index}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def stop(self, timeout=5.0):
+        """Stop the writers once the evidence already queued has been written"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def submit(self, frame, detection_data, violation_id=None):
+        """
+        Queue a violation frame's evidence
+
+        Args:
+            frame: Frame the violation was detected in (its decoded image is reused)
+            detection_data (dict): Detection results to draw
+            violation_id: Memo to point at the evidence once written, if one was created
+
+        Returns:
+            bool: True when queued, False when it was written inline
+        """
+        # Snapshot: the caller keeps using its record after this returns
+        job = _EvidenceJob(detection_data['detection_id'], violation_id, frame.image, dict(detection_data))
+
+        try:
+            if not self._running:
+                raise queue.Full
+            self._queue.put_nowait(job)
+            self._count('enqueued')
+            return True
+        except queue.Full:
+            self._count('inline')
+            self._write(job)
+            return False
+
+    def _run(self):
+        """Worker loop"""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            self._write(job)
+
+    def _write(self, job):
+        started = time.perf_counter()
+        try:
+            refs = [('detection', job.detection_id)] + ([('violation', job.violation_id)] if job.violation_id else [])
+            evidence_path = self.violation_processor.write_evidence(job.image, job.detection_data, refs)
+        except Exception as e:
+            print(f"Error writing evidence for {job.detection_id}: {e}")
+            self._count('failed')
+            self.db_handler.update_detection(job.detection_id, {'evidence_status': 'failed', 'evidence_error': str(e)})
+            return
+
+        with self._lock:
+            self._stats['written'] += 1
+            self._write_ms.append((time.perf_counter() - started) * 1000)
+
+        evidence_urls = self.violation_processor.evidence_urls(evidence_path)
+        self.db_handler.update_detection(job.detection_id, {
+            'processed_image': evidence_path,
+            'evidence_urls': evidence_urls,
+            'evidence_status': 'written',
+            'evidence_written_at': datetime.now()
+        })
+        if job.violation_id:
+            self.violation_processor.set_evidence_photo(job.violation_id, evidence_path, evidence_urls)
+        elif job.detection_data.get('memo_status') == 'pending_plate':
+            # The memo waits for the track's plate; if it was created meanwhile, point it here
+            record = self.db_handler.get_detection(job.detection_id) or {}
+            violation_id = (record.get('violation_memo') or {}).get('violation_id')
+            if violation_id:
+                self._attach(violation_id, evidence_path, evidence_urls)
+
+    def link_memo(self, detection_id, violation_id):
+        """
+        Point a memo created after its detection was saved at the detection's evidence
+
+        Does nothing when the evidence is not written yet; the writer links
+        the memo itself once it is.
+
+        Args:
+            detection_id: Detection the evidence was written for
+            violation_id: Memo generated for that detection
+        """
+        record = self.db_handler.get_detection(detection_id) or {}
+        if record.get('evidence_status') == 'written':
+            self._attach(violation_id, record['processed_image'], record.get('evidence_urls'))
+
+    def _attach(self, violation_id, evidence_path, evidence_urls):
+        self.violation_processor.media_store.add_reference(evidence_path, 'violation', violation_id)
+        self.violation_processor.set_evidence_photo(violation_id, evidence_path, evidence_urls)
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def get_stats(self):
+        """
+        Get queue depth, write counters and write times
+
+        Returns:
+            dict: Evidence writer statistics
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            write_ms = sorted(self._write_ms)
+
+        stats.update({
+            'running': self._running,
+            'workers': self.worker_count,
+            'depth': self._queue.qsize(),
+            'max_depth': self.max_depth
+        })
+        if write_ms:
+            stats['write_ms'] = {
+                'p50': round(write_ms[len(write_ms) // 2], 2),
+                'p95': round(write_ms[min(len(write_ms) - 1, int(len(write_ms) * 0.95))], 2)
+            }
+        return stats
+
+
+_evidence_writer = None
+_evidence_writer_lock = threading.Lock()
+
+
+def get_evidence_writer(violation_processor, db_handler):
+    """Create and start this process's EvidenceWriter on first use"""
+    global _evidence_writer
+    with _evidence_writer_lock:
+        if _evidence_writer is None:
+            config = CONFIG['EVIDENCE']
+            _evidence_writer = EvidenceWriter(
+                violation_processor,
+                db_handler,
+                workers=config['WRITER_WORKERS'],
+                max_depth=config['QUEUE_MAX_DEPTH']
+            )
+            _evidence_writer.start()
+    return _evidence_writer
+
+
+def peek_evidence_writer():
+    """This process's evidence writer if it has been started, else None"""
+    return _evidence_writer
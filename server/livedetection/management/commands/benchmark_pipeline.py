@@ -0,0 +1,120 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from livedetection.config.model_config import MODEL_CONFIG
+
+
+def parse_size(value):
+    """'1280x720' -> (1280, 720)"""
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise CommandError(f"Invalid size {value!r}, expected WIDTHxHEIGHT")
+    return width, height
+
+
+class Command(BaseCommand):
+    help = 'Benchmark process_image_detection end to end with per-stage latency percentiles, fps and peak RSS'
+
+    def add_arguments(self, parser):
+        config = MODEL_CONFIG['BENCHMARK']
+        parser.add_argument(
+            '--sizes', nargs='+', type=parse_size,
+            help='Synthetic frame sizes as WIDTHxHEIGHT (default: BENCHMARK SYNTHETIC_SIZES)'
+        )
+        parser.add_argument(
+            '--frames-per-size', type=int, default=config['SYNTHETIC_FRAMES_PER_SIZE'],
+            help='Synthetic frames per size'
+        )
+        parser.add_argument(
+            '--samples', default=str(config['SAMPLE_DIR']),
+            help='Directory of real frames added to the corpus'
+        )
+        parser.add_argument(
+            '--max-samples', type=int, default=config['MAX_SAMPLES'],
+            help='Most real frames used (0 for synthetic only)'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=1,
+            help='Passes over the corpus'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=config['WARMUP_FRAMES'],
+            help='Frames run before measuring'
+        )
+        parser.add_argument(
+            '--label', default='',
+            help='Name stored with the results, e.g. the change being measured'
+        )
+        parser.add_argument(
+            '--output', help='Write the results to this JSON file'
+        )
+        parser.add_argument(
+            '--compare', help='Earlier results JSON to compare against'
+        )
+
+    def handle(self, *args, **options):
+        from livedetection.benchmark import PipelineBenchmark, build_corpus, compare_results
+
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read {options['compare']}: {e}")
+
+        corpus = build_corpus(
+            sizes=options['sizes'],
+            per_size=options['frames_per_size'],
+            sample_dir=options['samples'],
+            max_samples=options['max_samples']
+        )
+        if not corpus:
+            raise CommandError('Empty corpus: no synthetic sizes and no sample frames')
+        self.stdout.write(f"Benchmarking {len(corpus)} frames x {options['repeat']} (warmup {options['warmup']})")
+
+        report = PipelineBenchmark(corpus, warmup_frames=options['warmup']).run(
+            repeat=options['repeat'], label=options['label']
+        )
+
+        percentiles = [key for key in next(iter(report['stages'].values()), {}) if key.startswith('p')]
+        self.stdout.write(f"{'stage':<32}{'count':>7}{'mean':>9}" + ''.join(f"{key[:-3]:>9}" for key in percentiles))
+        for stage, stats in report['stages'].items():
+            self.stdout.write(
+                f"{stage:<32}{stats['count']:>7}{stats['mean_ms']:>9.1f}"
+                + ''.join(f"{stats[key]:>9.1f}" for key in percentiles)
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['frames']} frames in {report['wall_seconds']:.1f}s: {report['fps']:.2f} fps, "
+            f"{report['violations']} violations, {report['errors']} errors, peak RSS {self._mb(report['peak_rss_mb'])}"
+        ))
+
+        if baseline:
+            comparison = compare_results(baseline, report)
+            report['compared_to'] = {'label': baseline.get('label', ''), 'commit': baseline.get('commit', ''), **comparison}
+            self.stdout.write(f"Compared to {options['compare']}:")
+            for name in ('fps', 'peak_rss_mb'):
+                self.stdout.write(self._delta_line(name, comparison[name]))
+            for stage, deltas in comparison['stages'].items():
+                for key, delta in deltas.items():
+                    self.stdout.write(self._delta_line(f"{stage} {key}", delta))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def _delta_line(self, name, delta):
+        before, after, change = delta
+        before, after = ('n/a' if value is None else f"{value:.2f}" for value in (before, after))
+        change = 'n/a' if change is None else f"{change:+.1f}%"
+        return f"  {name:<40}{before:>10} -> {after:>10}  {change}"
+
+    def _mb(self, value):
+        return 'n/a' if value is None else f"{value:.0f} MB"
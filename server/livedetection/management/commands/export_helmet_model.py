@@ -0,0 +1,93 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from livedetection.config.model_config import MODEL_CONFIG
+
+
+class Command(BaseCommand):
+    help = 'Export weights/helmet_detection.pt to ONNX Runtime and/or OpenVINO formats for CPU inference'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', dest='formats', nargs='+', choices=['onnx', 'openvino'],
+            help='Formats to export (defaults to the PERFORMANCE ONNX_EXPORT/OPENVINO flags)'
+        )
+        parser.add_argument(
+            '--weights', default=str(MODEL_CONFIG['PATHS']['MODELS']['HELMET_DETECTION']),
+            help='Source .pt weights'
+        )
+        parser.add_argument(
+            '--imgsz', type=int, default=MODEL_CONFIG['HELMET_DETECTION']['INPUT_SIZE'][0],
+            help='Inference image size baked into the export'
+        )
+        parser.add_argument(
+            '--check-parity', nargs='*', metavar='IMAGE',
+            help='Compare exported outputs against torch on these images '
+                 '(default: BENCHMARK SAMPLE_DIR frames, else images in the media store)'
+        )
+
+    def handle(self, *args, **options):
+        from livedetection.ai_models.inference_backends import export_model
+
+        weights = Path(options['weights'])
+        if not weights.exists():
+            raise CommandError(f"Weights not found: {weights}")
+
+        formats = options['formats']
+        if not formats:
+            performance = MODEL_CONFIG['PERFORMANCE']
+            formats = [name for name, enabled in (
+                ('onnx', performance['ONNX_EXPORT']),
+                ('openvino', performance['OPENVINO'])
+            ) if enabled]
+        if not formats:
+            raise CommandError("No export format selected: pass --format or enable ONNX_EXPORT/OPENVINO")
+
+        exported = export_model(weights, formats, imgsz=options['imgsz'])
+        for name, path in exported.items():
+            self.stdout.write(self.style.SUCCESS(f"{name}: {path}"))
+
+        if options['check_parity'] is not None:
+            self._check_parity(weights, formats, options['check_parity'], options['imgsz'])
+
+    def _check_parity(self, weights, formats, images, imgsz):
+        """Run torch and each exported backend on the same images and compare boxes/classes"""
+        from livedetection.ai_models.inference_backends import get_backend, compare_backend_outputs
+
+        if not images:
+            images = self._default_images()
+        if not images:
+            raise CommandError("No images available for the parity check")
+
+        conf = MODEL_CONFIG['HELMET_DETECTION']['CONFIDENCE_THRESHOLD']
+        iou = MODEL_CONFIG['HELMET_DETECTION']['IOU_THRESHOLD']
+
+        reference = get_backend('torch', weights).load()
+        reference_results = [reference(image, conf=conf, iou=iou, imgsz=imgsz)[0] for image in images]
+
+        failed = set()
+        for name in formats:
+            candidate = get_backend(name, weights).load()
+            for image, ref_result in zip(images, reference_results):
+                report = compare_backend_outputs(ref_result, candidate(image, conf=conf, iou=iou, imgsz=imgsz)[0])
+                if not report['match']:
+                    failed.add(name)
+                    self.stdout.write(self.style.ERROR(f"{name} parity mismatch on {image}: {report}"))
+
+            if name not in failed:
+                self.stdout.write(self.style.SUCCESS(f"{name} matches torch on {len(images)} images"))
+
+        if failed:
+            raise CommandError("Exported model outputs differ from torch")
+
+    def _default_images(self, limit=10):
+        """Real validation frames when present, else images from the media store (media/store/<ab>/<cd>/)"""
+        from livedetection.config.settings import CONFIG
+
+        sample_dir = Path(MODEL_CONFIG['BENCHMARK']['SAMPLE_DIR'])
+        samples = sorted(sample_dir.glob('*.jpg')) if sample_dir.is_dir() else []
+        if not samples:
+            store_dir = Path(CONFIG['PATHS']['MEDIA_DIR']) / CONFIG['MEDIA_STORE']['DIRECTORY']
+            samples = sorted(store_dir.rglob('*.jpg'))
+        return [str(p) for p in samples[:limit]]
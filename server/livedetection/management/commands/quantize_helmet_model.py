@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from livedetection.config.model_config import MODEL_CONFIG
+
+
+class Command(BaseCommand):
+    help = 'Quantize the helmet detector to INT8 and promote it only if val mAP50 stays within the allowed drop'
+
+    def add_arguments(self, parser):
+        config = MODEL_CONFIG['QUANTIZATION']
+        parser.add_argument(
+            '--format', dest='quant_format', choices=['openvino', 'onnx'], default=config['FORMAT'],
+            help='Quantized model format'
+        )
+        parser.add_argument(
+            '--max-map50-drop', type=float, default=config['MAX_MAP50_DROP'],
+            help='Largest acceptable FP32 -> INT8 mAP50 drop on the val split'
+        )
+        parser.add_argument(
+            '--no-promote', action='store_true',
+            help='Only build and measure the INT8 model, never install it'
+        )
+
+    def handle(self, *args, **options):
+        from livedetection.training.model_quantizer import ModelQuantizer
+
+        try:
+            report = ModelQuantizer().quantize(
+                quant_format=options['quant_format'],
+                max_map50_drop=options['max_map50_drop'],
+                promote=not options['no_promote']
+            )
+        except (FileNotFoundError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"mAP50 FP32 {report['fp32_map50']:.4f} -> INT8 {report['int8_map50']:.4f} "
+            f"(drop {report['map50_drop']:.4f}, limit {report['max_map50_drop']:.4f})"
+        )
+
+        if report['promoted']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Promoted to {report['promoted_path']}; set INFERENCE['BACKEND'] to "
+                f"'{report['format']}' and INFERENCE['PRECISION'] to 'int8' to use it"
+            ))
+        elif report['passed']:
+            self.stdout.write(self.style.WARNING(f"Passed but not promoted: {report['candidate_path']}"))
+        else:
+            raise CommandError(f"INT8 model rejected, kept at {report['candidate_path']}")
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from pymongo import MongoClient
+
+from livedetection.config.settings import CONFIG
+
+
+class Command(BaseCommand):
+    help = 'Re-encode stored media with the current ENCODING policy and move records to the smaller files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--class', dest='classes', nargs='+', choices=['upload', 'annotated', 'evidence'],
+            help='Media classes to re-encode (default: every class not kept as original)'
+        )
+        parser.add_argument(
+            '--legacy', action='store_true',
+            help='Also move files from media/uploads, media/processed and media/violations into the store'
+        )
+        parser.add_argument(
+            '--min-savings', type=float, default=CONFIG['ENCODING']['RECOMPRESS_MIN_SAVINGS'],
+            help='Fraction of a file\'s size re-encoding must save for it to be replaced'
+        )
+        parser.add_argument(
+            '--limit', type=int,
+            help='Stop after this many files'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report what would be saved'
+        )
+
+    def handle(self, *args, **options):
+        from livedetection.utils.media_recompressor import REFERENCE_FIELDS, MediaRecompressor
+        from livedetection.utils.media_store import get_media_store
+
+        database = CONFIG['DATABASE']
+        db = MongoClient(database['MONGO_URI'])[database['DB_NAME']]
+        collections = {name: db[database['COLLECTIONS'][name]] for name in REFERENCE_FIELDS}
+
+        media_store = get_media_store()
+        report = MediaRecompressor(media_store, collections=collections, min_savings=options['min_savings']).run(
+            classes=options['classes'],
+            legacy=options['legacy'],
+            dry_run=options['dry_run'],
+            limit=options['limit']
+        )
+
+        for media_class, stats in sorted(report['by_class'].items()):
+            self.stdout.write(
+                f"{media_class}: {stats['recompressed']} files, "
+                f"{stats['bytes_before'] / 1e6:.1f} MB -> {stats['bytes_after'] / 1e6:.1f} MB"
+            )
+
+        saved = report['bytes_before'] - report['bytes_after']
+        verb = 'Would save' if options['dry_run'] else 'Saved'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {saved / 1e6:.1f} MB: {report['recompressed']} of {report['scanned']} files re-encoded, "
+            f"{report['kept']} kept, {report['failed']} failed"
+        ))
+
+        for media_class, totals in sorted(media_store.storage_totals().items()):
+            self.stdout.write(f"Stored {media_class}: {totals['objects']} objects, {totals['bytes'] / 1e6:.1f} MB")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from livedetection.config.model_config import MODEL_CONFIG
+
+
+class Command(BaseCommand):
+    help = 'Run the shared inference server that owns the helmet detector and plate reader for all Django workers'
+
+    def add_arguments(self, parser):
+        config = MODEL_CONFIG['SERVING']
+        parser.add_argument(
+            '--socket', default=config['SOCKET_PATH'],
+            help='Unix socket to listen on (default: SERVING SOCKET_PATH, else a private runtime directory)'
+        )
+        parser.add_argument(
+            '--replicas', type=int, default=config['REPLICAS'],
+            help='Number of model copies to load'
+        )
+
+    def handle(self, *args, **options):
+        from livedetection.ai_models.model_server import ModelServer
+
+        try:
+            server = ModelServer(socket_path=options['socket'], replicas=options['replicas'])
+            server.serve_forever()
+        except (ValueError, RuntimeError) as e:
+            raise CommandError(str(e))
+        except KeyboardInterrupt:
+            self.stdout.write('Model server stopped')
@@ -0,0 +1,82 @@
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Read every active camera stream in its own process and run sampled frames through live detection'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--camera', dest='camera_ids', nargs='+',
+            help='Only ingest these camera_ids (default: every active camera with a stream_url)'
+        )
+        parser.add_argument(
+            '--source', nargs='+', metavar='CAMERA_ID=URL_OR_FILE',
+            help='Override stream URLs, e.g. CAM001=/data/clips/iscon.mp4 to stand in a video file for RTSP'
+        )
+        parser.add_argument(
+            '--sample-fps', type=float,
+            help='Sampling rate for every camera (overrides cameras.sample_fps and STREAM_SAMPLE_FPS)'
+        )
+        parser.add_argument(
+            '--no-motion-gate', action='store_true',
+            help='Run detection on every sampled frame, even when nothing moved'
+        )
+
+    def handle(self, *args, **options):
+        from livedetection.config.settings import CONFIG
+        from livedetection.streaming.ingestion import StreamIngestionSupervisor
+        from livedetection.utils.database_handler import DatabaseHandler
+
+        overrides = {}
+        for item in options['source'] or []:
+            camera_id, sep, source = item.partition('=')
+            if not sep or not source:
+                raise CommandError(f"--source expects CAMERA_ID=URL_OR_FILE, got {item}")
+            overrides[camera_id] = source
+
+        cameras = self._load_cameras(DatabaseHandler(), options['camera_ids'], overrides)
+        if not cameras:
+            raise CommandError('No cameras with a stream_url to ingest')
+
+        config = dict(CONFIG['STREAMING'])
+        if options['sample_fps']:
+            config['SAMPLE_FPS'] = options['sample_fps']
+            for camera in cameras:
+                camera.pop('sample_fps', None)
+
+        motion_gate_config = dict(CONFIG['MOTION_GATE'])
+        if options['no_motion_gate']:
+            motion_gate_config['ENABLED'] = False
+
+        supervisor = StreamIngestionSupervisor(cameras, config, motion_gate_config)
+        signal.signal(signal.SIGTERM, lambda *args: supervisor.stop())
+
+        for camera in cameras:
+            self.stdout.write(f"{camera['camera_id']}: {camera['stream_url']}")
+
+        supervisor.start()
+        try:
+            supervisor.supervise()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            supervisor.stop()
+            self.stdout.write('Stream ingestion stopped')
+
+    def _load_cameras(self, db_handler, camera_ids, overrides):
+        """Active cameras from Mongo, with --source overrides applied (and usable without a camera document)"""
+        cameras = {
+            camera['camera_id']: camera
+            for camera in db_handler.get_cameras()
+            if camera.get('camera_id') and camera.get('status', 'active') == 'active'
+        }
+
+        for camera_id, source in overrides.items():
+            cameras.setdefault(camera_id, {'camera_id': camera_id})['stream_url'] = source
+
+        if camera_ids:
+            cameras = {camera_id: cameras[camera_id] for camera_id in camera_ids if camera_id in cameras}
+
+        return [camera for camera in cameras.values() if camera.get('stream_url')]
@@ -0,0 +1,152 @@
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from livedetection.config.model_config import MODEL_CONFIG
+
+# Runs in a fresh interpreter so every app is measured from a cold import
+PROBE_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+setup_seconds = time.perf_counter() - started
+
+import importlib
+module, heavy_modules, warmup = sys.argv[1], sys.argv[2].split(','), sys.argv[3] == '1'
+started = time.perf_counter()
+importlib.import_module(module)
+import_seconds = time.perf_counter() - started
+
+result = {
+    'setup_seconds': round(setup_seconds, 3),
+    'import_seconds': round(import_seconds, 3),
+    'heavy_modules': [name for name in heavy_modules if name in sys.modules]
+}
+if warmup:
+    from livedetection import model_registry
+    started = time.perf_counter()
+    result['warmup'] = model_registry.warmup()
+    result['warmup_seconds'] = round(time.perf_counter() - started, 3)
+
+try:
+    import resource
+    result['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+except ImportError:
+    # Windows has no resource module
+    result['peak_rss_mb'] = None
+print('STARTUP_BENCHMARK ' + json.dumps(result))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Measure cold import time, peak RSS and heavy-module imports for each project app'
+
+    def add_arguments(self, parser):
+        config = MODEL_CONFIG['STARTUP']
+        parser.add_argument(
+            '--app', dest='app_labels', nargs='+',
+            help='Apps to measure (default: every project app plus the root URLconf)'
+        )
+        parser.add_argument(
+            '--budget', type=float, default=config['IMPORT_BUDGET_SECONDS'],
+            help='Per-app import time budget in seconds'
+        )
+        parser.add_argument(
+            '--warmup', action='store_true',
+            help='Also time livedetection model loading and the first inference'
+        )
+        parser.add_argument(
+            '--output', help='Write the results to this JSON file'
+        )
+        parser.add_argument(
+            '--enforce', action='store_true',
+            help='Fail when an app is over budget or imports a heavy module it should not'
+        )
+
+    def handle(self, *args, **options):
+        targets = self._targets(options['app_labels'])
+        heavy_modules = MODEL_CONFIG['STARTUP']['HEAVY_MODULES']
+        allowed_heavy = set(MODEL_CONFIG['STARTUP']['HEAVY_MODULE_APPS'])
+
+        results = []
+        problems = []
+        for label, module in targets:
+            warmup = options['warmup'] and label == 'livedetection'
+            result = {'app': label, 'module': module, **self._probe(module, heavy_modules, warmup)}
+            results.append(result)
+
+            if 'error' in result:
+                problems.append(f"{label}: {result['error']}")
+                self.stdout.write(self.style.ERROR(f"{label:<16} failed: {result['error']}"))
+                continue
+
+            over_budget = result['import_seconds'] > options['budget']
+            unexpected_heavy = result['heavy_modules'] and label not in allowed_heavy
+            if over_budget:
+                problems.append(f"{label} imports in {result['import_seconds']:.2f}s (budget {options['budget']:.2f}s)")
+            if unexpected_heavy:
+                problems.append(f"{label} imports {', '.join(result['heavy_modules'])}")
+
+            rss = 'n/a' if result['peak_rss_mb'] is None else f"{result['peak_rss_mb']:.1f}MB"
+            line = (
+                f"{label:<16} setup {result['setup_seconds']:6.2f}s  import {result['import_seconds']:6.2f}s  "
+                f"rss {rss:>9}  heavy: {', '.join(result['heavy_modules']) or '-'}"
+            )
+            if 'warmup_seconds' in result:
+                line += f"  warmup {result['warmup_seconds']:.2f}s"
+            style = self.style.WARNING if over_budget or unexpected_heavy else self.style.SUCCESS
+            self.stdout.write(style(line))
+
+        report = {
+            'recorded_at': datetime.now().isoformat(),
+            'python': sys.version.split()[0],
+            'budget_seconds': options['budget'],
+            'results': results,
+            'problems': problems
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if problems and options['enforce']:
+            raise CommandError('Startup budget exceeded: ' + '; '.join(problems))
+
+    def _targets(self, app_labels):
+        """(label, module) pairs: each app's URLconf (or package), then the root URLconf"""
+        base_dir = str(settings.BASE_DIR)
+        if app_labels:
+            configs = [apps.get_app_config(label) for label in app_labels]
+        else:
+            configs = [config for config in apps.get_app_configs() if config.path.startswith(base_dir)]
+
+        targets = []
+        for config in configs:
+            has_urls = os.path.exists(os.path.join(config.path, 'urls.py'))
+            targets.append((config.label, f"{config.name}.urls" if has_urls else config.name))
+
+        if not app_labels:
+            targets.append(('<root urls>', settings.ROOT_URLCONF))
+        return targets
+
+    def _probe(self, module, heavy_modules, warmup):
+        """Import one module in a fresh interpreter and parse its measurements"""
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'server.settings')}
+        completed = subprocess.run(
+            [sys.executable, '-c', PROBE_SCRIPT, module, ','.join(heavy_modules), '1' if warmup else '0'],
+            cwd=str(settings.BASE_DIR), env=env, capture_output=True, text=True
+        )
+
+        for line in completed.stdout.splitlines():
+            if line.startswith('STARTUP_BENCHMARK '):
+                return json.loads(line[len('STARTUP_BENCHMARK '):])
+
+        error = completed.stderr.strip().splitlines()
+        return {'error': error[-1] if error else f"exit code {completed.returncode}"}
@@ -0,0 +1,150 @@
+"""
+Detection models shared by the views, created on first use
+
+Importing this module (or livedetection.views) does not import torch,
+ultralytics or EasyOCR. Models are built the first time a request needs them,
+or up front by warmup() when MODEL_CONFIG['STARTUP']['WARMUP'] is enabled.
+"""
+import threading
+import time
+
+import numpy as np
+
+from .config.model_config import MODEL_CONFIG
+
+_lock = threading.RLock()
+_instances = {}
+
+
+def _get_or_create(name, factory):
+    """Return the named instance, building it once under the registry lock"""
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+
+    with _lock:
+        if name not in _instances:
+            started = time.perf_counter()
+            _instances[name] = factory()
+            print(f"Loaded {name} in {time.perf_counter() - started:.2f}s")
+        return _instances[name]
+
+
+def server_mode():
+    """True when the models live in the run_model_server process"""
+    return MODEL_CONFIG['SERVING']['MODE'] == 'server'
+
+
+def get_model_client():
+    """ModelClient for the shared model server, None when models run in-process"""
+    if not server_mode():
+        return None
+
+    def factory():
+        from .ai_models.model_server import ModelClient
+        return ModelClient()
+
+    return _get_or_create('model_client', factory)
+
+
+def get_helmet_detector():
+    """HelmetDetector (or ModelCascade when enabled), or the model server client in server mode"""
+    if server_mode():
+        return get_model_client()
+
+    def factory():
+        from .ai_models.model_cascade import create_helmet_detector
+        return create_helmet_detector()
+
+    return _get_or_create('helmet_detector', factory)
+
+
+def get_plate_reader():
+    """PlateReader, or the model server client in server mode"""
+    if server_mode():
+        return get_model_client()
+
+    def factory():
+        from .ai_models.plate_reader import PlateReader
+        return PlateReader()
+
+    return _get_or_create('plate_reader', factory)
+
+
+def get_batch_inference():
+    """Started BatchInferenceService, None when dynamic batching is off or in server mode"""
+    inference_config = MODEL_CONFIG['INFERENCE']
+    if server_mode() or not inference_config['DYNAMIC_BATCHING']:
+        return None
+
+    def factory():
+        from .ai_models.batch_inference import BatchInferenceService
+
+        service = BatchInferenceService(
+            get_helmet_detector(),
+            max_batch_size=inference_config['BATCH_SIZE'],
+            max_wait_ms=inference_config['BATCH_WAIT_MS'],
+            stats_window=inference_config['BATCH_STATS_WINDOW']
+        )
+        service.start()
+        return service
+
+    return _get_or_create('batch_inference', factory)
+
+
+def get_model_trainer():
+    """ModelTrainer, created when a training endpoint is first used"""
+    def factory():
+        from .training.model_trainer import ModelTrainer
+        return ModelTrainer()
+
+    return _get_or_create('model_trainer', factory)
+
+
+def peek(name):
+    """Return an already created instance without loading it"""
+    return _instances.get(name)
+
+
+def loaded_models():
+    """Names of the instances created so far"""
+    return sorted(_instances)
+
+
+def warmup():
+    """
+    Load the detection models and push a dummy frame through them
+
+    The first forward pass allocates buffers and compiles kernels, so running
+    it here keeps that cost off the first real request.
+
+    Returns:
+        dict: Seconds spent per warmup step
+    """
+    timings = {}
+    dummy = np.zeros((*MODEL_CONFIG['HELMET_DETECTION']['INPUT_SIZE'], 3), dtype=np.uint8)
+
+    started = time.perf_counter()
+    if server_mode():
+        get_model_client().ping()
+        timings['model_server_ping'] = round(time.perf_counter() - started, 3)
+        return timings
+
+    helmet_detector = get_helmet_detector()
+    timings['helmet_detector_load'] = round(time.perf_counter() - started, 3)
+
+    started = time.perf_counter()
+    helmet_detector.detect(dummy)
+    timings['helmet_detector_first_inference'] = round(time.perf_counter() - started, 3)
+
+    started = time.perf_counter()
+    plate_reader = get_plate_reader()
+    timings['plate_reader_load'] = round(time.perf_counter() - started, 3)
+
+    started = time.perf_counter()
+    plate_reader.read_plate_crop(dummy[:64, :256])
+    timings['plate_reader_first_inference'] = round(time.perf_counter() - started, 3)
+
+    get_batch_inference()
+    print(f"Model warmup finished: {timings}")
+    return timings
@@ -0,0 +1,578 @@
+"""
+Detection pipeline shared by the synchronous process-image view and the job queue
+"""
+import copy
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+from . import model_registry
+from .config.settings import CONFIG
+from .evidence_writer import get_evidence_writer
+from .stage_graph import Stage, StageGraph
+from .utils.frame import as_frame
+from .utils.roi import shift_boxes
+
+
+def new_detection_id():
+    """Generate unique detection ID"""
+    return f"DET_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+class DetectionPipeline:
+    def __init__(self, violation_processor, db_handler, motion_gate=None, tracker=None, plate_voter=None,
+                 regions=None, tiling=None, stage_timeouts=None, evidence_writer=None):
+        """
+        Initialize the (gate -> crop to ROI ->) detect -> (track ->) read plate -> check violation -> save pipeline
+
+        After the motion gate and ROI crop the stages run as a StageGraph:
+
+            detect -> track -> check ---------------+
+            detect -> plate (after track when voting) +-> owner_lookup -> memo -> save -> evidence
+
+        Plate OCR runs alongside tracking and the violation check. A stage
+        that times out or fails is replaced by an empty result and the frame
+        is still recorded; per-stage timings go into
+        detection_data['stage_timings']. The annotated evidence image is
+        rendered and written by the EvidenceWriter, off the request path.
+        With plate voting, a violation whose track has no settled plate yet
+        is saved with memo_status 'pending_plate'; its memo is generated on
+        a later frame, once the vote settles or the track expires.
+
+        Args:
+            violation_processor: ViolationProcessor for violation checks, annotation and memos
+            db_handler: DatabaseHandler the detection record is written with
+            motion_gate: Optional MotionGate that skips frames where nothing moved
+            tracker: Optional RiderTracker; when set a violation is raised once per rider track
+                instead of on every frame that shows the rider
+            plate_voter: Optional PlateVoter; with a tracker, plates are voted per track
+                instead of OCR'd on every frame
+            regions: Optional CameraRegions; detection and plate reading then only see
+                the camera's ROI, and boxes are mapped back to full-frame coordinates
+            tiling (dict): Optional TILING settings; wide frames are then detected tile by tile,
+                skipping tiles without motion
+            stage_timeouts (dict): Seconds per stage, defaults to CONFIG['PIPELINE']['STAGE_TIMEOUTS']
+            evidence_writer: EvidenceWriter for violation images, defaults to this process's shared one
+        """
+        self.violation_processor = violation_processor
+        self.db_handler = db_handler
+        self.motion_gate = motion_gate
+        self.tracker = tracker
+        self.plate_voter = plate_voter
+        self.regions = regions
+        self.tiling = tiling
+        self.evidence_writer = evidence_writer
+        self.vote_plates = tracker is not None and plate_voter is not None
+        self.graph = self._build_graph(stage_timeouts or CONFIG['PIPELINE']['STAGE_TIMEOUTS'])
+
+    def _build_graph(self, timeouts):
+        def is_violation(results):
+            return results['check']['is_violation']
+
+        return StageGraph([
+            Stage('detect', self._detect, timeout=timeouts.get('detect'), fallback=lambda results: {}),
+            Stage('track', self._track, deps=('detect',), fallback=self._untracked),
+            Stage('check', self._check, deps=('track',),
+                  fallback={'is_violation': False, 'violation_tracks': None}),
+            Stage('plate', self._read_plate, deps=('track',) if self.vote_plates else ('detect',),
+                  timeout=timeouts.get('plate'), fallback={}),
+            Stage('assemble', self._assemble, deps=('track', 'check', 'plate')),
+            Stage('owner_lookup', self._lookup_owner, deps=('assemble',), timeout=timeouts.get('owner_lookup'),
+                  when=lambda results: is_violation(results) and results['assemble']['plate_detected'],
+                  fallback={'vehicle': None, 'user': None})
+        ])
+
+    def process(self, frame, camera_id, detection_id=None, save=True):
+        """
+        Run every stage on one frame
+
+        Args:
+            frame: Frame decoded once at ingest (a path or image array is also accepted)
+            camera_id: Camera identifier
+            detection_id: Identifier reserved when the frame was queued, generated if None
+            save (bool): Insert the detection record (the job queue updates its own record instead)
+
+        Returns:
+            dict: Detection data, or None when the motion gate skipped the frame
+        """
+        started = time.perf_counter()
+        frame = as_frame(frame, camera_id)
+
+        # Static frames never reach the detector
+        if self.motion_gate is not None and not self.motion_gate.evaluate(frame)['process']:
+            return None
+
+        # Models only see the camera's region of interest
+        region = self.regions.get(camera_id) if self.regions is not None else None
+        if region is not None:
+            model_frame, offset = region.apply(frame)
+        else:
+            model_frame, offset = frame, (0, 0)
+
+        results, timings = self.graph.run({
+            'frame': frame,
+            'camera_id': camera_id,
+            'detection_id': detection_id or new_detection_id(),
+            'model_frame': model_frame,
+            'offset': offset
+        })
+
+        detection_data = results['assemble']
+        violation_id = None
+        if detection_data['is_violation']:
+            detection_data['violation_type'] = 'NO_HELMET'
+
+            violation_tracks = detection_data.get('violation_tracks')
+            if self.vote_plates and violation_tracks and not self.plate_voter.is_settled(violation_tracks):
+                # The track's vote is still open: the memo waits for it to settle or the track to expire
+                detection_data['memo_status'] = 'pending_plate'
+                self.plate_voter.defer_memo(dict(detection_data), violation_tracks)
+            # Generate violation memo if plate detected (its evidence_photo is set once written)
+            elif detection_data['plate_detected']:
+                memo_started = time.perf_counter()
+                violation_memo = self.violation_processor.generate_violation_memo(
+                    detection_data, owner=results['owner_lookup']
+                )
+                detection_data['violation_memo'] = violation_memo
+                violation_id = violation_memo.get('violation_id')
+                timings['memo'] = {'ms': round((time.perf_counter() - memo_started) * 1000, 2), 'status': 'ok'}
+
+        timings['total_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        detection_data['stage_timings'] = timings
+        detection_data['degraded_stages'] = [
+            name for name, timing in timings.items()
+            if isinstance(timing, dict) and timing['status'] in ('timeout', 'error', 'shed')
+        ]
+
+        # Save to database
+        if save:
+            self.db_handler.save_detection(detection_data)
+
+        # Queued after the save so the writer's update finds the record (it sets processed_image)
+        if detection_data['is_violation']:
+            self._evidence_writer().submit(frame, detection_data, violation_id)
+
+        # Uploaded originals are shared by identical uploads; record which detection uses this one
+        if frame.path:
+            self.violation_processor.media_store.add_reference(frame.path, 'detection', detection_data['detection_id'])
+
+        if self.vote_plates:
+            for deferred, plate_result in self.plate_voter.ready_memos():
+                self._deferred_memo(deferred, plate_result)
+
+        return detection_data
+
+    def _deferred_memo(self, detection_data, plate_result):
+        """Generate a held-back memo from its tracks' final vote and record it on the saved detection"""
+        detection_id = detection_data['detection_id']
+        plate_fields = {
+            key: plate_result[key]
+            for key in ('plate_detected', 'plate_number', 'plate_confidence', 'plate_bbox', 'plate_source')
+        }
+        if not plate_fields['plate_detected']:
+            # Tracks expired without any readable plate
+            self.db_handler.update_detection(detection_id, {'memo_status': 'no_plate'})
+            return
+
+        detection_data = {**detection_data, **plate_fields}
+        owner = self.violation_processor.lookup_owner(plate_fields['plate_number'])
+        violation_memo = self.violation_processor.generate_violation_memo(detection_data, owner=owner)
+        self.db_handler.update_detection(detection_id, {
+            **plate_fields, 'violation_memo': violation_memo, 'memo_status': 'created'
+        })
+
+        violation_id = violation_memo.get('violation_id')
+        if violation_id:
+            self._evidence_writer().link_memo(detection_id, violation_id)
+
+    def _evidence_writer(self):
+        if self.evidence_writer is not None:
+            return self.evidence_writer
+        return get_evidence_writer(self.violation_processor, self.db_handler)
+
+    def _detect(self, results):
+        """Detect helmets and persons in the model frame (ROI coordinates)"""
+        model_frame = results['model_frame']
+        if self._use_tiling(model_frame):
+            return model_registry.get_helmet_detector().detect_tiled(model_frame, self.tiling)
+
+        batch_inference = model_registry.get_batch_inference()
+        if batch_inference is not None:
+            return batch_inference.detect(model_frame)
+        return model_registry.get_helmet_detector().detect(model_frame)
+
+    def _to_full_frame(self, results):
+        """Detector output in full-frame coordinates, copied so the plate stage can keep reading the original"""
+        helmet_result = results['detect']
+        dx, dy = results['offset']
+        if dx or dy:
+            helmet_result = shift_boxes(copy.deepcopy(helmet_result), dx, dy)
+        return helmet_result
+
+    def _track(self, results):
+        """Follow riders across frames; only a no-helmet track that has persisted long enough counts, once"""
+        helmet_result = self._to_full_frame(results)
+        violation_tracks = None
+        if self.tracker is not None:
+            frame = results['frame']
+            violation_tracks = self.tracker.update(results['camera_id'], helmet_result.get('riders', []), frame.timestamp)
+        return {'helmet_result': helmet_result, 'violation_tracks': violation_tracks}
+
+    def _untracked(self, results):
+        return {'helmet_result': self._to_full_frame(results), 'violation_tracks': None}
+
+    def _check(self, results):
+        """Violation by track when tracking, else by the per-frame rules"""
+        helmet_result = results['track']['helmet_result']
+        violation_tracks = results['track']['violation_tracks']
+        if violation_tracks is not None:
+            return {'is_violation': bool(violation_tracks), 'violation_tracks': violation_tracks}
+
+        is_violation = self.violation_processor.check_violation({
+            'person_detected': helmet_result.get('person_detected', False),
+            'person_confidence': helmet_result.get('person_confidence', 0.0),
+            'helmet_detected': helmet_result.get('helmet_detected', False),
+            'helmet_confidence': helmet_result.get('helmet_confidence', 0.0),
+            'vehicle_detected': helmet_result.get('vehicle_detected', False),
+            'riders': helmet_result.get('riders', [])
+        })
+        return {'is_violation': is_violation, 'violation_tracks': None}
+
+    def _read_plate(self, results):
+        """Read license plates from the detector's plate/motorcycle boxes, voted per track when tracking"""
+        if self.vote_plates:
+            track = results['track']
+            helmet_result = track['helmet_result']
+            return self.plate_voter.update(
+                results['frame'], helmet_result.get('riders', []), helmet_result, track['violation_tracks']
+            )
+
+        plate_result = model_registry.get_plate_reader().detect_and_read(results['model_frame'], results['detect'])
+        dx, dy = results['offset']
+        if dx or dy:
+            shift_boxes(plate_result, dx, dy)
+        return plate_result
+
+    def _assemble(self, results):
+        """Combine results"""
+        frame = results['frame']
+        helmet_result = results['track']['helmet_result']
+        plate_result = results['plate']
+        check = results['check']
+
+        detection_data = {
+            'detection_id': results['detection_id'],
+            'camera_id': results['camera_id'],
+            'timestamp': frame.timestamp,
+            'original_image': frame.path,
+            'frame_scale': round(frame.scale, 4),  # Original pixels per box pixel
+
+            # Person detection
+            'person_detected': helmet_result.get('person_detected', False),
+            'person_confidence': helmet_result.get('person_confidence', 0.0),
+            'person_bbox': helmet_result.get('person_bbox', {}),
+
+            # Helmet detection
+            'helmet_detected': helmet_result.get('helmet_detected', False),
+            'helmet_confidence': helmet_result.get('helmet_confidence', 0.0),
+            'helmet_bbox': helmet_result.get('helmet_bbox', {}),
+
+            # Per-rider helmet verdicts
+            'riders': helmet_result.get('riders', []),
+            'rider_count': helmet_result.get('rider_count', 0),
+            'riders_without_helmet': helmet_result.get('riders_without_helmet', 0),
+
+            # Plate detection
+            'plate_detected': plate_result.get('plate_detected', False),
+            'plate_number': plate_result.get('plate_number', ''),
+            'plate_confidence': plate_result.get('plate_confidence', 0.0),
+            'plate_bbox': plate_result.get('plate_bbox', {}),
+            'plate_source': plate_result.get('plate_source', ''),
+
+            # Vehicle detection
+            'vehicle_detected': helmet_result.get('vehicle_detected', False),
+            'vehicle_type': helmet_result.get('vehicle_type', ''),
+            'vehicle_bbox': helmet_result.get('vehicle_bbox', {}),
+
+            'is_violation': check['is_violation']
+        }
+        if check['violation_tracks'] is not None:
+            detection_data['violation_tracks'] = check['violation_tracks']
+        return detection_data
+
+    def _lookup_owner(self, results):
+        """Registered vehicle and owner for the plate, needed by the memo"""
+        return self.violation_processor.lookup_owner(results['assemble']['plate_number'])
+
+    def _use_tiling(self, frame):
+        """Tile only when enabled and the frame is wide enough to lose small objects when downscaled"""
+        return (
+            self.tiling is not None and self.tiling['ENABLED'] and
+            frame.image.shape[1] >= self.tiling['MIN_FRAME_WIDTH']
+        )
+
+
+class QueueFullError(Exception):
+    """Raised when the detection job queue is at capacity"""
+
+    def __init__(self, depth, retry_after):
+        super().__init__(f"Detection queue is full ({depth} jobs waiting)")
+        self.depth = depth
+        self.retry_after = retry_after
+
+
+class QueueUnavailableError(Exception):
+    """Raised when detection jobs cannot be accepted at all"""
+
+
+class _DetectionJob:
+    """A queued frame waiting for the pipeline"""
+
+    __slots__ = ('detection_id', 'frame', 'camera_id', 'enqueued_at')
+
+    def __init__(self, detection_id, frame, camera_id):
+        self.detection_id = detection_id
+        self.frame = frame
+        self.camera_id = camera_id
+        self.enqueued_at = time.monotonic()
+
+
+class DetectionJobQueue:
+    def __init__(self, pipeline, db_handler, workers=2, max_depth=32, max_retries=2,
+                 retry_backoff_seconds=1.0, retry_after_seconds=2):
+        """
+        Initialize a bounded local worker pool for asynchronous detection
+
+        Job status is tracked on the helmet_detections record as
+        processing_status: queued -> processing -> (retrying ->) completed | failed.
+
+        Args:
+            pipeline: DetectionPipeline run for every job
+            db_handler: DatabaseHandler used to record job status
+            workers (int): Worker threads
+            max_depth (int): Jobs allowed to wait before enqueue is refused
+            max_retries (int): Extra attempts after a failed run
+            retry_backoff_seconds (float): Delay before a retry, multiplied by the attempt number
+            retry_after_seconds (int): Retry-After hint returned when the queue is full
+        """
+        self.pipeline = pipeline
+        self.db_handler = db_handler
+        self.worker_count = max(1, int(workers))
+        self.max_depth = max(1, int(max_depth))
+        self.max_retries = max(0, int(max_retries))
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.retry_after_seconds = retry_after_seconds
+
+        self._queue = queue.Queue(maxsize=self.max_depth)
+        self._workers = []
+        self._lock = threading.Lock()
+        self._running = False
+
+        # Counters
+        self._stats = {'enqueued': 0, 'rejected': 0, 'completed': 0, 'failed': 0, 'retries': 0}
+        self._queue_wait_ms = deque(maxlen=500)
+
+    def start(self):
+        """Start the worker threads"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+
+            for index in range(self.worker_count):
+                worker = threading.Thread(
+                    target=self._run, name=f'detection-job-{index}', daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def stop(self, timeout=5.0):
+        """Stop the workers once the jobs already queued have been processed"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def ensure_capacity(self):
+        """
+        Refuse work early, before the upload is decoded and saved
+
+        Raises:
+            QueueFullError: The queue is at max_depth
+            QueueUnavailableError: The workers are stopped
+        """
+        if not self._running:
+            raise QueueUnavailableError("Detection workers are not running")
+
+        if self._queue.full():
+            self._count('rejected')
+            raise QueueFullError(self._queue.qsize(), self.retry_after_seconds)
+
+    def enqueue(self, frame, camera_id):
+        """
+        Queue a frame for detection and record it as queued
+
+        Args:
+            frame: Frame decoded at ingest
+            camera_id: Camera identifier
+
+        Returns:
+            str: detection_id to poll
+
+        Raises:
+            QueueFullError: The queue is at max_depth
+            QueueUnavailableError: The workers are stopped or the job could not be recorded
+        """
+        self.ensure_capacity()
+
+        detection_id = new_detection_id()
+        recorded = self.db_handler.update_detection(detection_id, {
+            'detection_id': detection_id,
+            'camera_id': camera_id,
+            'timestamp': frame.timestamp,
+            'original_image': frame.path,
+            'processing_status': 'queued',
+            'attempts': 0,
+            'queued_at': datetime.now()
+        })
+        if not recorded:
+            raise QueueUnavailableError("Could not record detection job")
+
+        try:
+            self._queue.put_nowait(_DetectionJob(detection_id, frame, camera_id))
+        except queue.Full:
+            # Another request took the last slot between the check and the put
+            self._count('rejected')
+            self.db_handler.update_detection(detection_id, {
+                'processing_status': 'failed',
+                'error': 'Detection queue is full'
+            })
+            raise QueueFullError(self._queue.qsize(), self.retry_after_seconds)
+
+        self._count('enqueued')
+        return detection_id
+
+    def _run(self):
+        """Worker loop"""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+
+            with self._lock:
+                self._queue_wait_ms.append((time.monotonic() - job.enqueued_at) * 1000)
+
+            try:
+                self._process_job(job)
+            except Exception as e:
+                # Keep the worker alive whatever a job does
+                print(f"Error in detection worker for {job.detection_id}: {e}")
+                self._count('failed')
+                self.db_handler.update_detection(job.detection_id, {'processing_status': 'failed', 'error': str(e)})
+
+    def _process_job(self, job):
+        """Run the pipeline for one job, retrying failures up to max_retries times"""
+        for attempt in range(1, self.max_retries + 2):
+            self.db_handler.update_detection(job.detection_id, {
+                'processing_status': 'processing',
+                'attempts': attempt,
+                'started_at': datetime.now()
+            })
+
+            try:
+                detection_data = self.pipeline.process(
+                    job.frame, job.camera_id, detection_id=job.detection_id, save=False
+                )
+            except Exception as e:
+                print(f"Detection job {job.detection_id} attempt {attempt} failed: {e}")
+                error = {'attempt': attempt, 'error': str(e), 'at': datetime.now()}
+
+                if attempt <= self.max_retries:
+                    self._count('retries')
+                    self.db_handler.update_detection(
+                        job.detection_id, {'processing_status': 'retrying'}, push={'errors': error}
+                    )
+                    time.sleep(self.retry_backoff_seconds * attempt)
+                    continue
+
+                self._count('failed')
+                self.db_handler.update_detection(
+                    job.detection_id,
+                    {'processing_status': 'failed', 'error': str(e), 'finished_at': datetime.now()},
+                    push={'errors': error}
+                )
+                return
+
+            detection_data.update({
+                'processing_status': 'completed',
+                'finished_at': datetime.now()
+            })
+            self.db_handler.update_detection(job.detection_id, detection_data)
+            self._count('completed')
+            return
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def get_stats(self):
+        """
+        Get queue depth, throughput counters and queue wait times
+
+        Returns:
+            dict: Job queue statistics
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            waits = sorted(self._queue_wait_ms)
+
+        stats.update({
+            'running': self._running,
+            'workers': self.worker_count,
+            'depth': self._queue.qsize(),
+            'max_depth': self.max_depth
+        })
+        if waits:
+            stats['queue_wait_ms'] = {
+                'p50': round(waits[len(waits) // 2], 2),
+                'p95': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 2),
+                'max': round(waits[-1], 2)
+            }
+        return stats
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue(pipeline, db_handler):
+    """Create and start this process's DetectionJobQueue on first use"""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            config = CONFIG['JOB_QUEUE']
+            _job_queue = DetectionJobQueue(
+                pipeline,
+                db_handler,
+                workers=config['WORKERS'],
+                max_depth=config['MAX_DEPTH'],
+                max_retries=config['MAX_RETRIES'],
+                retry_backoff_seconds=config['RETRY_BACKOFF_SECONDS'],
+                retry_after_seconds=config['RETRY_AFTER_SECONDS']
+            )
+            _job_queue.start()
+    return _job_queue
+
+
+def peek_job_queue():
+    """This process's job queue if it has been started, else None"""
+    return _job_queue
@@ -0,0 +1,195 @@
+"""
+Small dependency graph that runs detection stages concurrently with per-stage timeouts
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .config.settings import CONFIG
+
+
+class Stage:
+    def __init__(self, name, func, deps=(), timeout=None, fallback=None, when=None):
+        """
+        Initialize one stage of a StageGraph
+
+        Args:
+            name (str): Stage name, also the key of its result
+            func: Callable taking the dict of finished results and returning this stage's result
+            deps (tuple): Names of the stages whose results func needs
+            timeout (float): Seconds before the stage is abandoned for its fallback, None waits forever
+            fallback: Degraded result used on timeout, error or skip (called with the results if callable)
+            when: Optional predicate on the results; the stage is skipped when it returns False
+        """
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.fallback = fallback
+        self.when = when
+
+    def fallback_value(self, results):
+        return self.fallback(results) if callable(self.fallback) else self.fallback
+
+
+class StageGraph:
+    def __init__(self, stages, executor=None):
+        """
+        Initialize a graph of stages; each starts as soon as its dependencies finish
+
+        Args:
+            stages (list): Stage objects, dependencies must be listed in the graph
+            executor: ThreadPoolExecutor to run every stage on; by default stages with a timeout
+                get their own pool (get_stage_executor(name)) and the rest share one
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            missing = [dep for dep in stage.deps if dep not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages: {', '.join(missing)}")
+        self.executor = executor
+
+    def run(self, results=None):
+        """
+        Run every stage
+
+        A stage that times out or raises is replaced by its fallback and the
+        graph carries on; a late result from an abandoned stage is ignored.
+
+        An abandoned stage keeps its thread until it returns. Timed stages
+        therefore run on their own pool, so slow OCR cannot starve the other
+        stages, and once PIPELINE['MAX_ABANDONED'] runs of a stage are still
+        in flight, new runs are shed straight to the fallback instead of
+        queueing behind them. A run that times out before it left the pool's
+        queue is cancelled rather than abandoned. Timeout and shed timings
+        carry the in-flight count as 'abandoned'.
+
+        Args:
+            results (dict): Initial values stages can read (e.g. the frame)
+
+        Returns:
+            tuple: (results by stage name, timings {stage: {'ms', 'status'}})
+        """
+        results = dict(results or {})
+        timings = {}
+        pending = dict(self.stages)
+        running = {}  # future -> (stage, started, deadline)
+
+        while pending or running:
+            # Start (or skip) every stage whose dependencies are done
+            for name, stage in list(pending.items()):
+                if any(dep not in results for dep in stage.deps):
+                    continue
+                del pending[name]
+
+                if stage.when is not None and not stage.when(results):
+                    results[name] = stage.fallback_value(results)
+                    timings[name] = {'ms': 0.0, 'status': 'skipped'}
+                    continue
+
+                in_flight = _abandoned.count(name) if stage.timeout else 0
+                if in_flight >= CONFIG['PIPELINE']['MAX_ABANDONED']:
+                    results[name] = stage.fallback_value(results)
+                    timings[name] = {'ms': 0.0, 'status': 'shed', 'abandoned': in_flight}
+                    continue
+
+                executor = self.executor or get_stage_executor(name if stage.timeout else None)
+                started = time.perf_counter()
+                deadline = started + stage.timeout if stage.timeout else None
+                running[executor.submit(stage.func, results)] = (stage, started, deadline)
+
+            if not running:
+                if pending:
+                    raise ValueError(f"Stage graph cannot make progress: {', '.join(pending)}")
+                break
+
+            deadlines = [deadline for _, _, deadline in running.values() if deadline is not None]
+            wait_for = max(0.0, min(deadlines) - time.perf_counter()) if deadlines else None
+            done, _ = wait(list(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                stage, started, _ = running.pop(future)
+                elapsed = round((time.perf_counter() - started) * 1000, 2)
+                try:
+                    results[stage.name] = future.result()
+                    timings[stage.name] = {'ms': elapsed, 'status': 'ok'}
+                except Exception as e:
+                    print(f"Stage {stage.name} failed: {e}")
+                    results[stage.name] = stage.fallback_value(results)
+                    timings[stage.name] = {'ms': elapsed, 'status': 'error', 'error': str(e)}
+
+            now = time.perf_counter()
+            for future, (stage, started, deadline) in list(running.items()):
+                if deadline is not None and now >= deadline and not future.done():
+                    del running[future]
+                    if future.cancel():
+                        # Still queued in the stage's pool: it never runs, so nothing is abandoned
+                        in_flight = _abandoned.count(stage.name)
+                    else:
+                        # The thread cannot be interrupted; its result is simply not waited for
+                        in_flight = _abandoned.add(stage.name, future)
+                    print(f"Stage {stage.name} timed out after {stage.timeout}s, using fallback ({in_flight} abandoned in flight)")
+                    results[stage.name] = stage.fallback_value(results)
+                    timings[stage.name] = {
+                        'ms': round((now - started) * 1000, 2), 'status': 'timeout', 'abandoned': in_flight
+                    }
+
+        return results, timings
+
+
+class _AbandonedStages:
+    """Runs of timed-out stages still holding a thread, by stage name"""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, future):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + 1
+            count = self._counts[name]
+        future.add_done_callback(lambda _: self._release(name))
+        return count
+
+    def _release(self, name):
+        with self._lock:
+            self._counts[name] -= 1
+
+    def count(self, name):
+        with self._lock:
+            return self._counts.get(name, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: count for name, count in self._counts.items() if count}
+
+
+_abandoned = _AbandonedStages()
+_executors = {}
+_executor_lock = threading.Lock()
+
+
+def get_stage_executor(stage_name=None):
+    """
+    Thread pool stages run on
+
+    Args:
+        stage_name (str): A timed stage gets a pool of its own (TIMED_STAGE_WORKERS threads);
+            None is the pool shared by the other stages of every graph (MAX_WORKERS threads)
+
+    Returns:
+        ThreadPoolExecutor: The pool, created on first use
+    """
+    with _executor_lock:
+        if stage_name not in _executors:
+            config = CONFIG['PIPELINE']
+            _executors[stage_name] = ThreadPoolExecutor(
+                max_workers=config['TIMED_STAGE_WORKERS'] if stage_name else config['MAX_WORKERS'],
+                thread_name_prefix=f'detection-stage-{stage_name}' if stage_name else 'detection-stage'
+            )
+    return _executors[stage_name]
+
+
+def abandoned_stages():
+    """Timed-out stage runs still occupying a thread, by stage name"""
+    return _abandoned.snapshot()
@@ -0,0 +1,8 @@
+# Camera stream ingestion
+from .camera_stream import CameraStreamReader
+from .ingestion import CameraIngestionWorker, StreamIngestionSupervisor
+from .motion_gate import MotionGate
+from .plate_voter import PlateVoter
+from .rider_tracker import RiderTracker
+
+__all__ = ['CameraStreamReader', 'CameraIngestionWorker', 'StreamIngestionSupervisor', 'MotionGate', 'PlateVoter', 'RiderTracker']
@@ -0,0 +1,231 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import cv2
+
+from ..utils.frame import Frame
+
+
+class CameraStreamReader:
+    def __init__(self, camera_id, source, sample_fps=2.0, reconnect_initial_seconds=1.0,
+                 reconnect_max_seconds=60.0, max_read_failures=5, loop_files=True, pace_files=True):
+        """
+        Decode a camera stream and hand out frames sampled at a fixed rate
+
+        Frames are decoded on a background thread and kept in a one-slot
+        buffer, so a slow consumer always gets the newest frame instead of
+        falling further and further behind the camera.
+
+        Args:
+            camera_id: Camera identifier stamped on every frame
+            source (str): RTSP/HTTP URL, or a local video file standing in for one
+            sample_fps (float): Frames per second handed to the consumer
+            reconnect_initial_seconds (float): First reconnect delay, doubled after each failure
+            reconnect_max_seconds (float): Upper bound for the reconnect delay
+            max_read_failures (int): Consecutive failed reads before the stream is reopened
+            loop_files (bool): Restart a video file when it ends
+            pace_files (bool): Play video files at their native frame rate, like a live camera
+        """
+        self.camera_id = camera_id
+        self.source = source
+        self.sample_interval = 1.0 / sample_fps if sample_fps > 0 else 0.0
+        self.reconnect_initial_seconds = reconnect_initial_seconds
+        self.reconnect_max_seconds = reconnect_max_seconds
+        self.max_read_failures = max_read_failures
+        self.is_file = os.path.isfile(str(source))
+        self.loop_files = loop_files
+        self.pace_files = pace_files
+
+        self._capture = None
+        self._latest = queue.Queue(maxsize=1)
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'frames_read': 0,
+            'frames_sampled': 0,
+            'frames_dropped': 0,
+            'reconnects': 0,
+            'connected': False,
+            'last_frame_at': None,
+            'last_error': None
+        }
+
+    def start(self):
+        """Start decoding in the background"""
+        if self._thread is not None:
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f'stream-{self.camera_id}', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stop decoding and release the capture"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._release()
+
+    @property
+    def finished(self):
+        """True once a non-looping file has been read to the end"""
+        return self._thread is not None and not self._thread.is_alive()
+
+    def read(self, timeout=1.0):
+        """
+        Get the newest sampled frame
+
+        Args:
+            timeout (float): Seconds to wait for a frame
+
+        Returns:
+            Frame: Decoded frame, or None if none arrived in time
+        """
+        try:
+            return self._latest.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def _open(self):
+        """Open the capture, True on success"""
+        if self.is_file:
+            capture = cv2.VideoCapture(str(self.source))
+        else:
+            capture = cv2.VideoCapture(str(self.source), cv2.CAP_FFMPEG)
+            # Keep the driver's buffer short so reads stay close to live
+            capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        if not capture.isOpened():
+            capture.release()
+            return False
+
+        self._capture = capture
+        return True
+
+    def _release(self):
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+    def _run(self):
+        """Connect, read, and reconnect with exponential backoff until stopped"""
+        delay = self.reconnect_initial_seconds
+
+        while not self._stop.is_set():
+            if not self._open():
+                self._record_error(f"Could not open stream {self.source}")
+                self._backoff(delay)
+                delay = min(delay * 2, self.reconnect_max_seconds)
+                continue
+
+            with self._lock:
+                self.stats['connected'] = True
+            print(f"Camera {self.camera_id} connected to {self.source}")
+
+            ended = self._read_until_failure()
+            self._release()
+
+            with self._lock:
+                self.stats['connected'] = False
+
+            if ended and self.is_file and not self.loop_files:
+                print(f"Camera {self.camera_id} reached the end of {self.source}")
+                break
+
+            if self._stop.is_set():
+                break
+
+            if ended and self.is_file:
+                # Looping a file is not a failure, start over immediately
+                delay = self.reconnect_initial_seconds
+                continue
+
+            with self._lock:
+                self.stats['reconnects'] += 1
+            self._backoff(delay)
+            delay = min(delay * 2, self.reconnect_max_seconds)
+
+    def _read_until_failure(self):
+        """
+        Read frames until the stream fails or ends
+
+        Returns:
+            bool: True if a file ended cleanly, False on read failures
+        """
+        failures = 0
+        next_sample_at = 0.0
+        started = time.monotonic()
+        source_fps = self._capture.get(cv2.CAP_PROP_FPS) or 25.0
+
+        while not self._stop.is_set():
+            # grab() demuxes without decoding, frames between samples are never decoded
+            if not self._capture.grab():
+                if self.is_file:
+                    return True
+                failures += 1
+                if failures >= self.max_read_failures:
+                    self._record_error(f"{failures} consecutive read failures")
+                    return False
+                continue
+
+            failures = 0
+            with self._lock:
+                self.stats['frames_read'] += 1
+
+            if self.is_file:
+                # Video files are sampled on media time and optionally paced to real time
+                position = self._capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                if self.pace_files:
+                    ahead = position - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(min(ahead, 1.0 / source_fps))
+            else:
+                position = time.monotonic() - started
+
+            if position < next_sample_at:
+                continue
+            next_sample_at = position + self.sample_interval
+
+            ok, image = self._capture.retrieve()
+            if not ok or image is None:
+                continue
+
+            self._publish(Frame(image, camera_id=self.camera_id, timestamp=datetime.now()))
+
+        return False
+
+    def _publish(self, frame):
+        """Replace whatever frame the consumer has not picked up yet"""
+        try:
+            self._latest.get_nowait()
+            dropped = 1
+        except queue.Empty:
+            dropped = 0
+        self._latest.put_nowait(frame)
+
+        with self._lock:
+            self.stats['frames_sampled'] += 1
+            self.stats['frames_dropped'] += dropped
+            self.stats['last_frame_at'] = frame.timestamp.isoformat()
+
+    def _record_error(self, message):
+        print(f"Camera {self.camera_id}: {message}")
+        with self._lock:
+            self.stats['last_error'] = message
+
+    def _backoff(self, delay):
+        """Wait before reconnecting, waking early on stop()"""
+        print(f"Camera {self.camera_id} reconnecting in {delay:.1f}s")
+        self._stop.wait(delay)
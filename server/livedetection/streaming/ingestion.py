@@ -0,0 +1,250 @@
+import multiprocessing
+import signal
+import time
+from datetime import datetime
+
+from ..config.model_config import MODEL_CONFIG
+from ..config.settings import CONFIG
+
+
+def camera_sample_fps(camera, default):
+    """Per-camera sampling rate from the cameras document, falling back to the default"""
+    try:
+        sample_fps = float(camera.get('sample_fps') or default)
+    except (TypeError, ValueError):
+        return default
+    return sample_fps if sample_fps > 0 else default
+
+
+def camera_tiling(camera, defaults=None):
+    """
+    Tiled-detection settings for a camera: cameras.tiling (enabled, tile_size, overlap, ...) over the defaults
+
+    Args:
+        camera (dict): Camera document
+        defaults (dict): TILING settings, defaults to MODEL_CONFIG['TILING']
+
+    Returns:
+        dict: TILING settings for this camera
+    """
+    tiling = dict(defaults or MODEL_CONFIG['TILING'])
+    for key, value in (camera.get('tiling') or {}).items():
+        if key.upper() in tiling:
+            tiling[key.upper()] = value
+    return tiling
+
+
+class CameraIngestionWorker:
+    def __init__(self, camera, config=None, motion_gate_config=None):
+        """
+        Feed one camera's sampled frames straight into the detection pipeline
+
+        Runs inside the camera's own process; frames stay in memory from
+        decode to detection.
+
+        Args:
+            camera (dict): Camera document with camera_id and stream_url
+            config (dict): STREAMING settings, defaults to CONFIG['STREAMING']
+            motion_gate_config (dict): MOTION_GATE settings, defaults to CONFIG['MOTION_GATE']
+        """
+        self.camera = camera
+        self.camera_id = camera['camera_id']
+        self.config = config or CONFIG['STREAMING']
+        self.motion_gate_config = motion_gate_config or CONFIG['MOTION_GATE']
+        self.running = True
+        self.motion_gate = None
+        self.tracker = None
+        self.plate_voter = None
+
+        self.frames_processed = 0
+        self.frames_gated = 0
+        self.violations = 0
+        self.errors = 0
+
+    def run(self):
+        """Process frames until stopped or a non-looping file ends"""
+        # Models, Mongo clients and threads are created here, after the fork
+        from ..ai_models.violation_processor import ViolationProcessor
+        from ..pipeline import DetectionPipeline
+        from ..utils.database_handler import DatabaseHandler
+        from ..utils.roi import CameraRegions
+        from .camera_stream import CameraStreamReader
+        from .motion_gate import MotionGate
+        from .plate_voter import PlateVoter
+        from .rider_tracker import RiderTracker
+
+        db_handler = DatabaseHandler()
+
+        # Static frames are dropped before the detector
+        self.motion_gate = None
+        if self.motion_gate_config['ENABLED']:
+            self.motion_gate = MotionGate(self.motion_gate_config)
+            if self.camera.get('motion_threshold') is not None:
+                self.motion_gate.set_threshold(self.camera_id, self.camera['motion_threshold'])
+
+        violation_processor = ViolationProcessor()
+
+        # One violation and a few plate reads per rider track, rather than per frame the rider is in
+        self.tracker = None
+        self.plate_voter = None
+        if self.config.get('TRACK_RIDERS', True):
+            self.tracker = RiderTracker(
+                confidence_threshold=violation_processor.violation_rules['confidence_threshold']
+            )
+            self.plate_voter = PlateVoter()
+
+        # The camera document is already at hand, so its ROI never needs a Mongo lookup
+        regions = CameraRegions()
+        regions.set(self.camera_id, self.camera.get('roi'), self.camera.get('roi_mask'))
+
+        pipeline = DetectionPipeline(
+            violation_processor, db_handler, motion_gate=self.motion_gate,
+            tracker=self.tracker, plate_voter=self.plate_voter, regions=regions,
+            tiling=camera_tiling(self.camera)
+        )
+
+        reader = CameraStreamReader(
+            self.camera_id,
+            self.camera['stream_url'],
+            sample_fps=camera_sample_fps(self.camera, self.config['SAMPLE_FPS']),
+            reconnect_initial_seconds=self.config['RECONNECT_INITIAL_SECONDS'],
+            reconnect_max_seconds=self.config['RECONNECT_MAX_SECONDS'],
+            max_read_failures=self.config['MAX_READ_FAILURES'],
+            loop_files=self.config['LOOP_VIDEO_FILES'],
+            pace_files=self.config['PACE_VIDEO_FILES']
+        )
+        reader.start()
+
+        last_status = 0.0
+        try:
+            while self.running and not reader.finished:
+                frame = reader.read(timeout=1.0)
+                if frame is not None:
+                    self.process_frame(pipeline, frame)
+
+                if time.monotonic() - last_status >= self.config['STATUS_INTERVAL_SECONDS']:
+                    self._report_status(db_handler, reader)
+                    last_status = time.monotonic()
+        finally:
+            reader.stop()
+            self._report_status(db_handler, reader)
+
+    def process_frame(self, pipeline, frame):
+        """Run the pipeline on one frame, never letting one bad frame stop the stream"""
+        try:
+            detection_data = pipeline.process(frame, self.camera_id)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error processing frame from {self.camera_id}: {e}")
+            return None
+
+        if detection_data is None:
+            self.frames_gated += 1
+            return None
+
+        self.frames_processed += 1
+        if detection_data.get('is_violation'):
+            self.violations += 1
+        return detection_data
+
+    def stop(self, *args):
+        self.running = False
+
+    def _report_status(self, db_handler, reader):
+        """Publish ingestion health on the camera document"""
+        status = {
+            **reader.get_stats(),
+            'frames_processed': self.frames_processed,
+            'frames_gated': self.frames_gated,
+            'violations': self.violations,
+            'errors': self.errors,
+            'updated_at': datetime.now()
+        }
+        if self.motion_gate is not None:
+            status['motion_gate'] = self.motion_gate.get_stats(self.camera_id).get(self.camera_id, {})
+        if self.tracker is not None:
+            status['tracking'] = self.tracker.get_stats(self.camera_id).get(self.camera_id, {})
+        if self.plate_voter is not None:
+            status['plate_voting'] = self.plate_voter.get_stats()
+        try:
+            db_handler.cameras.update_one({'camera_id': self.camera_id}, {'$set': {'ingestion': status}})
+        except Exception as e:
+            print(f"Error saving ingestion status for {self.camera_id}: {e}")
+
+
+def run_camera_worker(camera, config=None, motion_gate_config=None):
+    """Process entry point for one camera"""
+    worker = CameraIngestionWorker(camera, config, motion_gate_config)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+class StreamIngestionSupervisor:
+    def __init__(self, cameras, config=None, motion_gate_config=None):
+        """
+        Initialize one reader process per camera and keep them alive
+
+        Args:
+            cameras (list): Camera documents with camera_id and stream_url
+            config (dict): STREAMING settings, defaults to CONFIG['STREAMING']
+            motion_gate_config (dict): MOTION_GATE settings, defaults to CONFIG['MOTION_GATE']
+        """
+        self.cameras = {camera['camera_id']: camera for camera in cameras}
+        self.config = config or CONFIG['STREAMING']
+        self.motion_gate_config = motion_gate_config or CONFIG['MOTION_GATE']
+        self.processes = {}
+        self.restarts = {camera_id: 0 for camera_id in self.cameras}
+        self._running = False
+
+    def start(self):
+        """Start every camera process"""
+        self._running = True
+        for camera_id in self.cameras:
+            self._spawn(camera_id)
+
+    def _spawn(self, camera_id):
+        # spawn keeps CUDA/torch state out of the children and matches macOS/Windows behaviour
+        context = multiprocessing.get_context('spawn')
+        process = context.Process(
+            target=run_camera_worker,
+            args=(self.cameras[camera_id], self.config, self.motion_gate_config),
+            name=f'camera-{camera_id}',
+            daemon=False
+        )
+        process.start()
+        self.processes[camera_id] = process
+        print(f"Started ingestion for camera {camera_id} (pid {process.pid})")
+
+    def supervise(self, poll_seconds=5.0):
+        """Restart camera processes that die, until stop() is called"""
+        while self._running:
+            for camera_id, process in list(self.processes.items()):
+                if process.is_alive():
+                    continue
+
+                if process.exitcode == 0:
+                    # A non-looping file finished, nothing to restart
+                    print(f"Ingestion for camera {camera_id} finished")
+                    del self.processes[camera_id]
+                    continue
+
+                self.restarts[camera_id] += 1
+                print(f"Ingestion for camera {camera_id} exited with {process.exitcode}, restarting")
+                self._spawn(camera_id)
+
+            if not self.processes:
+                break
+            time.sleep(poll_seconds)
+
+    def stop(self, timeout=10.0):
+        """Ask every camera process to stop, then terminate stragglers"""
+        self._running = False
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()  # SIGTERM lets the worker release its capture
+        for process in self.processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+        self.processes = {}
@@ -0,0 +1,169 @@
+import threading
+import time
+
+import cv2
+
+from ..config.settings import CONFIG
+from ..utils.image_processor import ImageProcessor
+
+
+class _CameraBackground:
+    """Background model and gating counters for one camera"""
+
+    def __init__(self, method, learning_rate):
+        self.method = method
+        self.learning_rate = learning_rate
+        self.background = None
+        self.subtractor = None
+        self.last_processed_at = 0.0
+        self.active_frames_left = 0
+
+        self.evaluated = 0
+        self.passed = 0
+        self.skipped = 0
+        self.scene_changes = 0
+        self.forced = 0
+
+    def changed_mask(self, small, image_processor, pixel_threshold):
+        """Foreground mask of the thumbnail against this camera's background"""
+        # The first frame (or the first after a resolution change) only seeds the model
+        if self.background is None or self.background.shape != small.shape:
+            self.reset(small)
+            return None
+
+        if self.method == 'mog2':
+            return self.subtractor.apply(small, learningRate=self.learning_rate)
+
+        # Running-average background
+
+        mask = image_processor.frame_difference(self.background, small, pixel_threshold)
+        cv2.accumulateWeighted(small.astype('float32'), self.background, self.learning_rate)
+        return mask
+
+    def reset(self, small):
+        """Relearn the background from this frame alone"""
+        self.background = small.astype('float32')
+        if self.method == 'mog2':
+            if self.subtractor is None:
+                self.subtractor = cv2.createBackgroundSubtractorMOG2(history=200, detectShadows=False)
+            # A learning rate of 1 replaces the model with this frame, keeping the subtractor
+            self.subtractor.apply(small, learningRate=1)
+
+
+class MotionGate:
+    def __init__(self, config=None, thresholds=None):
+        """
+        Skip detection on frames where nothing moved
+
+        Each camera keeps a background model of a downscaled grayscale frame;
+        a frame is passed on only when the share of changed pixels reaches
+        the camera's threshold.
+
+        Args:
+            config (dict): MOTION_GATE settings, defaults to CONFIG['MOTION_GATE']
+            thresholds (dict): camera_id -> minimum changed fraction, overriding MIN_CHANGED_FRACTION
+        """
+        self.config = config or CONFIG['MOTION_GATE']
+        self.thresholds = dict(thresholds or {})
+        self.image_processor = ImageProcessor()
+
+        self._cameras = {}
+        self._lock = threading.Lock()
+
+    def set_threshold(self, camera_id, threshold):
+        """Set the minimum changed fraction for one camera"""
+        self.thresholds[camera_id] = float(threshold)
+
+    def threshold_for(self, camera_id):
+        return self.thresholds.get(camera_id, self.config['MIN_CHANGED_FRACTION'])
+
+    def evaluate(self, frame):
+        """
+        Decide whether a frame should go through detection
+
+        Args:
+            frame: Frame with camera_id and the decoded image
+
+        Returns:
+            dict: 'process' flag, 'changed_fraction' and the 'reason' for the decision
+        """
+        camera_id = frame.camera_id
+        with self._lock:
+            state = self._cameras.get(camera_id)
+            if state is None:
+                state = _CameraBackground(self.config['METHOD'], self.config['BACKGROUND_LEARNING_RATE'])
+                self._cameras[camera_id] = state
+
+        small = self.image_processor.downscale_gray(frame.image, self.config['DOWNSCALE_WIDTH'])
+        mask = state.changed_mask(small, self.image_processor, self.config['PIXEL_THRESHOLD'])
+        fraction = self.image_processor.changed_fraction(mask) if mask is not None else 1.0
+        now = time.monotonic()
+
+        if mask is None:
+            reason = 'first_frame'
+        elif fraction >= self.config['SCENE_CHANGE_FRACTION']:
+            # Lighting jump or the camera moved: relearn the background, and look at this frame
+            state.reset(small)
+            state.scene_changes += 1
+            reason = 'scene_change'
+        elif fraction >= self.threshold_for(camera_id):
+            reason = 'motion'
+        elif state.active_frames_left > 0:
+            # Keep looking for a few frames after motion, riders often stop at signals
+            state.active_frames_left -= 1
+            reason = 'motion_hold'
+        elif now - state.last_processed_at >= self.config['MAX_SKIP_SECONDS']:
+            state.forced += 1
+            reason = 'heartbeat'
+        else:
+            reason = 'static'
+
+        process = reason != 'static'
+
+        # Tiled detection only skips still tiles when this frame's own motion decided it
+        frame.motion_mask = mask if reason == 'motion' else None
+        if reason in ('motion', 'scene_change', 'first_frame'):
+            state.active_frames_left = self.config['HOLD_FRAMES']
+
+        state.evaluated += 1
+        if process:
+            state.passed += 1
+            state.last_processed_at = now
+        else:
+            state.skipped += 1
+
+        if state.evaluated % self.config['LOG_EVERY'] == 0:
+            print(
+                f"Motion gate {camera_id}: skipped {state.skipped}/{state.evaluated} frames "
+                f"({100.0 * state.skipped / state.evaluated:.1f}% inference saved)"
+            )
+
+        return {'process': process, 'changed_fraction': round(fraction, 4), 'reason': reason}
+
+    def get_stats(self, camera_id=None):
+        """
+        Gating counters per camera
+
+        Args:
+            camera_id: Only this camera, or every camera when None
+
+        Returns:
+            dict: camera_id -> counters and skip rate
+        """
+        with self._lock:
+            cameras = dict(self._cameras)
+
+        stats = {}
+        for cid, state in cameras.items():
+            if camera_id is not None and cid != camera_id:
+                continue
+            stats[cid] = {
+                'threshold': self.threshold_for(cid),
+                'evaluated': state.evaluated,
+                'passed': state.passed,
+                'skipped': state.skipped,
+                'scene_changes': state.scene_changes,
+                'heartbeats': state.forced,
+                'skip_rate': round(state.skipped / state.evaluated, 4) if state.evaluated else 0.0
+            }
+        return stats
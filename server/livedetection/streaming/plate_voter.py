@@ -0,0 +1,296 @@
+import threading
+from collections import Counter, defaultdict
+
+import cv2
+
+from .. import model_registry
+from ..config.model_config import MODEL_CONFIG
+from ..utils.box_utils import as_boxes, bbox_to_array, ioa_matrix
+
+
+def vote_plate(reads):
+    """
+    Character-by-character vote across several reads of one plate
+
+    Reads of the most supported length vote per position, weighted by OCR
+    confidence. The consensus confidence is the weakest position's winning
+    weight over all reads, so one disagreeing read lowers it.
+
+    Args:
+        reads (list): (text, confidence) pairs
+
+    Returns:
+        tuple: (voted plate or '', consensus confidence)
+    """
+    reads = [(text, confidence) for text, confidence in reads if text]
+    if not reads:
+        return '', 0.0
+
+    length_weights = Counter()
+    for text, confidence in reads:
+        length_weights[len(text)] += confidence
+    length = length_weights.most_common(1)[0][0]
+
+    positions = [Counter() for _ in range(length)]
+    for text, confidence in reads:
+        if len(text) == length:
+            for position, char in enumerate(text):
+                positions[position][char] += confidence
+
+    plate, consensus = [], 1.0
+    for votes in positions:
+        char, weight = votes.most_common(1)[0]
+        plate.append(char)
+        consensus = min(consensus, weight / len(reads))
+
+    return ''.join(plate), float(consensus)
+
+
+def crop_quality(crop):
+    """Rank plate crops by size and sharpness (variance of the Laplacian)"""
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if len(crop.shape) == 3 else crop
+    return float(gray.shape[0] * gray.shape[1]) * float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+class _TrackPlate:
+    """Kept reads and the current vote for one rider track"""
+
+    def __init__(self):
+        self.reads = []  # (quality, text, confidence, bbox)
+        self.ocr_calls = 0
+        self.plate = ''
+        self.confidence = 0.0
+        self.bbox = {}
+        self.settled = False
+        self.expired = False
+        self.last_seen = 0.0
+
+
+class PlateVoter:
+    def __init__(self, plate_reader=None, config=None, max_age_seconds=None):
+        """
+        Initialize per-track plate voting so a vehicle's plate is OCR'd a few times, not every frame
+
+        Every tracked rider's plate crop is ranked by size and sharpness;
+        only crops that beat the reads already kept are OCR'd, the kept
+        reads vote per character, and OCR stops for the track once the
+        consensus is confident.
+
+        Args:
+            plate_reader: PlateReader (or ModelClient), defaults to the shared one from model_registry
+            config (dict): TRACK_VOTING settings, defaults to MODEL_CONFIG
+            max_age_seconds (float): Forget a track's reads after this long unseen
+        """
+        self.plate_reader = plate_reader
+        self.config = config or MODEL_CONFIG['PLATE_RECOGNITION']['TRACK_VOTING']
+        self.padding = MODEL_CONFIG['PLATE_RECOGNITION']['DETECTOR_GUIDED']['CROP_PADDING']
+        self.max_age_seconds = max_age_seconds or (
+            2 * MODEL_CONFIG['VIOLATION_RULES']['TEMPORAL_CONSTRAINTS']['MAXIMUM_GAP_BETWEEN_DETECTIONS']
+        )
+
+        self._tracks = defaultdict(_TrackPlate)
+        self._deferred = []  # (detection_data, tracks) waiting for the tracks' plates to settle
+        self._lock = threading.Lock()
+        self._stats = {'plate_crops': 0, 'ocr_calls': 0, 'skipped_settled': 0, 'skipped_quality': 0, 'fallback_reads': 0}
+
+    def _reader(self):
+        return self.plate_reader or model_registry.get_plate_reader()
+
+    def update(self, frame, riders, helmet_result, violation_tracks=()):
+        """
+        Feed one frame's plate crops to the tracks they belong to
+
+        Tracked riders get 'plate_number', 'plate_confidence' and 'plate_reads'.
+
+        Args:
+            frame: Frame the riders were detected in
+            riders (list): Rider dicts with 'track_id' set by RiderTracker
+            helmet_result (dict): Detector output with the license_plate boxes
+            violation_tracks (list): Tracks raising a violation on this frame
+
+        Returns:
+            dict: Plate result for the frame, preferring a violating track's vote
+        """
+        now = frame.timestamp.timestamp()
+        tracked = [rider for rider in riders if rider.get('track_id')]
+
+        for rider, bbox in zip(tracked, self._plate_boxes(tracked, helmet_result)):
+            with self._lock:
+                track = self._tracks[rider['track_id']]
+                track.last_seen = now
+            if bbox is not None:
+                self._consider(track, frame.image, bbox)
+
+            rider['plate_number'] = track.plate
+            rider['plate_confidence'] = round(track.confidence, 4)
+            rider['plate_reads'] = len(track.reads)
+
+        self._expire(now)
+
+        result = self._frame_result(tracked, violation_tracks)
+        if violation_tracks and not result['plate_detected']:
+            # A violation without any voted plate: read the frame once the old way
+            self._count('fallback_reads')
+            result = self._reader().detect_and_read(frame, helmet_result)
+        return result
+
+    def is_settled(self, track_ids):
+        """True when every known track among track_ids has a settled vote"""
+        with self._lock:
+            return all(self._tracks[track_id].settled for track_id in track_ids if track_id in self._tracks)
+
+    def defer_memo(self, detection_data, track_ids):
+        """
+        Hold a violation's memo until its tracks' plates settle or the tracks expire
+
+        Args:
+            detection_data (dict): Detection record the memo is generated from
+            track_ids (list): Violating tracks whose vote the memo should carry
+        """
+        with self._lock:
+            tracks = [self._tracks[track_id] for track_id in track_ids if track_id in self._tracks]
+            self._deferred.append((detection_data, tracks))
+
+    def ready_memos(self):
+        """
+        Deferred violations whose tracks have settled or expired since they were raised
+
+        Returns:
+            list: (detection_data, plate result of the tracks' final vote) pairs
+        """
+        with self._lock:
+            ready = [entry for entry in self._deferred if all(t.settled or t.expired for t in entry[1])]
+            self._deferred = [entry for entry in self._deferred if entry not in ready]
+        return [(detection_data, self._plate_result(tracks)) for detection_data, tracks in ready]
+
+    def _plate_boxes(self, riders, helmet_result):
+        """The most confident license_plate box on each rider's vehicle, or None"""
+        plates = [
+            d['bbox'] for d in (helmet_result or {}).get('all_detections', [])
+            if d.get('class_name') == 'license_plate'
+        ]
+        if not plates or not riders:
+            return [None] * len(riders)
+
+        regions = []
+        for rider in riders:
+            if rider.get('motorcycle_bbox'):
+                regions.append(bbox_to_array(rider['motorcycle_bbox']))
+            else:
+                # No motorcycle: the plate sits around the lower half of the rider and below
+                x1, y1, x2, y2 = bbox_to_array(rider['person_bbox'])
+                regions.append([x1, (y1 + y2) / 2.0, x2, y2 + (y2 - y1) / 2.0])
+
+        overlap = ioa_matrix(as_boxes([bbox_to_array(plate) for plate in plates]), as_boxes(regions))
+        owners = overlap.argmax(axis=1)
+
+        boxes = [None] * len(riders)
+        for index, plate in enumerate(plates):
+            owner = owners[index]
+            if overlap[index, owner] < self.config['MIN_PLATE_OVERLAP']:
+                continue
+            if boxes[owner] is None or plate.get('confidence', 0.0) > boxes[owner].get('confidence', 0.0):
+                boxes[owner] = plate
+        return boxes
+
+    def _consider(self, track, image, bbox):
+        """OCR a crop only if the track is unsettled and the crop beats the reads kept so far"""
+        self._count('plate_crops')
+        if track.settled:
+            self._count('skipped_settled')
+            return
+
+        crop = self._crop(image, bbox)
+        if crop is None:
+            return
+
+        quality = crop_quality(crop)
+        if len(track.reads) >= self.config['MAX_READS'] and quality <= track.reads[-1][0]:
+            self._count('skipped_quality')
+            return
+
+        self._count('ocr_calls')
+        track.ocr_calls += 1
+        text, confidence = self._reader().read_plate_crop(crop)
+
+        if text:
+            track.reads.append((quality, text, confidence, bbox))
+            track.reads.sort(key=lambda read: read[0], reverse=True)
+            del track.reads[self.config['MAX_READS']:]
+
+            track.plate, track.confidence = vote_plate([(read[1], read[2]) for read in track.reads])
+            track.bbox = track.reads[0][3]
+
+        if len(track.reads) >= self.config['MIN_READS'] and track.confidence >= self.config['CONSENSUS_THRESHOLD']:
+            track.settled = True
+        elif track.ocr_calls >= 2 * self.config['MAX_READS']:
+            # Unreadable plate: keep whatever the vote has rather than OCR forever
+            track.settled = True
+
+    def _crop(self, image, bbox):
+        h, w = image.shape[:2]
+        pad_x = int((bbox['x2'] - bbox['x1']) * self.padding)
+        pad_y = int((bbox['y2'] - bbox['y1']) * self.padding)
+        x1, y1 = max(0, int(bbox['x1']) - pad_x), max(0, int(bbox['y1']) - pad_y)
+        x2, y2 = min(w, int(bbox['x2']) + pad_x), min(h, int(bbox['y2']) + pad_y)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return image[y1:y2, x1:x2]
+
+    def _frame_result(self, riders, violation_tracks):
+        """Plate result of the violating track, else the most confident vote in the frame"""
+        with self._lock:
+            candidates = [self._tracks[rider['track_id']] for rider in riders
+                          if rider['track_id'] in self._tracks]
+            violating = [self._tracks[track_id] for track_id in violation_tracks if track_id in self._tracks]
+
+        return self._plate_result(violating or candidates)
+
+    def _plate_result(self, tracks):
+        """Plate result of the most confident vote among tracks"""
+        voted = [track for track in tracks if track.plate]
+        if not voted:
+            return {
+                'plate_detected': False,
+                'plate_number': '',
+                'plate_confidence': 0.0,
+                'plate_bbox': {},
+                'plate_source': ''
+            }
+
+        best = max(voted, key=lambda track: track.confidence)
+        return {
+            'plate_detected': True,
+            'plate_number': best.plate,
+            'plate_confidence': round(best.confidence, 4),
+            'plate_bbox': best.bbox,
+            'plate_source': 'track_vote',
+            'plate_reads': len(best.reads)
+        }
+
+    def _expire(self, now):
+        with self._lock:
+            for track_id in [tid for tid, track in self._tracks.items() if now - track.last_seen > self.max_age_seconds]:
+                # Deferred memos still hold the track and take its final vote
+                self._tracks.pop(track_id).expired = True
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def get_stats(self):
+        """
+        Plate crops seen against OCR calls made
+
+        Returns:
+            dict: Counters, live tracks and the share of crops that skipped OCR
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['tracks'] = len(self._tracks)
+            stats['settled_tracks'] = sum(1 for track in self._tracks.values() if track.settled)
+            stats['deferred_memos'] = len(self._deferred)
+
+        crops = stats['plate_crops']
+        stats['ocr_saved_rate'] = round(1 - stats['ocr_calls'] / crops, 4) if crops else 0.0
+        return stats
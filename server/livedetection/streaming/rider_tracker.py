@@ -0,0 +1,270 @@
+import threading
+
+import numpy as np
+
+from ..config.model_config import MODEL_CONFIG
+from ..utils.box_utils import array_to_bbox, bbox_to_array, iou_matrix
+
+
+def _box_to_measurement(box):
+    """xyxy -> centre x, centre y, area, aspect ratio"""
+    width, height = box[2] - box[0], box[3] - box[1]
+    return np.array([box[0] + width / 2.0, box[1] + height / 2.0, width * height, width / max(height, 1e-6)])
+
+
+def _state_to_box(state):
+    """Centre x, centre y, area, aspect ratio -> xyxy"""
+    cx, cy, area, ratio = state[:4]
+    area = max(area, 1e-6)
+    width = np.sqrt(area * max(ratio, 1e-6))
+    height = area / max(width, 1e-6)
+    return np.array([cx - width / 2.0, cy - height / 2.0, cx + width / 2.0, cy + height / 2.0])
+
+
+def _greedy_match(iou, threshold):
+    """Pair rows and columns by descending IoU, skipping pairs below the threshold"""
+    matches = []
+    if not iou.size:
+        return matches
+
+    used_rows, used_cols = set(), set()
+    for flat in np.argsort(-iou, axis=None):
+        row, col = np.unravel_index(flat, iou.shape)
+        if iou[row, col] < threshold:
+            break
+        if row in used_rows or col in used_cols:
+            continue
+        used_rows.add(row)
+        used_cols.add(col)
+        matches.append((int(row), int(col)))
+    return matches
+
+
+class _RiderTrack:
+    """Constant-velocity Kalman filter on one rider box, plus its helmet history"""
+
+    # Measurement is (cx, cy, area, ratio); velocities are per second
+    H = np.hstack([np.eye(4), np.zeros((4, 3))])
+    R = np.diag([1.0, 1.0, 10.0, 10.0])
+
+    def __init__(self, track_id, box, timestamp):
+        self.track_id = track_id
+        self.state = np.zeros(7)
+        self.state[:4] = _box_to_measurement(box)
+        self.covariance = np.diag([10.0, 10.0, 10.0, 10.0, 1e4, 1e4, 1e4])
+
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.hits = 1
+
+        self.no_helmet_since = None
+        self.no_helmet_last = None
+        self.violation_emitted = False
+
+    def predict(self, dt):
+        """Advance the box dt seconds along its velocity"""
+        if self.state[2] + self.state[6] * dt <= 0:
+            self.state[6] = 0.0
+
+        transition = np.eye(7)
+        transition[0, 4] = transition[1, 5] = transition[2, 6] = dt
+        noise = np.diag([1.0, 1.0, 1.0, 0.01, 0.01, 0.01, 1e-4]) * max(dt, 1e-3)
+
+        self.state = transition @ self.state
+        self.covariance = transition @ self.covariance @ transition.T + noise
+        return _state_to_box(self.state)
+
+    def update(self, box, timestamp):
+        """Correct the filter with a matched rider box"""
+        innovation = _box_to_measurement(box) - self.H @ self.state
+        innovation_cov = self.H @ self.covariance @ self.H.T + self.R
+        gain = self.covariance @ self.H.T @ np.linalg.inv(innovation_cov)
+
+        self.state = self.state + gain @ innovation
+        self.covariance = (np.eye(7) - gain @ self.H) @ self.covariance
+        self.last_seen = timestamp
+        self.hits += 1
+
+    @property
+    def box(self):
+        return _state_to_box(self.state)
+
+
+class _CameraTracks:
+    """Live tracks and counters for one camera"""
+
+    def __init__(self):
+        self.tracks = []
+        self.last_timestamp = None
+        self.next_id = 1
+        self.created = 0
+        self.violations = 0
+
+
+class RiderTracker:
+    def __init__(self, config=None, confidence_threshold=0.5):
+        """
+        Initialize per-camera rider tracking so one rider raises one violation
+
+        Riders are associated across frames by IoU against Kalman-predicted
+        boxes, confident riders first and the rest against leftover tracks
+        (ByteTrack-style). A track raises a violation once it has been seen
+        without a helmet for MINIMUM_DETECTION_DURATION seconds, and never again.
+
+        Args:
+            config (dict): TEMPORAL_CONSTRAINTS settings, defaults to MODEL_CONFIG
+            confidence_threshold (float): Minimum rider confidence for a no-helmet observation to count
+        """
+        self.config = config or MODEL_CONFIG['VIOLATION_RULES']['TEMPORAL_CONSTRAINTS']
+        self.confidence_threshold = confidence_threshold
+        self.min_duration = self.config['MINIMUM_DETECTION_DURATION']
+        self.max_gap = self.config['MAXIMUM_GAP_BETWEEN_DETECTIONS']
+
+        self._cameras = {}
+        self._lock = threading.Lock()
+
+    def update(self, camera_id, riders, timestamp):
+        """
+        Assign track IDs to one frame's riders and collect new violations
+
+        Each rider dict gets a 'track_id' (None for an unmatched low-confidence rider).
+
+        Args:
+            camera_id: Camera identifier
+            riders (list): Rider dicts from the helmet detector
+            timestamp (datetime): Capture time of the frame
+
+        Returns:
+            list: track_ids whose no-helmet streak reached the minimum duration on this frame
+        """
+        now = timestamp.timestamp()
+
+        with self._lock:
+            state = self._cameras.setdefault(camera_id, _CameraTracks())
+
+            dt = max(0.0, now - state.last_timestamp) if state.last_timestamp is not None else 0.0
+            state.last_timestamp = now
+
+            # Tracks unseen for longer than the allowed gap are finished
+            state.tracks = [track for track in state.tracks if now - track.last_seen <= self.max_gap]
+            predicted = np.array([track.predict(dt) for track in state.tracks]).reshape(-1, 4)
+
+            for rider in riders:
+                rider['track_id'] = None
+            boxed = [rider for rider in riders if rider.get('person_bbox')]
+            boxes = np.array([bbox_to_array(rider['person_bbox']) for rider in boxed]).reshape(-1, 4)
+            confident = np.array(
+                [rider.get('person_confidence', 0.0) >= self.config['TRACK_HIGH_CONFIDENCE'] for rider in boxed],
+                dtype=bool
+            )
+
+            # First pass: confident riders; second pass: the rest against tracks still free
+            free_tracks = list(range(len(state.tracks)))
+            unmatched_confident, free_tracks = self._associate(
+                state, boxed, boxes, np.flatnonzero(confident), predicted, free_tracks, now
+            )
+            self._associate(state, boxed, boxes, np.flatnonzero(~confident), predicted, free_tracks, now)
+
+            # Only confident riders start new tracks
+            for index in unmatched_confident:
+                track = _RiderTrack(f"{camera_id}_T{state.next_id}", boxes[index], now)
+                state.next_id += 1
+                state.created += 1
+                state.tracks.append(track)
+                boxed[index]['track_id'] = track.track_id
+
+            tracks = {track.track_id: track for track in state.tracks}
+            violations = []
+            for rider in boxed:
+                track = tracks.get(rider['track_id'])
+                if track is not None and self._observe(track, rider, now):
+                    violations.append(track.track_id)
+                    rider['track_violation'] = True
+            state.violations += len(violations)
+
+        return violations
+
+    def _associate(self, state, riders, boxes, rows, predicted, free_tracks, now):
+        """
+        Match some riders to the free tracks and update the matched tracks
+
+        Returns:
+            tuple: (rider indices left unmatched, track indices still free)
+        """
+        if not rows.size or not free_tracks:
+            return list(rows), free_tracks
+
+        iou = iou_matrix(boxes[rows], predicted[free_tracks])
+        matches = _greedy_match(iou, self.config['TRACK_IOU_THRESHOLD'])
+
+        for row, col in matches:
+            track = state.tracks[free_tracks[col]]
+            track.update(boxes[rows[row]], now)
+            riders[rows[row]]['track_id'] = track.track_id
+
+        matched_rows = {row for row, _ in matches}
+        matched_cols = {col for _, col in matches}
+        return (
+            [rows[row] for row in range(len(rows)) if row not in matched_rows],
+            [track for col, track in enumerate(free_tracks) if col not in matched_cols]
+        )
+
+    def _observe(self, track, rider, now):
+        """Update the track's no-helmet streak, True when it first qualifies as a violation"""
+        if rider.get('helmet_detected'):
+            # A helmet seen on the track clears the streak
+            track.no_helmet_since = None
+            track.no_helmet_last = None
+            return False
+
+        if rider.get('person_confidence', 0.0) < self.confidence_threshold:
+            return False
+
+        if track.no_helmet_last is None or now - track.no_helmet_last > self.max_gap:
+            track.no_helmet_since = now
+        track.no_helmet_last = now
+
+        if (track.violation_emitted or track.hits < self.config['MIN_TRACK_HITS'] or
+                now - track.no_helmet_since < self.min_duration):
+            return False
+
+        track.violation_emitted = True
+        return True
+
+    def get_tracks(self, camera_id):
+        """Live tracks of one camera with their predicted boxes"""
+        with self._lock:
+            state = self._cameras.get(camera_id)
+            tracks = list(state.tracks) if state else []
+
+        return [
+            {
+                'track_id': track.track_id,
+                'bbox': array_to_bbox(track.box),
+                'hits': track.hits,
+                'no_helmet': track.no_helmet_since is not None,
+                'violation_emitted': track.violation_emitted
+            }
+            for track in tracks
+        ]
+
+    def get_stats(self, camera_id=None):
+        """
+        Tracking counters per camera
+
+        Args:
+            camera_id: Only this camera, or every camera when None
+
+        Returns:
+            dict: camera_id -> live/created track counts and violations raised
+        """
+        with self._lock:
+            return {
+                cid: {
+                    'live_tracks': len(state.tracks),
+                    'tracks_created': state.created,
+                    'violations': state.violations
+                }
+                for cid, state in self._cameras.items()
+                if camera_id is None or cid == camera_id
+            }
@@ -5,9 +5,10 @@ import numpy as np
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, ANY
 import json
 import time
+from datetime import datetime, timedelta
 
 class HelmetDetectionTestCase(TestCase):
     """Test cases for helmet detection functionality"""
@@ -208,7 +209,9 @@ class FileHandlerTestCase(TestCase):
     def setUp(self):
         """Set up file handler"""
         from .utils.file_handler import FileHandler
-        self.file_handler = FileHandler()
+        from .utils.media_store import MediaStore
+        self.media_dir = tempfile.TemporaryDirectory()
+        self.file_handler = FileHandler(media_store=MediaStore(self.media_dir.name))
         self.test_image_path = None
     
     def create_test_image(self):
@@ -231,6 +234,25 @@ class FileHandlerTestCase(TestCase):
         except Exception as e:
             self.fail(f"Failed to load image: {e}")
     
+    def test_read_uploaded_image(self):
+        """Test decoding upload into a frame and persisting it in the background"""
+        test_image = self.create_test_image()
+        
+        with open(test_image, 'rb') as img_file:
+            uploaded_file = SimpleUploadedFile("frame.jpg", img_file.read(), content_type="image/jpeg")
+        
+        frame = self.file_handler.read_uploaded_image(uploaded_file, 'test_camera')
+        try:
+            self.assertEqual(frame.shape, (100, 100, 3))
+            self.assertEqual(frame.camera_id, 'test_camera')
+            
+            saved_path = frame.wait_persisted(timeout=5)
+            self.assertTrue(os.path.exists(saved_path))
+            with open(saved_path, 'rb') as saved, open(test_image, 'rb') as original:
+                self.assertEqual(saved.read(), original.read())
+        finally:
+            self.file_handler.delete_file(frame.path)
+    
     def test_resize_image(self):
         """Test image resizing"""
         test_image = self.create_test_image()
@@ -245,6 +267,7 @@ class FileHandlerTestCase(TestCase):
     
     def tearDown(self):
         """Clean up"""
+        self.media_dir.cleanup()
         if self.test_image_path and os.path.exists(self.test_image_path):
             try:
                 os.unlink(self.test_image_path)
@@ -283,7 +306,1696 @@ class ModelTrainingTestCase(TestCase):
         except Exception as e:
             self.skipTest(f"Training check failed: {e}")
 
+class BatchInferenceTestCase(TestCase):
+    """Test cases for dynamic micro-batching"""
+    
+    def setUp(self):
+        """Set up batching service around a fake detector"""
+        from .ai_models.batch_inference import BatchInferenceService
+        
+        self.detector = MagicMock()
+        self.detector._empty_result.return_value = {'person_detected': False}
+        self.detector.detect_batch.side_effect = lambda images: [
+            {'person_detected': True, 'mean_pixel': float(image.mean())} for image in images
+        ]
+        self.service = BatchInferenceService(self.detector, max_batch_size=4, max_wait_ms=200)
+    
+    def test_concurrent_requests_share_forward_pass(self):
+        """Concurrent callers are batched and each gets its own result"""
+        import threading
+        
+        results = {}
+        
+        def worker(value):
+            image = np.full((32, 32, 3), value, dtype=np.uint8)
+            results[value] = self.service.detect(image, timeout=5)
+        
+        threads = [threading.Thread(target=worker, args=(value,)) for value in (10, 20, 30, 40)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(self.detector.detect_batch.call_count, 1)
+        for value, result in results.items():
+            self.assertEqual(result['mean_pixel'], float(value))
+        
+        stats = self.service.get_stats()
+        self.assertEqual(stats['total_frames'], 4)
+        self.assertEqual(stats['batch_size_histogram'], {'4': 1})
+    
+    def test_unreadable_image_returns_empty_result(self):
+        """Missing files resolve immediately without reaching the model"""
+        result = self.service.detect('/nonexistent/frame.jpg', timeout=5)
+        self.assertEqual(result, {'person_detected': False})
+        self.detector.detect_batch.assert_not_called()
+    
+    def tearDown(self):
+        """Stop the batching worker"""
+        self.service.stop()
+
+class InferenceBackendParityTestCase(TestCase):
+    """Exported CPU backends must reproduce the torch model's boxes and classes"""
+    
+    def setUp(self):
+        """Locate weights and sample frames"""
+        import importlib.util
+        from .config.model_config import MODEL_CONFIG
+        from .management.commands.export_helmet_model import Command
+        
+        if importlib.util.find_spec('ultralytics') is None:
+            self.skipTest("ultralytics not installed")
+        
+        self.weights = MODEL_CONFIG['PATHS']['MODELS']['HELMET_DETECTION']
+        if not self.weights.exists():
+            self.skipTest(f"Helmet weights not found at {self.weights}")
+        
+        self.images = Command()._default_images(limit=5)
+        if not self.images:
+            self.skipTest("No sample frames available")
+    
+    def _assert_parity(self, backend_name):
+        """Compare one exported backend against torch on the sample frames"""
+        import importlib.util
+        import shutil
+        from pathlib import Path
+        from .ai_models.inference_backends import get_backend, compare_backend_outputs
+        
+        # Export next to a copy of the weights, never next to the live ones
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        weights_copy = Path(tmp_dir.name) / self.weights.name
+        
+        backend = get_backend(backend_name, weights_copy)
+        if importlib.util.find_spec(backend.runtime_module) is None:
+            self.skipTest(f"{backend.runtime_module} not installed")
+        shutil.copy(self.weights, weights_copy)
+        backend.export()
+        
+        reference = get_backend('torch', self.weights, 'cpu').load()
+        candidate = backend.load()
+        
+        for image in self.images:
+            report = compare_backend_outputs(
+                reference(image, conf=0.5, iou=0.45)[0],
+                candidate(image, conf=0.5, iou=0.45)[0]
+            )
+            self.assertTrue(report['match'], f"{backend_name} differs from torch on {image}: {report}")
+    
+    def test_onnx_matches_torch(self):
+        self._assert_parity('onnx')
+    
+    def test_openvino_matches_torch(self):
+        self._assert_parity('openvino')
+
+class ModelQuantizationTestCase(TestCase):
+    """Test the INT8 accuracy gate"""
+    
+    def setUp(self):
+        """Point the quantizer at temporary weights"""
+        from pathlib import Path
+        from .training.model_quantizer import ModelQuantizer
+        
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.quantizer = ModelQuantizer()
+        self.quantizer.weights_dir = self.tmp_dir
+        self.quantizer.staging_dir = self.tmp_dir / 'quantization'
+        self.quantizer.fp32_model_path = self.tmp_dir / 'helmet_detection.pt'
+        self.quantizer.fp32_model_path.write_bytes(b'weights')
+        
+        self.candidate = self.tmp_dir / 'candidate_int8.onnx'
+        self.candidate.write_bytes(b'int8')
+    
+    def _quantize(self, fp32_map50, int8_map50):
+        with patch.object(self.quantizer, '_verify_inputs'), \
+                patch.object(self.quantizer, '_save_report'), \
+                patch.object(self.quantizer, '_quantize_onnx', return_value=self.candidate), \
+                patch.object(self.quantizer, '_validate', side_effect=[fp32_map50, int8_map50]):
+            return self.quantizer.quantize(quant_format='onnx', max_map50_drop=0.01)
+    
+    def test_rejects_large_map_drop(self):
+        report = self._quantize(0.80, 0.75)
+        self.assertFalse(report['passed'])
+        self.assertFalse(report['promoted'])
+        self.assertFalse((self.tmp_dir / 'helmet_detection_int8.onnx').exists())
+    
+    def test_promotes_within_delta(self):
+        report = self._quantize(0.80, 0.795)
+        self.assertTrue(report['promoted'])
+        self.assertEqual((self.tmp_dir / 'helmet_detection_int8.onnx').read_bytes(), b'int8')
+    
+    def test_onnx_int8_model_takes_batches(self):
+        """The quantized ONNX model keeps a dynamic batch axis, so dynamic batching can feed it"""
+        import importlib.util
+        import unittest
+        from .ai_models.inference_backends import OnnxRuntimeBackend
+        
+        if importlib.util.find_spec('onnx') is None or importlib.util.find_spec('onnxruntime') is None:
+            raise unittest.SkipTest('onnx and onnxruntime are not installed')
+        import onnx
+        import onnxruntime
+        from onnx import TensorProto, helper, numpy_helper
+        
+        # Stand-in for the YOLO export: one conv layer, exported the way the quantizer asks for
+        def export(**kwargs):
+            batch = 'batch' if kwargs.get('dynamic') else 1
+            graph = helper.make_graph(
+                [helper.make_node('Conv', ['images', 'w'], ['output0'], pads=[1, 1, 1, 1])],
+                'stand_in',
+                [helper.make_tensor_value_info('images', TensorProto.FLOAT, [batch, 3, 32, 32])],
+                [helper.make_tensor_value_info('output0', TensorProto.FLOAT, [batch, 4, 32, 32])],
+                [numpy_helper.from_array(np.random.rand(4, 3, 3, 3).astype(np.float32), 'w')]
+            )
+            path = self.tmp_dir / 'quantization' / 'helmet_detection.onnx'
+            path.parent.mkdir(exist_ok=True)
+            onnx.save(helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)], ir_version=8), str(path))
+            return str(path)
+        
+        self.quantizer.val_images_dir = self.tmp_dir / 'val'
+        self.quantizer.val_images_dir.mkdir()
+        for index in range(4):
+            cv2.imwrite(str(self.quantizer.val_images_dir / f'{index}.jpg'), np.random.randint(0, 255, (48, 64, 3), dtype=np.uint8))
+        self.quantizer.config['IMAGE_SIZE'] = 32
+        
+        with patch('ultralytics.YOLO') as yolo:
+            yolo.return_value.export.side_effect = export
+            int8_path = self.quantizer._quantize_onnx(self.quantizer.fp32_model_path)
+        
+        session = onnxruntime.InferenceSession(str(int8_path), providers=['CPUExecutionProvider'])
+        outputs = session.run(None, {'images': np.random.rand(8, 3, 32, 32).astype(np.float32)})
+        self.assertEqual(outputs[0].shape[0], 8)
+        
+        promoted = self.quantizer._promote(int8_path, 'onnx')
+        self.assertIsNone(OnnxRuntimeBackend(self.quantizer.fp32_model_path, precision='int8').static_batch_size())
+        self.assertTrue(promoted.exists())
+    
+    def test_fixed_batch_models_get_split_batches(self):
+        """A graph with a fixed batch size gets one image per forward pass instead of failing the batch"""
+        from .ai_models.helmet_detector import HelmetDetector
+        
+        with patch.object(HelmetDetector, 'load_model'):
+            detector = HelmetDetector()
+        detector.model = MagicMock(side_effect=lambda images, **kwargs: [MagicMock(boxes=None) for _ in images])
+        detector.backend = MagicMock()
+        detector.backend.static_batch_size.return_value = 1
+        detector._check_batch_size()
+        
+        results = detector.detect_batch([np.zeros((64, 64, 3), dtype=np.uint8)] * 3)
+        
+        self.assertEqual(len(results), 3)
+        self.assertEqual(detector.model.call_count, 3)
+        self.assertTrue(all(len(call[0][0]) == 1 for call in detector.model.call_args_list))
+    
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+class RiderAssociationTestCase(TestCase):
+    """Test vectorized post-processing and per-rider helmet verdicts"""
+    
+    def setUp(self):
+        """Create a detector without loading a model"""
+        from .ai_models.helmet_detector import HelmetDetector
+        
+        with patch.object(HelmetDetector, 'load_model'):
+            self.detector = HelmetDetector()
+        self.detector.model_path = __file__  # Treat as a custom model, no simulation
+    
+    def test_every_rider_gets_a_verdict(self):
+        """Two riders on motorcycles, one helmeted, plus a pedestrian"""
+        xyxy = np.array([
+            [100, 100, 200, 400],   # rider A
+            [400, 100, 500, 400],   # rider B
+            [800, 100, 900, 400],   # pedestrian, not on a motorcycle
+            [110, 95, 190, 200],    # helmet on rider A's head
+            [80, 250, 220, 480],    # motorcycle under A
+            [380, 250, 520, 480],   # motorcycle under B
+        ])
+        conf = np.array([0.9, 0.8, 0.95, 0.85, 0.9, 0.9])
+        cls = np.array([0, 0, 0, 1, 3, 3])
+        
+        result = self.detector._build_detection_data(xyxy, conf, cls, (600, 1000, 3))
+        
+        self.assertEqual(result['rider_count'], 2)
+        self.assertEqual(result['riders_without_helmet'], 1)
+        verdicts = {rider['person_bbox']['x1']: rider['helmet_detected'] for rider in result['riders']}
+        self.assertEqual(verdicts, {100: True, 400: False})
+        self.assertAlmostEqual(result['person_confidence'], 0.95, places=5)
+        self.assertEqual(len(result['all_detections']), 6)
+    
+    def test_violation_uses_rider_verdicts(self):
+        """Any unhelmeted confident rider makes the frame a violation"""
+        from .ai_models.violation_processor import ViolationProcessor
+        
+        processor = ViolationProcessor()
+        riders = [
+            {'person_confidence': 0.9, 'helmet_detected': True},
+            {'person_confidence': 0.8, 'helmet_detected': False}
+        ]
+        self.assertTrue(processor.check_violation({'person_detected': True, 'helmet_detected': True, 'riders': riders}))
+        self.assertFalse(processor.check_violation({'person_detected': True, 'riders': riders[:1]}))
+
+class PlateReaderTestCase(TestCase):
+    """Test detector-guided plate OCR"""
+    
+    def setUp(self):
+        """Create a plate reader around a mocked EasyOCR reader"""
+        with patch('livedetection.ai_models.plate_reader.easyocr.Reader') as reader_class:
+            from .ai_models.plate_reader import PlateReader
+            self.plate_reader = PlateReader()
+        self.ocr = reader_class.return_value
+        self.ocr.readtext.return_value = []
+        self.image = np.zeros((480, 640, 3), dtype=np.uint8)
+    
+    def _helmet_result(self, *boxes):
+        return {'all_detections': [
+            {'class_name': name, 'confidence': 0.9,
+             'bbox': {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2, 'confidence': 0.9}}
+            for name, (x1, y1, x2, y2) in boxes
+        ]}
+    
+    def test_plate_box_uses_recognition_only(self):
+        """A detected plate box is read without any full-frame pass"""
+        self.ocr.recognize.return_value = [(None, 'GJ05AB1234', 0.9)]
+        
+        result = self.plate_reader.detect_and_read(
+            self.image, self._helmet_result(('license_plate', (300, 400, 400, 430)))
+        )
+        
+        self.assertTrue(result['plate_detected'])
+        self.assertEqual(result['plate_number'], 'GJ05AB1234')
+        self.assertEqual(result['plate_source'], 'plate_box')
+        self.assertEqual(self.ocr.recognize.call_args.kwargs['allowlist'], self.plate_reader.allowlist)
+        self.ocr.readtext.assert_not_called()
+    
+    def test_unreadable_plate_box_skips_full_frame(self):
+        """A plate box that cannot be read does not fall back to the full frame"""
+        self.ocr.recognize.return_value = []
+        
+        result = self.plate_reader.detect_and_read(
+            self.image, self._helmet_result(('license_plate', (300, 400, 400, 430)))
+        )
+        
+        self.assertFalse(result['plate_detected'])
+        self.ocr.readtext.assert_not_called()
+    
+    def test_full_frame_fallback_without_plate_box(self):
+        """Without detector boxes the full-frame passes still run"""
+        self.plate_reader.detect_and_read(self.image, self._helmet_result())
+        
+        self.assertEqual(self.ocr.readtext.call_args_list[0].args[0].shape, self.image.shape)
+    
+    def test_cascade_learns_variant_order_per_camera(self):
+        """The variant that succeeds for a camera is tried first next time"""
+        def read_variant(name, gray):
+            if name != 'otsu':
+                return None
+            return {'text': 'GJ05AB1234', 'confidence': 0.95, 'bbox': {}, 'variant': name}
+        
+        with patch.object(self.plate_reader, '_read_variant', side_effect=read_variant):
+            result = self.plate_reader._preprocessed_detection(self.image, 'CAM001')
+        
+        self.assertEqual(result['ocr_variant'], 'otsu')
+        self.assertEqual(self.plate_reader.variant_order('CAM001')[0], 'otsu')
+        self.assertEqual(self.plate_reader.variant_order('CAM002')[0], 'gray')
+    
+    def test_cascade_honours_time_budget(self):
+        """Slow variants are abandoned once the frame budget is spent"""
+        def slow_variant(name, gray):
+            time.sleep(0.5)
+            return None
+        
+        with patch.object(self.plate_reader, '_read_variant', side_effect=slow_variant):
+            started = time.monotonic()
+            result = self.plate_reader._preprocessed_detection(self.image, 'CAM001', time.monotonic() + 0.1)
+        
+        self.assertFalse(result['plate_detected'])
+        self.assertLess(time.monotonic() - started, 0.4)
+    
+    def _cascade_reader(self, **cascade):
+        """Plate reader whose cascade pool is sized from the given CASCADE settings"""
+        from .config.model_config import MODEL_CONFIG
+        
+        with patch.dict(MODEL_CONFIG['PLATE_RECOGNITION']['CASCADE'], cascade), \
+                patch('livedetection.ai_models.plate_reader.easyocr.Reader'):
+            from .ai_models.plate_reader import PlateReader
+            plate_reader = PlateReader()
+            plate_reader.cascade_config = dict(plate_reader.cascade_config)
+        return plate_reader
+    
+    def test_overrunning_variants_do_not_delay_the_next_frame(self):
+        """Variants left running by a spent budget neither block the next frame nor let queued ones start"""
+        plate_reader = self._cascade_reader(MAX_WORKERS=2, MAX_OVERRUNNING=4)
+        starts = []
+        
+        def slow_variant(name, gray):
+            starts.append(time.monotonic())
+            time.sleep(0.5)
+            return None
+        
+        with patch.object(plate_reader, '_read_variant', side_effect=slow_variant):
+            plate_reader._preprocessed_detection(self.image, 'CAM001', time.monotonic() + 0.1)
+            self.assertEqual(plate_reader.get_cascade_stats()['overrunning_variants'], 2)
+            
+            second_started = time.monotonic()
+            plate_reader._preprocessed_detection(self.image, 'CAM001', time.monotonic() + 0.1)
+            time.sleep(0.6)
+        
+        # Two workers per frame: the other variants of each frame were never run
+        self.assertEqual(len(starts), 4)
+        self.assertLess(max(starts[2:]) - second_started, 0.05)
+        self.assertEqual(plate_reader.get_cascade_stats()['overrunning_variants'], 0)
+    
+    def test_consecutive_overruns_are_capped(self):
+        """Frames arriving while MAX_OVERRUNNING variants are still in flight skip the cascade"""
+        import threading
+        
+        plate_reader = self._cascade_reader(MAX_WORKERS=2, MAX_OVERRUNNING=2)
+        lock = threading.Lock()
+        running = []
+        peak = []
+        
+        def slow_variant(name, gray):
+            with lock:
+                running.append(name)
+                peak.append(len(running))
+            time.sleep(0.5)
+            with lock:
+                running.remove(name)
+            return None
+        
+        with patch.object(plate_reader, '_read_variant', side_effect=slow_variant):
+            for _ in range(10):
+                plate_reader._preprocessed_detection(self.image, 'CAM001', time.monotonic() + 0.05)
+            stats = plate_reader.get_cascade_stats()
+            time.sleep(0.6)
+        
+        self.assertEqual(len(peak), 2)
+        self.assertLessEqual(max(peak), 2)
+        self.assertEqual(stats['overrunning_variants'], 2)
+        self.assertEqual(stats['overrun_skips'], 9)
+        
+        # Once the overrunning variants finish the cascade runs again
+        with patch.object(plate_reader, '_read_variant', return_value=None) as read_variant:
+            plate_reader._preprocessed_detection(self.image, 'CAM001', time.monotonic() + 0.5)
+        self.assertTrue(read_variant.called)
+        self.assertEqual(plate_reader.get_cascade_stats()['overrun_skips'], 9)
+
 # Performance Tests
+class ModelServerTestCase(TestCase):
+    """Test the shared model server and its client over a Unix socket"""
+    
+    def setUp(self):
+        from .ai_models.model_server import ModelServer, ModelClient
+        import itertools
+        import threading
+        
+        self.temp_dir = tempfile.mkdtemp()
+        socket_path = os.path.join(self.temp_dir, 'models.sock')
+        
+        # Stand-in replicas so no models are loaded
+        self.replicas = []
+        for replica_id in range(2):
+            replica = MagicMock()
+            replica.requests_served = 0
+            replica.detect.side_effect = lambda frame, rid=replica_id: {
+                'replica': rid, 'shape': list(frame.shape), 'camera_id': frame.camera_id
+            }
+            replica.get_stats.return_value = {'replica_id': replica_id}
+            self.replicas.append(replica)
+        
+        self.server = ModelServer(socket_path=socket_path, replicas=2, authkey=b'test')
+        self.server.replicas = self.replicas
+        self.server._replica_cycle = itertools.cycle(self.replicas)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        
+        for _ in range(50):
+            if self.server._running:
+                break
+            time.sleep(0.05)
+        
+        self.client = ModelClient(socket_path=socket_path, authkey=b'test', timeout=5)
+    
+    def tearDown(self):
+        self.server.shutdown()
+    
+    def test_requests_round_robin_across_replicas(self):
+        """Frames reach the replicas decoded, alternating between them"""
+        from .utils.frame import Frame
+        
+        frame = Frame(np.zeros((48, 64, 3), dtype=np.uint8), camera_id='CAM_1')
+        results = [self.client.detect(frame) for _ in range(4)]
+        
+        self.assertEqual([r['replica'] for r in results], [0, 1, 0, 1])
+        self.assertEqual(results[0]['shape'], [48, 64, 3])
+        self.assertEqual(results[0]['camera_id'], 'CAM_1')
+        self.assertEqual(len(self.client.get_stats()['replicas']), 2)
+    
+    def test_server_errors_reach_the_client(self):
+        """A failing replica raises on the client instead of hanging it"""
+        self.replicas[0].detect.side_effect = ValueError('bad frame')
+        
+        with self.assertRaises(RuntimeError):
+            self.client.detect(np.zeros((8, 8, 3), dtype=np.uint8))
+        self.assertEqual(self.client.ping()['replicas'], 2)
+    
+    def test_timeout_is_not_retried(self):
+        """A slow request raises TimeoutError after one wait and is sent to the server only once"""
+        from .ai_models.model_server import ModelClient
+        
+        self.replicas[0].detect.side_effect = lambda frame: time.sleep(1.0) or {}
+        client = ModelClient(socket_path=self.server.socket_path, authkey=b'test', timeout=0.3)
+        
+        started = time.time()
+        with self.assertRaises(TimeoutError):
+            client.detect(np.zeros((8, 8, 3), dtype=np.uint8))
+        self.assertLess(time.time() - started, 0.9)
+        time.sleep(1.0)
+        self.assertEqual(self.replicas[0].detect.call_count + self.replicas[1].detect.call_count, 1)
+        self.assertEqual(client.ping()['replicas'], 2)
+    
+    def test_server_refuses_unsafe_startup(self):
+        """No authkey, a shared directory or a live socket stops startup; the live socket is left alone"""
+        from .ai_models.model_server import ModelServer
+        
+        with self.assertRaises(ValueError):
+            ModelServer(socket_path=self.server.socket_path, authkey=b'')
+        
+        second = ModelServer(socket_path=self.server.socket_path, replicas=1, authkey=b'test')
+        second.replicas = [MagicMock()]
+        with self.assertRaises(RuntimeError):
+            second.serve_forever()
+        self.assertEqual(self.client.ping()['replicas'], 2)
+        
+        shared_dir = tempfile.mkdtemp()
+        os.chmod(shared_dir, 0o777)
+        with self.assertRaises(RuntimeError):
+            ModelServer(socket_path=os.path.join(shared_dir, 'models.sock'), authkey=b'test')._prepare_socket()
+    
+    def test_default_socket_path_without_getuid(self):
+        """The default socket path resolves on platforms without os.getuid, e.g. Windows"""
+        from .ai_models import model_server
+        
+        with patch.dict(os.environ, {'XDG_RUNTIME_DIR': '', 'USERNAME': 'sentra'}), \
+                patch.object(model_server.os, 'getuid'):
+            del model_server.os.getuid
+            path = model_server.default_socket_path()
+        
+        self.assertEqual(path, os.path.join(tempfile.gettempdir(), 'sentra-sentra', 'sentra-model-server.sock'))
+
+class LazyModelLoadingTestCase(TestCase):
+    """Test that models and heavy modules load on first use only"""
+    
+    def test_views_import_without_heavy_modules(self):
+        """Importing the views must not pull in torch, ultralytics or easyocr"""
+        import subprocess
+        import sys
+        
+        script = (
+            "import sys, django; django.setup(); import livedetection.views; "
+            "print('HEAVY=' + ','.join(m for m in ('torch', 'ultralytics', 'easyocr') if m in sys.modules))"
+        )
+        completed = subprocess.run(
+            [sys.executable, '-c', script],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'server.settings'},
+            capture_output=True, text=True, timeout=120
+        )
+        
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        self.assertIn('HEAVY=\n', completed.stdout)
+    
+    def test_registry_creates_each_model_once(self):
+        """Concurrent first requests share one instance"""
+        from . import model_registry
+        from concurrent.futures import ThreadPoolExecutor
+        
+        factory = MagicMock(side_effect=lambda: object())
+        with patch.dict(model_registry._instances, clear=True):
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                instances = list(pool.map(lambda _: model_registry._get_or_create('dummy', factory), range(16)))
+            
+            self.assertEqual(factory.call_count, 1)
+            self.assertEqual(len({id(instance) for instance in instances}), 1)
+            self.assertEqual(model_registry.loaded_models(), ['dummy'])
+
+class DetectionJobQueueTestCase(TestCase):
+    """Test asynchronous detection jobs, retries and backpressure"""
+    
+    class InMemoryDetections:
+        """Stands in for DatabaseHandler's helmet_detections updates"""
+        
+        def __init__(self):
+            self.records = {}
+        
+        def update_detection(self, detection_id, fields, push=None):
+            record = self.records.setdefault(detection_id, {})
+            record.update(fields)
+            for key, value in (push or {}).items():
+                record.setdefault(key, []).append(value)
+            return True
+    
+    def setUp(self):
+        from .utils.frame import Frame
+        
+        self.db = self.InMemoryDetections()
+        self.pipeline = MagicMock()
+        self.pipeline.process.side_effect = lambda frame, camera_id, detection_id=None, save=True: {
+            'detection_id': detection_id, 'camera_id': camera_id, 'is_violation': False
+        }
+        self.frame = Frame(np.zeros((32, 32, 3), dtype=np.uint8), camera_id='CAM_1', path='/tmp/frame.jpg')
+    
+    def make_queue(self, **kwargs):
+        from .pipeline import DetectionJobQueue
+        
+        job_queue = DetectionJobQueue(self.pipeline, self.db, retry_backoff_seconds=0, **kwargs)
+        job_queue.start()
+        self.addCleanup(job_queue.stop)
+        return job_queue
+    
+    def wait_for(self, detection_id, status):
+        for _ in range(100):
+            if self.db.records.get(detection_id, {}).get('processing_status') == status:
+                return self.db.records[detection_id]
+            time.sleep(0.02)
+        self.fail(f"{detection_id} never reached {status}: {self.db.records.get(detection_id)}")
+    
+    def test_job_completes_and_records_result(self):
+        """Enqueue returns at once and the record ends up completed"""
+        detection_id = self.make_queue().enqueue(self.frame, 'CAM_1')
+        
+        record = self.wait_for(detection_id, 'completed')
+        self.assertEqual(record['attempts'], 1)
+        self.assertEqual(record['original_image'], '/tmp/frame.jpg')
+        self.pipeline.process.assert_called_once_with(self.frame, 'CAM_1', detection_id=detection_id, save=False)
+    
+    def test_failures_are_retried_then_recorded(self):
+        """Each failed attempt is pushed to errors; the last one marks the job failed"""
+        self.pipeline.process.side_effect = RuntimeError('OCR crashed')
+        job_queue = self.make_queue(max_retries=1)
+        detection_id = job_queue.enqueue(self.frame, 'CAM_1')
+        
+        record = self.wait_for(detection_id, 'failed')
+        self.assertEqual(record['attempts'], 2)
+        self.assertEqual(len(record['errors']), 2)
+        self.assertEqual(job_queue.get_stats()['retries'], 1)
+    
+    def test_full_queue_applies_backpressure(self):
+        """Once max_depth jobs wait, enqueue raises QueueFullError"""
+        import threading
+        from .pipeline import QueueFullError
+        
+        release = threading.Event()
+        self.pipeline.process.side_effect = lambda *args, **kwargs: release.wait(5) and {}
+        job_queue = self.make_queue(workers=1, max_depth=2)
+        self.addCleanup(release.set)  # Runs before the queue is stopped
+        
+        first = job_queue.enqueue(self.frame, 'CAM_1')
+        self.wait_for(first, 'processing')
+        job_queue.enqueue(self.frame, 'CAM_1')
+        job_queue.enqueue(self.frame, 'CAM_1')
+        
+        with self.assertRaises(QueueFullError):
+            job_queue.enqueue(self.frame, 'CAM_1')
+        self.assertEqual(job_queue.get_stats()['rejected'], 1)
+
+class StreamIngestionTestCase(TestCase):
+    """Test camera stream sampling with a local video file standing in for RTSP"""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.video_path = os.path.join(self.temp_dir, 'camera.avi')
+        
+        # 4 seconds at 10 fps
+        writer = cv2.VideoWriter(self.video_path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+        for index in range(40):
+            writer.write(np.full((48, 64, 3), index * 5, dtype=np.uint8))
+        writer.release()
+    
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_file_is_sampled_at_configured_fps(self):
+        """Only sampled frames are decoded and handed out as in-memory frames"""
+        from .streaming.camera_stream import CameraStreamReader
+        
+        reader = CameraStreamReader('CAM_TEST', self.video_path, sample_fps=2, loop_files=False, pace_files=False)
+        reader.start()
+        
+        frames = []
+        while not reader.finished or reader._latest.qsize():
+            frame = reader.read(timeout=0.5)
+            if frame is not None:
+                frames.append(frame)
+        reader.stop()
+        
+        stats = reader.get_stats()
+        self.assertEqual(stats['frames_read'], 40)
+        self.assertEqual(stats['frames_sampled'], 8)
+        self.assertEqual(len(frames) + stats['frames_dropped'], 8)
+        self.assertTrue(all(frame.camera_id == 'CAM_TEST' and frame.path is None for frame in frames))
+    
+    def test_unreachable_stream_backs_off(self):
+        """A stream that cannot be opened is retried with a growing delay"""
+        from .streaming.camera_stream import CameraStreamReader
+        
+        reader = CameraStreamReader('CAM_TEST', 'rtsp://127.0.0.1:1/none', reconnect_initial_seconds=0.01)
+        with patch.object(reader, '_open', return_value=False), patch.object(reader, '_backoff') as backoff:
+            backoff.side_effect = lambda delay: reader._stop.set() if backoff.call_count >= 4 else None
+            reader._run()
+        
+        delays = [call.args[0] for call in backoff.call_args_list]
+        self.assertEqual(delays, [0.01, 0.02, 0.04, 0.08])
+        self.assertIn('Could not open', reader.get_stats()['last_error'])
+
+class MotionGateTestCase(TestCase):
+    """Test that static frames are gated out before detection"""
+    
+    def setUp(self):
+        from .config.settings import CONFIG
+        from .streaming.motion_gate import MotionGate
+        
+        self.gate = MotionGate({**CONFIG['MOTION_GATE'], 'HOLD_FRAMES': 0, 'MAX_SKIP_SECONDS': 3600, 'LOG_EVERY': 1000})
+        self.background = np.full((360, 640, 3), 90, dtype=np.uint8)
+    
+    def frame(self, image, camera_id='CAM_1'):
+        from .utils.frame import Frame
+        return Frame(image, camera_id=camera_id)
+    
+    def test_static_scene_is_skipped_and_motion_passes(self):
+        """Only frames with enough changed pixels reach the detector"""
+        decisions = [self.gate.evaluate(self.frame(self.background.copy())) for _ in range(10)]
+        self.assertEqual(decisions[0]['reason'], 'first_frame')
+        self.assertTrue(all(d['reason'] == 'static' for d in decisions[1:]))
+        
+        moving = self.background.copy()
+        cv2.rectangle(moving, (200, 100), (300, 300), (255, 255, 255), -1)  # A rider enters
+        decision = self.gate.evaluate(self.frame(moving))
+        self.assertTrue(decision['process'])
+        self.assertEqual(decision['reason'], 'motion')
+        
+        stats = self.gate.get_stats()['CAM_1']
+        self.assertEqual(stats['skipped'], 9)
+        self.assertEqual(stats['passed'], 2)
+    
+    def test_per_camera_threshold_and_scene_change(self):
+        """A camera's own threshold applies; a global change relearns the background"""
+        self.gate.set_threshold('CAM_2', 0.5)
+        self.gate.evaluate(self.frame(self.background.copy(), 'CAM_2'))
+        
+        moving = self.background.copy()
+        cv2.rectangle(moving, (200, 100), (300, 300), (255, 255, 255), -1)
+        self.assertFalse(self.gate.evaluate(self.frame(moving, 'CAM_2'))['process'])
+        
+        lights_on = np.full_like(self.background, 200)
+        self.assertEqual(self.gate.evaluate(self.frame(lights_on, 'CAM_2'))['reason'], 'scene_change')
+        self.assertEqual(self.gate.evaluate(self.frame(lights_on, 'CAM_2'))['reason'], 'static')
+    
+    def test_mog2_static_scene_is_skipped(self):
+        """The MOG2 subtractor is seeded by the first frame and survives a scene change"""
+        from .config.settings import CONFIG
+        from .streaming.motion_gate import MotionGate
+        
+        gate = MotionGate({**CONFIG['MOTION_GATE'], 'METHOD': 'mog2', 'HOLD_FRAMES': 0, 'MAX_SKIP_SECONDS': 3600, 'LOG_EVERY': 1000})
+        reasons = [gate.evaluate(self.frame(self.background.copy()))['reason'] for _ in range(8)]
+        self.assertEqual(reasons, ['first_frame'] + ['static'] * 7)
+        
+        moving = self.background.copy()
+        cv2.rectangle(moving, (200, 100), (300, 300), (255, 255, 255), -1)
+        self.assertEqual(gate.evaluate(self.frame(moving))['reason'], 'motion')
+        
+        lights_on = np.full_like(self.background, 200)
+        self.assertEqual(gate.evaluate(self.frame(lights_on))['reason'], 'scene_change')
+        self.assertEqual(gate.evaluate(self.frame(lights_on))['reason'], 'static')
+        self.assertEqual(gate.get_stats('CAM_1')['CAM_1']['scene_changes'], 1)
+    
+    def test_pipeline_skips_gated_frames(self):
+        """A gated frame never reaches the detector"""
+        from .pipeline import DetectionPipeline
+        
+        pipeline = DetectionPipeline(MagicMock(), MagicMock(), motion_gate=self.gate)
+        self.gate.evaluate(self.frame(self.background.copy()))
+        
+        with patch('livedetection.pipeline.model_registry') as registry:
+            self.assertIsNone(pipeline.process(self.frame(self.background.copy()), 'CAM_1'))
+            registry.get_helmet_detector.assert_not_called()
+            registry.get_batch_inference.assert_not_called()
+
+class RiderTrackerTestCase(TestCase):
+    """Test that a rider on a stream raises one violation, not one per frame"""
+    
+    def setUp(self):
+        from .streaming.rider_tracker import RiderTracker
+        
+        self.tracker = RiderTracker()
+        self.start = datetime(2025, 1, 1, 9, 0, 0)
+    
+    def rider(self, x, helmet=False, confidence=0.9):
+        return {
+            'person_bbox': {'x1': x, 'y1': 100, 'x2': x + 80, 'y2': 300},
+            'person_confidence': confidence,
+            'helmet_detected': helmet
+        }
+    
+    def test_one_violation_per_track_after_minimum_duration(self):
+        """A no-helmet rider is flagged once, after MINIMUM_DETECTION_DURATION seconds"""
+        violations = []
+        for step in range(12):  # 6 seconds at 2 fps, rider moving right
+            riders = [self.rider(100 + 10 * step)]
+            violations.append(self.tracker.update('CAM_1', riders, self.start + timedelta(seconds=step / 2)))
+            self.assertEqual(riders[0]['track_id'], 'CAM_1_T1')
+        
+        flagged = [step for step, tracks in enumerate(violations) if tracks]
+        self.assertEqual(flagged, [4])  # 2 seconds after the first sighting
+        self.assertEqual(self.tracker.get_stats('CAM_1')['CAM_1']['violations'], 1)
+    
+    def test_helmeted_rider_and_separate_tracks(self):
+        """Helmeted riders never violate; distant riders get their own tracks"""
+        for step in range(8):
+            riders = [self.rider(100, helmet=True), self.rider(500)]
+            self.tracker.update('CAM_1', riders, self.start + timedelta(seconds=step))
+        
+        self.assertEqual([r['track_id'] for r in riders], ['CAM_1_T1', 'CAM_1_T2'])
+        tracks = {track['track_id']: track for track in self.tracker.get_tracks('CAM_1')}
+        self.assertFalse(tracks['CAM_1_T1']['violation_emitted'])
+        self.assertTrue(tracks['CAM_1_T2']['violation_emitted'])
+    
+    def test_track_expires_after_gap(self):
+        """A rider gone for longer than MAXIMUM_GAP_BETWEEN_DETECTIONS comes back as a new track"""
+        self.tracker.update('CAM_1', [self.rider(100)], self.start)
+        riders = [self.rider(100)]
+        self.tracker.update('CAM_1', riders, self.start + timedelta(seconds=30))
+        self.assertEqual(riders[0]['track_id'], 'CAM_1_T2')
+
+class PlateVotingTestCase(TestCase):
+    """Test that tracked plates are OCR'd a few times and voted per character"""
+    
+    def test_character_vote_overrides_single_misread(self):
+        """One misread character is outvoted by the other reads"""
+        from .streaming.plate_voter import vote_plate
+        
+        plate, confidence = vote_plate([('KA01AB1234', 0.9), ('KA01A81234', 0.7), ('KA01AB1234', 0.8)])
+        self.assertEqual(plate, 'KA01AB1234')
+        self.assertAlmostEqual(confidence, 1.7 / 3)
+        self.assertEqual(vote_plate([]), ('', 0.0))
+    
+    def test_pipeline_stops_ocr_once_plate_settles(self):
+        """OCR runs until the vote is confident, and the voted plate reaches the memo"""
+        from .pipeline import DetectionPipeline
+        from .streaming.plate_voter import PlateVoter
+        from .streaming.rider_tracker import RiderTracker
+        from .utils.frame import Frame
+        
+        image = np.random.RandomState(0).randint(0, 255, (480, 640, 3), dtype=np.uint8)
+        start = datetime(2025, 1, 1, 9, 0, 0)
+        
+        def detect(frame):
+            return {
+                'riders': [{
+                    'person_bbox': {'x1': 200, 'y1': 100, 'x2': 300, 'y2': 350},
+                    'person_confidence': 0.9,
+                    'helmet_detected': False,
+                    'motorcycle_bbox': {'x1': 180, 'y1': 250, 'x2': 330, 'y2': 460}
+                }],
+                'all_detections': [{
+                    'class_name': 'license_plate',
+                    'bbox': {'x1': 230, 'y1': 400, 'x2': 290, 'y2': 440, 'confidence': 0.8}
+                }]
+            }
+        
+        plate_reader = MagicMock()
+        plate_reader.read_plate_crop.return_value = ('KA01AB1234', 0.9)
+        violation_processor = MagicMock()
+        
+        pipeline = DetectionPipeline(
+            violation_processor, MagicMock(),
+            tracker=RiderTracker(), plate_voter=PlateVoter(plate_reader=plate_reader),
+            evidence_writer=MagicMock()
+        )
+        with patch('livedetection.pipeline.model_registry') as registry:
+            registry.get_batch_inference.return_value = None
+            registry.get_helmet_detector.return_value.detect.side_effect = detect
+            results = [
+                pipeline.process(Frame(image, camera_id='CAM_1', timestamp=start + timedelta(seconds=step / 2)), 'CAM_1')
+                for step in range(10)
+            ]
+            registry.get_plate_reader.return_value.detect_and_read.assert_not_called()
+        
+        self.assertEqual(plate_reader.read_plate_crop.call_count, 2)  # MIN_READS, then settled
+        self.assertEqual(sum(1 for r in results if r['is_violation']), 1)
+        memo_input = violation_processor.generate_violation_memo.call_args[0][0]
+        self.assertEqual(memo_input['plate_number'], 'KA01AB1234')
+        self.assertEqual(memo_input['plate_source'], 'track_vote')
+    
+    def test_memo_waits_for_plate_to_settle(self):
+        """A violation raised before the plate is readable gets its memo once the vote settles"""
+        from .pipeline import DetectionPipeline
+        from .streaming.plate_voter import PlateVoter
+        from .streaming.rider_tracker import RiderTracker
+        from .utils.frame import Frame
+        
+        image = np.random.RandomState(0).randint(0, 255, (480, 640, 3), dtype=np.uint8)
+        start = datetime(2025, 1, 1, 9, 0, 0)
+        rider = {
+            'person_bbox': {'x1': 200, 'y1': 100, 'x2': 300, 'y2': 350},
+            'person_confidence': 0.9,
+            'helmet_detected': False,
+            'motorcycle_bbox': {'x1': 180, 'y1': 250, 'x2': 330, 'y2': 460}
+        }
+        plate = {'class_name': 'license_plate', 'bbox': {'x1': 230, 'y1': 400, 'x2': 290, 'y2': 440, 'confidence': 0.8}}
+        
+        plate_reader = MagicMock()
+        plate_reader.read_plate_crop.return_value = ('KA01AB1234', 0.9)
+        plate_reader.detect_and_read.return_value = {'plate_detected': False}
+        violation_processor = MagicMock()
+        violation_processor.generate_violation_memo.return_value = {'violation_id': 'VIO1'}
+        db_handler = MagicMock()
+        evidence_writer = MagicMock()
+        
+        pipeline = DetectionPipeline(
+            violation_processor, db_handler,
+            tracker=RiderTracker(), plate_voter=PlateVoter(plate_reader=plate_reader),
+            evidence_writer=evidence_writer
+        )
+        with patch('livedetection.pipeline.model_registry') as registry:
+            registry.get_batch_inference.return_value = None
+            detector = registry.get_helmet_detector.return_value
+            results = []
+            for step in range(8):
+                # The plate only becomes visible after the violation frame (step 4)
+                detector.detect.return_value = {
+                    'riders': [dict(rider)], 'all_detections': [plate] if step >= 5 else []
+                }
+                results.append(pipeline.process(
+                    Frame(image, camera_id='CAM_1', timestamp=start + timedelta(seconds=step / 2)), 'CAM_1'
+                ))
+                if step == 4:
+                    violation_processor.generate_violation_memo.assert_not_called()
+        
+        violation = results[4]
+        self.assertTrue(violation['is_violation'])
+        self.assertEqual(violation['memo_status'], 'pending_plate')
+        self.assertNotIn('violation_memo', violation)
+        
+        violation_processor.generate_violation_memo.assert_called_once()
+        memo_input = violation_processor.generate_violation_memo.call_args[0][0]
+        self.assertEqual(memo_input['detection_id'], violation['detection_id'])
+        self.assertEqual(memo_input['plate_number'], 'KA01AB1234')
+        self.assertEqual(memo_input['plate_source'], 'track_vote')
+        
+        db_handler.update_detection.assert_called_once()
+        detection_id, fields = db_handler.update_detection.call_args[0]
+        self.assertEqual(detection_id, violation['detection_id'])
+        self.assertEqual(fields['memo_status'], 'created')
+        self.assertEqual(fields['plate_number'], 'KA01AB1234')
+        evidence_writer.link_memo.assert_called_once_with(violation['detection_id'], 'VIO1')
+
+class RegionOfInterestTestCase(TestCase):
+    """Test that models only see the camera's ROI and boxes come back in frame coordinates"""
+    
+    def setUp(self):
+        from .utils.roi import CameraRegions
+        
+        self.regions = CameraRegions(config={'ENABLED': True, 'MASK_OUTSIDE': True, 'CACHE_SECONDS': 60})
+        self.image = np.full((400, 800, 3), 255, dtype=np.uint8)
+    
+    def test_crop_mask_and_invalid_polygons(self):
+        """The crop is the polygon's bounding rectangle with the outside blacked out"""
+        from .utils.frame import Frame
+        
+        region = self.regions.set('CAM_1', [[0.25, 0.5], [0.75, 0.5], [0.75, 1.0], [0.5, 1.0]])
+        crop, offset = region.apply(Frame(self.image, camera_id='CAM_1'))
+        
+        self.assertEqual(offset, (200, 200))
+        self.assertEqual(crop.image.shape[:2], (200, 400))
+        self.assertEqual(crop.camera_id, 'CAM_1')
+        self.assertIsNone(crop.path)
+        self.assertEqual(crop.image[199, 0].tolist(), [0, 0, 0])  # Outside the polygon
+        self.assertEqual(crop.image[100, 350].tolist(), [255, 255, 255])
+        
+        self.assertIsNone(self.regions.set('CAM_2', [[0, 0], [1.5, 0], [1, 1]]))
+        self.assertIsNone(self.regions.set('CAM_2', [[0, 0], [1, 0]]))
+    
+    def test_pipeline_maps_boxes_back_to_full_frame(self):
+        """Detector and plate reader get the crop; results are shifted by the ROI offset"""
+        from .pipeline import DetectionPipeline
+        from .utils.frame import Frame
+        
+        self.regions.set('CAM_1', [[0.25, 0.5], [1.0, 0.5], [1.0, 1.0], [0.25, 1.0]])
+        helmet_bbox = {'x1': 10, 'y1': 10, 'x2': 50, 'y2': 40}
+        helmet_result = {
+            'person_bbox': {'x1': 0, 'y1': 0, 'x2': 100, 'y2': 150},
+            'helmet_bbox': helmet_bbox,
+            'riders': [{'person_bbox': {'x1': 0, 'y1': 0, 'x2': 100, 'y2': 150}, 'helmet_bbox': helmet_bbox}]
+        }
+        
+        pipeline = DetectionPipeline(MagicMock(), MagicMock(), regions=self.regions, evidence_writer=MagicMock())
+        with patch('livedetection.pipeline.model_registry') as registry:
+            registry.get_batch_inference.return_value = None
+            registry.get_helmet_detector.return_value.detect.return_value = helmet_result
+            registry.get_plate_reader.return_value.detect_and_read.return_value = {
+                'plate_detected': True, 'plate_bbox': {'x1': 5, 'y1': 100, 'x2': 60, 'y2': 120}
+            }
+            data = pipeline.process(Frame(self.image, camera_id='CAM_1'), 'CAM_1', save=False)
+            detected = registry.get_helmet_detector.return_value.detect.call_args[0][0]
+        
+        self.assertEqual(detected.image.shape[:2], (200, 600))
+        self.assertEqual(data['person_bbox']['x1'], 200)
+        self.assertEqual(data['riders'][0]['person_bbox']['y2'], 350)
+        self.assertEqual(data['helmet_bbox']['x1'], 210)  # Shared box shifted once
+        self.assertEqual(data['riders'][0]['helmet_bbox']['x1'], 210)
+        self.assertEqual(data['plate_bbox']['y1'], 300)
+
+class TiledDetectionTestCase(TestCase):
+    """Test tiled detection on wide frames with motion-aware tile skipping"""
+    
+    def setUp(self):
+        from .ai_models.helmet_detector import HelmetDetector
+        
+        with patch.object(HelmetDetector, 'load_model'):
+            self.detector = HelmetDetector()
+        self.detector.model_path = __file__
+        self.tiling = {
+            'ENABLED': True, 'TILE_SIZE': 640, 'OVERLAP': 0.2, 'MIN_FRAME_WIDTH': 1280,
+            'MIN_TILE_MOTION': 0.002, 'FULL_FRAME_PASS': True, 'MERGE_IOS_THRESHOLD': 0.6
+        }
+    
+    def result(self, xyxy, conf, cls):
+        from types import SimpleNamespace
+        
+        found = SimpleNamespace(xyxy=np.array(xyxy, dtype=np.float32), conf=np.array(conf, dtype=np.float32),
+                                cls=np.array(cls, dtype=np.float32))
+        boxes = MagicMock()
+        boxes.__len__.return_value = len(conf)
+        boxes.cpu.return_value.numpy.return_value = found
+        return SimpleNamespace(boxes=boxes)
+    
+    def test_tile_grid_and_cross_tile_nms(self):
+        """Tiles overlap and reach every edge; a box cut by a tile edge merges into the full box"""
+        from .ai_models.helmet_detector import tile_grid
+        from .utils.box_utils import nms
+        
+        tiles = tile_grid((2160, 3840, 3), 640, 0.2)
+        self.assertEqual(max(t[2] for t in tiles), 3840)
+        self.assertEqual(max(t[3] for t in tiles), 2160)
+        self.assertEqual(tile_grid((480, 640, 3), 640, 0.2), [(0, 0, 640, 480)])
+        
+        boxes = [[100, 100, 200, 300], [100, 100, 150, 300], [100, 100, 200, 300]]
+        keep = nms(boxes, [0.9, 0.8, 0.7], 0.6, classes=[0, 0, 1], metric='ios')
+        self.assertEqual(keep.tolist(), [0, 2])
+    
+    def test_still_tiles_are_skipped_and_batched_once(self):
+        """Only moving tiles plus the full frame go through one forward pass"""
+        image = np.zeros((1080, 1920, 3), dtype=np.uint8)
+        motion_mask = np.zeros((90, 160), dtype=np.uint8)
+        motion_mask[10:20, 5:15] = 255  # Motion in the top-left corner only
+        
+        calls = []
+        def model(inputs, **kwargs):
+            calls.append(len(inputs))
+            tile = self.result([[60, 80, 120, 300]], [0.8], [0])  # Distant person in the tile
+            full = self.result([[60, 80, 120, 300], [1500, 500, 1700, 900]], [0.7, 0.9], [0, 3])
+            return [tile] * (len(inputs) - 1) + [full]
+        self.detector.model = model
+        
+        result = self.detector.detect_tiled(image, self.tiling, motion_mask=motion_mask)
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(result['tiling']['tiles_run'], 1)
+        self.assertEqual(result['tiling']['tiles_run'] + result['tiling']['tiles_skipped'], result['tiling']['tiles'])
+        self.assertEqual(calls[0], 2)
+        persons = [d for d in result['all_detections'] if d['class_name'] == 'person']
+        self.assertEqual(len(persons), 1)  # Tile and full-frame boxes merged
+        self.assertAlmostEqual(persons[0]['confidence'], 0.8, places=5)
+
+class ModelCascadeTestCase(TestCase):
+    """Test that only uncertain frames reach the larger model"""
+    
+    def setUp(self):
+        from .ai_models.helmet_detector import HelmetDetector
+        from .ai_models.model_cascade import ModelCascade
+        from .config.model_config import MODEL_CONFIG
+        
+        with patch.object(HelmetDetector, 'load_model'):
+            fast = HelmetDetector()
+        fast.model_path = __file__
+        fast.model = MagicMock()
+        self.accurate = MagicMock()
+        self.accurate.detect_batch.side_effect = lambda images: [{'riders': [], 'source': 'accurate'} for _ in images]
+        self.cascade = ModelCascade(fast, self.accurate, MODEL_CONFIG['CASCADE'])
+        self.image = np.zeros((480, 640, 3), dtype=np.uint8)
+        
+        # person, helmet on the head, motorcycle
+        self.confident = (
+            np.array([[100, 100, 200, 400], [110, 95, 190, 200], [80, 250, 220, 470]], dtype=np.float32),
+            np.array([0.9, 0.85, 0.9], dtype=np.float32),
+            np.array([0, 1, 3])
+        )
+    
+    def test_confident_frame_stays_on_fast_tier(self):
+        """No borderline boxes and a helmet verdict for every rider: no escalation"""
+        self.cascade.fast.predict_arrays = MagicMock(return_value=[self.confident])
+        
+        result = self.cascade.detect(self.image)
+        
+        self.assertEqual(result['cascade'], {'tier': 'fast', 'reason': None})
+        self.assertTrue(result['riders'][0]['helmet_detected'])
+        self.accurate.detect_batch.assert_not_called()
+        self.assertEqual(self.cascade.get_stats()['escalation_rate'], 0.0)
+    
+    def test_uncertain_frames_are_escalated_in_one_batch(self):
+        """Borderline helmet boxes and undetermined riders go to the accurate model"""
+        xyxy, conf, cls = self.confident
+        borderline = (xyxy, np.array([0.9, 0.4, 0.9], dtype=np.float32), cls)  # Helmet at 0.4
+        undetermined = (xyxy[[0, 2]], conf[[0, 2]], cls[[0, 2]])  # Rider with no helmet evidence
+        self.cascade.fast.predict_arrays = MagicMock(return_value=[self.confident, borderline, undetermined])
+        
+        results = self.cascade.detect_batch([self.image] * 3)
+        
+        self.assertEqual([r['cascade']['tier'] for r in results], ['fast', 'accurate', 'accurate'])
+        self.assertEqual(self.accurate.detect_batch.call_count, 1)
+        self.assertEqual(len(self.accurate.detect_batch.call_args[0][0]), 2)
+        
+        stats = self.cascade.get_stats()
+        self.assertEqual(stats['reasons'], {'borderline_helmet': 1, 'undetermined_rider': 1})
+        self.assertAlmostEqual(stats['escalation_rate'], 2 / 3, places=3)
+
+class StageGraphTestCase(TestCase):
+    """Test concurrent stages, timeouts and per-stage timings"""
+    
+    def setUp(self):
+        from concurrent.futures import ThreadPoolExecutor
+        self.executor = ThreadPoolExecutor(max_workers=4)
+    
+    def tearDown(self):
+        self.executor.shutdown(wait=False)
+    
+    def test_independent_stages_run_concurrently(self):
+        """Two sleeping stages after a common dependency overlap"""
+        from .stage_graph import Stage, StageGraph
+        
+        def slow(value):
+            def run(results):
+                time.sleep(0.2)
+                return results['source'] + value
+            return run
+        
+        graph = StageGraph([
+            Stage('source', lambda results: 1),
+            Stage('left', slow(1), deps=('source',)),
+            Stage('right', slow(2), deps=('source',)),
+            Stage('total', lambda results: results['left'] + results['right'], deps=('left', 'right'))
+        ], executor=self.executor)
+        
+        started = time.perf_counter()
+        results, timings = graph.run()
+        
+        self.assertEqual(results['total'], 5)
+        self.assertLess(time.perf_counter() - started, 0.35)
+        self.assertEqual({timing['status'] for timing in timings.values()}, {'ok'})
+    
+    def test_timeout_and_error_use_fallbacks(self):
+        """A slow stage and a failing stage degrade instead of failing the graph"""
+        from .stage_graph import Stage, StageGraph
+        
+        def fail(results):
+            raise RuntimeError('lookup down')
+        
+        graph = StageGraph([
+            Stage('slow', lambda results: time.sleep(1) or 'late', timeout=0.1, fallback='empty'),
+            Stage('broken', fail, fallback=lambda results: {'vehicle': None}),
+            Stage('skipped', lambda results: 'ran', deps=('slow',), when=lambda results: results['slow'] != 'empty')
+        ], executor=self.executor)
+        
+        started = time.perf_counter()
+        results, timings = graph.run()
+        
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(results['slow'], 'empty')
+        self.assertEqual(results['broken'], {'vehicle': None})
+        self.assertIsNone(results['skipped'])
+        self.assertEqual(timings['slow']['status'], 'timeout')
+        self.assertEqual(timings['broken']['status'], 'error')
+        self.assertEqual(timings['skipped']['status'], 'skipped')
+    
+    def test_abandoned_stages_are_bounded(self):
+        """A stuck timed stage runs on its own pool and is shed once too many runs are still in flight"""
+        import threading
+        from .config.settings import CONFIG
+        from .stage_graph import Stage, StageGraph, abandoned_stages
+        
+        release = threading.Event()
+        graph = StageGraph([
+            Stage('stuck_ocr', lambda results: release.wait(5) and 'late', timeout=0.05, fallback={}),
+            Stage('quick', lambda results: 'ok')
+        ])
+        
+        with patch.dict(CONFIG['PIPELINE'], {'MAX_ABANDONED': 2}):
+            runs = [graph.run()[1] for _ in range(4)]
+        
+        self.assertEqual([timings['stuck_ocr']['status'] for timings in runs], ['timeout', 'timeout', 'shed', 'shed'])
+        self.assertEqual(runs[3]['stuck_ocr']['abandoned'], 2)
+        self.assertTrue(all(timings['quick']['status'] == 'ok' for timings in runs))
+        self.assertEqual(abandoned_stages()['stuck_ocr'], 2)
+        
+        release.set()
+        time.sleep(0.2)
+        self.assertNotIn('stuck_ocr', abandoned_stages())
+    
+    def test_queued_stage_timeout_is_cancelled(self):
+        """A run that times out while still queued never executes and is not counted as abandoned"""
+        from concurrent.futures import ThreadPoolExecutor
+        from .config.settings import validate_config, CONFIG
+        from .stage_graph import Stage, StageGraph, abandoned_stages
+        
+        queued_ran = []
+        executor = ThreadPoolExecutor(max_workers=1)
+        graph = StageGraph([
+            Stage('busy', lambda results: time.sleep(0.3), timeout=0.05, fallback={}),
+            Stage('queued', lambda results: queued_ran.append(True), timeout=0.05, fallback={})
+        ], executor=executor)
+        
+        timings = graph.run()[1]
+        executor.shutdown(wait=True)
+        
+        self.assertEqual(timings['queued']['status'], 'timeout')
+        self.assertEqual(timings['queued']['abandoned'], 0)
+        self.assertEqual(queued_ran, [])
+        self.assertNotIn('queued', abandoned_stages())
+        
+        # Abandoned runs holding every thread of a stage's pool is rejected
+        with patch.dict(CONFIG['PIPELINE'], {'MAX_ABANDONED': CONFIG['PIPELINE']['TIMED_STAGE_WORKERS']}):
+            with self.assertRaises(ValueError):
+                validate_config()
+    
+    def test_pipeline_records_stage_timings(self):
+        """A detector timeout still yields a saved, degraded detection record"""
+        from .pipeline import DetectionPipeline
+        from .utils.frame import Frame
+        
+        processor = MagicMock()
+        processor.check_violation.return_value = False
+        pipeline = DetectionPipeline(processor, MagicMock(), stage_timeouts={'detect': 0.1})
+        with patch('livedetection.pipeline.model_registry') as registry:
+            registry.get_batch_inference.return_value = None
+            registry.get_helmet_detector.return_value.detect.side_effect = lambda frame: time.sleep(0.5) or {}
+            registry.get_plate_reader.return_value.detect_and_read.return_value = {'plate_detected': False}
+            data = pipeline.process(Frame(np.zeros((120, 160, 3), dtype=np.uint8), camera_id='CAM_1'), 'CAM_1')
+        
+        self.assertEqual(data['degraded_stages'], ['detect'])
+        self.assertFalse(data['is_violation'])
+        self.assertEqual(data['stage_timings']['owner_lookup']['status'], 'skipped')
+        self.assertIn('total_ms', data['stage_timings'])
+        pipeline.db_handler.save_detection.assert_called_once()
+
+class EvidenceWriterTestCase(TestCase):
+    """Test that violation evidence is rendered and written off the request path"""
+    
+    def setUp(self):
+        from .ai_models.violation_processor import ViolationProcessor
+        from .utils.media_store import MediaStore
+        
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = MediaStore(self.tmp_dir.name)
+        self.processor = ViolationProcessor(media_store=self.store)
+        self.processor.set_evidence_photo = MagicMock(return_value=True)
+        self.db_handler = MagicMock()
+        self.detection_data = {
+            'detection_id': 'DET_1',
+            'camera_id': 'CAM_1',
+            'is_violation': True,
+            'riders': [{'person_bbox': {'x1': 10, 'y1': 10, 'x2': 60, 'y2': 100}, 'helmet_detected': False}]
+        }
+    
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+    
+    def test_evidence_is_written_once_and_recorded(self):
+        """The decoded frame is rendered straight into the store, then both records point at it"""
+        from .evidence_writer import EvidenceWriter
+        from .utils.frame import Frame
+        
+        writer = EvidenceWriter(self.processor, self.db_handler)
+        writer.start()
+        self.assertTrue(writer.submit(Frame(np.zeros((120, 160, 3), dtype=np.uint8)), self.detection_data, 'VIO1'))
+        writer.stop()
+        
+        fields = self.db_handler.update_detection.call_args[0][1]
+        path = fields['processed_image']
+        self.assertEqual(fields['evidence_status'], 'written')
+        self.assertEqual(cv2.imread(path).shape, (120, 160, 3))
+        # The evidence image plus its thumbnail and medium derivatives
+        self.assertEqual(sum(len(files) for _, _, files in os.walk(self.tmp_dir.name)), 3)
+        self.processor.set_evidence_photo.assert_called_once_with('VIO1', path, fields['evidence_urls'])
+        self.assertEqual(writer.get_stats()['written'], 1)
+    
+    def test_deferred_memo_is_linked_whichever_finishes_first(self):
+        """A memo created after its detection points at the evidence, before or after the write"""
+        from .evidence_writer import EvidenceWriter
+        from .utils.frame import Frame
+        
+        writer = EvidenceWriter(self.processor, self.db_handler)
+        
+        # Memo first: the writer finds it on the detection record
+        self.db_handler.get_detection.return_value = {'violation_memo': {'violation_id': 'VIO1'}}
+        writer.submit(Frame(np.zeros((120, 160, 3), dtype=np.uint8)), dict(self.detection_data, memo_status='pending_plate'))
+        path = self.db_handler.update_detection.call_args[0][1]['processed_image']
+        self.processor.set_evidence_photo.assert_called_once_with('VIO1', path, ANY)
+        
+        # Evidence first: the memo is linked when it is created
+        self.db_handler.get_detection.return_value = {'evidence_status': 'written', 'processed_image': path}
+        writer.link_memo('DET_1', 'VIO2')
+        self.processor.set_evidence_photo.assert_called_with('VIO2', path, None)
+    
+    def test_full_queue_writes_inline(self):
+        """Evidence is never dropped: without room in the queue it is written by the caller"""
+        from .evidence_writer import EvidenceWriter
+        from .utils.frame import Frame
+        
+        writer = EvidenceWriter(self.processor, self.db_handler)  # Not started
+        self.assertFalse(writer.submit(Frame(np.zeros((120, 160, 3), dtype=np.uint8)), self.detection_data))
+        
+        self.assertTrue(os.path.exists(self.db_handler.update_detection.call_args[0][1]['processed_image']))
+        self.assertEqual(writer.get_stats()['inline'], 1)
+        self.processor.set_evidence_photo.assert_not_called()
+    
+    def test_pipeline_queues_evidence_after_saving(self):
+        """The request returns without rendering; the record and memo get the evidence on completion"""
+        from .pipeline import DetectionPipeline
+        from .utils.frame import Frame
+        
+        processor = MagicMock()
+        processor.check_violation.return_value = True
+        memo_inputs = []
+        processor.generate_violation_memo.side_effect = lambda data, owner: (
+            memo_inputs.append(dict(data)) or {'status': 'success', 'violation_id': 'VIO2'}
+        )
+        calls = MagicMock()
+        pipeline = DetectionPipeline(processor, calls.db_handler, evidence_writer=calls.writer)
+        with patch('livedetection.pipeline.model_registry') as registry:
+            registry.get_batch_inference.return_value = None
+            registry.get_helmet_detector.return_value.detect.return_value = {'riders': []}
+            registry.get_plate_reader.return_value.detect_and_read.return_value = {
+                'plate_detected': True, 'plate_number': 'KA01AB1234'
+            }
+            frame = Frame(np.zeros((120, 160, 3), dtype=np.uint8), camera_id='CAM_1')
+            data = pipeline.process(frame, 'CAM_1', detection_id='DET_2')
+        
+        self.assertNotIn('processed_image', data)
+        self.assertNotIn('processed_image', memo_inputs[0])
+        processor.create_annotated_image.assert_not_called()
+        self.assertEqual([call[0] for call in calls.mock_calls], ['db_handler.save_detection', 'writer.submit'])
+        self.assertEqual(calls.writer.submit.call_args[0][2], 'VIO2')
+
+class MediaStoreTestCase(TestCase):
+    """Test the content-addressed, sharded media store"""
+    
+    def setUp(self):
+        from .utils.media_store import MediaStore
+        self.media_dir = tempfile.TemporaryDirectory()
+        self.collection = MagicMock()
+        self.store = MediaStore(self.media_dir.name, collection=self.collection)
+    
+    def tearDown(self):
+        self.media_dir.cleanup()
+    
+    def test_identical_content_is_stored_once(self):
+        """Two puts of the same bytes share one sharded file; each reference is tracked"""
+        data = cv2.imencode('.jpg', np.zeros((32, 32, 3), dtype=np.uint8))[1].tobytes()
+        
+        first = self.store.put_bytes(data, '.JPG', 'upload', refs=[('detection', 'DET_1')])
+        second = self.store.put_bytes(data, '.jpg', 'upload', refs=[('detection', 'DET_2')])
+        
+        digest = self.store.digest(data)
+        self.assertEqual(first, second)
+        self.assertEqual(self.store.key_of(first), f"store/{digest[:2]}/{digest[2:4]}/{digest}.jpg")
+        self.assertEqual(sum(len(files) for _, _, files in os.walk(self.media_dir.name)), 1)
+        self.assertEqual(self.store.digest_of(first), digest)
+        
+        refs = [call[0][1]['$addToSet']['refs']['$each'] for call in self.collection.update_one.call_args_list]
+        self.assertEqual(refs, [[{'kind': 'detection', 'id': 'DET_1'}], [{'kind': 'detection', 'id': 'DET_2'}]])
+    
+    def test_resolve_stays_inside_media_root(self):
+        """Keys and absolute paths inside the media root resolve; traversal does not"""
+        inside = os.path.join(self.media_dir.name, 'violations', 'VIO1_evidence.jpg')
+        
+        self.assertEqual(str(self.store.resolve('violations/VIO1_evidence.jpg')), os.path.realpath(inside))
+        self.assertEqual(str(self.store.resolve(inside)), os.path.realpath(inside))
+        self.assertIsNone(self.store.resolve('../settings.py'))
+        self.assertIsNone(self.store.resolve('/etc/passwd'))
+        self.assertIsNone(self.store.digest_of(inside))  # Legacy file, not a store object
+
+class MediaServingTestCase(TestCase):
+    """Test streamed media responses with Range, conditional GET and sendfile offload"""
+    
+    def setUp(self):
+        from django.test import RequestFactory
+        from .utils.media_store import MediaStore
+        
+        self.media_dir = tempfile.TemporaryDirectory()
+        self.store = MediaStore(self.media_dir.name)
+        self.data = bytes(range(256)) * 40
+        self.path = self.store.resolve(self.store.put_bytes(self.data, '.png', 'upload'))
+        self.factory = RequestFactory()
+        self.config = {
+            'SENDFILE': '', 'ACCEL_REDIRECT_PREFIX': '/protected-media/', 'CHUNK_SIZE': 1000,
+            'MAX_AGE': 60, 'IMMUTABLE_MAX_AGE': 600
+        }
+    
+    def tearDown(self):
+        self.media_dir.cleanup()
+    
+    def serve(self, config=None, **headers):
+        from .utils.media_response import media_response
+        request = self.factory.get('/media/x', **headers)
+        return media_response(request, self.path, self.store, config or self.config)
+    
+    def test_full_and_conditional_responses(self):
+        """The file is streamed with its type and validators; a matching ETag gets 304"""
+        response = self.serve()
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['ETag'], f'"{self.store.digest(self.data)}"')
+        self.assertIn('immutable', response['Cache-Control'])
+        
+        self.assertEqual(self.serve(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.serve(HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+    
+    def test_range_requests(self):
+        """Byte, open-ended and suffix ranges get 206; unsatisfiable ranges get 416"""
+        response = self.serve(HTTP_RANGE='bytes=100-2599')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-2599/{len(self.data)}')
+        self.assertEqual(b''.join(response.streaming_content), self.data[100:2600])
+        
+        self.assertEqual(b''.join(self.serve(HTTP_RANGE='bytes=-10').streaming_content), self.data[-10:])
+        self.assertEqual(b''.join(self.serve(HTTP_RANGE='bytes=10200-').streaming_content), self.data[10200:])
+        self.assertEqual(self.serve(HTTP_RANGE=f'bytes={len(self.data)}-').status_code, 416)
+        
+        # A stale If-Range gets the whole file
+        self.assertEqual(self.serve(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"').status_code, 200)
+    
+    def test_sendfile_offload(self):
+        """With X-Accel-Redirect the web server gets the media key and Django sends no body"""
+        response = self.serve(config={**self.config, 'SENDFILE': 'x-accel-redirect'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.store.key_of(self.path))
+        self.assertEqual(response['Content-Type'], 'image/png')
+
+class DerivativesTestCase(TestCase):
+    """Test thumbnail and medium derivatives of evidence images"""
+    
+    def setUp(self):
+        from .utils.media_store import MediaStore
+        self.media_dir = tempfile.TemporaryDirectory()
+        self.store = MediaStore(self.media_dir.name)
+        self.image = np.full((600, 1200, 3), 127, dtype=np.uint8)
+        data = cv2.imencode('.jpg', self.image)[1].tobytes()
+        self.path = self.store.put_bytes(data, '.jpg', 'evidence')
+    
+    def tearDown(self):
+        self.media_dir.cleanup()
+    
+    def test_derivatives_are_scaled_next_to_the_source(self):
+        """Each size is downscaled to its width, keeps the aspect ratio and sits beside the original"""
+        from .utils.derivatives import write_derivatives
+        
+        written = write_derivatives(self.image, self.path)
+        
+        self.assertEqual(set(written), {'thumbnail', 'medium'})
+        self.assertEqual(cv2.imread(written['thumbnail']).shape, (120, 240, 3))
+        self.assertEqual(cv2.imread(written['medium']).shape, (480, 960, 3))
+        for path in written.values():
+            self.assertEqual(os.path.dirname(path), os.path.dirname(self.path))
+            self.assertIsNone(self.store.digest_of(path))  # Not a content-addressed object
+    
+    def test_small_images_are_not_upscaled(self):
+        """An image narrower than a size is stored at its own resolution"""
+        from .utils.derivatives import write_derivatives
+        
+        small = np.zeros((50, 100, 3), dtype=np.uint8)
+        written = write_derivatives(small, self.path, sizes={'thumbnail': {'MAX_WIDTH': 240, 'QUALITY': 70}})
+        
+        self.assertEqual(cv2.imread(written['thumbnail']).shape, (50, 100, 3))
+    
+    def test_urls_only_for_existing_derivatives(self):
+        """Missing derivatives get an empty URL so list pages fall back to the full image"""
+        from .utils.derivatives import derivative_urls, write_derivatives
+        
+        urls = derivative_urls(self.store, self.path)
+        self.assertEqual(urls['full'], reverse('serve_media', args=[self.store.key_of(self.path)]))
+        self.assertEqual((urls['thumbnail'], urls['medium']), ('', ''))
+        
+        write_derivatives(self.image, self.path)
+        urls = derivative_urls(self.store, self.path)
+        self.assertIn('.thumbnail.jpg', urls['thumbnail'])
+        self.assertIn('.medium.jpg', urls['medium'])
+
+class EncodingPolicyTestCase(TestCase):
+    """Test per-class encoding, WebP output and recompression of stored media"""
+    
+    def setUp(self):
+        from .utils.encoding import EncodingPolicy
+        from .utils.media_store import MediaStore
+        
+        self.media_dir = tempfile.TemporaryDirectory()
+        self.store = MediaStore(self.media_dir.name)
+        self.config = {
+            'CLASSES': {
+                'upload': {'FORMAT': 'original', 'QUALITY': 90},
+                'annotated': {'FORMAT': 'jpeg', 'QUALITY': 40},
+                'evidence': {'FORMAT': 'webp', 'QUALITY': 60},
+                'thumbnail': {'FORMAT': 'jpeg', 'QUALITY': 70}
+            },
+            'PROGRESSIVE_JPEG': True,
+            'UNCOMPRESSED_QUALITY': 95,
+            'RECOMPRESS_MIN_SAVINGS': 0.1
+        }
+        self.policy = EncodingPolicy(self.config, compress=True, optimize=True)
+        # Noise makes the size depend on the quality setting
+        self.image = np.random.RandomState(0).randint(0, 255, (240, 320, 3), dtype=np.uint8)
+    
+    def tearDown(self):
+        self.media_dir.cleanup()
+    
+    def test_codec_and_quality_follow_the_media_class(self):
+        """Each class gets its own codec and quality, and the encoded bytes are accounted per class"""
+        annotated, annotated_ext = self.policy.encode(self.image, 'annotated')
+        evidence, evidence_ext = self.policy.encode(self.image, 'evidence')
+        default = cv2.imencode('.jpg', self.image)[1]
+        
+        self.assertEqual((annotated_ext, evidence_ext), ('.jpg', '.webp'))
+        self.assertLess(len(annotated), len(default.tobytes()))
+        self.assertEqual(cv2.imdecode(np.frombuffer(evidence, np.uint8), cv2.IMREAD_COLOR).shape, self.image.shape)
+        self.assertTrue(self.policy.keeps_original('upload'))
+        
+        stats = self.policy.get_stats()
+        self.assertEqual(stats['evidence']['encoded_bytes'], len(evidence))
+        self.assertEqual(stats['annotated']['format'], 'jpeg')
+    
+    def test_compression_off_writes_high_quality_jpeg(self):
+        """With COMPRESS_IMAGES off every class, uploads included, is re-encoded as quality 95 JPEG"""
+        from .utils.encoding import EncodingPolicy
+        
+        policy = EncodingPolicy(self.config, compress=False)
+        
+        self.assertEqual(policy.profile('evidence'), {'format': 'jpeg', 'quality': 95})
+        self.assertFalse(policy.keeps_original('upload'))
+        self.assertEqual(policy.encode(self.image, 'evidence')[1], '.jpg')
+    
+    def test_recompression_moves_records_to_the_smaller_object(self):
+        """A re-encoded evidence image replaces the old object, and records and URLs follow it"""
+        from .utils.media_recompressor import MediaRecompressor
+        
+        old_path = self.store.put_bytes(cv2.imencode('.png', self.image)[1].tobytes(), '.png', 'evidence')
+        self.store.lookup = MagicMock(return_value={'media_class': 'evidence', 'refs': [{'kind': 'violation', 'id': 'VIO1'}]})
+        collections = {'violations': MagicMock(), 'helmet_detections': MagicMock()}
+        
+        report = MediaRecompressor(self.store, self.policy, collections).run()
+        
+        self.assertEqual((report['scanned'], report['recompressed']), (1, 1))
+        self.assertLess(report['bytes_after'], report['bytes_before'])
+        self.assertFalse(os.path.exists(old_path))
+        
+        repoint, urls = collections['violations'].update_many.call_args_list
+        new_path = repoint[0][1]['$set']['evidence_photo']
+        self.assertEqual(repoint[0][0], {'evidence_photo': old_path})
+        self.assertTrue(new_path.endswith('.webp') and os.path.exists(new_path))
+        self.assertIn('.thumbnail.jpg', urls[0][1]['$set']['evidence_urls']['thumbnail'])
+
+class ReducedDecodeTestCase(TestCase):
+    """Test reduced-resolution decoding of large uploads and full-resolution plate crops"""
+    
+    def setUp(self):
+        # 2600x1400 frame with a bright "plate" at (1000, 400)-(1400, 600) in original pixels
+        self.original = np.zeros((1400, 2600, 3), dtype=np.uint8)
+        self.original[400:600, 1000:1400] = 255
+        self.data = cv2.imencode('.jpg', self.original)[1].tobytes()
+    
+    def test_large_jpeg_is_decoded_reduced(self):
+        """The largest libjpeg scale keeping min_side is used; other formats decode at full size"""
+        from .utils.frame import Frame, jpeg_size
+        
+        frame = Frame.from_bytes(self.data, min_side=640)
+        
+        self.assertEqual(jpeg_size(self.data), (2600, 1400))
+        self.assertEqual(frame.image.shape, (350, 650, 3))
+        self.assertEqual(frame.scale, 4.0)
+        
+        png = Frame.from_bytes(cv2.imencode('.png', self.original)[1].tobytes(), min_side=640)
+        self.assertEqual((png.image.shape, png.scale), ((1400, 2600, 3), 1.0))
+    
+    def test_plate_crop_comes_from_the_original(self):
+        """A box in reduced coordinates is cut from the full-resolution decode, also through an ROI crop"""
+        from .utils.frame import Frame
+        
+        frame = Frame.from_bytes(self.data, min_side=640)
+        crop = frame.full_resolution_crop(250, 100, 350, 150)
+        self.assertEqual(crop.shape, (200, 400, 3))
+        self.assertGreater(crop.mean(), 200)
+        
+        region = Frame(frame.image[50:, 200:])
+        region.parent = (frame, (200, 50))
+        self.assertEqual(region.full_resolution_crop(50, 50, 150, 100).shape, (200, 400, 3))
+    
+    def test_plate_crop_decodes_only_as_much_as_needed(self):
+        """With min_height the original is decoded at the smallest scale that is tall enough"""
+        from .utils.frame import Frame, get_crop_decode_stats
+        
+        frame = Frame.from_bytes(self.data, min_side=640)
+        before = get_crop_decode_stats()
+        self.assertEqual(frame.full_resolution_crop(250, 100, 350, 150, min_height=64).shape, (100, 200, 3))
+        # A 200-pixel plate is already 50 pixels tall in the 1/4 frame: no decode
+        self.assertEqual(frame.full_resolution_crop(250, 100, 350, 150, min_height=40).shape, (50, 100, 3))
+        
+        after = get_crop_decode_stats()
+        self.assertEqual(after['decodes'] - before['decodes'], 1)
+        self.assertEqual(after['by_factor'][2] - before['by_factor'].get(2, 0), 1)
+    
+    def test_model_server_crops_from_the_original(self):
+        """In server mode the reduced frame's original travels with it, so plate crops keep full resolution"""
+        import itertools
+        from .ai_models.model_server import ModelClient, ModelServer
+        from .utils.frame import Frame
+        
+        frame = Frame.from_bytes(self.data, min_side=640)
+        region = Frame(frame.image[50:, 200:])
+        region.parent = (frame, (200, 50))
+        payload = ModelClient(authkey=b'test')._frame_payload(region, with_original=True, helmet_result={})
+        
+        replica = MagicMock()
+        replica.read_plate.side_effect = lambda served, helmet_result: served.full_resolution_crop(50, 50, 150, 100).shape
+        server = ModelServer(replicas=1, authkey=b'test')
+        server.replicas, server._replica_cycle = [replica], itertools.cycle([replica])
+        
+        self.assertEqual(server.handle_request('read_plate', payload), (200, 400, 3))
+        self.assertIsNone(ModelClient(authkey=b'test')._frame_payload(Frame(self.original), with_original=True)['original'])
+    
+    def test_uploads_are_normalized_at_ingest(self):
+        """read_uploaded_image decodes reduced, then fits MAX_IMAGE_WIDTH x MAX_IMAGE_HEIGHT"""
+        from .config.settings import CONFIG
+        from .utils.file_handler import FileHandler
+        from .utils.media_store import MediaStore
+        
+        with tempfile.TemporaryDirectory() as media_dir:
+            file_handler = FileHandler(media_store=MediaStore(media_dir))
+            upload = SimpleUploadedFile('large.jpg', self.data, content_type='image/jpeg')
+            limits = {'REDUCED_DECODE': True, 'MIN_DECODED_SIDE': 1280, 'MAX_IMAGE_WIDTH': 1200, 'MAX_IMAGE_HEIGHT': 1080}
+            with patch.dict(CONFIG['FILES'], limits):
+                frame = file_handler.read_uploaded_image(upload, 'CAM_1', persist=False)
+        
+        self.assertEqual(frame.image.shape, (646, 1200, 3))
+        self.assertAlmostEqual(frame.scale, 2600 / 1200.0, places=2)
+
+class BenchmarkTestCase(TestCase):
+    """Test the end-to-end pipeline benchmark and its in-memory Mongo stand-in"""
+    
+    def test_memory_collection_updates(self):
+        """Upserts, $addToSet and $pull behave like Mongo for equality queries"""
+        from .benchmark import MemoryClient
+        
+        collection = MemoryClient()['sentra']['media_objects']
+        collection.update_one({'digest': 'abc'}, {'$setOnInsert': {'size': 10}, '$addToSet': {'refs': {'$each': ['a', 'b']}}}, upsert=True)
+        collection.update_one({'digest': 'abc'}, {'$addToSet': {'refs': 'a'}, '$set': {'size': 12}})
+        collection.update_one({'digest': 'abc'}, {'$pull': {'refs': 'b'}})
+        
+        document = collection.find_one({'digest': 'abc'}, {'_id': 0})
+        self.assertEqual(document, {'digest': 'abc', 'size': 12, 'refs': ['a']})
+        self.assertIsNone(collection.find_one({'digest': 'missing'}))
+        self.assertEqual(collection.update_one({'digest': 'missing'}, {'$set': {'size': 1}}).matched_count, 0)
+    
+    def test_benchmark_reports_stage_percentiles(self):
+        """Every frame runs end to end; model, OCR variant, encode and DB stages get percentiles"""
+        from .benchmark import PipelineBenchmark, build_corpus
+        
+        class Detector:
+            def model(self, image):
+                return image.shape
+            
+            def _process_detections(self, shape):
+                rider = {'person_bbox': {'x1': 10, 'y1': 10, 'x2': 60, 'y2': 100}, 'person_confidence': 0.9, 'helmet_detected': False}
+                return {'person_detected': True, 'person_confidence': 0.9, 'riders': [rider], 'rider_count': 1}
+            
+            def detect(self, frame):
+                return self._process_detections(self.model(frame.image))
+        
+        plate_reader = MagicMock()
+        plate_reader._read_variant = lambda name, gray: None
+        plate_reader.detect_and_read.side_effect = lambda image, helmet: (
+            plate_reader._read_variant('gray', image) or {'plate_detected': True, 'plate_number': 'KA01AB1234', 'plate_confidence': 0.9}
+        )
+        corpus = build_corpus(sizes=[(320, 240), (640, 480)], per_size=2, max_samples=0)
+        
+        with patch('livedetection.pipeline.model_registry') as registry, patch('livedetection.benchmark.model_registry', registry):
+            registry.server_mode.return_value = False
+            registry.get_batch_inference.return_value = None
+            registry.get_helmet_detector.return_value = Detector()
+            registry.get_plate_reader.return_value = plate_reader
+            report = PipelineBenchmark(corpus, warmup_frames=1, percentiles=[50, 95]).run(repeat=2, label='test')
+        
+        self.assertEqual((report['frames'], report['errors'], report['violations']), (8, 0, 8))
+        self.assertGreater(report['fps'], 0)
+        self.assertEqual(report['stages']['yolo']['count'], 8)
+        for stage in ('decode', 'postprocess', 'ocr.variant.gray', 'encode.evidence', 'db.violations.insert_one', 'stage.detect'):
+            self.assertIn('p95_ms', report['stages'][stage])
+        self.assertEqual(report['corpus']['sizes'], {'320x240': 2, '640x480': 2})
+        json.dumps(report)
+    
+    def test_benchmark_restores_the_live_pipeline(self):
+        """The views' pipeline and collections are put back after a run"""
+        from . import views
+        from .ai_models import violation_processor
+        from .benchmark import PipelineBenchmark
+        from .utils.frame import Frame
+        
+        pipeline, collection, from_bytes = views.detection_pipeline, violation_processor.violations_collection, Frame.from_bytes
+        with patch('livedetection.benchmark.model_registry') as registry:
+            registry.server_mode.return_value = False
+            PipelineBenchmark([], warmup_frames=0).run()
+        
+        self.assertIs(views.detection_pipeline, pipeline)
+        self.assertIs(violation_processor.violations_collection, collection)
+        self.assertEqual(Frame.from_bytes, from_bytes)
+    
+    def test_peak_rss_without_resource_module(self):
+        """Platforms without the resource module (Windows) report and compare peak RSS as None"""
+        import sys
+        from .benchmark import compare_results, peak_rss_mb
+        
+        self.assertGreater(peak_rss_mb(), 0)
+        with patch.dict(sys.modules, {'resource': None}):
+            self.assertIsNone(peak_rss_mb())
+        
+        comparison = compare_results({'fps': 2.0, 'peak_rss_mb': 512.0, 'stages': {}}, {'fps': 3.0, 'peak_rss_mb': None, 'stages': {}})
+        self.assertEqual(comparison['peak_rss_mb'], (512.0, None, None))
+        self.assertEqual(comparison['fps'], (2.0, 3.0, 50.0))
+
 class PerformanceTestCase(TestCase):
     """Performance test cases"""
     
@@ -1,5 +1,6 @@
 # Training Package
 from .model_trainer import ModelTrainer
 from .data_preprocessor import DataPreprocessor
+from .model_quantizer import ModelQuantizer
 
-__all__ = ['ModelTrainer', 'DataPreprocessor']
\ No newline at end of file
+__all__ = ['ModelTrainer', 'DataPreprocessor', 'ModelQuantizer']
\ No newline at end of file
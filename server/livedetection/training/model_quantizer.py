@@ -0,0 +1,249 @@
+import json
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from ..config.model_config import MODEL_CONFIG
+from ..ai_models.inference_backends import get_backend
+
+
+class ModelQuantizer:
+    def __init__(self):
+        """Initialize INT8 post-training quantization for the helmet detector"""
+        self.base_dir = Path(__file__).parent.parent
+        self.data_dir = self.base_dir / "data"
+        self.weights_dir = self.base_dir / "weights"
+        self.staging_dir = self.weights_dir / "quantization"
+
+        # Same dataset config and val split ModelTrainer trains against
+        self.dataset_config_path = self.data_dir / "data.yaml"
+        self.val_images_dir = self.data_dir / "val" / "images"
+        self.fp32_model_path = self.weights_dir / "helmet_detection.pt"
+
+        self.config = MODEL_CONFIG['QUANTIZATION'].copy()
+
+    def quantize(self, quant_format=None, max_map50_drop=None, promote=True):
+        """
+        Calibrate, quantize and validate the helmet model, promoting it only if accuracy holds
+
+        Args:
+            quant_format (str): 'openvino' or 'onnx', defaults to QUANTIZATION['FORMAT']
+            max_map50_drop (float): Largest acceptable FP32 -> INT8 mAP50 drop
+            promote (bool): Install the INT8 model when it passes the accuracy gate
+
+        Returns:
+            dict: Quantization report
+        """
+        quant_format = quant_format or self.config['FORMAT']
+        if max_map50_drop is None:
+            max_map50_drop = self.config['MAX_MAP50_DROP']
+
+        self._verify_inputs()
+
+        run_id = f"HELMET_INT8_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        run_dir = self.staging_dir / run_id
+        run_dir.mkdir(parents=True, exist_ok=True)
+
+        # Quantize a staged copy so nothing next to the live weights changes until promotion
+        staged_weights = run_dir / self.fp32_model_path.name
+        shutil.copy2(self.fp32_model_path, staged_weights)
+
+        report = {
+            'run_id': run_id,
+            'model_type': 'helmet_quantization',
+            'format': quant_format,
+            'max_map50_drop': max_map50_drop,
+            'dataset_config': str(self.dataset_config_path),
+            'started_at': datetime.now().isoformat()
+        }
+
+        print(f"Validating FP32 model: {self.fp32_model_path}")
+        report['fp32_map50'] = self._validate(self.fp32_model_path)
+
+        print(f"Quantizing to INT8 ({quant_format})")
+        if quant_format == 'openvino':
+            candidate_path = self._quantize_openvino(staged_weights)
+        elif quant_format == 'onnx':
+            candidate_path = self._quantize_onnx(staged_weights)
+        else:
+            raise ValueError(f"Unsupported quantization format: {quant_format}")
+        report['candidate_path'] = str(candidate_path)
+
+        print(f"Validating INT8 model: {candidate_path}")
+        report['int8_map50'] = self._validate(candidate_path)
+
+        report['map50_drop'] = round(report['fp32_map50'] - report['int8_map50'], 6)
+        report['passed'] = report['map50_drop'] <= max_map50_drop
+        report['promoted'] = False
+
+        if report['passed'] and promote:
+            report['promoted_path'] = str(self._promote(candidate_path, quant_format))
+            report['promoted'] = True
+        elif not report['passed']:
+            print(
+                f"INT8 model rejected: mAP50 dropped {report['map50_drop']:.4f} "
+                f"(limit {max_map50_drop:.4f})"
+            )
+
+        report['completed_at'] = datetime.now().isoformat()
+        self._save_report(run_dir, report)
+
+        return report
+
+    def _verify_inputs(self):
+        """Check the FP32 weights and the val split are present"""
+        if not self.fp32_model_path.exists():
+            raise FileNotFoundError(f"FP32 weights missing: {self.fp32_model_path}")
+
+        if not self.dataset_config_path.exists():
+            raise FileNotFoundError(f"Dataset config missing: {self.dataset_config_path}")
+
+        if not self._calibration_images():
+            raise ValueError(f"No calibration images found in {self.val_images_dir}")
+
+    def _calibration_images(self):
+        """Images from the val split used to calibrate activation ranges"""
+        images = sorted(
+            p for p in self.val_images_dir.glob('*.*')
+            if p.suffix.lower() in ('.jpg', '.jpeg', '.png', '.bmp')
+        )
+        return images[:self.config['CALIBRATION_IMAGES']]
+
+    def _validate(self, model_path):
+        """
+        mAP50 on the val split, computed the same way as HelmetDetector.validate_model
+
+        Args:
+            model_path: .pt weights or exported model
+
+        Returns:
+            float: mAP50
+        """
+        from ultralytics import YOLO
+
+        model = YOLO(str(model_path), task='detect')
+        results = model.val(
+            data=str(self.dataset_config_path),
+            split='val',
+            imgsz=self.config['IMAGE_SIZE'],
+            device='cpu',
+            plots=False,
+            verbose=False
+        )
+        return float(results.box.map50)
+
+    def _quantize_openvino(self, staged_weights):
+        """NNCF INT8 export; ultralytics calibrates on the dataset's val split"""
+        from ultralytics import YOLO
+
+        exported = YOLO(str(staged_weights)).export(
+            format='openvino',
+            int8=True,
+            dynamic=True,
+            data=str(self.dataset_config_path),
+            fraction=self._calibration_fraction(),
+            imgsz=self.config['IMAGE_SIZE'],
+            device='cpu'
+        )
+        return Path(exported)
+
+    def _quantize_onnx(self, staged_weights):
+        """Static QDQ quantization with ONNX Runtime, calibrated on data/val/images"""
+        from ultralytics import YOLO
+        from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+
+        # Dynamic axes, like the fp32 ONNX backend, so the INT8 model takes batches from dynamic batching;
+        # activation ranges are still calibrated at the inference size
+        fp32_onnx = Path(YOLO(str(staged_weights)).export(
+            format='onnx', imgsz=self.config['IMAGE_SIZE'], dynamic=True, simplify=True, device='cpu'
+        ))
+        int8_onnx = fp32_onnx.with_name(f"{fp32_onnx.stem}_int8.onnx")
+
+        quantize_static(
+            str(fp32_onnx),
+            str(int8_onnx),
+            _ValImageCalibrationReader(fp32_onnx, self._calibration_images(), self.config['IMAGE_SIZE']),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8
+        )
+        return int8_onnx
+
+    def _calibration_fraction(self):
+        """Fraction of the val split that yields CALIBRATION_IMAGES images"""
+        total = len(list(self.val_images_dir.glob('*.*')))
+        if total == 0:
+            return 1.0
+        return min(1.0, self.config['CALIBRATION_IMAGES'] / total)
+
+    def _promote(self, candidate_path, quant_format):
+        """Install the candidate where the INT8 backend loads it from"""
+        target = get_backend(quant_format, self.fp32_model_path, precision='int8').artifact_path
+
+        # Keep the previous INT8 model as a backup
+        if target.exists():
+            backup = self.weights_dir / 'backup' / f"{target.name}.{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            backup.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(target), str(backup))
+
+        if candidate_path.is_dir():
+            shutil.copytree(candidate_path, target)
+        else:
+            shutil.copy2(candidate_path, target)
+
+        print(f"INT8 model promoted to {target}")
+        return target
+
+    def _save_report(self, run_dir, report):
+        """Write the report next to the candidate and log it with the training sessions"""
+        with open(run_dir / 'report.json', 'w') as f:
+            json.dump(report, f, indent=2)
+
+        try:
+            from ..utils.database_handler import DatabaseHandler
+
+            DatabaseHandler().save_training_log({**report, 'training_id': report['run_id']})
+        except Exception as e:
+            print(f"Error logging quantization report: {e}")
+
+
+class _ValImageCalibrationReader:
+    """Feeds letterboxed val images to ONNX Runtime's static quantization calibrator"""
+
+    def __init__(self, onnx_path, image_paths, imgsz):
+        import onnxruntime
+
+        session = onnxruntime.InferenceSession(str(onnx_path), providers=['CPUExecutionProvider'])
+        self.input_name = session.get_inputs()[0].name
+        self.image_paths = list(image_paths)
+        self.imgsz = imgsz
+        self._iterator = iter(self.image_paths)
+
+    def get_next(self):
+        for image_path in self._iterator:
+            image = cv2.imread(str(image_path))
+            if image is not None:
+                return {self.input_name: self._preprocess(image)}
+        return None
+
+    def rewind(self):
+        self._iterator = iter(self.image_paths)
+
+    def _preprocess(self, image):
+        """Letterbox to imgsz with the YOLO pad colour, BGR->RGB, NCHW float in [0, 1]"""
+        h, w = image.shape[:2]
+        scale = min(self.imgsz / h, self.imgsz / w)
+        new_w, new_h = int(round(w * scale)), int(round(h * scale))
+        resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+        canvas = np.full((self.imgsz, self.imgsz, 3), MODEL_CONFIG['DATA']['PREPROCESSING']['PAD_COLOR'], dtype=np.uint8)
+        top, left = (self.imgsz - new_h) // 2, (self.imgsz - new_w) // 2
+        canvas[top:top + new_h, left:left + new_w] = resized
+
+        tensor = canvas[:, :, ::-1].transpose(2, 0, 1).astype(np.float32) / 255.0
+        return np.ascontiguousarray(tensor[np.newaxis])
@@ -5,8 +5,11 @@ urlpatterns = [
     # Image processing
     path('process-image/', views.process_image, name='process_image'),
     path('detections/', views.get_detections, name='get_detections'),
+    path('detections/<str:detection_id>/', views.get_detection_status, name='get_detection_status'),
     path('violations/', views.get_violations, name='get_violations'),
     path('stats/', views.get_stats, name='get_stats'),
+    path('inference-stats/', views.get_inference_stats, name='get_inference_stats'),
+    path('storage-stats/', views.get_storage_stats, name='get_storage_stats'),
     
     # Model training
     path('train-model/', views.train_model, name='train_model'),
@@ -2,5 +2,6 @@
 from .database_handler import DatabaseHandler
 from .file_handler import FileHandler
 from .image_processor import ImageProcessor
+from .frame import Frame
 
-__all__ = ['DatabaseHandler', 'FileHandler', 'ImageProcessor']
\ No newline at end of file
+__all__ = ['DatabaseHandler', 'FileHandler', 'ImageProcessor', 'Frame']
\ No newline at end of file
@@ -0,0 +1,101 @@
+"""
+Vectorized bounding box helpers (boxes are (N, 4) xyxy arrays)
+"""
+import numpy as np
+
+
+def as_boxes(boxes):
+    """Coerce a box list/array to a float (N, 4) array"""
+    return np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+
+
+def box_areas(boxes):
+    """Area of each box"""
+    boxes = as_boxes(boxes)
+    return np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+
+
+def intersection_matrix(a, b):
+    """Pairwise intersection areas, shape (len(a), len(b))"""
+    a, b = as_boxes(a), as_boxes(b)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    return np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+
+def iou_matrix(a, b):
+    """Pairwise intersection over union, shape (len(a), len(b))"""
+    inter = intersection_matrix(a, b)
+    union = box_areas(a)[:, None] + box_areas(b)[None, :] - inter
+    return inter / (union + 1e-6)
+
+
+def ioa_matrix(a, b):
+    """Pairwise intersection over the area of the boxes in a, shape (len(a), len(b))"""
+    inter = intersection_matrix(a, b)
+    return inter / (box_areas(a)[:, None] + 1e-6)
+
+
+def bbox_to_array(bbox):
+    """Convert a bbox dict with x1/y1/x2/y2 to a (4,) array"""
+    return np.array([bbox['x1'], bbox['y1'], bbox['x2'], bbox['y2']], dtype=np.float32)
+
+
+def array_to_bbox(box, confidence=None):
+    """Convert a (4,) xyxy array to the bbox dict used in detection results"""
+    x1, y1, x2, y2 = (int(v) for v in box)
+    bbox = {
+        'x1': x1, 'y1': y1,
+        'x2': x2, 'y2': y2,
+        'width': x2 - x1,
+        'height': y2 - y1
+    }
+    if confidence is not None:
+        bbox['confidence'] = float(confidence)
+    return bbox
+
+
+def nms(boxes, scores, iou_threshold, classes=None, metric='iou'):
+    """
+    Greedy non-maximum suppression
+
+    Args:
+        boxes: (N, 4) xyxy boxes
+        scores: (N,) confidences
+        iou_threshold (float): Overlap above which the lower-scored box is dropped
+        classes: Optional (N,) class ids; boxes of different classes never suppress each other
+        metric (str): 'iou', or 'ios' (intersection over the smaller box) to merge
+            partial boxes cut by tile edges with the full box
+
+    Returns:
+        numpy.ndarray: Indices of the kept boxes, highest score first
+    """
+    boxes = as_boxes(boxes)
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+    if not len(boxes):
+        return np.zeros(0, dtype=int)
+
+    if classes is not None:
+        # Shift each class into its own coordinate range
+        offsets = np.asarray(classes, dtype=np.float32).reshape(-1, 1) * (boxes.max() + 1)
+        boxes = boxes + offsets
+
+    areas = box_areas(boxes)
+    order = np.argsort(-scores, kind='stable')
+    keep = []
+    while order.size:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        if not rest.size:
+            break
+
+        inter = intersection_matrix(boxes[best:best + 1], boxes[rest])[0]
+        if metric == 'ios':
+            overlap = inter / (np.minimum(areas[best], areas[rest]) + 1e-6)
+        else:
+            overlap = inter / (areas[best] + areas[rest] - inter + 1e-6)
+        order = rest[overlap <= iou_threshold]
+
+    return np.asarray(keep, dtype=int)
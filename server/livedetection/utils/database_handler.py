@@ -4,10 +4,16 @@ from pymongo import MongoClient
 import json
 
 class DatabaseHandler:
-    def __init__(self):
-        """Initialize database connection and collections"""
+    def __init__(self, client=None):
+        """
+        Initialize database connection and collections
+        
+        Args:
+            client: MongoClient-compatible client, defaults to one for the local server
+                (the pipeline benchmark passes an in-memory stand-in)
+        """
         self.mongo_uri = "mongodb://localhost:27017/"
-        self.client = MongoClient(self.mongo_uri)
+        self.client = client if client is not None else MongoClient(self.mongo_uri)
         self.db = self.client["sentra"]
         
         # Collections based on your schema
@@ -48,6 +54,35 @@ class DatabaseHandler:
                 'message': str(e)
             }
     
+    def update_detection(self, detection_id, fields, push=None):
+        """
+        Update (or create) a detection record by detection_id
+        
+        Args:
+            detection_id: Detection identifier
+            fields (dict): Fields to set
+            push (dict): Values to append to list fields, e.g. {'errors': {...}}
+        """
+        try:
+            update = {'$set': fields}
+            if push:
+                update['$push'] = push
+            
+            self.detections.update_one({'detection_id': detection_id}, update, upsert=True)
+            return True
+        
+        except Exception as e:
+            print(f"Error updating detection {detection_id}: {e}")
+            return False
+    
+    def get_detection(self, detection_id):
+        """Get one detection record by detection_id"""
+        try:
+            return self.detections.find_one({'detection_id': detection_id}, {'_id': 0})
+        except Exception as e:
+            print(f"Error getting detection {detection_id}: {e}")
+            return None
+    
     def get_detections(self, limit=20, camera_id=None, violation_only=False):
         """Get detection history from database"""
         try:
@@ -236,6 +271,14 @@ class DatabaseHandler:
             print(f"Error getting cameras: {e}")
             return []
     
+    def get_camera(self, camera_id):
+        """Get one camera document by camera ID"""
+        try:
+            return self.cameras.find_one({'camera_id': camera_id}, {'_id': 0})
+        except Exception as e:
+            print(f"Error getting camera: {e}")
+            return None
+    
     def save_violation_memo(self, memo_data):
         """Save violation memo to database"""
         try:
@@ -0,0 +1,79 @@
+"""
+Reduced-size derivatives (thumbnail, medium review size) of evidence images
+"""
+import os
+import uuid
+from pathlib import Path
+
+import cv2
+
+from ..config.settings import CONFIG
+from .encoding import get_encoding_policy
+
+
+def derivative_path(path, name, ext='.jpg'):
+    """store/ab/cd/<sha256>.jpg -> store/ab/cd/<sha256>.<name><ext>, next to the source"""
+    path = Path(path)
+    return path.with_name(f"{path.stem}.{name}{ext}")
+
+
+def write_derivatives(image, source_path, sizes=None, policy=None):
+    """
+    Write downscaled JPEG copies of an image next to its stored file
+
+    Args:
+        image: Decoded OpenCV image array of the source
+        source_path: Path of the stored full-size file
+        sizes (dict): name -> {'MAX_WIDTH', 'QUALITY'}, defaults to CONFIG['DERIVATIVES']['SIZES']
+        policy: EncodingPolicy whose 'thumbnail' codec is used, defaults to the shared one
+
+    Returns:
+        dict: name -> path of every derivative written (or already present)
+    """
+    sizes = sizes or CONFIG['DERIVATIVES']['SIZES']
+    policy = policy or get_encoding_policy()
+    ext = policy.extension('thumbnail')
+    height, width = image.shape[:2]
+    written = {}
+
+    for name, size in sizes.items():
+        path = derivative_path(source_path, name, ext)
+        try:
+            if not path.exists():
+                scale = min(1.0, size['MAX_WIDTH'] / float(width))
+                resized = image if scale >= 1.0 else cv2.resize(
+                    image, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA
+                )
+                data, _ = policy.encode(resized, 'thumbnail', quality=size['QUALITY'])
+
+                partial_path = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.part")
+                partial_path.write_bytes(data)
+                os.replace(partial_path, path)
+            written[name] = str(path)
+        except Exception as e:
+            # Best effort: a missing derivative only means the full image is shown instead
+            print(f"Error writing {name} derivative of {source_path}: {e}")
+
+    return written
+
+
+def derivative_urls(media_store, source_path, sizes=None, policy=None):
+    """
+    serve_media URLs of a file and its derivatives
+
+    Args:
+        media_store: MediaStore the file is in
+        source_path: Path of the full-size file
+        sizes (dict): Derivative sizes, defaults to CONFIG['DERIVATIVES']['SIZES']
+        policy: EncodingPolicy that chose the derivatives' codec, defaults to the shared one
+
+    Returns:
+        dict: {'full': url, <name>: url or '' when the derivative does not exist}
+    """
+    sizes = sizes or CONFIG['DERIVATIVES']['SIZES']
+    ext = (policy or get_encoding_policy()).extension('thumbnail')
+    urls = {'full': media_store.url_for(source_path)}
+    for name in sizes:
+        path = derivative_path(source_path, name, ext) if source_path else None
+        urls[name] = media_store.url_for(path) if path is not None and path.exists() else ''
+    return urls
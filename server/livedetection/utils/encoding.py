@@ -0,0 +1,156 @@
+"""
+Encoding policy: codec and quality per media class, with encoded-size accounting
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from ..config.settings import CONFIG
+
+# Extension and quality flag of each codec; AVIF needs an OpenCV build with libavif
+CODECS = {
+    'jpeg': ('.jpg', 'IMWRITE_JPEG_QUALITY'),
+    'webp': ('.webp', 'IMWRITE_WEBP_QUALITY'),
+    'avif': ('.avif', 'IMWRITE_AVIF_QUALITY')
+}
+
+
+class EncodingPolicy:
+    def __init__(self, config=None, compress=None, optimize=None):
+        """
+        Initialize the encoding policy
+
+        Each media class (upload, annotated, evidence, thumbnail) has its own
+        FORMAT and QUALITY. FORMAT 'original' keeps uploaded bytes as
+        received; a codec this OpenCV build cannot write falls back to JPEG.
+
+        Args:
+            config (dict): ENCODING settings, defaults to CONFIG['ENCODING']
+            compress (bool): Apply the per-class profiles, defaults to CONFIG['FILES']['COMPRESS_IMAGES'];
+                off writes every class as high-quality JPEG
+            optimize (bool): Optimized Huffman tables for JPEG, defaults to CONFIG['PERFORMANCE']['OPTIMIZE_IMAGES']
+        """
+        self.config = config or CONFIG['ENCODING']
+        self.compress = CONFIG['FILES']['COMPRESS_IMAGES'] if compress is None else compress
+        self.optimize = CONFIG['PERFORMANCE']['OPTIMIZE_IMAGES'] if optimize is None else optimize
+
+        self._supported = {}
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def profile(self, media_class):
+        """
+        Codec and quality used for a media class
+
+        Returns:
+            dict: {'format': 'original'|'jpeg'|'webp'|'avif', 'quality': int}
+        """
+        if not self.compress:
+            return {'format': 'jpeg', 'quality': self.config['UNCOMPRESSED_QUALITY']}
+
+        profile = self.config['CLASSES'].get(media_class) or self.config['CLASSES']['evidence']
+        image_format = profile['FORMAT'].lower()
+        if image_format != 'original' and not self.supports(image_format):
+            image_format = 'jpeg'
+        return {'format': image_format, 'quality': int(profile['QUALITY'])}
+
+    def keeps_original(self, media_class):
+        """Whether files of this class are stored as received rather than re-encoded"""
+        return self.profile(media_class)['format'] == 'original'
+
+    def extension(self, media_class):
+        """File extension of newly encoded files of a class"""
+        image_format = self.profile(media_class)['format']
+        return CODECS['jpeg' if image_format == 'original' else image_format][0]
+
+    def supports(self, image_format):
+        """Whether this OpenCV build can write a codec (checked once per codec)"""
+        if image_format not in CODECS:
+            return False
+        with self._lock:
+            if image_format not in self._supported:
+                ext, flag = CODECS[image_format]
+                try:
+                    supported = hasattr(cv2, flag) and cv2.imencode(ext, np.zeros((8, 8, 3), dtype=np.uint8))[0]
+                except cv2.error:
+                    supported = False
+                if not supported:
+                    print(f"OpenCV cannot write {image_format}, using jpeg instead")
+                self._supported[image_format] = bool(supported)
+            return self._supported[image_format]
+
+    def encode(self, image, media_class, quality=None):
+        """
+        Encode an image with its class's codec
+
+        Args:
+            image: OpenCV image array
+            media_class (str): 'upload', 'annotated', 'evidence' or 'thumbnail'
+            quality (int): Overrides the class quality (e.g. per derivative size)
+
+        Returns:
+            tuple: (encoded bytes, extension including the dot)
+        """
+        profile = self.profile(media_class)
+        image_format = 'jpeg' if profile['format'] == 'original' else profile['format']
+        ext, flag = CODECS[image_format]
+
+        params = [getattr(cv2, flag), int(quality or profile['quality'])]
+        if image_format == 'jpeg':
+            params += [cv2.IMWRITE_JPEG_OPTIMIZE, int(bool(self.optimize))]
+            params += [cv2.IMWRITE_JPEG_PROGRESSIVE, int(bool(self.config['PROGRESSIVE_JPEG']))]
+
+        started = time.perf_counter()
+        ok, encoded = cv2.imencode(ext, image, params)
+        if not ok:
+            raise ValueError(f"Could not encode {media_class} image as {image_format}")
+        data = encoded.tobytes()
+
+        self._record(media_class, image.nbytes, len(data), (time.perf_counter() - started) * 1000)
+        return data, ext
+
+    def _record(self, media_class, raw_bytes, encoded_bytes, elapsed_ms):
+        with self._lock:
+            stats = self._stats.setdefault(media_class, {'encoded': 0, 'raw_bytes': 0, 'encoded_bytes': 0, 'encode_ms': 0.0})
+            stats['encoded'] += 1
+            stats['raw_bytes'] += raw_bytes
+            stats['encoded_bytes'] += encoded_bytes
+            stats['encode_ms'] += elapsed_ms
+
+    def get_stats(self):
+        """
+        Get encoded sizes per media class
+
+        Returns:
+            dict: media_class -> {'format', 'quality', 'encoded', 'encoded_bytes', 'avg_bytes', 'ratio', 'avg_encode_ms'}
+        """
+        with self._lock:
+            snapshot = {media_class: dict(stats) for media_class, stats in self._stats.items()}
+
+        report = {}
+        for media_class, stats in snapshot.items():
+            count = stats['encoded']
+            report[media_class] = {
+                **self.profile(media_class),
+                'encoded': count,
+                'encoded_bytes': stats['encoded_bytes'],
+                'avg_bytes': stats['encoded_bytes'] // count,
+                'ratio': round(stats['raw_bytes'] / max(1, stats['encoded_bytes']), 1),
+                'avg_encode_ms': round(stats['encode_ms'] / count, 2)
+            }
+        return report
+
+
+_encoding_policy = None
+_encoding_policy_lock = threading.Lock()
+
+
+def get_encoding_policy():
+    """This process's EncodingPolicy"""
+    global _encoding_policy
+    with _encoding_policy_lock:
+        if _encoding_policy is None:
+            _encoding_policy = EncodingPolicy()
+    return _encoding_policy
@@ -1,14 +1,30 @@
 import os
-import uuid
-import shutil
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 import cv2
 import numpy as np
 
+from .derivatives import write_derivatives
+from ..config.settings import CONFIG
+from .encoding import get_encoding_policy
+from .frame import Frame
+from .media_store import get_media_store
+
+# Background writer for originals, shared by all FileHandler instances
+_persist_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='frame-persist')
+
 class FileHandler:
-    def __init__(self):
-        """Initialize file handler with directory paths"""
+    def __init__(self, media_store=None, encoding_policy=None):
+        """
+        Initialize file handler with directory paths
+        
+        Args:
+            media_store: MediaStore every saved file goes to, defaults to the shared one
+            encoding_policy: EncodingPolicy choosing each media class's codec, defaults to the shared one
+        """
+        self.media_store = media_store or get_media_store()
+        self.encoding_policy = encoding_policy or get_encoding_policy()
         self.base_dir = Path(__file__).parent.parent
         self.media_dir = self.base_dir / "media"
         
@@ -43,37 +59,117 @@ class FileHandler:
     
     def save_uploaded_image(self, image_file, camera_id='upload'):
         """
-        Save uploaded image file to uploads directory
+        Save uploaded image file to the media store
         
         Args:
             image_file: Django uploaded file object
             camera_id: Camera identifier
             
         Returns:
-            str: Path to saved file
+            str: Path to saved file (shared with any identical upload)
         """
         try:
             # Validate file
             if not self._validate_image_file(image_file):
                 raise ValueError("Invalid image file")
             
-            # Generate unique filename
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            file_extension = Path(image_file.name).suffix.lower()
+            image_file.seek(0)
+            data = b''.join(image_file.chunks())
+            ext = Path(image_file.name).suffix.lower()
+            if not self.encoding_policy.keeps_original('upload'):
+                data, ext = self.encoding_policy.encode(Frame.from_bytes(data).image, 'upload')
+            file_path = self.media_store.put_bytes(data, ext, 'upload')
+            
+            print(f"Image saved: {file_path}")
+            return file_path
+            
+        except Exception as e:
+            print(f"Error saving uploaded image: {e}")
+            raise e
+    
+    def read_uploaded_image(self, image_file, camera_id='upload', persist=True):
+        """
+        Decode uploaded image straight from the upload buffer
+        
+        Large JPEGs are decoded at a reduced scale and every frame is
+        downsized to MAX_IMAGE_WIDTH x MAX_IMAGE_HEIGHT; the full-resolution
+        original stays in the buffer for plate crops. The original is
+        written to the store in the background; detection does not wait
+        for the write.
+        
+        Args:
+            image_file: Django uploaded file object
+            camera_id: Camera identifier
+            persist: Whether to schedule writing the original to disk
+            
+        Returns:
+            Frame: Decoded frame with its planned storage path
+        """
+        try:
+            # Validate file
+            if not self._validate_image_file(image_file):
+                raise ValueError("Invalid image file")
+            
+            image_file.seek(0)
+            data = b''.join(image_file.chunks())
             
-            filename = f"{camera_id}_{timestamp}_{uuid.uuid4().hex[:8]}{file_extension}"
-            file_path = self.uploads_dir / filename
+            # The path follows from the content, so it is known before the write
+            file_path = self.media_store.path_for(self.media_store.digest(data), Path(image_file.name).suffix.lower())
+            config = CONFIG['FILES']
+            frame = Frame.from_bytes(
+                data, camera_id=camera_id, path=file_path,
+                min_side=config['MIN_DECODED_SIDE'] if config['REDUCED_DECODE'] else None
+            )
+            self.normalize_frame(frame)
             
-            # Save file
-            with open(file_path, 'wb+') as destination:
-                for chunk in image_file.chunks():
-                    destination.write(chunk)
+            if persist:
+                self.persist_frame_async(frame)
+            
+            return frame
+            
+        except Exception as e:
+            print(f"Error reading uploaded image: {e}")
+            raise e
+    
+    def persist_frame_async(self, frame):
+        """
+        Write the frame's original bytes to its storage path in the background
+        
+        When the upload policy re-encodes (or the frame has no encoded
+        buffer), the encode happens here so the path is known on return.
+        
+        Args:
+            frame: Frame with a path (and ideally the original encoded buffer)
+            
+        Returns:
+            concurrent.futures.Future: Resolves to the written path
+        """
+        if frame.buffer is not None and self.encoding_policy.keeps_original('upload'):
+            data = frame.buffer
+            ext = Path(frame.path).suffix.lower() if frame.path else '.jpg'
+            digest = self.media_store.digest_of(frame.path) or self.media_store.digest(data)
+        else:
+            # Encoded now so the content (and with it the path) is known
+            data, ext = self.encoding_policy.encode(frame.full_resolution_image(), 'upload')
+            digest = self.media_store.digest(data)
+            if frame.buffer is None:
+                frame.buffer = data
+        
+        frame.path = str(self.media_store.path_for(digest, ext))
+        
+        frame.persist_future = _persist_executor.submit(self._write_frame, data, ext, digest)
+        return frame.persist_future
+    
+    def _write_frame(self, buffer, ext, digest):
+        """Store the original bytes (a no-op when identical content is already stored)"""
+        try:
+            file_path = self.media_store.put_bytes(buffer, ext, 'upload', digest=digest)
             
             print(f"Image saved: {file_path}")
-            return str(file_path)
+            return file_path
             
         except Exception as e:
-            print(f"Error saving uploaded image: {e}")
+            print(f"Error persisting frame: {e}")
             raise e
     
     def save_processed_image(self, image_array, original_path, suffix='processed'):
@@ -89,18 +185,10 @@ class FileHandler:
             str: Path to saved processed image
         """
         try:
-            # Generate processed filename
-            original_name = Path(original_path).stem
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            
-            processed_filename = f"{original_name}_{suffix}_{timestamp}.jpg"
-            processed_path = self.processed_dir / processed_filename
-            
-            # Save processed image
-            cv2.imwrite(str(processed_path), image_array)
+            processed_path = self._store_image(image_array, 'annotated')
             
             print(f"Processed image saved: {processed_path}")
-            return str(processed_path)
+            return processed_path
             
         except Exception as e:
             print(f"Error saving processed image: {e}")
@@ -118,13 +206,11 @@ class FileHandler:
             str: Path to saved evidence image
         """
         try:
-            evidence_filename = f"{violation_id}_evidence.jpg"
-            evidence_path = self.violations_dir / evidence_filename
-            
-            cv2.imwrite(str(evidence_path), image_array)
+            evidence_path = self._store_image(image_array, 'evidence', [('violation', violation_id)])
+            write_derivatives(image_array, evidence_path, policy=self.encoding_policy)
             
             print(f"Violation evidence saved: {evidence_path}")
-            return str(evidence_path)
+            return evidence_path
             
         except Exception as e:
             print(f"Error saving violation evidence: {e}")
@@ -132,32 +218,33 @@ class FileHandler:
     
     def copy_to_violations(self, source_path, violation_id):
         """
-        Copy file to violations directory
+        Use a file as violation evidence (stored once, referenced by the violation)
         
         Args:
             source_path: Path to source file
             violation_id: Violation identifier
             
         Returns:
-            str: Path to copied file
+            str: Path to the stored evidence
         """
         try:
             if not os.path.exists(source_path):
                 raise FileNotFoundError(f"Source file not found: {source_path}")
             
-            source_ext = Path(source_path).suffix
-            violation_filename = f"{violation_id}_evidence{source_ext}"
-            violation_path = self.violations_dir / violation_filename
-            
-            shutil.copy2(source_path, violation_path)
+            violation_path = self.media_store.put_file(source_path, 'evidence', [('violation', violation_id)])
             
-            print(f"File copied to violations: {violation_path}")
-            return str(violation_path)
+            print(f"File stored as violation evidence: {violation_path}")
+            return violation_path
             
         except Exception as e:
             print(f"Error copying to violations: {e}")
             raise e
     
+    def _store_image(self, image_array, media_class, refs=()):
+        """Encode an image with its class's codec and put it in the media store"""
+        data, ext = self.encoding_policy.encode(image_array, media_class)
+        return self.media_store.put_bytes(data, ext, media_class, refs)
+    
     def _validate_image_file(self, image_file):
         """
         Validate uploaded image file
@@ -237,6 +324,27 @@ class FileHandler:
             print(f"Error loading image: {e}")
             raise e
     
+    def normalize_frame(self, frame, max_width=None, max_height=None):
+        """
+        Downsize a frame to fit the ingest limits, keeping its scale to the original
+        
+        Args:
+            frame: Frame to normalize in place
+            max_width: Maximum width, defaults to CONFIG['FILES']['MAX_IMAGE_WIDTH']
+            max_height: Maximum height, defaults to CONFIG['FILES']['MAX_IMAGE_HEIGHT']
+            
+        Returns:
+            Frame: The same frame
+        """
+        width = frame.image.shape[1]
+        frame.image = self.resize_image(
+            frame.image,
+            max_width or CONFIG['FILES']['MAX_IMAGE_WIDTH'],
+            max_height or CONFIG['FILES']['MAX_IMAGE_HEIGHT']
+        )
+        frame.scale *= width / float(frame.image.shape[1])
+        return frame
+    
     def resize_image(self, image, max_width=1920, max_height=1080):
         """
         Resize image while maintaining aspect ratio
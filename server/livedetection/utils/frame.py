@@ -0,0 +1,305 @@
+"""
+In-memory frame passed through the detection pipeline
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+# libjpeg scaled decode: 1/2, 1/4 or 1/8 of the pixels per side, decoded directly
+REDUCED_DECODE_FLAGS = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+# Start-of-frame markers carrying the image size (not DHT/JPG/DAC, which share the range)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class Frame:
+    def __init__(self, image, camera_id='upload', path=None, buffer=None, timestamp=None, scale=1.0):
+        """
+        Wrap a decoded image so every pipeline stage shares one decode
+
+        Args:
+            image: Decoded OpenCV image array (BGR)
+            camera_id: Camera identifier
+            path: Where the original is (or will be) stored on disk
+            buffer: Original encoded bytes, kept so the file can be persisted without re-encoding
+            timestamp: Capture time, defaults to now
+            scale (float): Original pixels per image pixel, above 1 when decoded reduced or downsized
+        """
+        self.image = image
+        self.camera_id = camera_id
+        self.path = str(path) if path else None
+        self.buffer = buffer
+        self.timestamp = timestamp or datetime.now()
+        self.scale = scale
+
+        # (frame, (dx, dy)) this frame was cropped from, set by RegionOfInterest
+        self.parent = None
+
+        # Future for the background write of the original, set by FileHandler
+        self.persist_future = None
+
+        # Changed-pixel mask (downscaled) left by the MotionGate, used to skip still tiles
+        self.motion_mask = None
+
+    @classmethod
+    def from_bytes(cls, data, camera_id='upload', path=None, min_side=None):
+        """
+        Decode an encoded image buffer into a frame
+
+        With min_side, a large JPEG is decoded at 1/2, 1/4 or 1/8 scale
+        (the largest that keeps its long side at least min_side), which is
+        several times faster and smaller than a full decode.
+
+        Args:
+            data (bytes): Encoded image (JPEG, PNG, ...)
+            camera_id: Camera identifier
+            path: Planned storage path for the original
+            min_side (int): Smallest acceptable long side for a reduced decode, None decodes at full size
+
+        Returns:
+            Frame: Decoded frame
+        """
+        size = jpeg_size(data) if min_side else None
+        factor = reduced_decode_factor(size, min_side) if size else 1
+
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), REDUCED_DECODE_FLAGS.get(factor, cv2.IMREAD_COLOR))
+        if image is None:
+            raise ValueError("Could not decode image buffer")
+
+        # From the long sides, so EXIF rotation applied by the decoder does not matter
+        scale = max(size) / float(max(image.shape[:2])) if factor > 1 else 1.0
+        return cls(image, camera_id=camera_id, path=path, buffer=data, scale=scale)
+
+    @classmethod
+    def from_path(cls, image_path, camera_id='upload'):
+        """Decode an image file from disk into a frame"""
+        image = cv2.imread(str(image_path))
+        if image is None:
+            raise ValueError(f"Could not load image from {image_path}")
+
+        return cls(image, camera_id=camera_id, path=image_path)
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    @property
+    def name(self):
+        """Base filename used when deriving annotated/evidence filenames"""
+        if self.path:
+            return os.path.basename(self.path)
+        return f"{self.camera_id}_{self.timestamp.strftime('%Y%m%d_%H%M%S')}.jpg"
+
+    def full_resolution_image(self):
+        """
+        The image at its original resolution
+
+        A reduced frame decodes its whole buffer again on every call; the
+        result is not kept, so frames never hold a second, full-size copy.
+        Only persisting a re-encoded upload needs this.
+
+        Returns:
+            numpy.ndarray: OpenCV image array
+        """
+        if self.scale == 1.0 or self.buffer is None:
+            return self.image
+        image = cv2.imdecode(np.frombuffer(self.buffer, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return image if image is not None else self.image
+
+    def full_resolution_crop(self, x1, y1, x2, y2, min_height=None):
+        """
+        Crop a box given in this frame's coordinates from the original encoded image
+
+        Used for plate crops, the only place where detail lost to a reduced
+        decode matters. The buffer is decoded at the smallest libjpeg scale
+        that still gives the crop min_height pixels, so a plate that is large
+        enough never pays for a full-resolution decode. Decodes are counted
+        in get_crop_decode_stats(). Frames without a reduced original return
+        a plain crop.
+
+        Args:
+            x1, y1, x2, y2 (int): Box in this frame's pixels
+            min_height (int): Crop height wanted, None for the original resolution
+
+        Returns:
+            numpy.ndarray: Crop, larger than the box by up to the frame's scale
+        """
+        if self.parent is not None:
+            parent, (dx, dy) = self.parent
+            return parent.full_resolution_crop(x1 + dx, y1 + dy, x2 + dx, y2 + dy, min_height)
+
+        if self.scale == 1.0 or self.buffer is None:
+            return self.image[y1:y2, x1:x2]
+
+        factor = crop_decode_factor((y2 - y1) * self.scale, min_height)
+        if factor >= self.scale and self.image is not None:
+            # The frame's own pixels are already that detailed
+            return self.image[y1:y2, x1:x2]
+
+        started = time.perf_counter()
+        image = cv2.imdecode(np.frombuffer(self.buffer, dtype=np.uint8), REDUCED_DECODE_FLAGS.get(factor, cv2.IMREAD_COLOR))
+        _record_crop_decode(factor, (time.perf_counter() - started) * 1000)
+        if image is None:
+            return self.image[y1:y2, x1:x2] if self.image is not None else None
+
+        # Decoded pixels per frame pixel
+        ratio = self.scale / factor
+        return image[int(y1 * ratio):int(round(y2 * ratio)), int(x1 * ratio):int(round(x2 * ratio))]
+
+    def original_source(self):
+        """
+        Where this frame's full-resolution crops come from
+
+        Lets the frame be rebuilt in another process (the model server)
+        without losing full-resolution plate crops.
+
+        Returns:
+            tuple: (encoded buffer, scale, (dx, dy) offset of this frame in it), or None when crops
+                come from the frame's own pixels
+        """
+        frame, dx, dy = self, 0, 0
+        while frame.parent is not None:
+            frame, (offset_x, offset_y) = frame.parent
+            dx, dy = dx + offset_x, dy + offset_y
+
+        if frame.scale == 1.0 or frame.buffer is None:
+            return None
+        return frame.buffer, frame.scale, (dx, dy)
+
+    def wait_persisted(self, timeout=None):
+        """Block until the original has been written to disk (if a write was scheduled)"""
+        if self.persist_future is not None:
+            return self.persist_future.result(timeout)
+        return self.path
+
+
+def jpeg_size(data):
+    """
+    Read a JPEG's size from its frame header without decoding it
+
+    Returns:
+        tuple: (width, height), or None for anything that is not a readable JPEG
+    """
+    if not data.startswith(b'\xff\xd8'):
+        return None
+
+    index = 2
+    while index + 9 <= len(data):
+        if data[index] != 0xFF:
+            return None
+        marker = data[index + 1]
+        if marker == 0xFF:
+            # Fill byte
+            index += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # Markers without a length
+            index += 2
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            height = int.from_bytes(data[index + 5:index + 7], 'big')
+            width = int.from_bytes(data[index + 7:index + 9], 'big')
+            return (width, height) if width and height else None
+        index += 2 + int.from_bytes(data[index + 2:index + 4], 'big')
+    return None
+
+
+def reduced_decode_factor(size, min_side):
+    """Largest libjpeg scale (8, 4 or 2) keeping the long side at least min_side, else 1"""
+    long_side = max(size)
+    for factor in (8, 4, 2):
+        if long_side / factor >= min_side:
+            return factor
+    return 1
+
+
+def crop_decode_factor(original_height, min_height):
+    """Largest libjpeg scale (8, 4 or 2) keeping a crop of original_height at least min_height, else 1"""
+    if not min_height:
+        return 1
+    for factor in (8, 4, 2):
+        if original_height / factor >= min_height:
+            return factor
+    return 1
+
+
+_crop_decode_stats = {'decodes': 0, 'decode_ms': 0.0, 'by_factor': {}}
+_crop_decode_lock = threading.Lock()
+
+
+def _record_crop_decode(factor, elapsed_ms):
+    with _crop_decode_lock:
+        _crop_decode_stats['decodes'] += 1
+        _crop_decode_stats['decode_ms'] += elapsed_ms
+        by_factor = _crop_decode_stats['by_factor']
+        by_factor[factor] = by_factor.get(factor, 0) + 1
+
+
+def get_crop_decode_stats():
+    """
+    Cost of the buffer decodes made for full-resolution crops in this process
+
+    Returns:
+        dict: 'decodes', 'decode_ms' (total), 'avg_decode_ms' and decode counts by libjpeg scale
+    """
+    with _crop_decode_lock:
+        stats = {**_crop_decode_stats, 'by_factor': dict(_crop_decode_stats['by_factor'])}
+    stats['decode_ms'] = round(stats['decode_ms'], 2)
+    stats['avg_decode_ms'] = round(stats['decode_ms'] / stats['decodes'], 2) if stats['decodes'] else 0.0
+    return stats
+
+
+def as_frame(source, camera_id='upload'):
+    """
+    Wrap any pipeline input as a Frame
+
+    Args:
+        source: Frame, OpenCV image array or path to an image file
+        camera_id: Camera identifier for new frames
+
+    Returns:
+        Frame: The input frame, or a new frame around the array/file
+    """
+    if isinstance(source, Frame):
+        return source
+    if isinstance(source, np.ndarray):
+        return Frame(source, camera_id=camera_id)
+    return Frame.from_path(source, camera_id=camera_id)
+
+
+def load_frame_image(source):
+    """
+    Get the decoded image for any pipeline input
+
+    Args:
+        source: Frame, OpenCV image array or path to an image file
+
+    Returns:
+        numpy.ndarray: OpenCV image array, or None if it could not be loaded
+    """
+    if isinstance(source, Frame):
+        return source.image
+    if isinstance(source, np.ndarray):
+        return source
+    return cv2.imread(str(source))
+
+
+def frame_name(source):
+    """Base filename for any pipeline input"""
+    if isinstance(source, Frame):
+        return source.name
+    if isinstance(source, np.ndarray):
+        return f"frame_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
+    return os.path.basename(str(source))
+
+
+def frame_path(source):
+    """Storage path for any pipeline input, None for bare arrays"""
+    if isinstance(source, Frame):
+        return source.path
+    if isinstance(source, np.ndarray):
+        return None
+    return str(source)
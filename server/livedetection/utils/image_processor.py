@@ -301,4 +301,59 @@ class ImageProcessor:
             
         except Exception as e:
             print(f"Error creating mask: {e}")
-            return np.zeros(image.shape[:2], dtype=np.uint8)
\ No newline at end of file
+            return np.zeros(image.shape[:2], dtype=np.uint8)
+    
+    def downscale_gray(self, image, width=160, blur=True):
+        """
+        Shrink an image to a small blurred grayscale thumbnail for cheap frame comparisons
+        
+        Args:
+            image: OpenCV image array
+            width: Target width in pixels, height keeps the aspect ratio
+            blur: Smooth sensor noise so it does not count as motion
+            
+        Returns:
+            numpy.ndarray: Grayscale thumbnail
+        """
+        if len(image.shape) == 3:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = image
+        
+        height = max(1, int(round(gray.shape[0] * width / gray.shape[1])))
+        small = cv2.resize(gray, (width, height), interpolation=cv2.INTER_AREA)
+        
+        if blur:
+            small = cv2.GaussianBlur(small, (5, 5), 0)
+        
+        return small
+    
+    def frame_difference(self, previous, current, pixel_threshold=25):
+        """
+        Binary mask of pixels that changed between two grayscale images
+        
+        Args:
+            previous: Reference grayscale image (uint8 or float background model)
+            current: Grayscale image of the same size
+            pixel_threshold: Minimum absolute intensity change counted as a change
+            
+        Returns:
+            numpy.ndarray: Binary mask (255 where changed)
+        """
+        difference = cv2.absdiff(current.astype(np.float32), previous.astype(np.float32))
+        _, mask = cv2.threshold(difference, pixel_threshold, 255, cv2.THRESH_BINARY)
+        return mask.astype(np.uint8)
+    
+    def changed_fraction(self, mask):
+        """
+        Share of changed pixels in a binary mask
+        
+        Args:
+            mask: Binary mask from frame_difference or a background subtractor
+            
+        Returns:
+            float: Fraction of non-zero pixels (0.0-1.0)
+        """
+        if mask is None or mask.size == 0:
+            return 0.0
+        return float(np.count_nonzero(mask)) / mask.size
@@ -0,0 +1,162 @@
+"""
+Re-encode already stored media with the current encoding policy
+"""
+from pathlib import Path
+
+import cv2
+
+from ..config.settings import CONFIG
+from .derivatives import derivative_path, derivative_urls, write_derivatives
+from .encoding import get_encoding_policy
+
+# Pre-store flat directories under the media root, and the media class of their files
+LEGACY_DIRECTORIES = {'uploads': 'upload', 'processed': 'annotated', 'violations': 'evidence'}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp', '.avif'}
+
+# Record fields that hold media paths, by collection
+REFERENCE_FIELDS = {
+    'helmet_detections': ('original_image', 'processed_image'),
+    'violations': ('evidence_photo',)
+}
+# Field pointing at the evidence image whose derivative URLs a record keeps in evidence_urls
+EVIDENCE_FIELDS = {'helmet_detections': 'processed_image', 'violations': 'evidence_photo'}
+
+
+class MediaRecompressor:
+    def __init__(self, media_store, policy=None, collections=None, min_savings=None):
+        """
+        Initialize the recompressor
+
+        A re-encoded file has new content and so a new store path: the new
+        object is written first, records pointing at the old path are moved
+        to it, and only then is the old object (and its derivatives) removed.
+
+        Args:
+            media_store: MediaStore holding the media
+            policy: EncodingPolicy to re-encode with, defaults to the shared one
+            collections (dict): Collection name -> Mongo collection whose REFERENCE_FIELDS are repointed,
+                None leaves records alone
+            min_savings (float): Fraction of the size re-encoding must save, defaults to
+                CONFIG['ENCODING']['RECOMPRESS_MIN_SAVINGS']
+        """
+        self.media_store = media_store
+        self.policy = policy or get_encoding_policy()
+        self.collections = collections or {}
+        self.min_savings = CONFIG['ENCODING']['RECOMPRESS_MIN_SAVINGS'] if min_savings is None else min_savings
+
+    def run(self, classes=None, legacy=False, dry_run=False, limit=None):
+        """
+        Re-encode every stored file of the given classes that would shrink enough
+
+        Args:
+            classes: Media classes to process, defaults to every class the policy re-encodes
+            legacy (bool): Also move files from the flat uploads/processed/violations directories into the store
+            dry_run (bool): Only measure the savings
+            limit (int): Stop after this many files
+
+        Returns:
+            dict: Counts and bytes before/after, overall and per media class
+        """
+        classes = set(classes or [c for c in CONFIG['ENCODING']['CLASSES'] if not self.policy.keeps_original(c)])
+        report = {'scanned': 0, 'recompressed': 0, 'kept': 0, 'failed': 0, 'bytes_before': 0, 'bytes_after': 0, 'by_class': {}}
+
+        for path, media_class, refs in self._candidates(legacy):
+            if media_class not in classes:
+                continue
+            if limit is not None and report['scanned'] >= limit:
+                break
+
+            report['scanned'] += 1
+            by_class = report['by_class'].setdefault(media_class, {'recompressed': 0, 'bytes_before': 0, 'bytes_after': 0})
+            try:
+                before, after, _ = self.recompress(path, media_class, refs, dry_run=dry_run)
+            except Exception as e:
+                print(f"Error recompressing {path}: {e}")
+                report['failed'] += 1
+                continue
+
+            report['bytes_before'] += before
+            report['bytes_after'] += after
+            by_class['bytes_before'] += before
+            by_class['bytes_after'] += after
+            if after < before:
+                report['recompressed'] += 1
+                by_class['recompressed'] += 1
+            else:
+                report['kept'] += 1
+
+        return report
+
+    def _candidates(self, legacy):
+        """(path, media_class, refs) of each stored file; derivatives and partial writes are skipped"""
+        for path in sorted(self.media_store.root.rglob('*')):
+            if path.is_file() and self.media_store.digest_of(path):
+                document = self.media_store.lookup(path) or {}
+                refs = [(ref['kind'], ref['id']) for ref in document.get('refs', [])]
+                yield path, document.get('media_class'), refs
+
+        if legacy:
+            for directory, media_class in LEGACY_DIRECTORIES.items():
+                for path in sorted((self.media_store.media_root / directory).glob('*')):
+                    if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS:
+                        yield path, media_class, []
+
+    def recompress(self, path, media_class, refs=(), dry_run=False):
+        """
+        Re-encode one file
+
+        Args:
+            path (Path): File to re-encode
+            media_class (str): Its media class
+            refs: (kind, id) references to carry over to the new object
+            dry_run (bool): Only measure
+
+        Returns:
+            tuple: (bytes before, bytes after, new path or None when the file was kept)
+        """
+        before = path.stat().st_size
+        image = cv2.imread(str(path))
+        if image is None:
+            raise ValueError("could not decode image")
+
+        data, ext = self.policy.encode(image, media_class)
+        if len(data) > before * (1 - self.min_savings):
+            return before, before, None
+        if dry_run:
+            return before, len(data), None
+
+        new_path = self.media_store.put_bytes(data, ext, media_class, refs)
+        if Path(new_path) == path:
+            return before, before, None
+
+        old_path = str(path)
+        self._repoint(old_path, new_path)
+        if media_class == 'evidence':
+            write_derivatives(image, new_path, policy=self.policy)
+            self._set_evidence_urls(new_path)
+
+        if self.media_store.digest_of(path):
+            for name in CONFIG['DERIVATIVES']['SIZES']:
+                for derivative_ext in ('.jpg', '.webp', '.avif'):
+                    derivative_path(path, name, derivative_ext).unlink(missing_ok=True)
+            self.media_store.remove(path)
+        else:
+            path.unlink()
+
+        print(f"Recompressed {old_path} -> {new_path} ({before} -> {len(data)} bytes)")
+        return before, len(data), new_path
+
+    def _repoint(self, old_path, new_path):
+        for name, fields in REFERENCE_FIELDS.items():
+            collection = self.collections.get(name)
+            if collection is None:
+                continue
+            for field in fields:
+                collection.update_many({field: old_path}, {'$set': {field: new_path}})
+
+    def _set_evidence_urls(self, evidence_path):
+        urls = derivative_urls(self.media_store, evidence_path, policy=self.policy)
+        for name, field in EVIDENCE_FIELDS.items():
+            collection = self.collections.get(name)
+            if collection is not None:
+                collection.update_many({field: evidence_path}, {'$set': {'evidence_urls': urls}})
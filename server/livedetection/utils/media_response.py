@@ -0,0 +1,165 @@
+"""
+HTTP responses for stored media: streaming, Range, conditional GET and sendfile offload
+"""
+import mimetypes
+import re
+
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+
+from ..config.settings import CONFIG
+
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('image/avif', '.avif')
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def media_etag(path, stat, media_store=None):
+    """Strong ETag: the content hash for store objects, size and mtime for anything else"""
+    digest = media_store.digest_of(path) if media_store is not None else None
+    if digest:
+        return f'"{digest}"'
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range Range header
+
+    Args:
+        header (str): Range header value, e.g. 'bytes=0-1023', 'bytes=-500'
+        size (int): File size in bytes
+
+    Returns:
+        tuple: (start, end) inclusive, None to serve the whole file (no, malformed
+        or multi-range header), or False when the range cannot be satisfied
+    """
+    match = RANGE_PATTERN.match(header.strip()) if header else None
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def iter_file(path, start, length, chunk_size):
+    """Yield length bytes of a file from start"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        # If-None-Match wins over If-Modified-Since
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+    modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return modified_since is not None and int(mtime) <= modified_since
+
+
+def _range_applies(request, etag, mtime):
+    """If-Range: only honour the Range when the client's copy is still current"""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    validator_date = parse_http_date_safe(if_range)
+    return validator_date is not None and int(mtime) <= validator_date
+
+
+def media_response(request, path, media_store=None, config=None):
+    """
+    Build the response for one media file
+
+    The file is streamed in chunks, never read whole. Store objects are
+    immutable (their name is their hash) and cached for a year; other files
+    revalidate. With SENDFILE set, the front web server sends the bytes
+    and handles Range itself.
+
+    Args:
+        request: Django request (GET or HEAD)
+        path (Path): Resolved file inside the media root
+        media_store: MediaStore, used for hash ETags and X-Accel-Redirect keys
+        config (dict): MEDIA_SERVING settings, defaults to CONFIG['MEDIA_SERVING']
+
+    Returns:
+        HttpResponse: 200, 206, 304 or 416 response
+    """
+    config = config or CONFIG['MEDIA_SERVING']
+    stat = path.stat()
+    etag = media_etag(path, stat, media_store)
+    immutable = media_store is not None and media_store.digest_of(path) is not None
+
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': (
+            f"private, max-age={config['IMMUTABLE_MAX_AGE']}, immutable" if immutable
+            else f"private, max-age={config['MAX_AGE']}, must-revalidate"
+        ),
+        'Accept-Ranges': 'bytes'
+    }
+
+    if _not_modified(request, etag, stat.st_mtime):
+        response = HttpResponseNotModified()
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    content_type = mimetypes.guess_type(str(path))[0] or 'application/octet-stream'
+
+    sendfile = config['SENDFILE']
+    if sendfile:
+        response = HttpResponse(content_type=content_type)
+        if sendfile == 'x-accel-redirect':
+            key = media_store.key_of(path) if media_store is not None else path.name
+            response['X-Accel-Redirect'] = config['ACCEL_REDIRECT_PREFIX'].rstrip('/') + '/' + key
+        else:
+            response['X-Sendfile'] = str(path)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    size = stat.st_size
+    byte_range = parse_range(request.headers.get('Range'), size) if _range_applies(request, etag, stat.st_mtime) else None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    start, end = byte_range or (0, size - 1)
+    length = max(0, end - start + 1)
+    body = iter_file(path, start, length, config['CHUNK_SIZE']) if request.method != 'HEAD' else []
+
+    response = StreamingHttpResponse(body, content_type=content_type, status=206 if byte_range else 200)
+    response['Content-Length'] = str(length)
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    for name, value in headers.items():
+        response[name] = value
+    return response
@@ -0,0 +1,273 @@
+"""
+Content-addressed media store: one canonical file per content hash, sharded on disk
+"""
+import hashlib
+import os
+import re
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from django.urls import reverse
+from pymongo import MongoClient
+
+from ..config.settings import CONFIG
+
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class MediaStore:
+    def __init__(self, media_root=None, collection=None, config=None):
+        """
+        Initialize the media store
+
+        A file is stored once at <ROOT>/<ab>/<cd>/<sha256><ext>, whatever
+        uploaded or rendered it. Each object has a media_objects document
+        listing what references it (detections, violations), so identical
+        frames share one copy and unreferenced objects can be found.
+
+        Args:
+            media_root: Directory media paths and keys are relative to, defaults to CONFIG['PATHS']['MEDIA_DIR']
+            collection: Mongo collection for object metadata and references, None disables tracking
+            config (dict): MEDIA_STORE settings, defaults to CONFIG['MEDIA_STORE']
+        """
+        self.config = config or CONFIG['MEDIA_STORE']
+        self.media_root = Path(media_root or CONFIG['PATHS']['MEDIA_DIR']).resolve()
+        self.root = self.media_root / self.config['DIRECTORY']
+        self.collection = collection
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        # Bytes written and saved by deduplication, per media class
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def digest(data):
+        """Content hash of a bytes buffer"""
+        return hashlib.sha256(data).hexdigest()
+
+    def key_for(self, digest, ext):
+        """Media key (path relative to the media root) of an object"""
+        width, levels = self.config['SHARD_WIDTH'], self.config['SHARD_LEVELS']
+        shards = [digest[level * width:(level + 1) * width] for level in range(levels)]
+        return '/'.join([self.config['DIRECTORY'], *shards, f"{digest}{ext.lower()}"])
+
+    def path_for(self, digest, ext):
+        """Absolute path of an object"""
+        return self.media_root / self.key_for(digest, ext)
+
+    def put_bytes(self, data, ext, media_class, refs=(), digest=None):
+        """
+        Store a buffer, writing it only if this content is not stored yet
+
+        Args:
+            data (bytes): Encoded file content
+            ext (str): File extension including the dot, e.g. '.jpg'
+            media_class (str): 'upload', 'annotated' or 'evidence'
+            refs: (kind, id) pairs referencing the object, e.g. ('detection', 'DET_...')
+            digest (str): Precomputed content hash
+
+        Returns:
+            str: Absolute path of the canonical copy
+        """
+        digest = digest or self.digest(data)
+        path = self.path_for(digest, ext)
+
+        written = not path.exists()
+        if written:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Unique temporary name: concurrent writers of the same content all end in one file
+            partial_path = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.part")
+            partial_path.write_bytes(data)
+            os.replace(partial_path, path)
+
+        self._count(media_class, len(data), written)
+        self._track(digest, ext, media_class, len(data), refs)
+        return str(path)
+
+    def put_file(self, source_path, media_class, refs=()):
+        """Store a file from disk (e.g. a legacy flat-directory file); see put_bytes"""
+        source_path = Path(source_path)
+        return self.put_bytes(source_path.read_bytes(), source_path.suffix, media_class, refs)
+
+    def _count(self, media_class, size, written):
+        with self._stats_lock:
+            stats = self._stats.setdefault(media_class, {'written': 0, 'bytes_written': 0, 'deduplicated': 0, 'bytes_deduplicated': 0})
+            if written:
+                stats['written'] += 1
+                stats['bytes_written'] += size
+            else:
+                stats['deduplicated'] += 1
+                stats['bytes_deduplicated'] += size
+
+    def get_stats(self):
+        """Files and bytes this process wrote (or found already stored), per media class"""
+        with self._stats_lock:
+            return {media_class: dict(stats) for media_class, stats in self._stats.items()}
+
+    def storage_totals(self):
+        """
+        Objects and stored bytes per media class, from media_objects
+
+        Returns:
+            dict: media_class -> {'objects', 'bytes'}, empty when tracking is disabled
+        """
+        if self.collection is None:
+            return {}
+        try:
+            rows = self.collection.aggregate([
+                {'$group': {'_id': '$media_class', 'objects': {'$sum': 1}, 'bytes': {'$sum': '$size'}}}
+            ])
+            return {row['_id'] or 'unknown': {'objects': row['objects'], 'bytes': row['bytes']} for row in rows}
+        except Exception as e:
+            print(f"Error totalling media objects: {e}")
+            return {}
+
+    def _track(self, digest, ext, media_class, size, refs):
+        if self.collection is None:
+            return
+        try:
+            update = {
+                '$set': {'key': self.key_for(digest, ext), 'media_class': media_class, 'size': size},
+                '$setOnInsert': {'created_at': datetime.now()}
+            }
+            refs = [{'kind': kind, 'id': owner_id} for kind, owner_id in refs]
+            if refs:
+                update['$addToSet'] = {'refs': {'$each': refs}}
+            self.collection.update_one({'_id': digest}, update, upsert=True)
+        except Exception as e:
+            print(f"Error tracking media object {digest}: {e}")
+
+    def add_reference(self, path, kind, owner_id):
+        """
+        Record that a detection/violation uses a stored object
+
+        Args:
+            path: Absolute path or media key of the object
+            kind (str): 'detection' or 'violation'
+            owner_id: detection_id or violation_id
+
+        Returns:
+            bool: True when the reference was recorded
+        """
+        digest = self.digest_of(path)
+        if digest is None or self.collection is None:
+            return False
+        try:
+            # Upsert: the reference may land before a background write has tracked the object
+            self.collection.update_one(
+                {'_id': digest},
+                {'$addToSet': {'refs': {'kind': kind, 'id': owner_id}}, '$setOnInsert': {'created_at': datetime.now()}},
+                upsert=True
+            )
+            return True
+        except Exception as e:
+            print(f"Error adding reference to media object {digest}: {e}")
+            return False
+
+    def release(self, path, kind, owner_id):
+        """Drop a reference; objects left without references can be removed by a cleanup job"""
+        digest = self.digest_of(path)
+        if digest is None or self.collection is None:
+            return False
+        try:
+            self.collection.update_one({'_id': digest}, {'$pull': {'refs': {'kind': kind, 'id': owner_id}}})
+            return True
+        except Exception as e:
+            print(f"Error releasing media object {digest}: {e}")
+            return False
+
+    def remove(self, path):
+        """
+        Delete a stored object and its media_objects document (e.g. once replaced by a re-encoded copy)
+
+        Args:
+            path: Absolute path or media key of the object
+
+        Returns:
+            bool: True when the object was removed
+        """
+        digest = self.digest_of(path)
+        if digest is None:
+            return False
+        try:
+            self.resolve(path).unlink(missing_ok=True)
+            if self.collection is not None:
+                self.collection.delete_one({'_id': digest})
+            return True
+        except Exception as e:
+            print(f"Error removing media object {digest}: {e}")
+            return False
+
+    def lookup(self, path):
+        """The media_objects document of a stored object, or None"""
+        digest = self.digest_of(path)
+        if digest is None or self.collection is None:
+            return None
+        try:
+            return self.collection.find_one({'_id': digest})
+        except Exception as e:
+            print(f"Error looking up media object {digest}: {e}")
+            return None
+
+    def key_of(self, path):
+        """Media key of an absolute path or key inside the media root, or None outside it"""
+        resolved = self.resolve(path)
+        return resolved.relative_to(self.media_root).as_posix() if resolved is not None else None
+
+    def digest_of(self, path):
+        """Content hash of a store object's path or key, or None (outside the store, or a derivative)"""
+        key = self.key_of(path) if path else None
+        if key is None or not key.startswith(self.config['DIRECTORY'] + '/'):
+            return None
+        stem = Path(key).stem
+        return stem if DIGEST_PATTERN.match(stem) else None
+
+    def url_for(self, path):
+        """serve_media URL of a file inside the media root, or '' outside it"""
+        key = self.key_of(path) if path else None
+        return reverse('serve_media', args=[key]) if key else ''
+
+    def resolve(self, path):
+        """
+        Map a media key (or absolute path) to a file inside the media root
+
+        Legacy flat-directory keys such as violations/VIO1_evidence.jpg resolve
+        too. Anything escaping the media root resolves to None.
+
+        Args:
+            path: Media key relative to the media root, or absolute path
+
+        Returns:
+            Path: Absolute path (which may not exist yet), or None
+        """
+        candidate = Path(path)
+        if not candidate.is_absolute():
+            candidate = self.media_root / candidate
+        candidate = candidate.resolve()
+
+        if candidate != self.media_root and self.media_root not in candidate.parents:
+            return None
+        return candidate
+
+
+_media_store = None
+_media_store_lock = threading.Lock()
+
+
+def peek_media_store():
+    """This process's MediaStore if it has been created, else None"""
+    return _media_store
+
+
+def get_media_store():
+    """This process's MediaStore, tracking objects in sentra.media_objects"""
+    global _media_store
+    with _media_store_lock:
+        if _media_store is None:
+            database = CONFIG['DATABASE']
+            client = MongoClient(database['MONGO_URI'])
+            collection = client[database['DB_NAME']][database['COLLECTIONS']['media_objects']]
+            _media_store = MediaStore(collection=collection)
+    return _media_store
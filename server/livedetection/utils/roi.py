@@ -0,0 +1,180 @@
+"""
+Per-camera regions of interest: crop frames to the enforceable lane before inference
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from ..config.settings import CONFIG
+from .frame import Frame
+
+BOX_KEYS = ('x1', 'y1', 'x2', 'y2')
+
+
+def parse_polygon(points):
+    """
+    Validate an ROI polygon from a cameras document
+
+    Args:
+        points: [[x, y], ...] as fractions of the frame width/height
+
+    Returns:
+        numpy.ndarray: (N, 2) float array, or None when the polygon is missing or invalid
+    """
+    if not points:
+        return None
+
+    try:
+        polygon = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+    except (TypeError, ValueError):
+        return None
+
+    if len(polygon) < 3 or polygon.min() < 0.0 or polygon.max() > 1.0:
+        return None
+    return polygon
+
+
+def shift_boxes(result, dx, dy):
+    """
+    Move every x1/y1/x2/y2 box in a detection result by (dx, dy), in place
+
+    Box dicts shared between fields (e.g. a rider's helmet_bbox reused as the
+    frame-level helmet_bbox) are shifted once.
+    """
+    seen = set()
+
+    def visit(value):
+        if isinstance(value, dict):
+            if id(value) in seen:
+                return
+            seen.add(id(value))
+            if all(key in value for key in BOX_KEYS):
+                value['x1'] += dx
+                value['x2'] += dx
+                value['y1'] += dy
+                value['y2'] += dy
+            for item in value.values():
+                visit(item)
+        elif isinstance(value, list):
+            for item in value:
+                visit(item)
+
+    visit(result)
+    return result
+
+
+class RegionOfInterest:
+    def __init__(self, polygon, mask_outside=True):
+        """
+        Initialize a camera's region of interest
+
+        Args:
+            polygon: (N, 2) points as fractions of the frame width/height
+            mask_outside (bool): Black out pixels inside the bounding rectangle but outside the polygon
+        """
+        self.polygon = np.asarray(polygon, dtype=np.float32).reshape(-1, 2)
+        self.mask_outside = mask_outside
+        self._geometry = {}
+
+    def _geometry_for(self, shape):
+        """Bounding rectangle and polygon mask in pixels, cached per frame size"""
+        height, width = shape[:2]
+        if (height, width) not in self._geometry:
+            points = np.round(self.polygon * [width, height]).astype(np.int32)
+            x, y = (int(v) for v in points.min(axis=0))
+            x2, y2 = (int(v) for v in points.max(axis=0))
+            w, h = max(1, min(width, x2) - x), max(1, min(height, y2) - y)
+
+            mask = None
+            if self.mask_outside:
+                mask = np.zeros((h, w), dtype=np.uint8)
+                cv2.fillPoly(mask, [points - [x, y]], 255)
+                if mask.all():
+                    mask = None  # Rectangular ROI, nothing to black out
+
+            self._geometry[(height, width)] = (x, y, w, h, mask)
+        return self._geometry[(height, width)]
+
+    def apply(self, frame):
+        """
+        Crop a frame to the ROI's bounding rectangle
+
+        Args:
+            frame: Full frame
+
+        Returns:
+            tuple: (cropped Frame, (dx, dy) offset of the crop in the full frame)
+        """
+        x, y, w, h, mask = self._geometry_for(frame.image.shape)
+        crop = frame.image[y:y + h, x:x + w]
+        if mask is not None:
+            crop = cv2.bitwise_and(crop, crop, mask=mask)
+
+        # No path: nothing downstream should reopen the full-size original for this crop
+        cropped = Frame(crop, camera_id=frame.camera_id, timestamp=frame.timestamp)
+        # Plate crops still reach the full-resolution original through the parent
+        cropped.parent = (frame, (x, y))
+        if frame.motion_mask is not None:
+            scale = frame.motion_mask.shape[1] / float(frame.image.shape[1])
+            mx, my = int(x * scale), int(y * scale)
+            cropped.motion_mask = frame.motion_mask[my:my + max(1, int(h * scale)), mx:mx + max(1, int(w * scale))]
+        return cropped, (x, y)
+
+
+class CameraRegions:
+    def __init__(self, db_handler=None, config=None):
+        """
+        Initialize the per-camera ROI lookup, read from cameras.roi and cached
+
+        Args:
+            db_handler: DatabaseHandler used to load camera documents (None: only preset ROIs)
+            config (dict): ROI settings, defaults to CONFIG['ROI']
+        """
+        self.db_handler = db_handler
+        self.config = config or CONFIG['ROI']
+        self._regions = {}
+        self._lock = threading.Lock()
+
+    def set(self, camera_id, points, mask_outside=None):
+        """Use this polygon for a camera (None clears it) without reading Mongo"""
+        if mask_outside is None:
+            mask_outside = self.config['MASK_OUTSIDE']
+        polygon = parse_polygon(points)
+        region = RegionOfInterest(polygon, mask_outside) if polygon is not None else None
+        with self._lock:
+            self._regions[camera_id] = (region, float('inf'))
+        return region
+
+    def get(self, camera_id):
+        """
+        The camera's ROI, or None when it has none (or ROIs are disabled)
+
+        Args:
+            camera_id: Camera identifier
+
+        Returns:
+            RegionOfInterest: Region to crop to, or None for the full frame
+        """
+        if not self.config['ENABLED']:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            cached = self._regions.get(camera_id)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+
+        region = None
+        camera = self.db_handler.get_camera(camera_id) if self.db_handler is not None else None
+        if camera:
+            polygon = parse_polygon(camera.get('roi'))
+            if polygon is not None:
+                region = RegionOfInterest(polygon, camera.get('roi_mask', self.config['MASK_OUTSIDE']))
+            elif camera.get('roi'):
+                print(f"Ignoring invalid ROI for camera {camera_id}: {camera.get('roi')}")
+
+        with self._lock:
+            self._regions[camera_id] = (region, now + self.config['CACHE_SECONDS'])
+        return region
@@ -4,6 +4,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.core.files.storage import default_storage
 from django.conf import settings
+from django.urls import reverse
 from pymongo import MongoClient
 import json
 import os
@@ -27,12 +28,20 @@ def clean_for_json(data):
 
 
 
-from .ai_models.helmet_detector import HelmetDetector
-from .ai_models.plate_reader import PlateReader
 from .ai_models.violation_processor import ViolationProcessor
-from .training.model_trainer import ModelTrainer
 from .utils.database_handler import DatabaseHandler
 from .utils.file_handler import FileHandler
+from .utils.frame import get_crop_decode_stats
+from .utils.media_response import media_response
+from .utils.encoding import get_encoding_policy
+from .utils.media_store import get_media_store, peek_media_store
+from .utils.roi import CameraRegions
+from .ai_models.model_cascade import ModelCascade
+from .pipeline import DetectionPipeline, QueueFullError, QueueUnavailableError, get_job_queue, peek_job_queue
+from .evidence_writer import peek_evidence_writer
+from .stage_graph import abandoned_stages
+from .config.settings import CONFIG
+from . import model_registry  # AI models are created on first use
 
 # MongoDB connection
 MONGO_URI = "mongodb://localhost:27017/"
@@ -46,13 +55,10 @@ violations_collection = db["violations"]
 payments_collection = db["payments"]
 cameras_collection = db["cameras"]
 
-# Initialize AI models
-helmet_detector = HelmetDetector()
-plate_reader = PlateReader()
 violation_processor = ViolationProcessor()
-model_trainer = ModelTrainer()
 db_handler = DatabaseHandler()
 file_handler = FileHandler()
+detection_pipeline = DetectionPipeline(violation_processor, db_handler, regions=CameraRegions(db_handler))
 
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -68,11 +74,28 @@ def process_image(request):
         image_file = request.FILES['image']
         camera_id = request.POST.get('camera_id', 'upload')
         
-        # Save uploaded image
-        file_path = file_handler.save_uploaded_image(image_file, camera_id)
+        # Cameras can ask for the frame to be processed in the background
+        async_mode = request.POST.get('async', str(CONFIG['JOB_QUEUE']['ASYNC_BY_DEFAULT'])).lower() == 'true'
+        if async_mode:
+            try:
+                get_job_queue(detection_pipeline, db_handler).ensure_capacity()
+            except (QueueFullError, QueueUnavailableError) as e:
+                return queue_rejection_response(e)
+        
+        # Decode once from the upload buffer; the original is written in the background
+        try:
+            frame = file_handler.read_uploaded_image(image_file, camera_id)
+        except ValueError as e:
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=400)
+        
+        if async_mode:
+            return enqueue_image_detection(frame, camera_id)
         
         # Process image with AI models
-        detection_result = process_image_detection(file_path, camera_id)
+        detection_result = process_image_detection(frame, camera_id)
         
         return JsonResponse({
             'status': 'success',
@@ -89,69 +112,15 @@ def process_image(request):
             'message': 'Image processed successfully'
         })
 
-def process_image_detection(image_path, camera_id):
-    """Core image processing logic"""
+def process_image_detection(frame, camera_id):
+    """Core image processing logic
+    
+    Args:
+        frame: Frame decoded once at ingest (a path or image array is also accepted)
+        camera_id: Camera identifier
+    """
     try:
-        # Detect helmets and persons
-        helmet_result = helmet_detector.detect(image_path)
-        
-        # Detect license plates
-        plate_result = plate_reader.detect_and_read(image_path)
-        
-        # Generate unique detection ID
-        detection_id = f"DET_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
-        
-        # Combine results
-        detection_data = {
-            'detection_id': detection_id,
-            'camera_id': camera_id,
-            'timestamp': datetime.now(),
-            'original_image': image_path,
-            
-            # Person detection
-            'person_detected': helmet_result.get('person_detected', False),
-            'person_confidence': helmet_result.get('person_confidence', 0.0),
-            'person_bbox': helmet_result.get('person_bbox', {}),
-            
-            # Helmet detection
-            'helmet_detected': helmet_result.get('helmet_detected', False),
-            'helmet_confidence': helmet_result.get('helmet_confidence', 0.0),
-            'helmet_bbox': helmet_result.get('helmet_bbox', {}),
-            
-            # Plate detection
-            'plate_detected': plate_result.get('plate_detected', False),
-            'plate_number': plate_result.get('plate_number', ''),
-            'plate_confidence': plate_result.get('plate_confidence', 0.0),
-            'plate_bbox': plate_result.get('plate_bbox', {}),
-            
-            # Vehicle detection
-            'vehicle_detected': helmet_result.get('vehicle_detected', False),
-            'vehicle_type': helmet_result.get('vehicle_type', ''),
-            'vehicle_bbox': helmet_result.get('vehicle_bbox', {}),
-        }
-        
-        # Check for violation
-        is_violation = violation_processor.check_violation(detection_data)
-        detection_data['is_violation'] = is_violation
-        
-        if is_violation:
-            detection_data['violation_type'] = 'NO_HELMET'
-            
-            # Create processed image with annotations
-            processed_image_path = violation_processor.create_annotated_image(
-                image_path, detection_data
-            )
-            detection_data['processed_image'] = processed_image_path
-            
-            # Generate violation memo if plate detected
-            if detection_data['plate_detected']:
-                violation_memo = violation_processor.generate_violation_memo(detection_data)
-                detection_data['violation_memo'] = violation_memo
-        
-        # Save to database
-        db_handler.save_detection(detection_data)
-        
-        return detection_data
+        return detection_pipeline.process(frame, camera_id)
         
     except Exception as e:
         print(f"Error in process_image_detection: {str(e)}")
@@ -160,6 +129,43 @@ def process_image_detection(image_path, camera_id):
         'message': str(e)
     }, status=500)
 
+def queue_rejection_response(error):
+    """429 with Retry-After when the job queue is full, 503 when it cannot take jobs at all"""
+    if isinstance(error, QueueFullError):
+        response = JsonResponse({
+            'status': 'error',
+            'message': str(error)
+        }, status=429)
+        response['Retry-After'] = str(error.retry_after)
+        return response
+    
+    return JsonResponse({
+        'status': 'error',
+        'message': str(error)
+    }, status=503)
+
+def enqueue_image_detection(frame, camera_id):
+    """Queue a frame for background processing and answer with its detection_id
+    
+    Args:
+        frame: Frame decoded at ingest
+        camera_id: Camera identifier
+    """
+    try:
+        detection_id = get_job_queue(detection_pipeline, db_handler).enqueue(frame, camera_id)
+    except (QueueFullError, QueueUnavailableError) as e:
+        return queue_rejection_response(e)
+    
+    return JsonResponse({
+        'status': 'success',
+        'data': {
+            'detection_id': detection_id,
+            'processing_status': 'queued',
+            'status_url': reverse('get_detection_status', args=[detection_id])
+        },
+        'message': 'Image queued for processing'
+    }, status=202)
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_detections(request):
@@ -188,6 +194,32 @@ def get_detections(request):
             'message': str(e)
         }, status=500)
 
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_detection_status(request, detection_id):
+    """Get the processing status, and the result once finished, of one detection"""
+    try:
+        detection = db_handler.get_detection(detection_id)
+        if not detection:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Detection not found'
+            }, status=404)
+        
+        # Records written by the synchronous path have no processing_status
+        detection.setdefault('processing_status', 'completed')
+        
+        return JsonResponse({
+            'status': 'success',
+            'data': clean_for_json(detection)
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=500)
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_violations(request):
@@ -230,12 +262,79 @@ def get_stats(request):
             'message': str(e)
         }, status=500)
 
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_inference_stats(request):
+    """Get dynamic batching, plate OCR cascade, model cascade, job queue, evidence writer, media encoding and model server statistics"""
+    try:
+        # Report on the models that are loaded, never load them just for stats
+        batch_inference = model_registry.peek('batch_inference')
+        plate_reader = model_registry.peek('plate_reader')
+        helmet_detector = model_registry.peek('helmet_detector')
+        
+        if model_registry.server_mode():
+            stats = {'model_server': model_registry.get_model_client().get_stats()}
+        elif batch_inference is None:
+            stats = {'dynamic_batching': False}
+        else:
+            stats = {'dynamic_batching': True, **batch_inference.get_stats()}
+        
+        stats['loaded_models'] = model_registry.loaded_models()
+        if peek_job_queue() is not None:
+            stats['job_queue'] = peek_job_queue().get_stats()
+        if peek_evidence_writer() is not None:
+            stats['evidence_writer'] = peek_evidence_writer().get_stats()
+        stats['abandoned_stages'] = abandoned_stages()
+        stats['media_encoding'] = get_encoding_policy().get_stats()
+        if peek_media_store() is not None:
+            stats['media_store'] = peek_media_store().get_stats()
+        if plate_reader is not None and plate_reader.reader is not None:
+            stats['plate_cascade'] = plate_reader.get_cascade_stats()
+            stats['plate_crop_decode'] = get_crop_decode_stats()
+        if helmet_detector is not None and isinstance(helmet_detector, ModelCascade):
+            stats['model_cascade'] = helmet_detector.get_stats()
+        
+        return JsonResponse({
+            'status': 'success',
+            'data': stats
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=500)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_storage_stats(request):
+    """Get stored objects and bytes per media class, with the encoding profile of each class"""
+    try:
+        policy = get_encoding_policy()
+        totals = get_media_store().storage_totals()
+        
+        return JsonResponse({
+            'status': 'success',
+            'data': {
+                media_class: {**usage, 'encoding': policy.profile(media_class)}
+                for media_class, usage in totals.items()
+            },
+            'total_bytes': sum(usage['bytes'] for usage in totals.values())
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=500)
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def train_model(request):
     """Start model training"""
     try:
         # Check if training is already in progress
+        model_trainer = model_registry.get_model_trainer()
         if model_trainer.is_training():
             return JsonResponse({
                 'status': 'error',
@@ -263,7 +362,7 @@ def train_model(request):
 def get_training_status(request):
     """Get current training status"""
     try:
-        status = model_trainer.get_training_status()
+        status = model_registry.get_model_trainer().get_training_status()
         
         return JsonResponse({
             'status': 'success',
@@ -362,22 +461,21 @@ def get_cameras(request):
         }, status=500)
 
 @csrf_exempt
-@require_http_methods(["GET"])
+@require_http_methods(["GET", "HEAD"])
 def serve_media(request, file_path):
-    """Serve media files"""
+    """Serve media files (streamed, with Range and conditional GET support)"""
     try:
-        full_path = os.path.join(settings.MEDIA_ROOT, file_path)
+        # Media keys (store/ab/cd/<sha256>.jpg, or legacy violations/...) never resolve outside the media root
+        media_store = get_media_store()
+        full_path = media_store.resolve(file_path)
         
-        if not os.path.exists(full_path):
+        if full_path is None or not full_path.is_file():
             return JsonResponse({
                 'status': 'error',
                 'message': 'File not found'
             }, status=404)
         
-        with open(full_path, 'rb') as f:
-            response = HttpResponse(f.read())
-            response['Content-Type'] = 'image/jpeg'
-            return response
+        return media_response(request, full_path, media_store)
             
     except Exception as e:
         return JsonResponse({
@@ -1,3 +1,30 @@
+from unittest.mock import patch
+
 from django.test import TestCase
 
-# Create your tests here.
+from livefeed import views
+
+
+class MongoAvailabilityTestCase(TestCase):
+    """The Mongo reachability check is cached briefly, never for the life of the process"""
+    
+    def setUp(self):
+        views._mongo_available = None
+        views._mongo_checked_at = 0.0
+    
+    def tearDown(self):
+        views._mongo_available = None
+        views._mongo_checked_at = 0.0
+    
+    def test_failure_is_retried_after_the_retry_ttl(self):
+        with patch.object(views, 'client') as client, patch.object(views, 'time') as clock:
+            ping = client.admin.command
+            ping.side_effect = [Exception('down'), {'ok': 1}]
+            clock.monotonic.side_effect = [100.0, 101.0, 100.0 + views.MONGO_RETRY_TTL, 106.0, 107.0]
+            
+            self.assertFalse(views.mongo_available())
+            self.assertFalse(views.mongo_available())  # Still within the retry TTL
+            self.assertTrue(views.mongo_available())
+            self.assertTrue(views.mongo_available())  # Success is cached for MONGO_CHECK_TTL
+            
+            self.assertEqual(ping.call_count, 2)
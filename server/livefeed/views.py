@@ -3,34 +3,50 @@ from django.views.decorators.csrf import csrf_exempt
 from pymongo import MongoClient
 from datetime import datetime, timedelta
 import json
+import time
 
 # MongoDB Connection
-try:
-    MONGO_URI = "mongodb://localhost:27017/"
-    client = MongoClient(MONGO_URI)
-    db = client["sentra"]
-    
-    # Test connection
-    client.admin.command('ping')
-    print("MongoDB connection successful for LiveFeed!")
-    
-except Exception as e:
-    print(f"MongoDB connection failed: {e}")
-    client = None
-    db = None
+# MongoClient connects in the background; reachability is checked on first use
+# instead of at import so manage.py commands and worker boot don't wait on Mongo.
+MONGO_URI = "mongodb://localhost:27017/"
+client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+db = client["sentra"]
 
 # Collections
-if db is not None:
-    cameras_collection = db["cameras"]
-    violations_collection = db["violations"]
-    vehicles_collection = db["vehicles"]
-    users_collection = db["admin"]
+cameras_collection = db["cameras"]
+violations_collection = db["violations"]
+vehicles_collection = db["vehicles"]
+users_collection = db["admin"]
+
+# Reachability is re-checked after a TTL, and sooner after a failure, so a
+# Mongo blip only puts the live feed on mock data until the next check.
+MONGO_CHECK_TTL = 30
+MONGO_RETRY_TTL = 5
+
+_mongo_available = None
+_mongo_checked_at = 0.0
+
+def mongo_available():
+    """Ping MongoDB and cache the result for a short TTL; views fall back to mock data when it is down"""
+    global _mongo_available, _mongo_checked_at
+    ttl = MONGO_CHECK_TTL if _mongo_available else MONGO_RETRY_TTL
+    if _mongo_available is None or time.monotonic() - _mongo_checked_at >= ttl:
+        try:
+            client.admin.command('ping')
+            if not _mongo_available:
+                print("MongoDB connection successful for LiveFeed!")
+            _mongo_available = True
+        except Exception as e:
+            print(f"MongoDB connection failed: {e}")
+            _mongo_available = False
+        _mongo_checked_at = time.monotonic()
+    return _mongo_available
 
 @csrf_exempt
 def get_cameras(request):
     if request.method == 'GET':
         try:
-            if db is None or cameras_collection.count_documents({}) == 0:
+            if not mongo_available() or cameras_collection.count_documents({}) == 0:
                 # Return mock camera data
                 mock_cameras = [
                     {
@@ -115,7 +131,7 @@ def get_live_detections(request):
         try:
             camera_id = request.GET.get('camera_id')
             
-            if db is None or violations_collection.count_documents({}) == 0:
+            if not mongo_available() or violations_collection.count_documents({}) == 0:
                 # Return mock detection data
                 mock_detections = [
                     {
@@ -190,6 +206,8 @@ def get_live_detections(request):
                     "detected_at": violation.get("created_at").isoformat() if violation.get("created_at") else datetime.now().isoformat(),
                     "confidence": 90 + (hash(violation.get("violation_id", "")) % 10),  # Mock confidence
                     "evidence_photo": violation.get("evidence_photo"),
+                    "evidence_thumbnail": (violation.get("evidence_urls") or {}).get("thumbnail", ""),
+                    "evidence_medium": (violation.get("evidence_urls") or {}).get("medium", ""),
                     "processed": violation.get("status") != "pending"
                 }
                 
@@ -220,7 +238,7 @@ def get_live_detections(request):
 def get_camera_status(request, camera_id):
     if request.method == 'GET':
         try:
-            if db is None:
+            if not mongo_available():
                 # Return mock status
                 return JsonResponse({
                     'status': 'success',
@@ -255,7 +273,7 @@ def get_camera_status(request, camera_id):
             data = json.loads(request.body)
             new_status = data.get('status')
             
-            if db is None:
+            if not mongo_available():
                 return JsonResponse({
                     'status': 'success',
                     'message': f'Camera {camera_id} status updated to {new_status}'
@@ -298,7 +316,7 @@ def get_camera_status(request, camera_id):
 def get_camera_stream(request, camera_id):
     if request.method == 'GET':
         try:
-            if db is None:
+            if not mongo_available():
                 # Return mock HTTP stream for testing
                 return JsonResponse({
                     'status': 'success',
@@ -120,6 +120,8 @@ def get_penalty_data(request):
                 "timestamp": penalty.get("created_at", datetime.now()).isoformat(),
                 "due_date": due_date.isoformat(),
                 "evidence_photo": penalty.get("evidence_photo", ""),
+                "evidence_thumbnail": (penalty.get("evidence_urls") or {}).get("thumbnail", ""),
+                "evidence_medium": (penalty.get("evidence_urls") or {}).get("medium", ""),
                 "owner_name": owner_info.get("name", "Unknown"),
                 "owner_mobile": owner_info.get("mobile_number", ""),
                 "owner_email": owner_info.get("email", ""),
@@ -321,6 +323,7 @@ def get_penalty_details(request, penalty_id):
                 "fine_amount": penalty.get("fine_amount", 0),
                 "location": penalty.get("location", ""),
                 "evidence_photo": penalty.get("evidence_photo", ""),
+                "evidence_medium": (penalty.get("evidence_urls") or {}).get("medium", ""),
                 "status": penalty.get("status", "pending"),
                 "created_at": penalty.get("created_at", datetime.now()).isoformat(),
                 "vehicle_info": {
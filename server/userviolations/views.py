@@ -154,6 +154,8 @@ def get_user_violations_history(request, user_id):
                 "time": violation.get("created_at").strftime("%H:%M") if violation.get("created_at") else "",
                 "status": status,
                 "evidencePhoto": violation.get("evidence_photo", ""),
+                "evidenceThumbnail": (violation.get("evidence_urls") or {}).get("thumbnail", ""),
+                "evidenceMedium": (violation.get("evidence_urls") or {}).get("medium", ""),
                 "evidence": f"Speed limit violation detected at {camera_location}",
                 "officerName": "Traffic Camera System",
                 "cameraId": f"CAM{violation.get('violation_id', '').replace('VIO', '')}",
@@ -423,6 +425,7 @@ def get_violation_details(request, user_id, violation_id):
             "status": violation.get("status", ""),
             "created_at": violation.get("created_at").isoformat() if violation.get("created_at") else "",
             "evidence_photo": violation.get("evidence_photo", ""),
+            "evidence_medium": (violation.get("evidence_urls") or {}).get("medium", ""),
             "vehicle": {
                 "plate_number": vehicle.get("plate_number", ""),
                 "make": vehicle.get("make", ""),